@@ -0,0 +1,210 @@
+"""
+Booking Archive for LockSpot - Raw SQL
+Moves finished bookings out of the live tables, and reads history across both
+
+Completed/Cancelled/Expired bookings that ended more than the retention window
+ago are moved, with their payments, QR codes and notifications, into the
+*archive tables (same columns and ids, no foreign keys). Each batch is one
+short transaction over a few hundred primary keys, so the live tables are
+never locked for long; scripts/maintenance/archive_bookings.py drives the
+batches and throttles between them. Bookings with a review stay live, since
+lockers_review cascades from lockers_booking and feeds location ratings.
+
+History reads stay transparent: a page is served from the live table alone
+while it is newer than the user's newest archived row, and merged with the
+archive once it reaches that far back.
+"""
+
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from . import hot_queries
+from .notifications import release_unread
+
+
+TERMINAL_STATUSES = ('Completed', 'Cancelled', 'Expired')
+
+BOOKING_COLUMNS = """
+    id, user_id, locker_id, discount_id, start_time, end_time, booking_type,
+    subtotal_amount, discount_amount, total_amount, status, cancellation_reason,
+    created_at, updated_at
+"""
+
+# (archive table, live table, columns, column referencing the booking), moved before the booking
+ARCHIVED_CHILDREN = [
+    ('lockers_paymentarchive', 'lockers_payment', """
+        id, booking_id, method_id, amount, payment_date, transaction_reference, status,
+        failure_reason, refund_amount, refund_date, processed_by
+    """, 'booking_id'),
+    ('lockers_qraccesscodearchive', 'lockers_qraccesscode', """
+        id, booking_id, location_id, code, code_type, generated_at, expires_at, used_at, is_used
+    """, 'booking_id'),
+    ('lockers_notificationarchive', 'lockers_notification', """
+        id, user_id, title, message, notification_type, related_booking_id, is_read, read_at, created_at
+    """, 'related_booking_id'),
+]
+
+ARCHIVE_TABLES = ['lockers_bookingarchive'] + [archive for archive, _, _, _ in ARCHIVED_CHILDREN]
+
+_STATUS_LIST = ", ".join(f"'{s}'" for s in TERMINAL_STATUSES)
+
+ELIGIBLE = f"""
+    b.status IN ({_STATUS_LIST})
+    AND b.end_time < NOW() - INTERVAL %s DAY
+    AND NOT EXISTS (SELECT 1 FROM lockers_review r WHERE r.booking_id = b.id)
+"""
+
+# Same page size as hot_queries.USER_NOTIFICATIONS
+NOTIFICATION_LIMIT = 50
+
+ARCHIVED_NOTIFICATIONS = """
+    SELECT id, title, message, notification_type, is_read,
+           read_at, created_at, related_booking_id
+    FROM lockers_notificationarchive
+    WHERE user_id = %s
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s
+"""
+
+
+# ==================== ARCHIVING ====================
+
+def next_batch(cursor, older_than_days: int, after_id: int, batch_size: int) -> List[int]:
+    """Ids of the next archivable bookings in primary-key order (a plain read, no locks)"""
+    cursor.execute(f"""
+        SELECT b.id FROM lockers_booking b
+        WHERE b.id > %s AND {ELIGIBLE}
+        ORDER BY b.id
+        LIMIT %s
+    """, (after_id, older_than_days, batch_size))
+    return [row[0] if isinstance(row, tuple) else row['id'] for row in cursor.fetchall()]
+
+
+def archive_batch(conn, ids: List[int], older_than_days: int) -> Dict[str, int]:
+    """
+    Move the given bookings (those still eligible once locked) and their
+    payments, QR codes and notifications into the archive tables, in one
+    transaction. Returns rows moved per live table.
+    """
+    moved = {'lockers_booking': 0}
+    moved.update({live: 0 for _, live, _, _ in ARCHIVED_CHILDREN})
+    if not ids:
+        return moved
+
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(ids))
+        # Lock the bookings: new payments, QR codes or reviews for them wait on
+        # these rows and then fail their foreign key check instead of being lost
+        cursor.execute(f"""
+            SELECT b.id FROM lockers_booking b
+            WHERE b.id IN ({placeholders}) AND {ELIGIBLE}
+            FOR UPDATE
+        """, (*ids, older_than_days))
+        locked = [row[0] for row in cursor.fetchall()]
+        if not locked:
+            conn.commit()
+            return moved
+
+        placeholders = ", ".join(["%s"] * len(locked))
+        for archive, live, columns, booking_column in ARCHIVED_CHILDREN:
+            cursor.execute(f"""
+                INSERT INTO {archive} ({columns})
+                SELECT {columns} FROM {live} WHERE {booking_column} IN ({placeholders})
+            """, locked)
+            if live == 'lockers_notification':
+                # Archived notifications can no longer be marked read
+                release_unread(cursor, f"related_booking_id IN ({placeholders})", locked)
+            cursor.execute(f"DELETE FROM {live} WHERE {booking_column} IN ({placeholders})", locked)
+            moved[live] = cursor.rowcount
+
+        cursor.execute(f"""
+            INSERT INTO lockers_bookingarchive ({BOOKING_COLUMNS})
+            SELECT {BOOKING_COLUMNS} FROM lockers_booking WHERE id IN ({placeholders})
+        """, locked)
+        cursor.execute(f"DELETE FROM lockers_booking WHERE id IN ({placeholders})", locked)
+        moved['lockers_booking'] = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return moved
+
+
+# ==================== HISTORY READS ====================
+
+def encode_page_cursor(row: Dict) -> str:
+    """Opaque `before` value for the page after `row`"""
+    return f"{row['created_at']:%Y%m%d%H%M%S}.{row['id']}"
+
+
+def decode_page_cursor(value: str) -> Tuple[datetime, int]:
+    """Inverse of encode_page_cursor; raises ValueError on anything else"""
+    stamp, _, row_id = value.partition('.')
+    return datetime.strptime(stamp, '%Y%m%d%H%M%S'), int(row_id)
+
+
+def merge_newest(live: List[Dict], archived: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+    """Merge two newest-first row lists by (created_at, id)"""
+    merged = heapq.merge(live, archived, key=lambda row: (row['created_at'], row['id']), reverse=True)
+    return list(islice(merged, limit))
+
+
+def _newest_archived(cursor, table: str, user_id: int) -> Optional[datetime]:
+    # Index-only lookup on (user_id, created_at)
+    cursor.execute(f"SELECT MAX(created_at) AS newest FROM {table} WHERE user_id = %s", (user_id,))
+    return cursor.fetchone()['newest']
+
+
+def _needs_archive(cursor, table: str, user_id: int, live: List[Dict], fetched: Optional[int]) -> bool:
+    """False when the live rows already cover the page: it is full and newer than anything archived"""
+    newest = _newest_archived(cursor, table, user_id)
+    if newest is None:
+        return False
+    return not (fetched and len(live) == fetched and live[-1]['created_at'] > newest)
+
+
+def booking_history(cursor, user_id: int, status: Optional[str] = None,
+                    before: Optional[Tuple[datetime, int]] = None,
+                    limit: Optional[int] = None) -> Tuple[List[Dict], bool]:
+    """
+    A user's bookings newest first across lockers_booking and the archive
+    (dictionary cursor). Returns (rows, has_more); every row when `limit` is None.
+    """
+    fetch = limit + 1 if limit else None
+    query, params = hot_queries.booking_list_query(user_id, status, before, fetch)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+
+    if (not status or status in TERMINAL_STATUSES) and \
+            _needs_archive(cursor, 'lockers_bookingarchive', user_id, rows, fetch):
+        query, params = hot_queries.booking_list_query(user_id, status, before, fetch,
+                                                       table='lockers_bookingarchive')
+        cursor.execute(query, params)
+        rows = merge_newest(rows, cursor.fetchall(), fetch)
+
+    if limit:
+        return rows[:limit], len(rows) > limit
+    return rows, False
+
+
+def archived_booking(cursor, booking_id: int, user_id: int) -> Optional[Dict]:
+    """A single archived booking of the user, in the booking list row shape"""
+    cursor.execute(hot_queries.BOOKING_LIST_SELECT.format(table='lockers_bookingarchive') + """
+        WHERE b.id = %s AND b.user_id = %s
+    """, (booking_id, user_id))
+    return cursor.fetchone()
+
+
+def notification_history(cursor, user_id: int) -> List[Dict]:
+    """The user's latest notifications across lockers_notification and the archive"""
+    cursor.execute(hot_queries.USER_NOTIFICATIONS, (user_id,))
+    rows = cursor.fetchall()
+    if _needs_archive(cursor, 'lockers_notificationarchive', user_id, rows, NOTIFICATION_LIMIT):
+        cursor.execute(ARCHIVED_NOTIFICATIONS, (user_id, NOTIFICATION_LIMIT))
+        rows = merge_newest(rows, cursor.fetchall(), NOTIFICATION_LIMIT)
+    return rows
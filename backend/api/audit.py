@@ -0,0 +1,286 @@
+"""
+Audit Log for LockSpot - Raw SQL
+Asynchronous, batched writer for lockers_auditlog
+
+record() only puts a tuple on a bounded in-memory queue, a few microseconds,
+so auditing adds nothing measurable to a request. A daemon thread per
+process takes whatever is queued (up to BATCH_SIZE entries) and writes it
+with one multi-row INSERT. When the database is slow or failing (a flush
+raising or taking longer than SLOW_FLUSH_SECONDS), batches go to a local
+append-only JSON-lines spill file instead, and keep going there for
+BACKOFF_SECONDS; a full queue spills from the request thread the same way.
+When the queue is idle and the database healthy again, the thread replays
+spill files into the table: its own, and those of other processes that were
+left untouched for STALE_SPILL_SECONDS (e.g. after a restart).
+
+Entries are written at least once and only lost if the process dies with
+entries still queued. Booking lifecycle entries come from the outbox
+(api/outbox.py); this covers the other status changes made by the views and
+the admin: lockers, discounts, payments and admin edits of bookings.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from db_utils import DatabaseConnection
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_SECONDS = 1.0
+SLOW_FLUSH_SECONDS = 0.5
+BACKOFF_SECONDS = 30
+STALE_SPILL_SECONDS = 3600
+
+# (user_id, action, table_name, record_id, old_values, new_values, ip_address, user_agent, created_at)
+INSERT_ENTRIES = """
+    INSERT INTO lockers_auditlog
+    (user_id, action, table_name, record_id, old_values, new_values, ip_address, user_agent, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def insert_entries(entries: List[tuple]):
+    rows = [
+        (*entry[:4],
+         None if entry[4] is None else json.dumps(entry[4], default=str),
+         None if entry[5] is None else json.dumps(entry[5], default=str),
+         *entry[6:])
+        for entry in entries
+    ]
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_ENTRIES, rows)
+        cursor.close()
+
+
+# ==================== WRITER ====================
+
+class AuditWriter:
+    """Bounded queue drained by a background thread, with a file to spill to"""
+
+    def __init__(self, spill_dir, queue_size: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE,
+                 insert=insert_entries, autostart: bool = True):
+        self.spill_dir = Path(spill_dir)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.insert = insert
+        self.autostart = autostart
+        self.stats = {'recorded': 0, 'written': 0, 'spilled': 0, 'replayed': 0}
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._spill_until = 0.0
+        self._pid = None
+        self._thread = None
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    @property
+    def spill_path(self) -> Path:
+        return self.spill_dir / f'audit-{os.getpid()}.jsonl'
+
+    def record(self, entry: tuple):
+        if self.autostart and self._pid != os.getpid():
+            self._start()
+        self.stats['recorded'] += 1
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._spill([entry])
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked after the parent started: its queue and thread are not ours
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.take(timeout=FLUSH_SECONDS)
+            try:
+                if batch:
+                    self.flush(batch)
+                elif time.monotonic() >= self._spill_until:
+                    self.replay_spills()
+            except Exception:
+                logger.exception('Audit writer failed to flush or replay entries')
+
+    def take(self, timeout: Optional[float] = None) -> List[tuple]:
+        """Wait up to `timeout` for an entry, then take whatever else is queued up to batch_size"""
+        try:
+            batch = [self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self, batch: List[tuple]):
+        if time.monotonic() < self._spill_until:
+            self._spill(batch)
+            return
+        started = time.monotonic()
+        try:
+            self.insert(batch)
+        except Exception:
+            self._spill(batch)
+            self._spill_until = time.monotonic() + BACKOFF_SECONDS
+            raise
+        self.stats['written'] += len(batch)
+        if time.monotonic() - started > SLOW_FLUSH_SECONDS:
+            self._spill_until = time.monotonic() + BACKOFF_SECONDS
+
+    def drain(self):
+        """Spill everything still queued (at exit: no database round trip)"""
+        while True:
+            batch = self.take()
+            if not batch:
+                return
+            self._spill(batch)
+
+    # ---------- spill files ----------
+
+    def _spill(self, entries: List[tuple]):
+        lines = ''.join(json.dumps(entry, default=str) + '\n' for entry in entries)
+        with self._spill_lock:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        self.stats['spilled'] += len(entries)
+
+    def _spill_files(self) -> List[Path]:
+        if not self.spill_dir.is_dir():
+            return []
+        stale = time.time() - STALE_SPILL_SECONDS
+        own = self.spill_path
+        return sorted(
+            path for path in self.spill_dir.glob('audit-*')
+            if path == own or path.stat().st_mtime < stale
+        )
+
+    def replay_spills(self) -> int:
+        """Insert spilled entries; stops (re-spilling the rest) at the first failure"""
+        replayed = 0
+        for path in self._spill_files():
+            claimed = self.spill_dir / f'audit-{os.getpid()}-{time.time_ns()}.replay'
+            with self._spill_lock:  # appends from this process go to a new file from now on
+                try:
+                    path.rename(claimed)
+                except FileNotFoundError:
+                    continue  # another process took it
+            with open(claimed, encoding='utf-8') as f:
+                entries = [tuple(json.loads(line)) for line in f if line.strip()]
+            for start in range(0, len(entries), self.batch_size):
+                batch = entries[start:start + self.batch_size]
+                try:
+                    self.insert(batch)
+                except Exception:
+                    self._spill(entries[start:])
+                    claimed.unlink()
+                    self._spill_until = time.monotonic() + BACKOFF_SECONDS
+                    self.stats['replayed'] += replayed
+                    raise
+                replayed += len(batch)
+            claimed.unlink()
+        self.stats['replayed'] += replayed
+        return replayed
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> AuditWriter:
+    """Writer configured from settings.AUDIT_SPILL_DIR"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                from django.conf import settings
+                _writer = AuditWriter(settings.AUDIT_SPILL_DIR)
+                atexit.register(_writer.drain)
+    return _writer
+
+
+# ==================== RECORDING ====================
+
+# (user_id, ip_address, user_agent) of whoever is making the changes
+_actor: ContextVar = ContextVar('audit_actor', default=(None, None, None))
+
+
+def client_ip(request) -> Optional[str]:
+    """
+    REMOTE_ADDR, unless it is one of settings.AUDIT_TRUSTED_PROXIES: then the
+    last X-Forwarded-For hop that is not a trusted proxy (earlier hops are
+    whatever the client sent)
+    """
+    from django.conf import settings
+    trusted = set(getattr(settings, 'AUDIT_TRUSTED_PROXIES', ()))
+    ip = request.META.get('REMOTE_ADDR')
+    if ip in trusted:
+        hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        while hops and ip in trusted:
+            ip = hops.pop()
+    return ip
+
+
+def actor_from(request) -> tuple:
+    user = getattr(request, 'user', None)
+    ip = client_ip(request)
+    return (
+        getattr(user, 'id', None) if getattr(user, 'is_authenticated', False) else None,
+        ip or None,
+        request.META.get('HTTP_USER_AGENT', '')[:500] or None,
+    )
+
+
+@contextmanager
+def acting_as(actor: tuple):
+    """Attribute the entries recorded inside the block to `actor` (see actor_from)"""
+    token = _actor.set(actor)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+def current_actor() -> tuple:
+    return _actor.get()
+
+
+def record(action: str, table_name: str, record_id: int, old_values: Optional[Dict] = None,
+           new_values: Optional[Dict] = None, request=None, actor: Optional[tuple] = None):
+    """Queue one audit entry by `actor`, else the request's user, else the current acting_as actor"""
+    if actor is None:
+        actor = actor_from(request) if request is not None else _actor.get()
+    get_writer().record((
+        actor[0], action, table_name, record_id, old_values, new_values, actor[1], actor[2],
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),  # local time, like NOW()
+    ))
+
+
+def record_status_changes(action: str, table_name: str, changes, field: str = 'status',
+                          request=None, actor: Optional[tuple] = None):
+    """One entry per (record id, old value, new value) that really changed"""
+    for record_id, old, new in changes:
+        if old != new:
+            record(action, table_name, record_id, {field: old}, {field: new}, request, actor)
@@ -3,12 +3,23 @@ JWT Authentication for Django REST Framework - 100% Raw SQL
 """
 
 import jwt
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Dict, Optional
 from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
 from db_utils import DatabaseConnection
 
+from .kiosk_sync import kiosk_key_location
+
 
 class MockUser:
     """Mock User object for authentication"""
@@ -24,8 +35,158 @@ class MockUser:
         self.is_authenticated = True
 
 
+class TokenCache:
+    """
+    Verified access tokens -> decoded claims, so a token the app sends again
+    and again is parsed and checked only once per process.
+
+    A hit still costs one HMAC-SHA256 of the token (the key), about what
+    jwt.decode spends on the HS256 signature; it saves the base64 and JSON
+    decoding and the claim checks, not the signature work.
+
+    Keys are HMAC-SHA256 digests of the whole token under JWT_SECRET: a token
+    that differs in any byte (header, claims or signature) is a different key
+    and goes through jwt.decode, and rotating the secret orphans every entry.
+    Entries are dropped when the token expires and the least recently used
+    ones are evicted beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> claims
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hmac.new(settings.JWT_SECRET.encode(), token.encode(), hashlib.sha256).digest()
+
+    def get(self, key: bytes) -> Optional[Dict]:
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims['exp'] <= time.time():
+                del self._entries[key]
+                claims = None
+            if claims is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, key: bytes, claims: Dict):
+        with self._lock:
+            self._entries[key] = claims
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_token_cache = None
+
+
+def get_token_cache() -> TokenCache:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache(settings.JWT_TOKEN_CACHE_SIZE)
+    return _token_cache
+
+
+class UserStateCache:
+    """
+    auth_user rows of authenticated users, kept for ttl seconds, so disabling
+    or demoting an account takes effect within seconds of the change while a
+    busy user costs one primary-key lookup per ttl instead of one per request
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # user_id -> (expires at, row or None)
+        self._lock = threading.Lock()
+        self.lookups = 0
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, email, first_name, last_name, phone,
+                       user_type, is_verified, is_active
+                FROM auth_user
+                WHERE id = %s
+            """, (user_id,))
+            row = cursor.fetchone()
+            cursor.close()
+
+        with self._lock:
+            self.lookups += 1
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (now + self.ttl, row)
+        return row
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_user_states = None
+
+
+def get_user_states() -> UserStateCache:
+    global _user_states
+    if _user_states is None:
+        _user_states = UserStateCache(settings.JWT_USER_CHECK_SECONDS, settings.JWT_TOKEN_CACHE_SIZE)
+    return _user_states
+
+
+def decode_access_token(token: str) -> Dict:
+    """Claims of a valid access token, from the cache when it was verified before"""
+    cache = get_token_cache()
+    key = cache.key(token)
+    claims = cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        cache.put(key, claims)
+    return claims
+
+
 class JWTAuthentication(BaseAuthentication):
-    """JWT Token Authentication - Raw SQL"""
+    """
+    JWT Token Authentication - Raw SQL
+
+    The token is verified from the token cache; the user (is_active and
+    user_type included) comes from auth_user through UserStateCache, so a
+    disabled or demoted account loses access within JWT_USER_CHECK_SECONDS
+    whatever the access token lifetime. A logout only revokes refresh tokens.
+    """
     
     def authenticate(self, request):
         auth_header = request.headers.get('Authorization')
@@ -41,44 +202,43 @@ class JWTAuthentication(BaseAuthentication):
             return None
         
         try:
-            payload = jwt.decode(
-                token,
-                settings.JWT_SECRET,
-                algorithms=[settings.JWT_ALGORITHM]
-            )
+            claims = decode_access_token(token)
         except jwt.ExpiredSignatureError:
             raise AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError:
             raise AuthenticationFailed('Invalid token')
         
-        # Get user from database using raw SQL
-        try:
-            with DatabaseConnection.get_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT id, email, first_name, last_name, phone, 
-                           user_type, is_verified, is_active
-                    FROM auth_user
-                    WHERE id = %s
-                """, (payload.get('user_id'),))
-                user_data = cursor.fetchone()
-                cursor.close()
-                
-                if not user_data:
-                    raise AuthenticationFailed('User not found')
-                
-                if not user_data['is_active']:
-                    raise AuthenticationFailed('User account is disabled')
-                
-                user = MockUser(user_data)
-                return (user, token)
-        except Exception as e:
-            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+        user_data = get_user_states().get(claims.get('user_id'))
+        if not user_data:
+            raise AuthenticationFailed('User not found')
+        if not user_data['is_active']:
+            raise AuthenticationFailed('User account is disabled')
+        return (MockUser(user_data), token)
+
+
+class IsKiosk(BasePermission):
+    """
+    Locker kiosk calls, authenticated by the X-Kiosk-Key header: the key of one
+    location (api.kiosk_sync.kiosk_key), set as request.kiosk_location_id
+    """
+    
+    def has_permission(self, request, view):
+        key = request.headers.get('X-Kiosk-Key', '')
+        request.kiosk_location_id = kiosk_key_location(key, settings.KIOSK_API_KEY)
+        return request.kiosk_location_id is not None
+
+
+class IsAdminUser(BasePermission):
+    """Authenticated users with user_type Admin (operations endpoints)"""
+    
+    def has_permission(self, request, view):
+        return getattr(request.user, 'user_type', None) == 'Admin'
 
 
 def create_access_token(user_data):
     """Generate JWT token for user - accepts dict or object"""
-    expiration = datetime.utcnow() + timedelta(hours=settings.JWT_EXPIRATION_HOURS)
+    now = datetime.utcnow()
+    expiration = now + timedelta(minutes=settings.JWT_ACCESS_TOKEN_MINUTES)
     
     # Handle both dict and object
     if isinstance(user_data, dict):
@@ -95,7 +255,7 @@ def create_access_token(user_data):
         'email': email,
         'user_type': user_type,
         'exp': expiration,
-        'iat': datetime.utcnow()
+        'iat': now
     }
     
     token = jwt.encode(
@@ -108,5 +268,99 @@ def create_access_token(user_data):
 
 
 def get_token_expiration_seconds():
-    """Get token expiration in seconds"""
-    return settings.JWT_EXPIRATION_HOURS * 3600
+    """Get access token expiration in seconds"""
+    return settings.JWT_ACCESS_TOKEN_MINUTES * 60
+
+
+# ==================== REFRESH TOKENS ====================
+# Opaque random strings; lockers_refreshtoken keeps their SHA-256 only.
+# Every refresh revokes the token used and issues a new one. A revoked token
+# coming back means it was copied, so all of the user's tokens are revoked.
+
+def _refresh_token_hash(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def issue_refresh_token(cursor, user_id: int) -> str:
+    """Store a new refresh token for the user in the caller's transaction"""
+    refresh_token = secrets.token_urlsafe(32)
+    cursor.execute("""
+        INSERT INTO lockers_refreshtoken (user_id, token_hash, expires_at, created_at)
+        VALUES (%s, %s, NOW() + INTERVAL %s DAY, NOW())
+    """, (user_id, _refresh_token_hash(refresh_token), settings.JWT_REFRESH_TOKEN_DAYS))
+    return refresh_token
+
+
+def token_pair(cursor, user: Dict) -> Dict:
+    """Access and refresh token fields of a login, registration or refresh response"""
+    return {
+        'access_token': create_access_token(user),
+        'refresh_token': issue_refresh_token(cursor, user['id']),
+        'token_type': 'Bearer',
+        'expires_in': get_token_expiration_seconds(),
+        'refresh_expires_in': settings.JWT_REFRESH_TOKEN_DAYS * 86400,
+    }
+
+
+def rotate_refresh_token(conn, refresh_token: str) -> Dict:
+    """
+    Exchange a refresh token for a new token pair, committing the rotation.
+    Raises AuthenticationFailed for unknown, revoked or expired tokens and
+    disabled accounts.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT t.id, t.user_id, t.revoked_at, t.expires_at <= NOW() AS expired,
+                   u.email, u.user_type, u.is_active
+            FROM lockers_refreshtoken t
+            JOIN auth_user u ON u.id = t.user_id
+            WHERE t.token_hash = %s
+            FOR UPDATE OF t
+        """, (_refresh_token_hash(refresh_token),))
+        row = cursor.fetchone()
+        if not row:
+            raise AuthenticationFailed('Invalid refresh token')
+        if row['revoked_at'] is not None:
+            revoke_user_refresh_tokens(cursor, row['user_id'])
+            conn.commit()
+            raise AuthenticationFailed('Refresh token has been revoked')
+        if row['expired']:
+            raise AuthenticationFailed('Refresh token has expired')
+        if not row['is_active']:
+            raise AuthenticationFailed('User account is disabled')
+
+        cursor.execute("UPDATE lockers_refreshtoken SET revoked_at = NOW() WHERE id = %s", (row['id'],))
+        tokens = token_pair(cursor, {'id': row['user_id'], 'email': row['email'], 'user_type': row['user_type']})
+        conn.commit()
+        return tokens
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def revoke_user_refresh_tokens(cursor, user_id: int) -> int:
+    """Sign the user out everywhere (at the latest when their access tokens expire)"""
+    cursor.execute("""
+        UPDATE lockers_refreshtoken SET revoked_at = NOW()
+        WHERE user_id = %s AND revoked_at IS NULL
+    """, (user_id,))
+    return cursor.rowcount
+
+
+def revoke_refresh_token(cursor, refresh_token: str, everywhere: bool = False) -> int:
+    """Revoke a refresh token, or with everywhere=True all tokens of its user; returns tokens revoked"""
+    token_hash = _refresh_token_hash(refresh_token)
+    if everywhere:
+        cursor.execute("SELECT user_id FROM lockers_refreshtoken WHERE token_hash = %s", (token_hash,))
+        row = cursor.fetchone()
+        if not row:
+            return 0
+        return revoke_user_refresh_tokens(cursor, row['user_id'] if isinstance(row, dict) else row[0])
+    cursor.execute("""
+        UPDATE lockers_refreshtoken SET revoked_at = NOW()
+        WHERE token_hash = %s AND revoked_at IS NULL
+    """, (token_hash,))
+    return cursor.rowcount
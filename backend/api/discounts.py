@@ -0,0 +1,177 @@
+"""
+Discount Redemption for LockSpot - Raw SQL
+Atomic, single-statement redemption that runs inside the booking transaction
+"""
+
+import random
+from decimal import Decimal
+from typing import Dict, Optional
+
+
+# Conditions shared by every redemption statement: active, inside the validity
+# window and above the minimum booking amount.
+VALIDITY_CONDITIONS = """
+    d.is_active = 1
+    AND NOW() BETWEEN d.valid_from AND d.valid_to
+    AND d.min_booking_amount <= %s
+"""
+
+
+# ==================== HELPERS ====================
+
+def calculate_discount_amount(discount: Dict, booking_amount) -> Decimal:
+    """Discount for a booking amount, capped by max_discount_amount"""
+    amount = Decimal(str(booking_amount))
+    value = Decimal(str(discount['discount_value']))
+
+    if discount['discount_type'] == 'Percentage':
+        discount_amount = amount * value / 100
+    else:  # FixedAmount
+        discount_amount = value
+
+    if discount['max_discount_amount']:
+        discount_amount = min(discount_amount, Decimal(str(discount['max_discount_amount'])))
+
+    # Never discount more than the booking is worth
+    return min(discount_amount, amount).quantize(Decimal('0.01'))
+
+
+def get_discount_usage(cursor, discount_id: int) -> int:
+    """Total uses of a discount: the base counter plus all counter shards"""
+    cursor.execute("""
+        SELECT d.current_uses + COALESCE(SUM(s.uses), 0) AS total_uses
+        FROM lockers_discount d
+        LEFT JOIN lockers_discountusageshard s ON s.discount_id = d.id
+        WHERE d.id = %s
+        GROUP BY d.id, d.current_uses
+    """, (discount_id,))
+    row = cursor.fetchone()
+    if not row:
+        return 0
+    return int(row['total_uses'] if isinstance(row, dict) else row[0])
+
+
+# ==================== REDEMPTION ====================
+
+def redeem_discount(cursor, code: str, booking_amount) -> Optional[Dict]:
+    """
+    Redeem a discount code for a booking amount.
+
+    Must be called with a cursor of the booking transaction so the usage
+    increment commits or rolls back together with the booking.
+
+    Returns the discount row with 'calculated_discount' set, or None if the
+    code is unknown, inactive, outside its validity window, below the minimum
+    amount or out of uses.
+    """
+    cursor.execute("""
+        SELECT id, code, discount_type, discount_value, max_discount_amount,
+               min_booking_amount, max_uses, counter_shards
+        FROM lockers_discount
+        WHERE code = %s
+    """, (code,))
+    discount = cursor.fetchone()
+
+    if not discount:
+        return None
+
+    if discount['counter_shards']:
+        redeemed = _redeem_sharded(cursor, discount, booking_amount)
+    else:
+        redeemed = _redeem_single_row(cursor, discount, booking_amount)
+
+    if not redeemed:
+        return None
+
+    discount['calculated_discount'] = calculate_discount_amount(discount, booking_amount)
+    return discount
+
+
+def _redeem_single_row(cursor, discount: Dict, booking_amount) -> bool:
+    """Check every rule and increment current_uses in one conditional UPDATE"""
+    cursor.execute(f"""
+        UPDATE lockers_discount d
+        SET d.current_uses = d.current_uses + 1
+        WHERE d.id = %s
+          AND d.counter_shards = 0
+          AND {VALIDITY_CONDITIONS}
+          AND (d.max_uses IS NULL OR d.current_uses < d.max_uses)
+    """, (discount['id'], booking_amount))
+    return cursor.rowcount == 1
+
+
+def _redeem_sharded(cursor, discount: Dict, booking_amount) -> bool:
+    """
+    Increment one randomly chosen counter slot.
+
+    Each slot carries its own share of max_uses, so the conditional UPDATE only
+    locks that slot's row and the slots together can never exceed the limit.
+    When the chosen slot is exhausted the remaining slots are tried in turn.
+    """
+    slots = list(range(discount['counter_shards']))
+    random.shuffle(slots)
+
+    for slot in slots:
+        cursor.execute(f"""
+            UPDATE lockers_discountusageshard s
+            JOIN lockers_discount d ON d.id = s.discount_id
+            SET s.uses = s.uses + 1
+            WHERE s.discount_id = %s
+              AND s.slot = %s
+              AND {VALIDITY_CONDITIONS}
+              AND (s.max_uses IS NULL OR s.uses < s.max_uses)
+        """, (discount['id'], slot, booking_amount))
+        if cursor.rowcount == 1:
+            return True
+
+    return False
+
+
+# ==================== SHARDED COUNTER SETUP ====================
+
+def enable_sharded_counter(cursor, discount_id: int, shards: int) -> None:
+    """
+    Switch a hot discount code to N counter slots.
+
+    Uses already recorded (base counter and any previous slots) are folded into
+    current_uses, and the remaining max_uses budget is split across the new
+    slots. Pass shards=0 to fold the slots back into the single counter.
+    """
+    cursor.execute("""
+        SELECT id, max_uses FROM lockers_discount WHERE id = %s FOR UPDATE
+    """, (discount_id,))
+    discount = cursor.fetchone()
+    if not discount:
+        raise ValueError(f'Discount {discount_id} not found')
+
+    # Lock every slot before folding so no redemption slips in between
+    cursor.execute("""
+        SELECT slot FROM lockers_discountusageshard WHERE discount_id = %s FOR UPDATE
+    """, (discount_id,))
+    cursor.fetchall()
+
+    total_uses = get_discount_usage(cursor, discount_id)
+    cursor.execute("""
+        DELETE FROM lockers_discountusageshard WHERE discount_id = %s
+    """, (discount_id,))
+    cursor.execute("""
+        UPDATE lockers_discount SET current_uses = %s, counter_shards = %s WHERE id = %s
+    """, (total_uses, shards, discount_id))
+
+    if not shards:
+        return
+
+    rows = []
+    for slot in range(shards):
+        if discount['max_uses'] is None:
+            slot_cap = None
+        else:
+            remaining = max(discount['max_uses'] - total_uses, 0)
+            # Spread the remainder over the first slots
+            slot_cap = remaining // shards + (1 if slot < remaining % shards else 0)
+        rows.append((discount_id, slot, 0, slot_cap))
+
+    cursor.executemany("""
+        INSERT INTO lockers_discountusageshard (discount_id, slot, uses, max_uses)
+        VALUES (%s, %s, %s, %s)
+    """, rows)
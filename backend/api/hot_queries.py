@@ -0,0 +1,182 @@
+"""
+Hot Read Queries for LockSpot - Raw SQL
+The statements behind the busiest listing endpoints, kept in one place so
+the views and the query-plan regression tests (api/tests.py) run the same SQL.
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+LOCATION_LIST = """
+    SELECT
+        l.id, l.name, l.description, l.image,
+        l.operating_hours_start, l.operating_hours_end,
+        l.contact_phone, l.is_active,
+        a.street_address, a.city, a.state, a.country,
+        a.latitude, a.longitude,
+        COUNT(DISTINCT lu.id) as total_lockers,
+        SUM(CASE WHEN lu.status = 'Available' THEN 1 ELSE 0 END) as available_lockers
+    FROM lockers_lockerlocation l
+    LEFT JOIN lockers_locationaddress a ON l.address_id = a.id
+    LEFT JOIN lockers_lockerunit lu ON lu.location_id = l.id
+    WHERE l.is_active = 1
+    GROUP BY l.id
+    ORDER BY l.name
+"""
+
+# Shared by the live table and lockers_bookingarchive (see api/archive.py)
+BOOKING_LIST_SELECT = """
+    SELECT b.id, b.user_id, b.locker_id, b.start_time, b.end_time,
+           b.booking_type, b.subtotal_amount, b.discount_amount,
+           b.total_amount, b.status, b.created_at,
+           l.unit_number, l.size, loc.name as location_name
+    FROM {table} b
+    JOIN lockers_lockerunit l ON b.locker_id = l.id
+    JOIN lockers_lockerlocation loc ON l.location_id = loc.id
+"""
+
+LOCATION_REVIEWS = """
+    SELECT r.id, r.rating, r.title, r.comment, r.created_at,
+           u.first_name, u.last_name
+    FROM lockers_review r
+    JOIN lockers_booking b ON r.booking_id = b.id
+    JOIN auth_user u ON b.user_id = u.id
+    JOIN lockers_lockerunit l ON b.locker_id = l.id
+    WHERE l.location_id = %s
+    ORDER BY r.created_at DESC
+"""
+
+USER_NOTIFICATIONS = """
+    SELECT id, title, message, notification_type, is_read,
+           read_at, created_at, related_booking_id
+    FROM lockers_notification
+    WHERE user_id = %s
+    ORDER BY created_at DESC
+    LIMIT 50
+"""
+
+
+def locker_list_query(location_id=None, size=None, status=None) -> Tuple[str, List]:
+    """Locker listing with optional location / size / status filters"""
+    conditions = ["1=1"]
+    params = []
+
+    if location_id:
+        conditions.append("l.location_id = %s")
+        params.append(location_id)
+
+    if size:
+        conditions.append("l.size = %s")
+        params.append(size)
+
+    if status:
+        conditions.append("l.status = %s")
+        params.append(status)
+
+    query = f"""
+        SELECT
+            l.id, l.unit_number, l.size, l.status,
+            l.location_id, loc.name as location_name,
+            p.hourly_rate, p.daily_rate, p.weekly_rate
+        FROM lockers_lockerunit l
+        JOIN lockers_lockerlocation loc ON l.location_id = loc.id
+        JOIN lockers_pricingtier p ON l.tier_id = p.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY loc.name, l.unit_number
+    """
+    return query, params
+
+
+def booking_list_query(user_id, status=None, before=None, limit=None,
+                       table='lockers_booking') -> Tuple[str, List]:
+    """
+    A user's bookings, newest first. `before` is the (created_at, id) of the
+    last row of the previous page; `limit` is omitted for the full list.
+    """
+    conditions = ["b.user_id = %s"]
+    params = [user_id]
+
+    if status:
+        conditions.append("b.status = %s")
+        params.append(status)
+
+    if before:
+        created_at, booking_id = before
+        conditions.append("(b.created_at < %s OR (b.created_at = %s AND b.id < %s))")
+        params.extend([created_at, created_at, booking_id])
+
+    query = BOOKING_LIST_SELECT.format(table=table) + f"""
+        WHERE {" AND ".join(conditions)}
+        ORDER BY b.created_at DESC, b.id DESC
+    """
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+# ==================== QUERY PLANS ====================
+
+def explain(cursor, query: str, params=()) -> Dict:
+    """EXPLAIN FORMAT=JSON of a statement, parsed"""
+    cursor.execute("EXPLAIN FORMAT=JSON " + query, params)
+    row = cursor.fetchone()
+    return json.loads(row['EXPLAIN'] if isinstance(row, dict) else row[0])
+
+
+def summarize_plan(plan: Dict) -> Dict:
+    """
+    Flatten an EXPLAIN FORMAT=JSON tree into
+    {'tables': [{table, access_type, key, rows}], 'filesort': bool, 'temporary': bool}
+    """
+    summary = {'tables': [], 'filesort': False, 'temporary': False}
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if node.get('using_filesort'):
+            summary['filesort'] = True
+        if node.get('using_temporary_table'):
+            summary['temporary'] = True
+        table = node.get('table')
+        if isinstance(table, dict) and 'table_name' in table:
+            summary['tables'].append({
+                'table': table['table_name'],
+                'access_type': table.get('access_type'),
+                'key': table.get('key'),
+                'rows': table.get('rows_examined_per_scan', 0),
+            })
+        for value in node.values():
+            walk(value)
+
+    walk(plan)
+    return summary
+
+
+def plan_problems(summary: Dict, full_scan_ok=(), keys: Optional[Dict] = None, max_rows: int = 0,
+                  filesort_ok: bool = False, temporary_ok: bool = False) -> List[str]:
+    """
+    Regressions in a summarized plan: full scans outside `full_scan_ok`
+    (table aliases), tables not using one of their expected `keys`, more
+    than `max_rows` examined per scan, and unexpected filesort/temporary tables.
+    """
+    problems = []
+    for table in summary['tables']:
+        alias = table['table']
+        if table['access_type'] == 'ALL' and alias not in full_scan_ok:
+            problems.append(f"{alias}: full table scan ({table['rows']:,} rows)")
+        expected = (keys or {}).get(alias)
+        if expected and table['key'] not in expected:
+            problems.append(f"{alias}: uses {table['key'] or 'no index'}, expected one of {sorted(expected)}")
+        if max_rows and alias not in full_scan_ok and table['rows'] > max_rows:
+            problems.append(f"{alias}: examines {table['rows']:,} rows per scan (limit {max_rows:,})")
+    if summary['filesort'] and not filesort_ok:
+        problems.append('uses filesort')
+    if summary['temporary'] and not temporary_ok:
+        problems.append('uses a temporary table')
+    return problems
@@ -0,0 +1,180 @@
+"""
+Kiosk Sync for LockSpot - Raw SQL
+Compact binary snapshots/deltas of bookings and access codes per location
+
+The sequence number is a server-side unix-second watermark. A delta request
+re-reads everything changed since `since - SYNC_OVERLAP_SECONDS`, so rows
+committed late by a slow transaction are still picked up; kiosks apply records
+as upserts keyed by id, which makes the overlap harmless.
+
+Kiosks only get their own location: each authenticates with the key of its
+location (kiosk_key), derived from KIOSK_API_KEY, which the kiosks never see.
+
+Payload layout (big-endian):
+    header   'LSK1' | seq u32 | full u8 | bookings u32 | codes u32
+    booking  id u32 | locker_id u32 | start u32 | end u32 | status u8
+    code     id u32 | booking_id u32 | locker_id u32 | code_type u8 |
+             expires u32 | is_used u8 | code_len u8 | code bytes
+"""
+
+import hashlib
+import hmac
+import struct
+import time
+from typing import Dict, List, Optional
+
+from .qr_tokens import CODE_TYPE_IDS, CODE_TYPES, to_epoch, from_epoch
+
+
+MAGIC = b'LSK1'
+HEADER = struct.Struct('>4sIBII')
+BOOKING = struct.Struct('>IIIIB')
+CODE = struct.Struct('>IIIBIBB')
+
+SYNC_OVERLAP_SECONDS = 120
+
+# Mirrors lockers.models.Booking.Status (order is part of the format)
+BOOKING_STATUSES = ('Pending', 'Confirmed', 'Active', 'Completed', 'Cancelled', 'Expired')
+BOOKING_STATUS_IDS = {name: index for index, name in enumerate(BOOKING_STATUSES)}
+
+
+# ==================== KIOSK KEYS ====================
+
+def kiosk_key(secret: str, location_id: int) -> str:
+    """Credential for the kiosks of one location: '<location id>.<HMAC of the id>'"""
+    digest = hmac.new(secret.encode(), f'kiosk-location:{location_id}'.encode(), hashlib.sha256).hexdigest()
+    return f'{location_id}.{digest}'
+
+
+def kiosk_key_location(key: str, secret: str) -> Optional[int]:
+    """Location a kiosk key was issued for, or None if it is not a valid key"""
+    location, _, _ = key.partition('.')
+    if not secret or not location.isdigit():
+        return None
+    if not hmac.compare_digest(key.encode(), kiosk_key(secret, int(location)).encode()):
+        return None
+    return int(location)
+
+
+# ==================== QUERIES ====================
+
+def fetch_location_changes(cursor, location_id: int, since: int) -> Dict[str, List[Dict]]:
+    """
+    Bookings and access codes for a location's lockers.
+    since=0 returns a full snapshot of currently valid rows.
+
+    Signed tokens only get a row once they are used, so the codes are mostly
+    used tokens, which the kiosk must refuse from then on
+    (KioskVerifier.apply_sync), plus any unexpired stored codes.
+    """
+    if since:
+        changed_after = from_epoch(max(since - SYNC_OVERLAP_SECONDS, 0))
+
+        # Any status, so cancellations reach the kiosk as revocations
+        # (KioskVerifier.apply_sync).
+        # Served by idx_booking_locker_updated (locker_id, updated_at)
+        cursor.execute("""
+            SELECT b.id, b.locker_id, b.start_time, b.end_time, b.status
+            FROM lockers_booking b
+            JOIN lockers_lockerunit l ON b.locker_id = l.id
+            WHERE l.location_id = %s
+              AND b.updated_at >= %s
+        """, (location_id, changed_after))
+        bookings = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT q.id, q.booking_id, b.locker_id, q.code, q.code_type,
+                   q.expires_at, q.is_used
+            FROM lockers_qraccesscode q
+            JOIN lockers_booking b ON q.booking_id = b.id
+            WHERE q.location_id = %s
+              AND q.expires_at > NOW()
+              AND (q.generated_at >= %s OR q.used_at >= %s)
+        """, (location_id, changed_after, changed_after))
+        codes = cursor.fetchall()
+    else:
+        cursor.execute("""
+            SELECT b.id, b.locker_id, b.start_time, b.end_time, b.status
+            FROM lockers_booking b
+            JOIN lockers_lockerunit l ON b.locker_id = l.id
+            WHERE l.location_id = %s
+              AND b.status IN ('Confirmed', 'Active')
+              AND b.end_time > NOW()
+        """, (location_id,))
+        bookings = cursor.fetchall()
+
+        # Served by idx_qr_location_expires (location_id, expires_at)
+        cursor.execute("""
+            SELECT q.id, q.booking_id, b.locker_id, q.code, q.code_type,
+                   q.expires_at, q.is_used
+            FROM lockers_qraccesscode q
+            JOIN lockers_booking b ON q.booking_id = b.id
+            WHERE q.location_id = %s
+              AND q.expires_at > NOW()
+        """, (location_id,))
+        codes = cursor.fetchall()
+
+    return {'bookings': bookings, 'codes': codes}
+
+
+# ==================== ENCODING ====================
+
+def encode_sync_payload(seq: int, full: bool, bookings: List[Dict], codes: List[Dict]) -> bytes:
+    """Pack rows into the binary kiosk format"""
+    parts = [HEADER.pack(MAGIC, seq, 1 if full else 0, len(bookings), len(codes))]
+
+    pack_booking = BOOKING.pack
+    for b in bookings:
+        parts.append(pack_booking(
+            b['id'], b['locker_id'], to_epoch(b['start_time']), to_epoch(b['end_time']),
+            BOOKING_STATUS_IDS[b['status']]
+        ))
+
+    pack_code = CODE.pack
+    for c in codes:
+        code = c['code'].encode('utf-8')[:255]
+        parts.append(pack_code(
+            c['id'], c['booking_id'], c['locker_id'], CODE_TYPE_IDS[c['code_type']],
+            to_epoch(c['expires_at']), 1 if c['is_used'] else 0, len(code)
+        ))
+        parts.append(code)
+
+    return b''.join(parts)
+
+
+def decode_sync_payload(data: bytes) -> Dict:
+    """Kiosk-side decoder (also used by the simulator)"""
+    magic, seq, full, booking_count, code_count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('Not a kiosk sync payload')
+    offset = HEADER.size
+
+    bookings = []
+    for _ in range(booking_count):
+        booking_id, locker_id, start, end, status = BOOKING.unpack_from(data, offset)
+        offset += BOOKING.size
+        bookings.append({
+            'id': booking_id, 'locker_id': locker_id, 'start': start, 'end': end,
+            'status': BOOKING_STATUSES[status],
+        })
+
+    codes = []
+    for _ in range(code_count):
+        code_id, booking_id, locker_id, code_type, expires, is_used, length = CODE.unpack_from(data, offset)
+        offset += CODE.size
+        codes.append({
+            'id': code_id, 'booking_id': booking_id, 'locker_id': locker_id,
+            'code_type': CODE_TYPES[code_type], 'expires': expires, 'is_used': bool(is_used),
+            'code': data[offset:offset + length].decode('utf-8'),
+        })
+        offset += length
+
+    return {'seq': seq, 'full': bool(full), 'bookings': bookings, 'codes': codes}
+
+
+def build_sync_payload(cursor, location_id: int, since: int = 0) -> bytes:
+    """Query and encode one sync response"""
+    # Taken before querying so nothing committed meanwhile is skipped next time
+    seq = int(time.time())
+    rows = fetch_location_changes(cursor, location_id, since)
+    return encode_sync_payload(seq, not since, rows['bookings'], rows['codes'])
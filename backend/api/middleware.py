@@ -0,0 +1,109 @@
+"""
+API middleware for LockSpot
+"""
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from db_utils import start_query_count, stop_query_count
+
+
+class QueryCountMiddleware:
+    """
+    Adds an X-DB-Queries header with the number of SQL statements a request
+    ran, raw SQL (DatabaseConnection) and ORM together. Used by the load-test
+    scripts; only installed when settings.QUERY_COUNT_HEADER is on.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_COUNT_HEADER', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        orm_queries = [0]
+
+        def count_orm(execute, sql, params, many, context):
+            orm_queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start_query_count()
+        try:
+            with connection.execute_wrapper(count_orm):
+                response = self.get_response(request)
+        finally:
+            raw_queries = stop_query_count()
+        response['X-DB-Queries'] = str(raw_queries + orm_queries[0])
+        return response
+
+
+class SiteMiddleware:
+    """
+    Runs settings.SITE_MIDDLEWARE (sessions, CSRF, auth, messages, ...) for
+    every path except settings.LEAN_MIDDLEWARE_PATHS. API calls authenticate
+    with a bearer token (api.authentication.JWTAuthentication) and only get
+    the middleware listed before this one: metrics, CORS, security headers
+    and CommonMiddleware (APPEND_SLASH redirects).
+
+    The inner middleware are loaded the way Django's handler loads
+    MIDDLEWARE (sync only), and their process_view / process_exception /
+    process_template_response hooks run through this middleware's, so CSRF
+    checks on admin views behave exactly as before.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lean_paths = tuple(settings.LEAN_MIDDLEWARE_PATHS)
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+
+        handler = get_response
+        for path in reversed(settings.SITE_MIDDLEWARE):
+            try:
+                instance = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, 'process_view'):
+                self.view_hooks.insert(0, instance.process_view)
+            if hasattr(instance, 'process_template_response'):
+                self.template_response_hooks.append(instance.process_template_response)
+            if hasattr(instance, 'process_exception'):
+                self.exception_hooks.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.site_handler = handler
+
+    def is_lean(self, request):
+        return request.path_info.startswith(self.lean_paths)
+
+    def __call__(self, request):
+        if self.is_lean(request):
+            return self.get_response(request)
+        return self.site_handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_lean(request):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if not self.is_lean(request):
+            for hook in self.template_response_hooks:
+                response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_lean(request):
+            return None
+        for hook in self.exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
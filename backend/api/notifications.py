@@ -0,0 +1,166 @@
+"""
+Notification Engine for LockSpot - Raw SQL
+Set-based fan-out and per-user unread counters
+
+A broadcast resolves its recipients with one query (one row per user, e.g.
+everyone with an active booking at a location) and streams them from an
+unbuffered cursor into multi-row INSERTs of BATCH_SIZE notifications. Each
+batch is its own short transaction, together with the counter increments
+for the same users.
+
+lockers_notificationcounter holds the number of unread live notifications
+per user, so GET /api/notifications/unread-count/ is a primary-key lookup.
+Everything that inserts, reads, archives or deletes notifications adjusts it
+in the same transaction, always touching lockers_notification before the
+counters so concurrent writers take their locks in the same order.
+"""
+
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from db_utils import DatabaseConnection
+
+
+BATCH_SIZE = 1000
+
+ACTIVE_BOOKING_STATUSES = ('Confirmed', 'Active')
+
+_STATUS_LIST = ", ".join(f"'{s}'" for s in ACTIVE_BOOKING_STATUSES)
+
+# Recipient queries: (user_id, related booking id or NULL), one row per user
+AUDIENCES = {
+    'active-at-location': f"""
+        SELECT b.user_id, MIN(b.id)
+        FROM lockers_booking b
+        JOIN lockers_lockerunit l ON b.locker_id = l.id
+        WHERE l.location_id = %s AND b.status IN ({_STATUS_LIST})
+        GROUP BY b.user_id
+    """,
+    'all-customers': """
+        SELECT id, NULL
+        FROM auth_user
+        WHERE user_type = 'Customer' AND is_active = 1
+    """,
+}
+
+
+# ==================== COUNTERS ====================
+
+def add_unread(cursor, counts: Dict[int, int]):
+    """Add new unread notifications to the users' counters, in one upsert"""
+    if not counts:
+        return
+    cursor.executemany("""
+        INSERT INTO lockers_notificationcounter (user_id, unread)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE unread = unread + VALUES(unread)
+    """, sorted(counts.items()))
+
+
+def release_unread(cursor, where: str, params: Iterable):
+    """
+    Take the unread notifications matching `where` off their users' counters;
+    call it right before they are deleted or moved to the archive
+    """
+    cursor.execute(f"""
+        UPDATE lockers_notificationcounter c
+        JOIN (
+            SELECT user_id, COUNT(*) AS unread
+            FROM lockers_notification
+            WHERE is_read = 0 AND ({where})
+            GROUP BY user_id
+        ) gone ON gone.user_id = c.user_id
+        SET c.unread = GREATEST(c.unread - gone.unread, 0)
+    """, tuple(params))
+
+
+def unread_count(cursor, user_id: int) -> int:
+    """The user's counter; a user without one yet gets it seeded from the table once"""
+    for _ in range(2):
+        cursor.execute("SELECT unread AS n FROM lockers_notificationcounter WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            return row['n'] if isinstance(row, dict) else row[0]
+        cursor.execute("""
+            INSERT IGNORE INTO lockers_notificationcounter (user_id, unread)
+            SELECT %s, COUNT(*) FROM lockers_notification WHERE user_id = %s AND is_read = 0
+        """, (user_id, user_id))
+    return 0
+
+
+# ==================== WRITES ====================
+
+def insert_notifications(cursor, rows: Iterable[Tuple]) -> int:
+    """
+    (user_id, title, message, notification_type, related_booking_id) rows as
+    one multi-row INSERT, plus the matching counter increments
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    cursor.executemany("""
+        INSERT INTO lockers_notification
+        (user_id, title, message, notification_type, related_booking_id, is_read, created_at)
+        VALUES (%s, %s, %s, %s, %s, 0, NOW())
+    """, rows)
+    add_unread(cursor, Counter(row[0] for row in rows))
+    return len(rows)
+
+
+def mark_read(cursor, user_id: int, notification_id: int) -> Optional[bool]:
+    """True if it was unread, False if already read, None if it is not the user's"""
+    cursor.execute("""
+        UPDATE lockers_notification
+        SET is_read = 1, read_at = NOW()
+        WHERE id = %s AND user_id = %s AND is_read = 0
+    """, (notification_id, user_id))
+    if cursor.rowcount == 1:
+        cursor.execute("""
+            UPDATE lockers_notificationcounter SET unread = GREATEST(unread - 1, 0) WHERE user_id = %s
+        """, (user_id,))
+        return True
+    cursor.execute("SELECT 1 FROM lockers_notification WHERE id = %s AND user_id = %s",
+                   (notification_id, user_id))
+    return False if cursor.fetchone() else None
+
+
+def mark_all_read(cursor, user_id: int) -> int:
+    cursor.execute("""
+        UPDATE lockers_notification
+        SET is_read = 1, read_at = NOW()
+        WHERE user_id = %s AND is_read = 0
+    """, (user_id,))
+    count = cursor.rowcount
+    if count:
+        # By the rows changed, not to zero: notifications committed meanwhile stay counted
+        cursor.execute("""
+            UPDATE lockers_notificationcounter SET unread = GREATEST(unread - %s, 0) WHERE user_id = %s
+        """, (count, user_id))
+    return count
+
+
+# ==================== FAN-OUT ====================
+
+def broadcast(audience: str, params: Tuple, title: str, message: str, notification_type: str = 'System',
+              batch_size: int = BATCH_SIZE, log=None) -> Dict:
+    """Send one notification to every recipient of `audience`; returns counts and seconds"""
+    started = time.perf_counter()
+    sent = 0
+    with DatabaseConnection.get_connection() as reader, DatabaseConnection.get_connection() as writer:
+        recipients = reader.cursor()  # unbuffered: recipients arrive as they are fetched
+        recipients.execute(AUDIENCES[audience], params)
+        cursor = writer.cursor()
+        while True:
+            chunk = recipients.fetchmany(batch_size)
+            if not chunk:
+                break
+            sent += insert_notifications(cursor, [
+                (user_id, title, message, notification_type, booking_id) for user_id, booking_id in chunk
+            ])
+            writer.commit()
+            if log:
+                log(f"  ... {sent:,} notifications")
+        cursor.close()
+        recipients.close()
+    return {'notifications': sent, 'seconds': round(time.perf_counter() - started, 2)}
@@ -0,0 +1,291 @@
+"""
+Transactional Outbox for LockSpot - Raw SQL
+Booking side effects recorded with the booking, delivered by a dispatcher
+
+Creating, cancelling and expiring a booking adds one lockers_outboxevent row
+per booking inside the same transaction (a single INSERT, however many side
+effects are attached). `python manage.py dispatch_outbox` drains the table in
+batches and runs every handler routed to the event type:
+
+- notification: a lockers_notification row for the customer (and their
+  unread counter, api/notifications.py)
+- audit: a lockers_auditlog entry for the status change
+- qr_codes: render the QR images of a new booking; retire the stored, unused
+  codes of a cancelled or expired one
+
+Delivery is at least once. A batch is claimed with SKIP LOCKED and leased for
+LEASE_SECONDS, so events of a dispatcher that dies mid-batch are picked up
+again once the lease runs out. Each handler runs over the whole batch in its
+own transaction, which also records it in done_handlers, so database handlers
+apply exactly once and only the idempotent QR image rendering can
+repeat. A failing handler is retried one event at a time, so a single bad
+event does not hold back the rest of the batch; that event is retried later
+with exponential backoff (only the handlers it still lacks) and parked as
+Failed after MAX_ATTEMPTS.
+"""
+
+import json
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List
+
+from db_utils import DatabaseConnection
+
+from .notifications import insert_notifications
+
+
+BOOKING_CREATED = 'booking.created'
+BOOKING_CANCELLED = 'booking.cancelled'
+BOOKING_EXPIRED = 'booking.expired'
+
+BATCH_SIZE = 200
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+RENDER_TIMEOUT_SECONDS = 30
+
+# Booking (b), locker (l) and location (loc) columns an event payload is built from
+BOOKING_COLUMNS = """
+    b.id AS booking_id, b.user_id, b.locker_id, b.status, b.start_time, b.end_time,
+    b.total_amount, l.unit_number, l.location_id, loc.name AS location_name
+"""
+
+Event = namedtuple('Event', 'id event_type booking_id payload attempts done')
+
+
+# ==================== ENQUEUE ====================
+
+def booking_payload(row: Dict, to_status: str) -> Dict:
+    """Event payload from a BOOKING_COLUMNS row (status is the status before the change)"""
+    payload = dict(row, from_status=row.get('status'), to_status=to_status)
+    payload.pop('status', None)
+    return payload
+
+
+def enqueue(cursor, event_type: str, payloads: Iterable[Dict]) -> int:
+    """
+    Add one event per payload in the caller's transaction; it is only
+    delivered if that transaction commits. One INSERT for all of them.
+    """
+    payloads = list(payloads)
+    if not payloads:
+        return 0
+    values = ", ".join(["(%s, %s, %s, 'Pending', 0, JSON_ARRAY(), NOW(), NOW())"] * len(payloads))
+    params = []
+    for payload in payloads:
+        params += [event_type, payload['booking_id'], json.dumps(payload, default=str)]
+    cursor.execute(f"""
+        INSERT INTO lockers_outboxevent
+        (event_type, booking_id, payload, status, attempts, done_handlers, next_attempt_at, created_at)
+        VALUES {values}
+    """, params)
+    return len(payloads)
+
+
+# ==================== HANDLERS ====================
+# Each handler gets a cursor and the events of one batch that still need it.
+# Database writes join the transaction that marks the handler as done.
+
+NOTIFICATION_TEXT = {
+    BOOKING_CREATED: ('Booking confirmed',
+                      'Locker {unit_number} at {location_name} is yours from {start_time:.16} to {end_time:.16}.'),
+    BOOKING_CANCELLED: ('Booking cancelled',
+                        'Your booking of locker {unit_number} at {location_name} has been cancelled.'),
+    BOOKING_EXPIRED: ('Booking completed',
+                      'Your booking of locker {unit_number} at {location_name} has ended. Thanks for using LockSpot!'),
+}
+
+
+def notify_customer(cursor, events: List[Event]):
+    rows = []
+    for event in events:
+        title, message = NOTIFICATION_TEXT[event.event_type]
+        rows.append((event.payload['user_id'], title, message.format(**event.payload),
+                     'Booking', event.booking_id))
+    insert_notifications(cursor, rows)
+
+
+def audit_status_change(cursor, events: List[Event]):
+    rows = [(
+        # Expiry is done by the system, not by the customer
+        None if event.event_type == BOOKING_EXPIRED else event.payload['user_id'],
+        event.event_type,
+        event.booking_id,
+        json.dumps({'status': event.payload['from_status']}) if event.payload.get('from_status') else None,
+        json.dumps({'status': event.payload['to_status'], 'locker_id': event.payload['locker_id'],
+                    'total_amount': event.payload.get('total_amount')}),
+    ) for event in events]
+    cursor.executemany("""
+        INSERT INTO lockers_auditlog
+        (user_id, action, table_name, record_id, old_values, new_values, created_at)
+        VALUES (%s, %s, 'lockers_booking', %s, %s, %s, NOW())
+    """, rows)
+
+
+def update_qr_codes(cursor, events: List[Event]):
+    from datetime import datetime
+    from .qr_images import prerender_booking_qr
+
+    ended = [event.booking_id for event in events if event.event_type != BOOKING_CREATED]
+    if ended:
+        placeholders = ", ".join(["%s"] * len(ended))
+        cursor.execute(f"""
+            UPDATE lockers_qraccesscode
+            SET expires_at = NOW()
+            WHERE booking_id IN ({placeholders}) AND is_used = 0 AND expires_at > NOW()
+        """, ended)
+
+    # Same naive times as stored, so the images match the QR endpoints' tokens
+    renders = []
+    for event in events:
+        if event.event_type == BOOKING_CREATED:
+            p = event.payload
+            renders += prerender_booking_qr(event.booking_id, p['locker_id'],
+                                            datetime.fromisoformat(p['start_time']),
+                                            datetime.fromisoformat(p['end_time']))
+    for future in renders:
+        future.result(timeout=RENDER_TIMEOUT_SECONDS)
+
+
+HANDLERS = {
+    'notification': notify_customer,
+    'audit': audit_status_change,
+    'qr_codes': update_qr_codes,
+}
+
+ROUTES = {
+    BOOKING_CREATED: ('notification', 'audit', 'qr_codes'),
+    BOOKING_CANCELLED: ('notification', 'audit', 'qr_codes'),
+    BOOKING_EXPIRED: ('notification', 'audit', 'qr_codes'),
+}
+
+
+# ==================== DISPATCHER ====================
+
+def _loads(value):
+    return json.loads(value) if isinstance(value, (str, bytes, bytearray)) else value
+
+
+def claim(conn, batch_size: int) -> List[Event]:
+    """Lock up to batch_size due events, lease them and commit"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, event_type, booking_id, payload, attempts, done_handlers
+        FROM lockers_outboxevent
+        WHERE status = 'Pending' AND next_attempt_at <= NOW()
+        ORDER BY next_attempt_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (batch_size,))
+    events = [
+        Event(row['id'], row['event_type'], row['booking_id'], _loads(row['payload']),
+              row['attempts'], set(_loads(row['done_handlers']) or ()))
+        for row in cursor.fetchall()
+    ]
+    if events:
+        placeholders = ", ".join(["%s"] * len(events))
+        cursor.execute(f"""
+            UPDATE lockers_outboxevent
+            SET next_attempt_at = DATE_ADD(NOW(), INTERVAL %s SECOND)
+            WHERE id IN ({placeholders})
+        """, [LEASE_SECONDS] + [event.id for event in events])
+    conn.commit()
+    cursor.close()
+    return events
+
+
+def _apply(conn, name: str, handler, events: List[Event]):
+    """Run one handler and record it as done on the events, in one transaction"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        handler(cursor, events)
+        placeholders = ", ".join(["%s"] * len(events))
+        cursor.execute(f"""
+            UPDATE lockers_outboxevent
+            SET done_handlers = JSON_ARRAY_APPEND(done_handlers, '$', %s)
+            WHERE id IN ({placeholders})
+        """, [name] + [event.id for event in events])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    for event in events:
+        event.done.add(name)
+
+
+def retry_delay(attempts: int) -> int:
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def _finish(conn, events: List[Event], errors: Dict[int, str]):
+    cursor = conn.cursor()
+    done = [event.id for event in events if event.id not in errors]
+    if done:
+        placeholders = ", ".join(["%s"] * len(done))
+        cursor.execute(f"""
+            UPDATE lockers_outboxevent
+            SET status = 'Done', processed_at = NOW(), last_error = NULL
+            WHERE id IN ({placeholders})
+        """, done)
+    retries = []
+    for event in events:
+        if event.id in errors:
+            attempts = event.attempts + 1
+            retries.append((attempts, 'Failed' if attempts >= MAX_ATTEMPTS else 'Pending',
+                            errors[event.id][:2000], retry_delay(attempts), event.id))
+    if retries:
+        cursor.executemany("""
+            UPDATE lockers_outboxevent
+            SET attempts = %s, status = %s, last_error = %s,
+                next_attempt_at = DATE_ADD(NOW(), INTERVAL %s SECOND)
+            WHERE id = %s
+        """, retries)
+    conn.commit()
+    cursor.close()
+
+
+def dispatch_batch(conn, batch_size: int = BATCH_SIZE, handlers: Dict = None) -> Dict[str, int]:
+    """Claim one batch and deliver it; returns counts of events done and retried"""
+    handlers = HANDLERS if handlers is None else handlers
+    events = claim(conn, batch_size)
+    errors = {}
+    for name, handler in handlers.items():
+        due = [e for e in events if name in ROUTES.get(e.event_type, ()) and name not in e.done]
+        if not due:
+            continue
+        try:
+            _apply(conn, name, handler, due)
+        except Exception:
+            # Find the event(s) at fault; the others still get this handler now
+            for event in due:
+                try:
+                    _apply(conn, name, handler, [event])
+                except Exception as e:
+                    errors.setdefault(event.id, f"{name}: {type(e).__name__}: {e}")
+    _finish(conn, events, errors)
+    return {'events': len(events), 'done': len(events) - len(errors), 'retried': len(errors)}
+
+
+def dispatch(batch_size: int = BATCH_SIZE, once: bool = False, idle_seconds: float = 1.0, log=None) -> Dict:
+    """
+    Deliver due events batch after batch. With once=True stop when nothing is
+    due (cron); otherwise poll every idle_seconds while the outbox is empty.
+    """
+    started = time.perf_counter()
+    totals = {'events': 0, 'done': 0, 'retried': 0}
+    with DatabaseConnection.get_connection() as conn:
+        while True:
+            counts = dispatch_batch(conn, batch_size)
+            for key in totals:
+                totals[key] += counts[key]
+            if counts['events'] and log:
+                log(f"  ... {totals['done']:,} delivered, {totals['retried']:,} to retry")
+            if counts['events'] < batch_size:
+                if once:
+                    break
+                time.sleep(idle_seconds)
+    totals['seconds'] = round(time.perf_counter() - started, 2)
+    return totals
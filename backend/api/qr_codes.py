@@ -0,0 +1,237 @@
+"""
+QR Code Consumption for LockSpot - Raw SQL
+Online scan path: validate and mark a code as used in one conditional statement
+
+Stored codes (rows in lockers_qraccesscode) are looked up in an in-process
+cache of unexpired, unused codes first, so scans of unknown, expired or
+wrong-locker codes are rejected without a database round trip. The cache is
+only trusted for existence and expiry; whether a code is still unused is
+decided by the UPDATE itself, so two concurrent scans cannot both succeed.
+
+Signed tokens (api.qr_tokens) need no cache: the signature and validity window
+are checked in-process and the usage row is written with a single upsert.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Optional
+
+from .qr_tokens import TOKEN_BYTES, InvalidQRToken, get_signer, to_epoch, from_epoch
+
+
+IssuedCode = namedtuple('IssuedCode', 'id booking_id locker_id location_id code_type expires_at')
+
+# Base64url length of a signed token, used to route a scanned string
+SIGNED_TOKEN_LENGTH = (TOKEN_BYTES * 8 + 5) // 6
+
+
+# ==================== ISSUED CODE CACHE ====================
+
+class IssuedCodeCache:
+    """
+    code -> IssuedCode for every unused code that has not expired yet.
+
+    Loaded once, then refreshed incrementally from generated_at (served by
+    idx_qr_generated) at most every `refresh_interval` seconds, so codes issued
+    by other processes become scannable within that interval.
+    """
+
+    REFRESH_OVERLAP_SECONDS = 5
+
+    def __init__(self, refresh_interval: float = 2.0, max_entries: int = 500000):
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self._codes = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._watermark = None  # epoch seconds of the last refresh
+        self._next_refresh = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code: str) -> Optional[IssuedCode]:
+        entry = self._codes.get(code)
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def discard(self, code: str):
+        with self._lock:
+            self._codes.pop(code, None)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def refresh_due(self) -> bool:
+        return time.monotonic() >= self._next_refresh
+
+    def begin_refresh(self) -> bool:
+        """
+        Claim the refresh. Only one thread refreshes at a time; during a scan
+        burst the others keep serving from the current entries instead of
+        queueing on the database (they only wait for the very first load).
+        """
+        if not self._refresh_lock.acquire(blocking=self._watermark is None):
+            return False
+        if not self.refresh_due():
+            self._refresh_lock.release()
+            return False
+        return True
+
+    def end_refresh(self):
+        self._refresh_lock.release()
+
+    def refresh(self, cursor):
+        """Full load on first call, then only codes generated since the last one"""
+        started = int(time.time())
+
+        if self._watermark is None:
+            cursor.execute("""
+                SELECT q.id, q.code, q.booking_id, b.locker_id, q.location_id, q.code_type, q.expires_at
+                FROM lockers_qraccesscode q
+                JOIN lockers_booking b ON q.booking_id = b.id
+                WHERE q.expires_at > NOW()
+                  AND q.is_used = 0
+            """)
+        else:
+            cursor.execute("""
+                SELECT q.id, q.code, q.booking_id, b.locker_id, q.location_id, q.code_type, q.expires_at
+                FROM lockers_qraccesscode q
+                JOIN lockers_booking b ON q.booking_id = b.id
+                WHERE q.generated_at >= %s
+                  AND q.expires_at > NOW()
+                  AND q.is_used = 0
+            """, (from_epoch(self._watermark - self.REFRESH_OVERLAP_SECONDS),))
+        rows = cursor.fetchall()
+
+        now = time.time()
+        with self._lock:
+            codes = {c: e for c, e in self._codes.items() if e.expires_at > now}
+            for row in rows:
+                if len(codes) >= self.max_entries:
+                    break
+                codes[row['code']] = IssuedCode(
+                    row['id'], row['booking_id'], row['locker_id'], row['location_id'], row['code_type'],
+                    to_epoch(row['expires_at'])
+                )
+            self._codes = codes
+            self._watermark = started
+            self._next_refresh = time.monotonic() + self.refresh_interval
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'entries': len(self._codes),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+        }
+
+
+_code_cache = None
+
+
+def get_code_cache() -> IssuedCodeCache:
+    global _code_cache
+    if _code_cache is None:
+        _code_cache = IssuedCodeCache()
+    return _code_cache
+
+
+# ==================== CONSUME ====================
+
+def consume_qr_code(code: str, locker_id: Optional[int] = None,
+                    location_id: Optional[int] = None) -> Optional[Dict]:
+    """
+    Validate a scanned code and mark it as used in one statement.
+
+    Returns the consumed code (id, booking_id, locker_id, location_id,
+    code_type, expires_at) or None if it is unknown, expired, for another
+    locker or location, or already used.
+    """
+    if len(code) == SIGNED_TOKEN_LENGTH:
+        try:
+            qr = get_signer().verify(code, locker_id=locker_id)
+        except InvalidQRToken:
+            return None
+        return _consume_signed_token(code, qr, location_id)
+
+    return _consume_stored_code(code, locker_id, location_id)
+
+
+def _consume_stored_code(code: str, locker_id: Optional[int], location_id: Optional[int]) -> Optional[Dict]:
+    from db_utils import DatabaseConnection
+
+    cache = get_code_cache()
+    if cache.refresh_due() and cache.begin_refresh():
+        try:
+            with DatabaseConnection.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cache.refresh(cursor)
+                cursor.close()
+        finally:
+            cache.end_refresh()
+
+    entry = cache.get(code)
+    if entry is None or entry.expires_at <= time.time():
+        return None
+    if locker_id is not None and entry.locker_id != locker_id:
+        return None
+    if location_id is not None and entry.location_id != location_id:
+        return None
+
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor()
+        # Primary-key update; the WHERE clause is the single-use check
+        cursor.execute("""
+            UPDATE lockers_qraccesscode
+            SET is_used = 1, used_at = NOW()
+            WHERE id = %s
+              AND is_used = 0
+              AND expires_at > NOW()
+        """, (entry.id,))
+        consumed = cursor.rowcount == 1
+        cursor.close()
+
+    # Used now or by someone else: either way it cannot be scanned again
+    cache.discard(code)
+    return entry._asdict() if consumed else None
+
+
+def _consume_signed_token(token: str, qr, location_id: Optional[int]) -> Optional[Dict]:
+    """
+    Insert the usage row, or flip an existing unused row, in one upsert.
+    Affected rows: 1 = inserted, 2 = updated, 0 = row was already used.
+    """
+    from db_utils import DatabaseConnection
+
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO lockers_qraccesscode
+            (booking_id, location_id, code, code_type, generated_at, expires_at, used_at, is_used)
+            SELECT b.id, l.location_id, %s, %s, %s, %s, NOW(), 1
+            FROM lockers_booking b
+            JOIN lockers_lockerunit l ON b.locker_id = l.id
+            WHERE b.id = %s AND b.locker_id = %s AND b.status IN ('Confirmed', 'Active')
+              AND l.location_id = COALESCE(%s, l.location_id)
+            ON DUPLICATE KEY UPDATE
+                id = LAST_INSERT_ID(lockers_qraccesscode.id),
+                used_at = IF(lockers_qraccesscode.is_used = 0, NOW(), lockers_qraccesscode.used_at),
+                is_used = 1
+        """, (token, qr.code_type, from_epoch(qr.valid_from), from_epoch(qr.valid_to),
+              qr.booking_id, qr.locker_id, location_id))
+        consumed = cursor.rowcount in (1, 2)
+        code_id = cursor.lastrowid
+        cursor.close()
+
+    if not consumed:
+        return None
+    return IssuedCode(code_id, qr.booking_id, qr.locker_id, location_id, qr.code_type, qr.valid_to)._asdict()
@@ -0,0 +1,213 @@
+"""
+Rendered QR Images for LockSpot
+PNG/SVG rendering with a content-addressed on-disk cache
+
+An image is identified by sha256(renderer version, format, size, payload), so
+the cache key doubles as a strong ETag and a cached file never needs to be
+invalidated: a different token or size is simply a different file. A new
+booking's images are pre-rendered on a small thread pool (from the outbox
+dispatcher, api/outbox.py); a cache hit only reads the file, and a miss
+renders in the request thread (~10 ms), never queueing behind pre-renders.
+
+The directory is bounded by max_bytes: once about SWEEP_FRACTION of it has
+been written, a sweep on the pool deletes the least recently used files
+(oldest mtime; hits refresh it at most every TOUCH_SECONDS) down to
+LOW_WATER. Deleted images are rendered again on their next request.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+RENDERER_VERSION = 1
+IMAGE_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+DEFAULT_SIZE = 300
+MIN_SIZE = 64
+MAX_SIZE = 1024
+
+SWEEP_FRACTION = 0.05
+LOW_WATER = 0.8
+TOUCH_SECONDS = 3600
+
+
+# ==================== RENDERING ====================
+
+def render_qr(payload: str, fmt: str, size: int) -> bytes:
+    """Render payload as a QR image; PNG is exactly size x size pixels"""
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_M
+
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_M, border=4)
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    buffer = io.BytesIO()
+    if fmt == 'svg':
+        from qrcode.image.svg import SvgPathImage
+        qr.make_image(image_factory=SvgPathImage).save(buffer)
+    else:
+        from PIL import Image
+        qr.box_size = max(size // (qr.modules_count + 2 * qr.border), 1)
+        image = qr.make_image().get_image()
+        image.resize((size, size), Image.NEAREST).save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def image_key(payload: str, fmt: str, size: int) -> str:
+    # SVG is resolution independent, so size is not part of its identity
+    size = 0 if fmt == 'svg' else size
+    return hashlib.sha256(f'{RENDERER_VERSION}:{fmt}:{size}:{payload}'.encode()).hexdigest()
+
+
+def clamp_size(size: Optional[int]) -> int:
+    return min(max(size or DEFAULT_SIZE, MIN_SIZE), MAX_SIZE)
+
+
+# ==================== DISK CACHE ====================
+
+class QRImageCache:
+    """Content-addressed files under `directory`, at most about `max_bytes` of them"""
+
+    def __init__(self, directory, workers: int = 2, max_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qr-render')
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._written = 0  # bytes written since the last sweep
+        self._sweeping = False
+
+    def path_for(self, key: str, fmt: str) -> Path:
+        return self.directory / key[:2] / f'{key}.{fmt}'
+
+    def get(self, key: str, fmt: str) -> Optional[Path]:
+        path = self.path_for(key, fmt)
+        try:
+            if time.time() - path.stat().st_mtime > TOUCH_SECONDS:
+                os.utime(path)  # still in use: keep it out of the next sweep
+        except FileNotFoundError:
+            return None
+        return path
+
+    def submit(self, payload: str, fmt: str, size: int) -> Future:
+        """Render in the pool unless cached or already in flight"""
+        key = image_key(payload, fmt, size)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(self._render_to_disk, key, payload, fmt, size)
+                self._pending[key] = future
+                future.add_done_callback(lambda _f, k=key: self._forget(k))
+        return future
+
+    def get_or_render(self, payload: str, fmt: str, size: int) -> bytes:
+        """Image bytes from disk, or rendered (and stored) in the calling thread"""
+        key = image_key(payload, fmt, size)
+        path = self.get(key, fmt)
+        if path:
+            try:
+                return path.read_bytes()
+            except FileNotFoundError:
+                pass  # swept in between
+        data = render_qr(payload, fmt, size)
+        self._store(key, fmt, data)
+        return data
+
+    def prerender(self, payloads, formats=('png',), size: int = DEFAULT_SIZE) -> List[Future]:
+        """Queue renders and return immediately"""
+        return [self.submit(payload, fmt, size) for payload in payloads for fmt in formats]
+
+    def _render_to_disk(self, key: str, payload: str, fmt: str, size: int) -> Path:
+        path = self.path_for(key, fmt)
+        if path.exists():
+            return path
+        return self._store(key, fmt, render_qr(payload, fmt, size))
+
+    def _store(self, key: str, fmt: str, data: bytes) -> Path:
+        path = self.path_for(key, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so readers never see a partial file
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        if self.max_bytes:
+            with self._lock:
+                self._written += len(data)
+                sweep = not self._sweeping and self._written >= self.max_bytes * SWEEP_FRACTION
+                if sweep:
+                    self._written, self._sweeping = 0, True
+            if sweep:
+                self._pool.submit(self._sweep)
+        return path
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _sweep(self):
+        try:
+            self.evict()
+        finally:
+            with self._lock:
+                self._sweeping = False
+
+    def evict(self) -> Dict:
+        """
+        Delete the least recently used images until the directory is under
+        LOW_WATER of max_bytes (if it is over max_bytes). Files of every
+        process are counted, so each worker's sweep sees the real total.
+        """
+        files = []
+        for path in self.directory.glob('*/*'):
+            if path.suffix[1:] not in IMAGE_FORMATS:
+                continue  # renames in flight
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        if self.max_bytes and total > self.max_bytes:
+            target = self.max_bytes * LOW_WATER
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return {'files': len(files) - removed, 'bytes': total, 'removed': removed}
+
+
+_image_cache = None
+
+
+def get_image_cache() -> QRImageCache:
+    """Cache configured from settings.QR_IMAGE_CACHE_DIR and QR_IMAGE_CACHE_MAX_MB"""
+    global _image_cache
+    if _image_cache is None:
+        from django.conf import settings
+        _image_cache = QRImageCache(settings.QR_IMAGE_CACHE_DIR, settings.QR_IMAGE_RENDER_WORKERS,
+                                    settings.QR_IMAGE_CACHE_MAX_MB * 1024 * 1024)
+    return _image_cache
+
+
+def prerender_booking_qr(booking_id: int, locker_id: int, start_time, end_time) -> List[Future]:
+    """Queue the default Unlock/Lock images for a new booking"""
+    from .qr_tokens import issue_booking_token
+    tokens = [
+        issue_booking_token(booking_id, locker_id, start_time, end_time, code_type)
+        for code_type in ('Unlock', 'Lock')
+    ]
+    return get_image_cache().prerender(tokens)
@@ -0,0 +1,314 @@
+"""
+Signed QR Access Tokens for LockSpot
+Compact HMAC-signed tokens that kiosks verify offline (no database round trip)
+
+Token layout (34 bytes, base64url without padding = 46 characters):
+    version      1 byte
+    code_type    1 byte   (index into CODE_TYPES)
+    booking_id   4 bytes
+    locker_id    4 bytes
+    valid_from   4 bytes  (unix seconds)
+    valid_to     4 bytes  (unix seconds)
+    signature   16 bytes  (truncated HMAC-SHA256 over the 18 bytes above)
+
+This module only needs the standard library on the verifying side, so it can
+be copied to a kiosk as-is together with the signing secret. The secret is
+QR_TOKEN_SECRET, never SECRET_KEY or JWT_SECRET: whoever holds it can open
+lockers, and it must not also sign sessions or access tokens.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional
+
+
+TOKEN_VERSION = 1
+SIGNATURE_BYTES = 16
+PAYLOAD = struct.Struct('>BBIIII')
+TOKEN_BYTES = PAYLOAD.size + SIGNATURE_BYTES
+
+# Mirrors lockers.models.QRAccessCode.CodeType (order is part of the format)
+CODE_TYPES = ('Unlock', 'Lock', 'Emergency')
+CODE_TYPE_IDS = {name: index for index, name in enumerate(CODE_TYPES)}
+
+# Booking statuses whose tokens open the locker; tokens are only issued for
+# these, and kiosks refuse tokens of bookings synced with any other status
+ACCESS_STATUSES = ('Confirmed', 'Active')
+
+QRToken = namedtuple('QRToken', 'booking_id locker_id code_type valid_from valid_to')
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidQRToken(Exception):
+    """Token is malformed, forged, expired or for another locker"""
+
+
+# ==================== SIGNING & VERIFICATION ====================
+
+class QRTokenSigner:
+    """Issues and verifies tokens for a single secret"""
+
+    def __init__(self, secret):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        # Keyed HMAC state is built once and copied per token
+        self._mac = hmac.new(secret, digestmod=hashlib.sha256)
+
+    def _sign(self, payload: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(payload)
+        return mac.digest()[:SIGNATURE_BYTES]
+
+    def issue(self, booking_id: int, locker_id: int, valid_from: int, valid_to: int,
+              code_type: str = 'Unlock') -> str:
+        """Return a signed token for a booking's validity window (unix seconds)"""
+        payload = PAYLOAD.pack(
+            TOKEN_VERSION, CODE_TYPE_IDS[code_type],
+            int(booking_id), int(locker_id), int(valid_from), int(valid_to)
+        )
+        raw = payload + self._sign(payload)
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+    def verify(self, token: str, locker_id: Optional[int] = None,
+               now: Optional[float] = None, check_window: bool = True) -> QRToken:
+        """
+        Validate signature, validity window and (optionally) the locker.
+        Raises InvalidQRToken; never touches the database.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (ValueError, TypeError):
+            raise InvalidQRToken('Malformed token')
+
+        if len(raw) != TOKEN_BYTES:
+            raise InvalidQRToken('Malformed token')
+
+        payload = raw[:PAYLOAD.size]
+        if not hmac.compare_digest(raw[PAYLOAD.size:], self._sign(payload)):
+            raise InvalidQRToken('Invalid signature')
+
+        version, code_type, booking_id, token_locker, valid_from, valid_to = PAYLOAD.unpack(payload)
+        if version != TOKEN_VERSION or code_type >= len(CODE_TYPES):
+            raise InvalidQRToken('Unsupported token')
+
+        if check_window:
+            now = time.time() if now is None else now
+            if now < valid_from:
+                raise InvalidQRToken('Token not yet valid')
+            if now > valid_to:
+                raise InvalidQRToken('Token has expired')
+
+        if locker_id is not None and token_locker != locker_id:
+            raise InvalidQRToken('Token is for another locker')
+
+        return QRToken(booking_id, token_locker, CODE_TYPES[code_type], valid_from, valid_to)
+
+
+class KioskVerifier:
+    """
+    Offline verifier for a kiosk: signature check, the booking statuses and
+    used codes synced from the server (apply_sync) and a local single-use
+    memory, so a token cannot open a locker once its booking was cancelled or
+    completed, nor open the same locker twice.
+    """
+
+    def __init__(self, secret, locker_ids=None, reporter=None):
+        self.signer = QRTokenSigner(secret)
+        self.locker_ids = set(locker_ids) if locker_ids else None
+        self.reporter = reporter
+        self._used = {}  # token -> valid_to
+        self._revoked = {}  # booking_id -> booking end
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def apply_sync(self, sync: Dict):
+        """
+        Take in a decoded sync payload (api.kiosk_sync.decode_sync_payload).
+        Bookings no longer in ACCESS_STATUSES are revoked until they end;
+        codes used at another kiosk of the station count as used here too.
+        """
+        with self._lock:
+            for booking in sync['bookings']:
+                if booking['status'] in ACCESS_STATUSES:
+                    self._revoked.pop(booking['id'], None)
+                else:
+                    self._revoked[booking['id']] = booking['end']
+            for code in sync['codes']:
+                if code['is_used']:
+                    self._used.setdefault(code['code'], code['expires'])
+
+    def consume(self, token: str, locker_id: Optional[int] = None) -> QRToken:
+        now = time.time()
+        qr = self.signer.verify(token, locker_id=locker_id, now=now)
+        if self.locker_ids is not None and qr.locker_id not in self.locker_ids:
+            raise InvalidQRToken('Token is for another station')
+
+        with self._lock:
+            if qr.booking_id in self._revoked:
+                raise InvalidQRToken('Booking is no longer active')
+            if token in self._used:
+                raise InvalidQRToken('Token already used')
+            self._used[token] = qr.valid_to
+            if now >= self._next_purge:
+                self._purge(now)
+
+        if self.reporter:
+            self.reporter.report(token, now)
+        return qr
+
+    def _purge(self, now):
+        """Forget used tokens and revoked bookings once they have expired anyway"""
+        self._used = {t: exp for t, exp in self._used.items() if exp >= now}
+        self._revoked = {b: end for b, end in self._revoked.items() if end >= now}
+        self._next_purge = now + 60
+
+
+# ==================== USAGE REPORTING ====================
+
+class QRUsageReporter:
+    """
+    Buffers usage events in memory and hands them to `sink` in batches from a
+    background thread. The scan path only does a non-blocking queue put.
+    """
+
+    def __init__(self, sink: Callable[[List[Dict]], None], batch_size: int = 500,
+                 flush_interval: float = 2.0, max_pending: int = 100000):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='qr-usage-reporter', daemon=True)
+        self._thread.start()
+
+    def report(self, token: str, used_at: Optional[float] = None):
+        try:
+            self._queue.put_nowait({'token': token, 'used_at': used_at or time.time()})
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch):
+        try:
+            self.sink(batch)
+        except Exception as e:
+            # Keep the events for the next round instead of losing them
+            logger.warning("QR usage report of %d events failed: %s", len(batch), e)
+            for event in batch:
+                try:
+                    self._queue.put_nowait(event)
+                except queue.Full:
+                    self.dropped += 1
+            time.sleep(self.flush_interval)
+
+
+# ==================== SERVER SIDE ====================
+
+_signer = None
+
+
+def get_signer() -> QRTokenSigner:
+    """Signer configured from settings.QR_TOKEN_SECRET"""
+    global _signer
+    if _signer is None:
+        from django.conf import settings
+        _signer = QRTokenSigner(settings.QR_TOKEN_SECRET)
+    return _signer
+
+
+def issue_booking_token(booking_id: int, locker_id: int, start_time, end_time,
+                        code_type: str = 'Unlock') -> str:
+    """Token valid from shortly before the booking starts until it ends"""
+    from django.conf import settings
+    valid_from = to_epoch(start_time) - settings.QR_TOKEN_EARLY_ACCESS_MINUTES * 60
+    return get_signer().issue(booking_id, locker_id, valid_from, to_epoch(end_time), code_type)
+
+
+def record_qr_usage(events: List[Dict], location_id: Optional[int] = None) -> int:
+    """
+    Write a batch of kiosk usage events to lockers_qraccesscode with one
+    multi-row INSERT. Events whose token does not verify, or (with
+    location_id) is for a locker of another location, are skipped.
+    """
+    from db_utils import DatabaseConnection
+
+    signer = get_signer()
+    verified = []
+    for event in events:
+        try:
+            # Reports arrive late, so only the signature matters here
+            verified.append((signer.verify(event['token'], check_window=False), event))
+        except InvalidQRToken:
+            continue
+
+    if not verified:
+        return 0
+
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Resolve every locker's location in one query
+        locker_ids = sorted({qr.locker_id for qr, _ in verified})
+        placeholders = ', '.join(['%s'] * len(locker_ids))
+        cursor.execute(
+            f"SELECT id, location_id FROM lockers_lockerunit WHERE id IN ({placeholders})",
+            locker_ids
+        )
+        locations = dict(cursor.fetchall())
+
+        rows = [
+            (qr.booking_id, locations.get(qr.locker_id), event['token'], qr.code_type,
+             from_epoch(qr.valid_from), from_epoch(qr.valid_to), from_epoch(event['used_at']))
+            for qr, event in verified
+            if location_id is None or locations.get(qr.locker_id) == location_id
+        ]
+        if not rows:
+            cursor.close()
+            return 0
+        cursor.executemany("""
+            INSERT INTO lockers_qraccesscode
+            (booking_id, location_id, code, code_type, generated_at, expires_at, used_at, is_used)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE is_used = 1, used_at = COALESCE(used_at, VALUES(used_at))
+        """, rows)
+        cursor.close()
+
+    return len(rows)
+
+
+def to_epoch(value) -> int:
+    """Unix seconds; naive datetimes are in the configured TIME_ZONE"""
+    from django.utils import timezone
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return int(value.timestamp())
+
+
+def from_epoch(seconds) -> str:
+    """MySQL DATETIME string in the configured TIME_ZONE"""
+    from datetime import datetime
+    from django.utils import timezone
+    value = datetime.fromtimestamp(seconds, tz=timezone.get_current_timezone())
+    return value.strftime('%Y-%m-%d %H:%M:%S')
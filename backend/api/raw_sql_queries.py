@@ -8,7 +8,7 @@ from datetime import datetime, timedelta
 from django.contrib.auth.hashers import make_password, check_password
 import uuid
 
-from .db_utils import DatabaseConnection, format_datetime, parse_datetime, dict_to_insert, dict_to_update  # type: ignore
+from .db_utils import DatabaseConnection, format_datetime, dict_to_insert, dict_to_update  # type: ignore
 
 
 # ==========================================
@@ -367,25 +367,9 @@ def get_qr_codes_by_booking(booking_id: int) -> List[Dict]:
 
 
 def verify_qr_code(code: str) -> Optional[Dict]:
-    """Verify QR code and mark as used"""
-    qr = DatabaseConnection.execute_query_one(
-        "SELECT * FROM lockers_qraccesscode WHERE code = ? AND is_used = 0",
-        (code,)
-    )
-    
-    if qr:
-        # Check if expired
-        expires_at = parse_datetime(qr['expires_at'])
-        if expires_at and expires_at < datetime.now():
-            return None
-        
-        # Mark as used
-        DatabaseConnection.execute_update(
-            "UPDATE lockers_qraccesscode SET is_used = 1, used_at = ? WHERE id = ?",
-            (format_datetime(datetime.now()), qr['id'])
-        )
-    
-    return qr
+    """Verify QR code and mark as used (single conditional UPDATE, see qr_codes)"""
+    from .qr_codes import consume_qr_code
+    return consume_qr_code(code)
 
 
 # ==========================================
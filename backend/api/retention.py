@@ -0,0 +1,180 @@
+"""
+Retention for LockSpot - Raw SQL
+TTL purge of old notifications, expired QR codes and used-up refresh tokens
+in small batches
+
+Notifications are kept for a number of days that depends on their type
+(NOTIFICATION_TTL_DAYS), QR codes for QR_CODE_GRACE_DAYS after they expired,
+refresh tokens for REFRESH_TOKEN_GRACE_DAYS after they expired or were
+revoked (long enough to still recognise a stolen token being replayed).
+Each table is walked once in primary-key order, up to the highest id among
+rows old enough for the shortest TTL (one index-only lookup on the
+created_at / generated_at index), so the purge never scans rows it could not
+delete. Every batch locks its rows, re-checks them and deletes them in one
+short transaction; unread notifications are taken off their users' unread
+counters in the same transaction. scripts/maintenance/purge_expired.py
+drives the batches, sleeps between them and waits while replicas lag.
+"""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .notifications import release_unread
+
+
+NOTIFICATION_TTL_DAYS = {
+    'Promo': 30,
+    'Reminder': 30,
+    'System': 90,
+    'Booking': 180,
+    'Payment': 365,
+    'Security': 365,
+}
+QR_CODE_GRACE_DAYS = 30
+REFRESH_TOKEN_GRACE_DAYS = 7
+
+
+class Target(NamedTuple):
+    table: str
+    age_column: str  # indexed; bounds the primary-key walk
+    condition: str  # rows that may go, with %s placeholders
+    params: Tuple
+    min_days: int  # shortest TTL: nothing newer than this is ever deleted
+
+
+def notification_target(ttl_days: Dict[str, int] = None) -> Target:
+    """Notifications older than the TTL of their type; types without a TTL are kept"""
+    ttl_days = ttl_days or NOTIFICATION_TTL_DAYS
+    clauses, params = [], []
+    for notification_type, days in sorted(ttl_days.items()):
+        clauses.append("(notification_type = %s AND created_at < NOW() - INTERVAL %s DAY)")
+        params += [notification_type, days]
+    return Target('lockers_notification', 'created_at', " OR ".join(clauses), tuple(params),
+                  min(ttl_days.values()))
+
+
+def qr_code_target(grace_days: int = QR_CODE_GRACE_DAYS) -> Target:
+    # A code expires after it is generated, so generated_at bounds the walk as well
+    return Target('lockers_qraccesscode', 'generated_at', "expires_at < NOW() - INTERVAL %s DAY",
+                  (grace_days,), grace_days)
+
+
+def refresh_token_target(grace_days: int = REFRESH_TOKEN_GRACE_DAYS) -> Target:
+    # Rotated tokens are revoked after they were created, so created_at bounds the walk
+    return Target('lockers_refreshtoken', 'created_at',
+                  "expires_at < NOW() - INTERVAL %s DAY OR revoked_at < NOW() - INTERVAL %s DAY",
+                  (grace_days, grace_days), grace_days)
+
+
+# ==================== BATCHES ====================
+
+def upper_id(cursor, target: Target) -> Optional[int]:
+    """Highest id that can qualify (None when nothing is old enough)"""
+    cursor.execute(f"""
+        SELECT MAX(id) AS upper_id FROM {target.table}
+        WHERE {target.age_column} < NOW() - INTERVAL %s DAY
+    """, (target.min_days,))
+    row = cursor.fetchone()
+    return row[0] if isinstance(row, tuple) else row['upper_id']
+
+
+def count_expired(cursor, target: Target, upper: int) -> int:
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM {target.table}
+        WHERE id <= %s AND ({target.condition})
+    """, (upper, *target.params))
+    return cursor.fetchone()[0]
+
+
+def next_batch(cursor, target: Target, after_id: int, upper: int, batch_size: int) -> List[int]:
+    """Ids of the next rows to purge in primary-key order (a plain read, no locks)"""
+    cursor.execute(f"""
+        SELECT id FROM {target.table}
+        WHERE id > %s AND id <= %s AND ({target.condition})
+        ORDER BY id
+        LIMIT %s
+    """, (after_id, upper, *target.params, batch_size))
+    return [row[0] if isinstance(row, tuple) else row['id'] for row in cursor.fetchall()]
+
+
+def purge_batch(conn, target: Target, ids: List[int]) -> int:
+    """Delete the given rows that still qualify once locked, in one transaction; returns rows deleted"""
+    if not ids:
+        return 0
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"""
+            SELECT id FROM {target.table}
+            WHERE id IN ({placeholders}) AND ({target.condition})
+            FOR UPDATE
+        """, (*ids, *target.params))
+        locked = [row[0] for row in cursor.fetchall()]
+        if not locked:
+            conn.commit()
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(locked))
+        if target.table == 'lockers_notification':
+            release_unread(cursor, f"id IN ({placeholders})", locked)
+        cursor.execute(f"DELETE FROM {target.table} WHERE id IN ({placeholders})", locked)
+        deleted = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return deleted
+
+
+# ==================== REPLICATION LAG ====================
+
+def replica_lag(conn) -> Optional[float]:
+    """Seconds the replica behind `conn` is behind its source; None when replication is not running"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+    except Exception:
+        cursor.execute("SHOW SLAVE STATUS")  # before MySQL 8.0.22
+    channels = cursor.fetchall()  # one row per replication channel
+    cursor.close()
+    lags = [row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master')) for row in channels]
+    if not lags or None in lags:
+        return None
+    return float(max(lags))
+
+
+class ReplicaThrottle:
+    """Blocks between batches while any replica is more than max_lag seconds behind"""
+
+    def __init__(self, replicas: Dict[str, object], max_lag: float, poll_seconds: float = 1.0,
+                 max_wait: float = 600, sleep=time.sleep, log=print):
+        self.replicas = replicas  # name -> connection
+        self.max_lag = max_lag
+        self.poll_seconds = poll_seconds
+        self.max_wait = max_wait
+        self.sleep = sleep
+        self.log = log
+        self.waited = 0.0
+
+    def lagging(self) -> Dict[str, Optional[float]]:
+        lags = {name: replica_lag(conn) for name, conn in self.replicas.items()}
+        return {name: lag for name, lag in lags.items() if lag is None or lag > self.max_lag}
+
+    def wait(self):
+        """Return once every replica is within max_lag; raise after max_wait seconds"""
+        waited = 0.0
+        while True:
+            lagging = self.lagging()
+            if not lagging:
+                return
+            if waited >= self.max_wait:
+                raise RuntimeError(f"replicas still lagging after {self.max_wait:.0f}s: {lagging}")
+            if waited == 0:
+                described = ', '.join(f"{name} {'stopped' if lag is None else f'{lag:.0f}s'}"
+                                      for name, lag in lagging.items())
+                self.log(f"  ⏸  waiting for replicas ({described})")
+            self.sleep(self.poll_seconds)
+            waited += self.poll_seconds
+            self.waited += self.poll_seconds
@@ -1,3 +1,1191 @@
-from django.test import TestCase
+import base64
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import jwt
+import mysql.connector
+from django.db import connection
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+import db_utils
+from db_utils import DATABASE_CONFIG, DatabaseConnection
+from lockers.models import User
+
+from . import (
+    archive, audit, authentication, discounts, hot_queries, kiosk_sync, notifications, outbox, qr_codes,
+    qr_images, qr_tokens, retention, views,
+)
+
+
+class QueryCountMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+
+    def test_header_is_off_by_default(self):
+        response = self.client.get('/api/health/')
+        self.assertNotIn('X-DB-Queries', response)
+
+    @override_settings(QUERY_COUNT_HEADER=True)
+    def test_header_counts_statements(self):
+        client = Client()  # middleware is loaded per handler
+        self.assertEqual(client.get('/api/health/')['X-DB-Queries'], '0')
+
+        client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/admin/')
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(response['X-DB-Queries'], str(len(queries)))
+
+
+class SiteMiddlewareTests(TestCase):
+    """/api/ skips sessions, CSRF and messages; the admin keeps the full stack"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+
+    def test_api_gets_only_the_lean_stack(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')  # SecurityMiddleware
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+        # A session cookie no longer authenticates API calls
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 403)
+
+    def test_api_paths_without_a_slash_redirect(self):
+        for path in ('/api/locations', '/api/auth/me'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 301)
+                self.assertEqual(response['Location'], path + '/')
+
+    def test_admin_keeps_sessions_and_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.post('/admin/login/', {'username': 'admin@lockspot.test', 'password': 'admin-pass'})
+        self.assertEqual(response.status_code, 403)
+
+        client.force_login(self.admin)
+        response = client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertEqual(response.wsgi_request.user, self.admin)
+
+
+class StatementLogTests(SimpleTestCase):
+
+    class FakeCursor:
+        def __init__(self):
+            self.calls = []
+
+        def execute(self, query, params=None):
+            self.calls.append((query, params))
+
+        def executemany(self, query, seq_params):
+            self.calls.append((query, list(seq_params)))
+
+    def test_statements_are_logged(self):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        fake = self.FakeCursor()
+
+        db_utils.start_statement_log(path)
+        try:
+            cursor = db_utils._CountingCursor(fake)
+            cursor.execute("SELECT * FROM auth_user WHERE email = %s AND id > %s", ('sara@lockspot.test', 7))
+            cursor.executemany("INSERT INTO lockers_notification (user_id, title) VALUES (%s, %s)",
+                               ((1, 'Booking confirmed'), (2, 'Booking confirmed'), (3, 'Booking confirmed')))
+        finally:
+            db_utils.stop_statement_log()
+        cursor.execute("SELECT 1")
+
+        with open(path) as f:
+            log = f.read()
+        records = [json.loads(line) for line in log.splitlines()]
+        self.assertEqual(len(records), 2)
+        self.assertNotIn('sara@', log)
+        self.assertEqual(records[0]['params'], [{'redacted': 'str', 'len': 18}, 7])
+        self.assertEqual((records[1]['params'], records[1]['rows']), ([1, {'redacted': 'str', 'len': 17}], 3))
+        self.assertEqual(fake.calls[0][1], ('sara@lockspot.test', 7))
+
+    def test_raw_params_are_opt_in(self):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        db_utils.start_statement_log(path, raw_params=True)
+        try:
+            db_utils._CountingCursor(self.FakeCursor()).execute(
+                "SELECT * FROM lockers_booking WHERE user_id = %s AND status = %s", (7, 'Completed'))
+        finally:
+            db_utils.stop_statement_log()
+
+        with open(path) as f:
+            self.assertEqual(json.loads(f.readline())['params'], [7, 'Completed'])
+
+
+# Plans are only meaningful on realistic volumes (see generate_synthetic_data.py)
+PLAN_MIN_BOOKINGS = 100000
+
+
+def _populated_mysql():
+    """The MySQL database from db_utils, if reachable and loaded with enough data to plan against"""
+    try:
+        conn = mysql.connector.connect(**DATABASE_CONFIG, connection_timeout=2)
+    except mysql.connector.Error:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT TABLE_ROWS FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'lockers_booking'
+        """)
+        row = cursor.fetchone()
+        return bool(row) and (row[0] or 0) >= PLAN_MIN_BOOKINGS
+    finally:
+        conn.close()
+
+
+@skipUnless(_populated_mysql(), 'needs the populated MySQL database from db_utils')
+class QueryPlanTests(SimpleTestCase):
+    """EXPLAIN every hot statement; fails when an index stops being used"""
+
+    # Small dimension tables may be scanned
+    SMALL_TABLES = ('loc', 'p', 'a')
+    MAX_ROWS = 20000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        sample = DatabaseConnection.execute_query_one("""
+            SELECT b.user_id, l.location_id FROM lockers_booking b
+            JOIN lockers_lockerunit l ON b.locker_id = l.id
+            ORDER BY b.id DESC LIMIT 1
+        """)
+        cls.user_id, cls.location_id = sample['user_id'], sample['location_id']
+
+    def assertPlan(self, query, params, **expectations):
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            summary = hot_queries.summarize_plan(hot_queries.explain(cursor, query, params))
+            cursor.close()
+        expectations.setdefault('full_scan_ok', self.SMALL_TABLES)
+        expectations.setdefault('max_rows', self.MAX_ROWS)
+        problems = hot_queries.plan_problems(summary, **expectations)
+        self.assertFalse(problems, f"plan regressions: {problems}\nplan: {summary}")
+
+    def test_location_list(self):
+        # One row per location: grouping and sorting that many rows is expected
+        self.assertPlan(hot_queries.LOCATION_LIST, (), full_scan_ok=('l', 'a'), max_rows=0,
+                        keys={'lu': {'idx_locker_location', 'unique_location_unit'}},
+                        filesort_ok=True, temporary_ok=True)
+
+    def test_locker_filter(self):
+        query, params = hot_queries.locker_list_query(self.location_id, 'Small', 'Available')
+        self.assertPlan(query, params, filesort_ok=True,
+                        keys={'l': {'idx_locker_location', 'unique_location_unit'}})
+
+    def test_booking_list_by_user(self):
+        query, params = hot_queries.booking_list_query(self.user_id)
+        self.assertPlan(query, params, keys={'b': {'idx_booking_user_created'}})
+
+    def test_booking_history_page(self):
+        query, params = hot_queries.booking_list_query(self.user_id, before=(datetime(2030, 1, 1), 1 << 30), limit=21)
+        self.assertPlan(query, params, keys={'b': {'idx_booking_user_created'}})
+
+    def test_archived_booking_history_page(self):
+        if not DatabaseConnection.execute_query_one("SELECT id FROM lockers_bookingarchive LIMIT 1"):
+            self.skipTest('nothing archived yet (scripts/maintenance/archive_bookings.py)')
+        query, params = hot_queries.booking_list_query(self.user_id, limit=21, table='lockers_bookingarchive')
+        self.assertPlan(query, params, keys={'b': {'idx_booking_archive_user'}})
+
+    def test_booking_list_by_user_and_status(self):
+        query, params = hot_queries.booking_list_query(self.user_id, 'Completed')
+        self.assertPlan(query, params, keys={'b': {'idx_booking_user_st_created'}})
+
+    def test_reviews_by_location(self):
+        # Reviews of all the location's lockers are merged, so sorting them stays
+        self.assertPlan(hot_queries.LOCATION_REVIEWS, (self.location_id,), filesort_ok=True,
+                        keys={'l': {'idx_locker_location', 'unique_location_unit'},
+                              'b': {'idx_booking_locker', 'idx_booking_locker_updated'}})
+
+    def test_notifications_by_user(self):
+        self.assertPlan(hot_queries.USER_NOTIFICATIONS, (self.user_id,),
+                        keys={'lockers_notification': {'idx_notification_user_created'}})
+
+
+class PlanSummaryTests(SimpleTestCase):
+
+    PLAN = {'query_block': {'ordering_operation': {
+        'using_filesort': True,
+        'nested_loop': [
+            {'table': {'table_name': 'b', 'access_type': 'ALL', 'key': None, 'rows_examined_per_scan': 50000}},
+            {'table': {'table_name': 'l', 'access_type': 'eq_ref', 'key': 'PRIMARY', 'rows_examined_per_scan': 1}},
+        ],
+    }}}
+
+    def test_regressions_are_reported(self):
+        summary = hot_queries.summarize_plan(self.PLAN)
+        self.assertEqual([t['table'] for t in summary['tables']], ['b', 'l'])
+        problems = hot_queries.plan_problems(summary, keys={'b': {'idx_booking_user'}}, max_rows=1000)
+        self.assertEqual(len(problems), 4)
+        self.assertIn('b: full table scan (50,000 rows)', problems)
+        self.assertIn('uses filesort', problems)
+
+    def test_expected_plan_passes(self):
+        summary = hot_queries.summarize_plan(self.PLAN)
+        self.assertEqual(hot_queries.plan_problems(summary, full_scan_ok=('b',), filesort_ok=True), [])
+
+
+class BookingHistoryTests(SimpleTestCase):
+    """Live/archive union of booking history, against a scripted cursor"""
+
+    class ScriptedCursor:
+        def __init__(self, *results):
+            self.results = list(results)
+            self.queries = []
+
+        def execute(self, query, params=()):
+            self.queries.append(query)
+            self.current = self.results.pop(0)
+
+        def fetchall(self):
+            return self.current
+
+        def fetchone(self):
+            return self.current[0] if self.current else None
+
+    @staticmethod
+    def rows(*specs):
+        return [{'id': row_id, 'created_at': datetime(2026, month, 1)} for row_id, month in specs]
+
+    def test_newer_full_page_skips_archive(self):
+        cursor = self.ScriptedCursor(self.rows((9, 9), (8, 8), (7, 7)), [{'newest': datetime(2026, 3, 1)}])
+        rows, has_more = archive.booking_history(cursor, 1, limit=2)
+        self.assertEqual([r['id'] for r in rows], [9, 8])
+        self.assertTrue(has_more)
+        self.assertFalse(any('lockers_bookingarchive b' in q for q in cursor.queries))
+
+    def test_older_page_merges_archive(self):
+        cursor = self.ScriptedCursor(self.rows((9, 9), (4, 4)), [{'newest': datetime(2026, 6, 1)}],
+                                     self.rows((6, 6), (5, 5), (3, 3)))
+        rows, has_more = archive.booking_history(cursor, 1, limit=3)
+        self.assertEqual([r['id'] for r in rows], [9, 6, 5])
+        self.assertTrue(has_more)
+        self.assertIn('lockers_bookingarchive b', cursor.queries[-1])
+
+    def test_live_status_filter_never_reads_archive(self):
+        cursor = self.ScriptedCursor(self.rows((9, 9)))
+        rows, has_more = archive.booking_history(cursor, 1, status='Active')
+        self.assertEqual(len(cursor.queries), 1)
+        self.assertEqual((len(rows), has_more), (1, False))
+
+    def test_page_cursor_round_trip(self):
+        row = self.rows((42, 5))[0]
+        self.assertEqual(archive.decode_page_cursor(archive.encode_page_cursor(row)), (row['created_at'], 42))
+        with self.assertRaises(ValueError):
+            archive.decode_page_cursor('not-a-cursor')
+
+
+class OutboxTests(SimpleTestCase):
+    """Outbox writes and per-handler delivery, against a recording connection"""
+
+    class Connection:
+        def __init__(self, due=()):
+            self.due = list(due)
+            self.statements = []
+
+        def cursor(self, dictionary=False):
+            return OutboxTests.Cursor(self)
+
+        def commit(self):
+            self.statements.append(('COMMIT', None))
+
+        def rollback(self):
+            self.statements.append(('ROLLBACK', None))
+
+    class Cursor:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, query, params=()):
+            self.conn.statements.append((' '.join(query.split()), list(params)))
+
+        def executemany(self, query, rows):
+            self.conn.statements.append((' '.join(query.split()), list(rows)))
+
+        def fetchall(self):
+            return self.conn.due
+
+        def close(self):
+            pass
+
+    @staticmethod
+    def due(*specs):
+        return [{'id': event_id, 'event_type': outbox.BOOKING_CREATED, 'booking_id': event_id,
+                 'payload': json.dumps({'booking_id': event_id}), 'attempts': attempts, 'done_handlers': done}
+                for event_id, attempts, done in specs]
+
+    @staticmethod
+    def handler(calls, fail_on=None):
+        def run(cursor, events):
+            calls.append([e.id for e in events])
+            if fail_on in calls[-1]:
+                raise RuntimeError('boom')
+        return run
+
+    def test_enqueue_is_one_insert_for_any_number_of_bookings(self):
+        conn = self.Connection()
+        added = outbox.enqueue(conn.cursor(), outbox.BOOKING_EXPIRED,
+                               [{'booking_id': i, 'end_time': datetime(2026, 1, 1)} for i in (1, 2, 3)])
+        self.assertEqual(added, 3)
+        self.assertEqual(len(conn.statements), 1)
+        query, params = conn.statements[0]
+        self.assertTrue(query.startswith('INSERT INTO lockers_outboxevent'))
+        self.assertEqual(params[:3], [outbox.BOOKING_EXPIRED, 1, '{"booking_id": 1, "end_time": "2026-01-01 00:00:00"}'])
+        self.assertEqual(len(params), 9)
+
+    def test_failing_event_is_retried_alone(self):
+        conn = self.Connection(self.due((1, 0, '[]'), (2, 0, '[]'), (3, 0, '[]')))
+        notified, audited = [], []
+        counts = outbox.dispatch_batch(conn, handlers={
+            'notification': self.handler(notified),
+            'audit': self.handler(audited, fail_on=2),
+        })
+
+        self.assertEqual(counts, {'events': 3, 'done': 2, 'retried': 1})
+        self.assertEqual(notified, [[1, 2, 3]])
+        self.assertEqual(audited, [[1, 2, 3], [1], [2], [3]])
+        marked = [params for query, params in conn.statements if 'JSON_ARRAY_APPEND' in query]
+        self.assertEqual(marked, [['notification', 1, 2, 3], ['audit', 1], ['audit', 3]])
+        done = next(params for query, params in conn.statements if "status = 'Done'" in query)
+        self.assertEqual(done, [1, 3])
+        retry = next(rows for query, rows in conn.statements if 'SET attempts' in query)
+        self.assertEqual(retry, [(1, 'Pending', 'audit: RuntimeError: boom', outbox.RETRY_BASE_SECONDS, 2)])
+
+    def test_done_handlers_are_skipped_and_last_attempt_parks_the_event(self):
+        conn = self.Connection(self.due((7, outbox.MAX_ATTEMPTS - 1, '["notification"]')))
+        notified, audited = [], []
+        outbox.dispatch_batch(conn, handlers={
+            'notification': self.handler(notified),
+            'audit': self.handler(audited, fail_on=7),
+        })
+
+        self.assertEqual(notified, [])
+        retry = next(rows for query, rows in conn.statements if 'SET attempts' in query)
+        self.assertEqual(retry[0][:2], (outbox.MAX_ATTEMPTS, 'Failed'))
+
+
+class NotificationEngineTests(SimpleTestCase):
+    """Fan-out batches and unread counter upkeep, against a recording cursor"""
+
+    class Cursor:
+        def __init__(self, rowcounts=(), rows=()):
+            self.rowcounts = list(rowcounts)
+            self.rows = list(rows)
+            self.statements = []
+            self.rowcount = 0
+
+        def execute(self, query, params=()):
+            self.statements.append((' '.join(query.split()), tuple(params)))
+            self.rowcount = self.rowcounts.pop(0) if self.rowcounts else 0
+
+        def executemany(self, query, rows):
+            self.statements.append((' '.join(query.split()), list(rows)))
+
+        def fetchone(self):
+            return self.rows.pop(0) if self.rows else None
+
+    def test_insert_counts_each_user_once_per_batch(self):
+        cursor = self.Cursor()
+        rows = [(5, 'Closing', 'Bye', 'System', None), (3, 'Closing', 'Bye', 'System', 9),
+                (5, 'Closing', 'Again', 'System', None)]
+        self.assertEqual(notifications.insert_notifications(cursor, rows), 3)
+
+        (insert, inserted), (upsert, counts) = cursor.statements
+        self.assertTrue(insert.startswith('INSERT INTO lockers_notification '))
+        self.assertEqual(inserted, rows)
+        self.assertIn('ON DUPLICATE KEY UPDATE unread = unread + VALUES(unread)', upsert)
+        self.assertEqual(counts, [(3, 1), (5, 2)])
+
+    def test_mark_read_decrements_only_unread(self):
+        cursor = self.Cursor(rowcounts=[1])
+        self.assertTrue(notifications.mark_read(cursor, 7, 40))
+        self.assertIn('GREATEST(unread - 1, 0)', cursor.statements[-1][0])
+
+        cursor = self.Cursor(rowcounts=[0], rows=[(1,)])
+        self.assertFalse(notifications.mark_read(cursor, 7, 40))
+        self.assertFalse(any('notificationcounter' in query for query, _ in cursor.statements))
+
+        cursor = self.Cursor(rowcounts=[0])
+        self.assertIsNone(notifications.mark_read(cursor, 7, 41))
+
+    def test_mark_all_read_subtracts_rows_changed(self):
+        cursor = self.Cursor(rowcounts=[4])
+        self.assertEqual(notifications.mark_all_read(cursor, 7), 4)
+        self.assertEqual(cursor.statements[-1][1], (4, 7))
+
+    def test_unread_count_seeds_missing_counter(self):
+        cursor = self.Cursor(rows=[None, {'n': 2}])
+        self.assertEqual(notifications.unread_count(cursor, 7), 2)
+        self.assertTrue(cursor.statements[1][0].startswith('INSERT IGNORE INTO lockers_notificationcounter'))
+
+        cursor = self.Cursor(rows=[{'n': 0}])
+        self.assertEqual(notifications.unread_count(cursor, 7), 0)
+        self.assertEqual(len(cursor.statements), 1)
+
+
+class RetentionTests(SimpleTestCase):
+    """TTL purge batches and the replica lag throttle"""
+
+    class Connection:
+        def __init__(self, locked=(), rowcount=0, replica_rows=()):
+            self.locked = list(locked)
+            self.rowcount = rowcount
+            self.replica_rows = list(replica_rows)
+            self.statements = []
+
+        def cursor(self, dictionary=False):
+            return RetentionTests.Cursor(self)
+
+        def commit(self):
+            self.statements.append('COMMIT')
+
+        def rollback(self):
+            self.statements.append('ROLLBACK')
+
+    class Cursor:
+        def __init__(self, conn):
+            self.conn = conn
+            self.rowcount = 0
+
+        def execute(self, query, params=()):
+            self.conn.statements.append(' '.join(query.split()))
+            self.rowcount = self.conn.rowcount
+
+        def fetchall(self):
+            if self.conn.replica_rows:
+                return [self.conn.replica_rows.pop(0)]
+            return [(row_id,) for row_id in self.conn.locked]
+
+        def close(self):
+            pass
+
+    def test_notification_condition_uses_each_type_ttl(self):
+        target = retention.notification_target({'Promo': 14, 'Security': 365})
+        self.assertEqual(target.params, ('Promo', 14, 'Security', 365))
+        self.assertEqual(target.condition.count('notification_type = %s'), 2)
+        self.assertEqual(target.min_days, 14)
+
+    def test_notification_batch_releases_unread_counts_before_deleting(self):
+        conn = self.Connection(locked=[3, 5], rowcount=2)
+        self.assertEqual(retention.purge_batch(conn, retention.notification_target(), [3, 4, 5]), 2)
+        lock, release, delete, commit = conn.statements
+        self.assertTrue(lock.endswith('FOR UPDATE'))
+        self.assertTrue(release.startswith('UPDATE lockers_notificationcounter'))
+        self.assertEqual(delete, 'DELETE FROM lockers_notification WHERE id IN (%s, %s)')
+        self.assertEqual(commit, 'COMMIT')
+
+        conn = self.Connection(locked=[8], rowcount=1)
+        retention.purge_batch(conn, retention.qr_code_target(), [8])
+        self.assertFalse(any('notificationcounter' in s for s in conn.statements))
+
+    def test_throttle_waits_while_a_replica_lags(self):
+        replica = self.Connection(replica_rows=[{'Seconds_Behind_Source': 30}, {'Seconds_Behind_Source': 12},
+                                                {'Seconds_Behind_Source': 2}])
+        slept = []
+        throttle = retention.ReplicaThrottle({'r1': replica}, max_lag=5, poll_seconds=0.5,
+                                             sleep=slept.append, log=lambda message: None)
+        throttle.wait()
+        self.assertEqual(slept, [0.5, 0.5])
+        self.assertEqual(throttle.waited, 1.0)
+
+        stopped = self.Connection(replica_rows=[{'Seconds_Behind_Source': None}] * 3)
+        throttle = retention.ReplicaThrottle({'r2': stopped}, max_lag=5, poll_seconds=1, max_wait=2,
+                                             sleep=lambda s: None, log=lambda message: None)
+        with self.assertRaises(RuntimeError):
+            throttle.wait()
+
+
+class AuditActorTests(SimpleTestCase):
+    """The audited client address only comes from X-Forwarded-For behind a trusted proxy"""
+
+    def ip(self, remote_addr, forwarded=None):
+        headers = {'REMOTE_ADDR': remote_addr}
+        if forwarded is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        return audit.actor_from(APIRequestFactory().get('/api/bookings/', **headers))[1]
+
+    @override_settings(AUDIT_TRUSTED_PROXIES=[])
+    def test_forwarded_for_is_ignored_from_untrusted_peers(self):
+        self.assertEqual(self.ip('203.0.113.9', '198.51.100.1'), '203.0.113.9')
+
+    @override_settings(AUDIT_TRUSTED_PROXIES=['10.0.0.5', '10.0.0.6'])
+    def test_last_untrusted_hop_behind_trusted_proxies(self):
+        self.assertEqual(self.ip('10.0.0.5', '198.51.100.1, 203.0.113.9, 10.0.0.6'), '203.0.113.9')
+        self.assertEqual(self.ip('10.0.0.5'), '10.0.0.5')
+        self.assertEqual(self.ip('203.0.113.9', '198.51.100.1'), '203.0.113.9')
+
+
+class AuditWriterTests(SimpleTestCase):
+    """Queueing, batching and spilling of audit entries"""
+
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+        self.inserted = []
+
+    def writer(self, insert=None, **kwargs):
+        return audit.AuditWriter(self.spill_dir, insert=insert or self.inserted.append, autostart=False, **kwargs)
+
+    def entry(self, record_id):
+        return (1, 'locker.status_changed', 'lockers_lockerunit', record_id,
+                {'status': 'Available'}, {'status': 'Booked'}, None, None, '2026-01-01 10:00:00')
+
+    def test_record_never_blocks_and_spills_when_the_queue_is_full(self):
+        writer = self.writer(queue_size=100)
+        started = time.perf_counter()
+        for record_id in range(1000):
+            writer.record(self.entry(record_id))
+        per_entry = (time.perf_counter() - started) / 1000
+        self.assertLess(per_entry, 0.001)
+        self.assertEqual(writer.stats['spilled'], 900)
+
+        self.assertEqual(writer.take(), [self.entry(i) for i in range(100)])
+        self.assertEqual(writer.replay_spills(), 900)
+        self.assertEqual([len(batch) for batch in self.inserted], [500, 400])
+        self.assertEqual(self.inserted[0][0], self.entry(100))
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_failed_flush_spills_the_batch_and_backs_off(self):
+        def fail(batch):
+            raise mysql.connector.Error('gone away')
+
+        writer = self.writer(insert=fail)
+        with self.assertRaises(mysql.connector.Error):
+            writer.flush([self.entry(1), self.entry(2)])
+        writer.insert = self.inserted.append
+        writer.flush([self.entry(3)])  # still backing off: spilled, not written
+        self.assertEqual(self.inserted, [])
+        self.assertEqual(writer.stats['spilled'], 3)
+
+        self.assertEqual(writer.replay_spills(), 3)
+        self.assertEqual([row[3] for row in self.inserted[0]], [1, 2, 3])
+
+    def test_slow_flush_sends_the_next_batches_to_the_spill_file(self):
+        def slow(batch):
+            self.inserted.append(batch)
+            time.sleep(0.02)
+
+        writer = self.writer(insert=slow)
+        with mock.patch.object(audit, 'SLOW_FLUSH_SECONDS', 0.01):
+            writer.flush([self.entry(1)])
+            writer.flush([self.entry(2)])
+        self.assertEqual(writer.stats['written'], 1)
+        self.assertEqual(writer.stats['spilled'], 1)
+
+
+class TokenCacheTests(SimpleTestCase):
+    """Decoded access token cache, the auth_user check and refresh token rotation"""
+
+    USER = {'id': 7, 'email': 'user@lockspot.test', 'user_type': 'Customer'}
+
+    def setUp(self):
+        self.cache = authentication.TokenCache(max_entries=2)
+        self.user_states = authentication.UserStateCache(ttl=60)
+        self.user_row = dict(self.USER, first_name='Sara', last_name='Ali', phone=None, is_verified=1, is_active=1)
+        self.user_conn = self.Connection(self.user_row)
+        for patcher in (
+            mock.patch.object(authentication, '_token_cache', self.cache),
+            mock.patch.object(authentication, '_user_states', self.user_states),
+            mock.patch.object(authentication.DatabaseConnection, 'get_connection',
+                              lambda: contextlib.nullcontext(self.user_conn)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def authenticate(self, token):
+        request = RequestFactory().get('/api/bookings/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return authentication.JWTAuthentication().authenticate(request)
+
+    def test_repeat_requests_skip_parsing_and_recheck_the_user_per_ttl(self):
+        token = authentication.create_access_token(self.USER)
+        with mock.patch.object(authentication.jwt, 'decode', wraps=jwt.decode) as decode:
+            for _ in range(4):
+                user, _ = self.authenticate(token)
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual((user.id, user.email, user.user_type, user.first_name),
+                         (7, 'user@lockspot.test', 'Customer', 'Sara'))
+        self.assertEqual(self.cache.stats()['hit_rate'], 0.75)
+        self.assertEqual((self.user_states.lookups, len(self.user_conn.statements)), (1, 1))
+
+    def test_disabled_or_demoted_accounts_lose_access_with_a_valid_token(self):
+        admin_token = authentication.create_access_token(dict(self.USER, user_type='Admin'))
+        self.user_conn.row = dict(self.user_row, user_type='Admin')
+        self.assertEqual(self.authenticate(admin_token)[0].user_type, 'Admin')
+
+        # Demoted: the claim still says Admin, the database wins once the entry expires
+        self.user_conn.row = self.user_row
+        self.user_states.clear()
+        user, _ = self.authenticate(admin_token)
+        self.assertEqual(user.user_type, 'Customer')
+        request = APIRequestFactory().get('/api/forecasts/')
+        request.user = user
+        self.assertFalse(authentication.IsAdminUser().has_permission(request, None))
+
+        self.user_conn.row = dict(self.user_row, is_active=0)
+        self.user_states.clear()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User account is disabled'):
+            self.authenticate(admin_token)
+
+        self.user_conn.row = None
+        self.user_states.clear()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User not found'):
+            self.authenticate(admin_token)
+
+    def test_user_state_expires_after_the_ttl(self):
+        token = authentication.create_access_token(self.USER)
+        self.authenticate(token)
+        self.user_conn.row = dict(self.user_row, is_active=0)
+        self.authenticate(token)  # still cached
+        with mock.patch.object(authentication.time, 'monotonic', return_value=time.monotonic() + 61):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token)
+
+    def test_substituted_or_expired_tokens_are_never_served_from_the_cache(self):
+        token = authentication.create_access_token(self.USER)
+        self.authenticate(token)
+        header, _, signature = token.split('.')
+        claims = jwt.utils.base64url_encode(json.dumps({'user_id': 1, 'user_type': 'Admin', 'exp': 4102444800}).encode())
+        other_claims = f'{header}.{claims.decode()}.{signature}'
+        other_signature = token[:-2] + ('BB' if token.endswith('AA') else 'AA')
+        for forged in (other_claims, other_signature):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(forged)
+        with override_settings(JWT_SECRET='rotated-secret-' * 3), self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+        self.cache.put(self.cache.key('stale'), {'user_id': 7, 'exp': time.time() - 1})
+        self.assertIsNone(self.cache.get(self.cache.key('stale')))
+        self.cache.put(b'a', {'exp': time.time() + 60})
+        self.cache.put(b'b', {'exp': time.time() + 60})
+        self.assertEqual((len(self.cache), self.cache.evictions), (2, 1))
+
+    class Connection:
+        def __init__(self, row):
+            self.row = row
+            self.statements = []
+
+        def cursor(self, dictionary=False):
+            return TokenCacheTests.Cursor(self)
+
+        def commit(self):
+            self.statements.append('COMMIT')
+
+        def rollback(self):
+            self.statements.append('ROLLBACK')
+
+    class Cursor:
+        rowcount = 1
+
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, query, params=()):
+            self.conn.statements.append(' '.join(query.split()))
+
+        def fetchone(self):
+            return self.conn.row
+
+        def close(self):
+            pass
+
+    def test_refresh_rotates_and_reuse_revokes_every_token_of_the_user(self):
+        row = {'id': 3, 'user_id': 7, 'revoked_at': None, 'expired': 0,
+               'email': 'user@lockspot.test', 'user_type': 'Customer', 'is_active': 1}
+        conn = self.Connection(row)
+        tokens = authentication.rotate_refresh_token(conn, 'old-refresh-token')
+        self.assertEqual(jwt.decode(tokens['access_token'], options={'verify_signature': False})['user_id'], 7)
+        self.assertNotEqual(tokens['refresh_token'], 'old-refresh-token')
+        lock, revoke, insert, commit = conn.statements
+        self.assertTrue(lock.endswith('FOR UPDATE OF t'))
+        self.assertEqual(revoke, 'UPDATE lockers_refreshtoken SET revoked_at = NOW() WHERE id = %s')
+        self.assertTrue(insert.startswith('INSERT INTO lockers_refreshtoken'))
+
+        conn = self.Connection(dict(row, revoked_at=datetime(2026, 1, 1)))
+        with self.assertRaises(AuthenticationFailed):
+            authentication.rotate_refresh_token(conn, 'old-refresh-token')
+        self.assertIn('WHERE user_id = %s AND revoked_at IS NULL', conn.statements[1])
+        self.assertEqual(conn.statements[2], 'COMMIT')
+
+
+
+def _mysql_schema():
+    """The MySQL database from db_utils, if reachable and created from sql/01_create_schema_mysql.sql"""
+    try:
+        conn = mysql.connector.connect(**DATABASE_CONFIG, connection_timeout=2)
+    except mysql.connector.Error:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'lockers_discountusageshard'
+        """)
+        return cursor.fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+@skipUnless(_mysql_schema(), 'needs the MySQL database from db_utils')
+class DiscountRedemptionTests(SimpleTestCase):
+    """Redemption against MySQL, where the conditional UPDATEs enforce the rules"""
+
+    def setUp(self):
+        self.codes = []
+
+    def tearDown(self):
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor()
+            # Counter slots go with the discount (ON DELETE CASCADE)
+            cursor.executemany("DELETE FROM lockers_discount WHERE code = %s", [(code,) for code in self.codes])
+            cursor.close()
+
+    def create_discount(self, max_uses=None, current_uses=0, min_booking_amount=0, valid_days=(-1, 30)):
+        code = f'TEST-{os.getpid()}-{time.time_ns()}'
+        self.codes.append(code)
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO lockers_discount
+                (code, discount_type, discount_value, min_booking_amount, valid_from, valid_to,
+                 max_uses, current_uses)
+                VALUES (%s, 'Percentage', 10, %s, NOW() + INTERVAL %s DAY, NOW() + INTERVAL %s DAY, %s, %s)
+            """, (code, min_booking_amount, *valid_days, max_uses, current_uses))
+            discount_id = cursor.lastrowid
+            cursor.close()
+        return code, discount_id
+
+    def redeem(self, code, amount=100):
+        """One booking transaction on its own connection; True if it got a use of the code"""
+        conn = mysql.connector.connect(**DATABASE_CONFIG)
+        try:
+            redeemed = discounts.redeem_discount(conn.cursor(dictionary=True), code, amount)
+            conn.commit()
+            return redeemed is not None
+        except mysql.connector.Error as e:
+            if e.errno != 1213:
+                raise
+            # Deadlock victim: its booking transaction is rolled back, without a use
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def redeem_concurrently(self, code, attempts):
+        barrier = threading.Barrier(attempts)
+
+        def attempt(_):
+            barrier.wait()
+            return self.redeem(code)
+
+        with ThreadPoolExecutor(max_workers=attempts) as pool:
+            return sum(pool.map(attempt, range(attempts)))
+
+    def usage(self, discount_id):
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            uses = discounts.get_discount_usage(cursor, discount_id)
+            cursor.close()
+        return uses
+
+    def test_only_one_concurrent_redemption_gets_the_last_use(self):
+        code, discount_id = self.create_discount(max_uses=10, current_uses=9)
+        self.assertEqual(self.redeem_concurrently(code, 8), 1)
+        self.assertEqual(self.usage(discount_id), 10)
+        self.assertFalse(self.redeem(code))
+
+    def test_expired_and_below_minimum_codes_are_rejected(self):
+        expired, expired_id = self.create_discount(valid_days=(-30, -1))
+        self.assertFalse(self.redeem(expired))
+        self.assertEqual(self.usage(expired_id), 0)
+
+        minimum, minimum_id = self.create_discount(min_booking_amount=50)
+        self.assertFalse(self.redeem(minimum, amount=49.99))
+        self.assertEqual(self.usage(minimum_id), 0)
+        self.assertTrue(self.redeem(minimum, amount=50))
+        self.assertEqual(self.usage(minimum_id), 1)
+
+    def test_sharded_total_never_exceeds_max_uses(self):
+        code, discount_id = self.create_discount(max_uses=20, current_uses=5)
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            discounts.enable_sharded_counter(cursor, discount_id, 4)
+            cursor.close()
+
+        redeemed = self.redeem_concurrently(code, 24)
+        self.assertLessEqual(redeemed, 15)
+        self.assertEqual(self.usage(discount_id), 5 + redeemed)
+        while self.redeem(code):  # whatever deadlock victims left over
+            redeemed += 1
+        self.assertEqual(redeemed, 15)
+        self.assertEqual(self.usage(discount_id), 20)
+
+
+class ShardedCounterSetupTests(SimpleTestCase):
+    """enable_sharded_counter splits what is left of max_uses over the slots"""
+
+    class Cursor:
+        def __init__(self, max_uses, uses):
+            self.rows = [{'id': 5, 'max_uses': max_uses}, {'total_uses': uses}]
+            self.statements = []
+
+        def execute(self, query, params=()):
+            self.statements.append((' '.join(query.split()), params))
+
+        def executemany(self, query, rows):
+            self.statements.append((' '.join(query.split()), list(rows)))
+
+        def fetchone(self):
+            return self.rows.pop(0)
+
+        def fetchall(self):
+            return []
+
+    def test_slot_caps_add_up_to_the_remaining_uses(self):
+        cursor = self.Cursor(max_uses=100, uses=31)
+        discounts.enable_sharded_counter(cursor, 5, 4)
+        fold, insert = cursor.statements[-2:]
+        self.assertEqual(fold[1], (31, 4, 5))
+        self.assertEqual([row[3] for row in insert[1]], [18, 17, 17, 17])
+
+    def test_exhausted_or_unlimited_codes(self):
+        cursor = self.Cursor(max_uses=10, uses=12)
+        discounts.enable_sharded_counter(cursor, 5, 3)
+        self.assertEqual([row[3] for row in cursor.statements[-1][1]], [0, 0, 0])
+
+        cursor = self.Cursor(max_uses=None, uses=12)
+        discounts.enable_sharded_counter(cursor, 5, 2)
+        self.assertEqual([row[3] for row in cursor.statements[-1][1]], [None, None])
+
+
+class QRTokenTests(SimpleTestCase):
+    """Signed QR tokens: issuing, offline verification and the kiosk's checks"""
+
+    SECRET = 'qr-test-secret-' * 3
+    START, END = 1767261600, 1767276000  # 2026-01-01 10:00-14:00 UTC
+
+    def setUp(self):
+        self.signer = qr_tokens.QRTokenSigner(self.SECRET)
+        self.token = self.signer.issue(42, 7, self.START, self.END)
+
+    def test_issued_token_round_trips(self):
+        self.assertEqual(len(self.token), qr_codes.SIGNED_TOKEN_LENGTH)
+        self.assertEqual(self.signer.verify(self.token, locker_id=7, now=self.START),
+                         qr_tokens.QRToken(42, 7, 'Unlock', self.START, self.END))
+        lock = self.signer.issue(42, 7, self.START, self.END, code_type='Lock')
+        self.assertEqual(self.signer.verify(lock, now=self.START).code_type, 'Lock')
+
+    def test_tampered_or_foreign_tokens_are_rejected(self):
+        raw = bytearray(base64.urlsafe_b64decode(self.token + '=='))
+        for index in (2, len(raw) - 1):  # booking id, signature
+            forged = bytearray(raw)
+            forged[index] ^= 1
+            with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'Invalid signature'):
+                self.signer.verify(base64.urlsafe_b64encode(forged).rstrip(b'=').decode(), now=self.START)
+        for malformed in (self.token[:-4], 'not a token!'):
+            with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'Malformed token'):
+                self.signer.verify(malformed, now=self.START)
+        with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'Invalid signature'):
+            qr_tokens.QRTokenSigner('another-secret').verify(self.token, now=self.START)
+        with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'another locker'):
+            self.signer.verify(self.token, locker_id=8, now=self.START)
+
+    def test_validity_window(self):
+        with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'not yet valid'):
+            self.signer.verify(self.token, now=self.START - 1)
+        with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'expired'):
+            self.signer.verify(self.token, now=self.END + 1)
+        # Usage reports arrive late: only the signature is checked
+        self.assertEqual(self.signer.verify(self.token, now=self.END + 3600, check_window=False).booking_id, 42)
+
+    def test_kiosk_refuses_reuse_and_bookings_synced_as_finished(self):
+        kiosk = qr_tokens.KioskVerifier(self.SECRET, locker_ids=[7])
+        other = self.signer.issue(43, 7, self.START, self.END)
+        elsewhere = self.signer.issue(44, 9, self.START, self.END)
+        used_at_another_kiosk = self.signer.issue(45, 7, self.START, self.END)
+        kiosk.apply_sync({'bookings': [
+            {'id': 42, 'locker_id': 7, 'start': self.START, 'end': self.END, 'status': 'Active'},
+            {'id': 43, 'locker_id': 7, 'start': self.START, 'end': self.END, 'status': 'Cancelled'},
+        ], 'codes': [
+            {'code': used_at_another_kiosk, 'booking_id': 45, 'expires': self.END, 'is_used': True},
+        ]})
+
+        with mock.patch.object(qr_tokens.time, 'time', return_value=self.START + 60):
+            self.assertEqual(kiosk.consume(self.token, locker_id=7).booking_id, 42)
+            for token, message in ((self.token, 'already used'), (other, 'no longer active'),
+                                   (elsewhere, 'another station'), (used_at_another_kiosk, 'already used')):
+                with self.assertRaisesMessage(qr_tokens.InvalidQRToken, message):
+                    kiosk.consume(token)
+
+            kiosk.apply_sync({'bookings': [
+                {'id': 42, 'locker_id': 7, 'start': self.START, 'end': self.END, 'status': 'Completed'},
+            ], 'codes': []})
+            lock = self.signer.issue(42, 7, self.START, self.END, code_type='Lock')
+            with self.assertRaisesMessage(qr_tokens.InvalidQRToken, 'no longer active'):
+                kiosk.consume(lock)
+
+    class Connection:
+        def __init__(self, row):
+            self.row = row
+
+        def cursor(self, dictionary=False):
+            return self
+
+        def execute(self, query, params=()):
+            pass
+
+        def fetchone(self):
+            return self.row
+
+        def close(self):
+            pass
+
+    def booking_response(self, view, path, booking_status, **kwargs):
+        row = {'id': 42, 'user_id': 1, 'locker_id': 7, 'status': booking_status,
+               'start_time': datetime(2026, 1, 1, 10), 'end_time': datetime(2026, 1, 1, 14),
+               'booking_type': 'Storage', 'subtotal_amount': '20.00', 'discount_amount': '0.00',
+               'total_amount': '20.00', 'created_at': datetime(2026, 1, 1, 9),
+               'unit_number': 'A1', 'size': 'Small', 'location_name': 'Station'}
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=authentication.MockUser({'id': 1, 'email': 'user@lockspot.test'}))
+        with mock.patch.object(views.DatabaseConnection, 'get_connection',
+                               lambda: contextlib.nullcontext(self.Connection(row))), \
+                mock.patch.object(qr_tokens, '_signer', self.signer):
+            return view.as_view()(request, booking_id=42, **kwargs)
+
+    def test_no_token_is_issued_for_cancelled_or_completed_bookings(self):
+        detail = self.booking_response(views.BookingDetailView, '/api/bookings/42/', 'Active')
+        self.assertEqual(self.signer.verify(detail.data['qr_code'], check_window=False).booking_id, 42)
+
+        for booking_status in ('Cancelled', 'Completed'):
+            detail = self.booking_response(views.BookingDetailView, '/api/bookings/42/', booking_status)
+            self.assertIsNone(detail.data['qr_code'])
+            qr = self.booking_response(views.BookingQRView, '/api/bookings/42/qr/', booking_status)
+            self.assertEqual(qr.status_code, 400)
+            image = self.booking_response(views.BookingQRImageView, '/api/bookings/42/qr.png',
+                                          booking_status, fmt='png')
+            self.assertEqual(image.status_code, 400)
+
+
+@override_settings(KIOSK_API_KEY='kiosk-master-secret')
+class KioskKeyTests(SimpleTestCase):
+    """A kiosk key only opens its own location's endpoints"""
+
+    def sync(self, location_id, key):
+        request = APIRequestFactory().get(f'/api/kiosk/locations/{location_id}/sync/', HTTP_X_KIOSK_KEY=key)
+        with mock.patch.object(views.DatabaseConnection, 'get_connection',
+                               lambda: contextlib.nullcontext(QRTokenTests.Connection(None))), \
+                mock.patch.object(views, 'build_sync_payload', return_value=b'LSK1') as build:
+            response = views.KioskSyncView.as_view()(request, location_id=location_id)
+        return response, build
+
+    def test_keys_are_bound_to_one_location(self):
+        key = kiosk_sync.kiosk_key('kiosk-master-secret', 3)
+        self.assertEqual(kiosk_sync.kiosk_key_location(key, 'kiosk-master-secret'), 3)
+        location, digest = key.split('.')
+        for forged in (f'4.{digest}', f'03.{digest}', key[:-1], 'kiosk-master-secret', ''):
+            self.assertIsNone(kiosk_sync.kiosk_key_location(forged, 'kiosk-master-secret'))
+        self.assertIsNone(kiosk_sync.kiosk_key_location(key, ''))
+
+    def test_sync_refuses_keys_of_other_locations(self):
+        key = kiosk_sync.kiosk_key('kiosk-master-secret', 3)
+        response, build = self.sync(3, key)
+        self.assertEqual((response.status_code, response.content), (200, b'LSK1'))
+        self.assertEqual(build.call_args.args[1:], (3, 0))
+
+        response, build = self.sync(4, key)
+        self.assertEqual(response.status_code, 403)
+        build.assert_not_called()
+        self.assertEqual(self.sync(3, 'kiosk-master-secret')[0].status_code, 403)
+
+
+class QRConsumeTests(SimpleTestCase):
+    """Online consume: routing by length, the token upsert and the stored code UPDATE"""
+
+    class Connection:
+        def __init__(self, test):
+            self.test = test
+
+        def cursor(self, dictionary=False):
+            return QRConsumeTests.Cursor(self.test)
+
+    class Cursor:
+        def __init__(self, test):
+            self.test = test
+            self.rowcount = 0
+            self.lastrowid = None
+
+        def execute(self, query, params=()):
+            self.test.statements.append((' '.join(query.split()), params))
+            if query.lstrip().startswith(('INSERT', 'UPDATE')):
+                self.rowcount = self.test.rowcounts.pop(0)
+                self.lastrowid = 900
+
+        def fetchall(self):
+            return self.test.issued
+
+        def close(self):
+            pass
+
+    def setUp(self):
+        self.statements = []
+        self.rowcounts = []
+        self.issued = [{'id': 11, 'code': 'LOCKSPOT-STORED-1', 'booking_id': 42, 'locker_id': 7,
+                        'location_id': 3, 'code_type': 'Unlock', 'expires_at': datetime(2099, 1, 1)}]
+        self.signer = qr_tokens.QRTokenSigner('qr-test-secret-' * 3)
+        now = int(time.time())
+        self.token = self.signer.issue(42, 7, now - 60, now + 3600)
+        cache = qr_codes.IssuedCodeCache()
+        for patcher in (
+            mock.patch.object(db_utils.DatabaseConnection, 'get_connection',
+                              lambda: contextlib.nullcontext(self.Connection(self))),
+            mock.patch.object(qr_codes, 'get_signer', lambda: self.signer),
+            mock.patch.object(qr_codes, 'get_code_cache', lambda: cache),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_scans_are_routed_by_length(self):
+        with mock.patch.object(qr_codes, '_consume_signed_token') as signed, \
+                mock.patch.object(qr_codes, '_consume_stored_code') as stored:
+            qr_codes.consume_qr_code(self.token, 7, 3)
+            qr_codes.consume_qr_code('LOCKSPOT-STORED-1', 7, 3)
+        self.assertEqual(signed.call_args.args[1].booking_id, 42)
+        stored.assert_called_once_with('LOCKSPOT-STORED-1', 7, 3)
+
+        # Right length, bad signature: refused in-process
+        forged = self.token[:-2] + ('BB' if self.token.endswith('AA') else 'AA')
+        self.assertIsNone(qr_codes.consume_qr_code(forged))
+        self.assertIsNone(qr_codes.consume_qr_code(self.token, locker_id=8))
+        self.assertEqual(self.statements, [])
+
+    def test_token_upsert_affected_rows(self):
+        # 1 = first use inserted, 2 = unused row flipped, 0 = already used
+        self.rowcounts = [1, 2, 0]
+        first = qr_codes.consume_qr_code(self.token, 7, 3)
+        self.assertEqual((first['id'], first['booking_id'], first['location_id']), (900, 42, 3))
+        self.assertIsNotNone(qr_codes.consume_qr_code(self.token, 7, 3))
+        self.assertIsNone(qr_codes.consume_qr_code(self.token, 7, 3))
+
+        query, params = self.statements[0]
+        self.assertTrue(query.startswith('INSERT INTO lockers_qraccesscode'))
+        self.assertIn("b.status IN ('Confirmed', 'Active')", query)
+        self.assertIn('ON DUPLICATE KEY UPDATE', query)
+        self.assertEqual(params[-3:], (42, 7, 3))
+
+    def test_stored_code_is_consumed_by_one_conditional_update(self):
+        self.rowcounts = [1]
+        consumed = qr_codes.consume_qr_code('LOCKSPOT-STORED-1', 7, 3)
+        self.assertEqual((consumed['id'], consumed['booking_id']), (11, 42))
+        load, update = self.statements
+        self.assertTrue(load[0].startswith('SELECT q.id, q.code'))
+        self.assertEqual(update, ('UPDATE lockers_qraccesscode SET is_used = 1, used_at = NOW() '
+                                  'WHERE id = %s AND is_used = 0 AND expires_at > NOW()', (11,)))
+
+        # Used now: a second scan is refused from the cache
+        self.assertIsNone(qr_codes.consume_qr_code('LOCKSPOT-STORED-1', 7, 3))
+        self.assertEqual(len(self.statements), 2)
+
+    def test_stored_code_lost_race_unknown_or_elsewhere(self):
+        cache = qr_codes.get_code_cache()
+        self.rowcounts = [0]  # another scan flipped is_used first
+        self.assertIsNone(qr_codes.consume_qr_code('LOCKSPOT-STORED-1', 7, 3))
+        self.assertIsNone(cache.get('LOCKSPOT-STORED-1'))
+
+        self.issued[0]['code'] = 'LOCKSPOT-STORED-2'
+        cache._next_refresh = 0
+        statements = len(self.statements)
+        self.assertIsNone(qr_codes.consume_qr_code('LOCKSPOT-UNKNOWN'))
+        self.assertIsNone(qr_codes.consume_qr_code('LOCKSPOT-STORED-2', locker_id=8))
+        self.assertIsNone(qr_codes.consume_qr_code('LOCKSPOT-STORED-2', 7, location_id=4))
+        # Only the refresh reached the database
+        self.assertEqual([q for q, _ in self.statements[statements:] if q.startswith('UPDATE')], [])
+
+
+class QRImageCacheTests(SimpleTestCase):
+    """Content-addressed QR images: inline render on a miss, ETags and eviction"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = qr_images.QRImageCache(directory.name, workers=1, max_bytes=1000)
+        self.addCleanup(self.cache._pool.shutdown)
+
+    def test_miss_renders_in_the_calling_thread_then_reads_the_file(self):
+        with mock.patch.object(qr_images, 'render_qr', return_value=b'png-bytes') as render:
+            self.assertEqual(self.cache.get_or_render('token', 'png', 300), b'png-bytes')
+            self.assertEqual(self.cache.get_or_render('token', 'png', 300), b'png-bytes')
+        render.assert_called_once_with('token', 'png', 300)
+        self.assertTrue(self.cache.get(qr_images.image_key('token', 'png', 300), 'png'))
+
+    def test_least_recently_used_images_are_evicted(self):
+        now = time.time()
+        keys = [qr_images.image_key(f'token-{i}', 'png', 300) for i in range(6)]
+        with mock.patch.object(self.cache._pool, 'submit') as submit:
+            for age, key in zip((60, 50, 40, 30, 20, 10), keys):
+                path = self.cache._store(key, 'png', b'x' * 200)
+                os.utime(path, (now - age * 3600, now - age * 3600))
+        # One sweep is queued once SWEEP_FRACTION of max_bytes was written
+        submit.assert_called_once_with(self.cache._sweep)
+        self.cache.get(keys[1], 'png')  # hit: refreshes an old mtime
+
+        self.assertEqual(self.cache.evict(), {'files': 4, 'bytes': 800, 'removed': 2})
+        self.assertEqual([bool(self.cache.get(key, 'png')) for key in keys], [False, True, False, True, True, True])
+
+    class Connection(QRTokenTests.Connection):
+        pass
+
+    def image(self, **headers):
+        request = APIRequestFactory().get('/api/bookings/42/qr.png', **headers)
+        force_authenticate(request, user=authentication.MockUser({'id': 1, 'email': 'user@lockspot.test'}))
+        row = {'id': 42, 'locker_id': 7, 'status': 'Active',
+               'start_time': datetime(2026, 1, 1, 10), 'end_time': datetime(2026, 1, 1, 14)}
+        with mock.patch.object(views.DatabaseConnection, 'get_connection',
+                               lambda: contextlib.nullcontext(self.Connection(row))), \
+                mock.patch.object(views, 'get_image_cache', return_value=self.cache), \
+                mock.patch.object(qr_images, 'render_qr', return_value=b'png-bytes') as render:
+            response = views.BookingQRImageView.as_view()(request, booking_id=42, fmt='png')
+        return response, render
+
+    def test_etag_round_trip_returns_304_without_rendering(self):
+        response, render = self.image()
+        self.assertEqual((response.status_code, response.content, response['Content-Type']),
+                         (200, b'png-bytes', 'image/png'))
+        self.assertEqual(response['Cache-Control'], 'private, max-age=3600')
+        etag = response['ETag']
+
+        response, render = self.image(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag'], response.content), (304, etag, b''))
+        render.assert_not_called()
+
+        response, _ = self.image(HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
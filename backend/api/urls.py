@@ -6,19 +6,23 @@ No Django ORM ViewSets
 from django.urls import path
 from .views import (
     # Auth
-    RegisterView, LoginView, ProfileView,
+    RegisterView, LoginView, ProfileView, TokenRefreshView, LogoutView, TokenCacheStatsView,
     # Locations
     LocationListView, LocationDetailView, LocationPricingView,
     # Lockers
     LockerListView, LockerAvailabilityView,
     # Bookings
-    BookingListCreateView, BookingDetailView, BookingQRView, BookingCancelView,
+    BookingListCreateView, BookingDetailView, BookingQRView, BookingQRImageView, BookingCancelView,
+    # Kiosks
+    QRUsageReportView, QRConsumeView, KioskSyncView,
     # Reviews
     ReviewListCreateView, LocationReviewsView,
     # Notifications
-    NotificationListView, NotificationMarkReadView, NotificationMarkAllReadView,
+    NotificationListView, NotificationMarkReadView, NotificationMarkAllReadView, NotificationUnreadCountView,
     # Discounts
     DiscountView,
+    # Forecasts
+    DemandForecastView,
     # Health
     health_check
 )
@@ -32,6 +36,9 @@ urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/me/', ProfileView.as_view(), name='profile'),
+    path('auth/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('auth/logout/', LogoutView.as_view(), name='logout'),
+    path('auth/token-cache/', TokenCacheStatsView.as_view(), name='token-cache-stats'),
     
     # ==================== LOCATIONS ====================
     path('locations/', LocationListView.as_view(), name='location-list'),
@@ -48,8 +55,15 @@ urlpatterns = [
     path('bookings/', BookingListCreateView.as_view(), name='booking-list-create'),
     path('bookings/<int:booking_id>/', BookingDetailView.as_view(), name='booking-detail'),
     path('bookings/<int:booking_id>/qr/', BookingQRView.as_view(), name='booking-qr'),
+    path('bookings/<int:booking_id>/qr.png', BookingQRImageView.as_view(), {'fmt': 'png'}, name='booking-qr-png'),
+    path('bookings/<int:booking_id>/qr.svg', BookingQRImageView.as_view(), {'fmt': 'svg'}, name='booking-qr-svg'),
     path('bookings/<int:booking_id>/cancel/', BookingCancelView.as_view(), name='booking-cancel'),
     
+    # ==================== KIOSKS ====================
+    path('kiosk/qr-consume/', QRConsumeView.as_view(), name='kiosk-qr-consume'),
+    path('kiosk/qr-usage/', QRUsageReportView.as_view(), name='kiosk-qr-usage'),
+    path('kiosk/locations/<int:location_id>/sync/', KioskSyncView.as_view(), name='kiosk-sync'),
+    
     # ==================== REVIEWS ====================
     path('reviews/', ReviewListCreateView.as_view(), name='review-list-create'),
     
@@ -57,7 +71,11 @@ urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notification-list'),
     path('notifications/<int:notification_id>/read/', NotificationMarkReadView.as_view(), name='notification-mark-read'),
     path('notifications/read-all/', NotificationMarkAllReadView.as_view(), name='notification-mark-all-read'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification-unread-count'),
     
     # ==================== DISCOUNTS ====================
     path('discounts/validate/', DiscountView.as_view(), name='discount-validate'),
+    
+    # ==================== FORECASTS (admin users) ====================
+    path('forecasts/', DemandForecastView.as_view(), name='demand-forecasts'),
 ]
@@ -5,9 +5,11 @@ No Django ORM - All queries use raw SQL
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import HttpResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 import uuid
@@ -17,7 +19,17 @@ from decimal import Decimal
 
 # Import raw SQL functions
 from db_utils import DatabaseConnection
-from .authentication import create_access_token, get_token_expiration_seconds
+from .authentication import (
+    IsAdminUser, IsKiosk, get_token_cache, get_user_states, revoke_refresh_token, rotate_refresh_token,
+    token_pair,
+)
+from .qr_tokens import issue_booking_token, record_qr_usage, ACCESS_STATUSES, CODE_TYPES
+from .kiosk_sync import build_sync_payload
+from .qr_codes import consume_qr_code
+from .qr_images import IMAGE_FORMATS, clamp_size, image_key, get_image_cache
+from .discounts import redeem_discount, get_discount_usage, calculate_discount_amount
+from .archive import booking_history, archived_booking, notification_history, encode_page_cursor, decode_page_cursor
+from . import audit, hot_queries, notifications, outbox
 
 
 # ==================== HELPER FUNCTIONS ====================
@@ -99,10 +111,11 @@ class RegisterView(APIView):
                 FROM auth_user WHERE id = %s
             """, (user_id,))
             user = cursor.fetchone()
-            cursor.close()
             
-            # Generate token
-            access_token = create_access_token(user)
+            # Generate tokens
+            tokens = token_pair(cursor, user)
+            conn.commit()
+            cursor.close()
             
             return Response({
                 'user': {
@@ -114,9 +127,7 @@ class RegisterView(APIView):
                     'user_type': user['user_type'],
                     'is_verified': bool(user['is_verified'])
                 },
-                'access_token': access_token,
-                'token_type': 'Bearer',
-                'expires_in': get_token_expiration_seconds()
+                **tokens
             }, status=status.HTTP_201_CREATED)
 
 
@@ -184,8 +195,11 @@ class LoginView(APIView):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
             
-            # Generate token
-            access_token = create_access_token(user)
+            # Generate tokens
+            cursor = conn.cursor()
+            tokens = token_pair(cursor, user)
+            conn.commit()
+            cursor.close()
             
             return Response({
                 'user': {
@@ -197,12 +211,67 @@ class LoginView(APIView):
                     'user_type': user['user_type'],
                     'is_verified': bool(user['is_verified'])
                 },
-                'access_token': access_token,
-                'token_type': 'Bearer',
-                'expires_in': get_token_expiration_seconds()
+                **tokens
             })
 
 
+class TokenRefreshView(APIView):
+    """Exchange a refresh token for a new access and refresh token"""
+    permission_classes = [AllowAny]
+    authentication_classes = []  # the access token is usually expired by now
+    
+    def post(self, request):
+        refresh_token = request.data.get('refresh_token')
+        if not refresh_token:
+            return Response(
+                {'detail': 'refresh_token is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            with DatabaseConnection.get_connection() as conn:
+                tokens = rotate_refresh_token(conn, refresh_token)
+        except AuthenticationFailed as e:
+            return Response({'detail': e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(tokens)
+
+
+class LogoutView(APIView):
+    """Revoke a refresh token (all of the user's with "everywhere": true)"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def post(self, request):
+        refresh_token = request.data.get('refresh_token')
+        if not refresh_token:
+            return Response(
+                {'detail': 'refresh_token is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            revoked = revoke_refresh_token(cursor, refresh_token, bool(request.data.get('everywhere')))
+            conn.commit()
+            cursor.close()
+        
+        # Access tokens stay valid until they expire (JWT_ACCESS_TOKEN_MINUTES);
+        # disabling the account cuts them off within JWT_USER_CHECK_SECONDS
+        return Response({'revoked': revoked})
+
+
+class TokenCacheStatsView(APIView):
+    """
+    Decoded access token cache of this worker process (operations). A hit
+    skips JWT parsing and claim checks only: the cache key is itself an
+    HMAC of the token, and the user is still checked (user_lookups)
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        return Response({**get_token_cache().stats(), 'user_lookups': get_user_states().lookups})
+
+
 class ProfileView(APIView):
     """User Profile with Raw SQL"""
     permission_classes = [IsAuthenticated]
@@ -285,22 +354,7 @@ class LocationListView(APIView):
         """Get all active locations"""
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    l.id, l.name, l.description, l.image,
-                    l.operating_hours_start, l.operating_hours_end,
-                    l.contact_phone, l.is_active,
-                    a.street_address, a.city, a.state, a.country,
-                    a.latitude, a.longitude,
-                    COUNT(DISTINCT lu.id) as total_lockers,
-                    SUM(CASE WHEN lu.status = 'Available' THEN 1 ELSE 0 END) as available_lockers
-                FROM lockers_lockerlocation l
-                LEFT JOIN lockers_locationaddress a ON l.address_id = a.id
-                LEFT JOIN lockers_lockerunit lu ON lu.location_id = l.id
-                WHERE l.is_active = 1
-                GROUP BY l.id
-                ORDER BY l.name
-            """)
+            cursor.execute(hot_queries.LOCATION_LIST)
             locations = cursor.fetchall()
             cursor.close()
             
@@ -481,35 +535,7 @@ class LockerListView(APIView):
         size = request.query_params.get('size')
         status_filter = request.query_params.get('status', 'Available')
         
-        # Build query with conditions
-        conditions = ["1=1"]
-        params = []
-        
-        if location_id:
-            conditions.append("l.location_id = %s")
-            params.append(location_id)
-        
-        if size:
-            conditions.append("l.size = %s")
-            params.append(size)
-        
-        if status_filter:
-            conditions.append("l.status = %s")
-            params.append(status_filter)
-        
-        where_clause = " AND ".join(conditions)
-        
-        query = f"""
-            SELECT 
-                l.id, l.unit_number, l.size, l.status,
-                l.location_id, loc.name as location_name,
-                p.hourly_rate, p.daily_rate, p.weekly_rate
-            FROM lockers_lockerunit l
-            JOIN lockers_lockerlocation loc ON l.location_id = loc.id
-            JOIN lockers_pricingtier p ON l.tier_id = p.id
-            WHERE {where_clause}
-            ORDER BY loc.name, l.unit_number
-        """
+        query, params = hot_queries.locker_list_query(location_id, size, status_filter)
         
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -579,43 +605,36 @@ class BookingListCreateView(APIView):
     """List and Create Bookings with Raw SQL"""
     permission_classes = [IsAuthenticated]
     
+    MAX_PAGE_SIZE = 100
+    
     def get(self, request):
-        """Get user's bookings with optional status filter"""
+        """
+        Get user's bookings with optional status filter. With ?limit= (and
+        ?before= from the previous page's `next`) the list is paged; older
+        pages include archived bookings.
+        """
         user_id = request.user.id
         status_filter = request.query_params.get('status')
+        limit = request.query_params.get('limit')
+        before = request.query_params.get('before')
+        
+        try:
+            limit = min(int(limit), self.MAX_PAGE_SIZE) if limit else (20 if before else None)
+            before = decode_page_cursor(before) if before else None
+        except ValueError:
+            return Response(
+                {'detail': 'limit must be a number and before a value returned as next'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit is not None and limit < 1:
+            return Response({'detail': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
         
         # First, auto-complete expired bookings
         self._complete_expired_bookings(user_id)
         
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            
-            if status_filter:
-                cursor.execute("""
-                    SELECT b.id, b.user_id, b.locker_id, b.start_time, b.end_time,
-                           b.booking_type, b.subtotal_amount, b.discount_amount, 
-                           b.total_amount, b.status, b.created_at,
-                           l.unit_number, l.size, loc.name as location_name
-                    FROM lockers_booking b
-                    JOIN lockers_lockerunit l ON b.locker_id = l.id
-                    JOIN lockers_lockerlocation loc ON l.location_id = loc.id
-                    WHERE b.user_id = %s AND b.status = %s
-                    ORDER BY b.created_at DESC
-                """, (user_id, status_filter))
-            else:
-                cursor.execute("""
-                    SELECT b.id, b.user_id, b.locker_id, b.start_time, b.end_time,
-                           b.booking_type, b.subtotal_amount, b.discount_amount, 
-                           b.total_amount, b.status, b.created_at,
-                           l.unit_number, l.size, loc.name as location_name
-                    FROM lockers_booking b
-                    JOIN lockers_lockerunit l ON b.locker_id = l.id
-                    JOIN lockers_lockerlocation loc ON l.location_id = loc.id
-                    WHERE b.user_id = %s
-                    ORDER BY b.created_at DESC
-                """, (user_id,))
-            
-            bookings = cursor.fetchall()
+            bookings, has_more = booking_history(cursor, user_id, status_filter, before, limit)
             cursor.close()
             
             results = []
@@ -635,36 +654,69 @@ class BookingListCreateView(APIView):
                     'total_amount': parse_decimal(b['total_amount']),
                     'status': b['status'],
                     'created_at': format_datetime(b['created_at']),
-                    'qr_code': f"LOCKSPOT-{b['id']}",
+                    'qr_code': issue_booking_token(b['id'], b['locker_id'], b['start_time'], b['end_time'])
+                               if b['status'] in ACCESS_STATUSES else None,
                     'payment_status': 'paid'
                 })
             
-            return Response({'results': results})
+            if limit is None:
+                return Response({'results': results})
+            return Response({
+                'results': results,
+                'next': encode_page_cursor(bookings[-1]) if has_more else None
+            })
     
     def _complete_expired_bookings(self, user_id):
         """Mark expired active bookings as completed"""
         with DatabaseConnection.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE lockers_booking 
-                SET status = 'Completed', updated_at = NOW()
-                WHERE user_id = %s 
-                AND status IN ('Active', 'Confirmed')
-                AND end_time < NOW()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT {outbox.BOOKING_COLUMNS}
+                FROM lockers_booking b
+                JOIN lockers_lockerunit l ON b.locker_id = l.id
+                JOIN lockers_lockerlocation loc ON l.location_id = loc.id
+                WHERE b.user_id = %s 
+                AND b.status IN ('Active', 'Confirmed')
+                AND b.end_time < NOW()
+                FOR UPDATE OF b
             """, (user_id,))
+            expired = cursor.fetchall()
+            
+            if expired:
+                placeholders = ', '.join(['%s'] * len(expired))
+                cursor.execute(f"""
+                    UPDATE lockers_booking 
+                    SET status = 'Completed', updated_at = NOW()
+                    WHERE id IN ({placeholders})
+                """, [b['booking_id'] for b in expired])
+                
+                # Notifications, audit log and QR codes: delivered by the outbox dispatcher
+                outbox.enqueue(cursor, outbox.BOOKING_EXPIRED,
+                               [outbox.booking_payload(b, 'Completed') for b in expired])
             
             # Also free up the lockers
             cursor.execute("""
-                UPDATE lockers_lockerunit l
+                SELECT DISTINCT l.id
+                FROM lockers_lockerunit l
                 JOIN lockers_booking b ON l.id = b.locker_id
-                SET l.status = 'Available'
                 WHERE b.user_id = %s 
                 AND b.status = 'Completed'
                 AND l.status = 'Booked'
+                FOR UPDATE OF l
             """, (user_id,))
+            freed = [row['id'] for row in cursor.fetchall()]
+            if freed:
+                placeholders = ', '.join(['%s'] * len(freed))
+                cursor.execute(f"""
+                    UPDATE lockers_lockerunit SET status = 'Available'
+                    WHERE id IN ({placeholders}) AND status = 'Booked'
+                """, freed)
             
             conn.commit()
             cursor.close()
+        
+        audit.record_status_changes('locker.status_changed', 'lockers_lockerunit',
+                                    [(locker_id, 'Booked', 'Available') for locker_id in freed])
     
     def post(self, request):
         """Create a new booking"""
@@ -673,6 +725,7 @@ class BookingListCreateView(APIView):
         start_time = request.data.get('start_time')
         end_time = request.data.get('end_time')
         booking_type = request.data.get('booking_type', 'Storage')
+        discount_code = request.data.get('discount_code')
         
         if not locker_id or not start_time or not end_time:
             return Response(
@@ -715,9 +768,27 @@ class BookingListCreateView(APIView):
             duration_hours = (end_dt - start_dt).total_seconds() / 3600
             
             if duration_hours <= 24:
-                total_amount = parse_decimal(locker['hourly_rate']) * duration_hours
+                subtotal_amount = parse_decimal(locker['hourly_rate']) * duration_hours
             else:
-                total_amount = parse_decimal(locker['daily_rate']) * (duration_hours / 24)
+                subtotal_amount = parse_decimal(locker['daily_rate']) * (duration_hours / 24)
+            subtotal_amount = round(subtotal_amount, 2)
+            
+            # Redeem discount in the booking transaction (atomic usage check)
+            discount_id = None
+            discount_amount = 0.0
+            if discount_code:
+                discount = redeem_discount(cursor, discount_code, subtotal_amount)
+                if not discount:
+                    conn.rollback()
+                    cursor.close()
+                    return Response(
+                        {'detail': 'Discount code is expired or invalid'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                discount_id = discount['id']
+                discount_amount = parse_decimal(discount['calculated_discount'])
+            
+            total_amount = round(subtotal_amount - discount_amount, 2)
             
             # Convert to MySQL format
             start_time_mysql = start_dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -726,10 +797,11 @@ class BookingListCreateView(APIView):
             # Create booking
             cursor.execute("""
                 INSERT INTO lockers_booking 
-                (user_id, locker_id, start_time, end_time, booking_type,
+                (user_id, locker_id, discount_id, start_time, end_time, booking_type,
                  subtotal_amount, discount_amount, total_amount, status, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, 0, %s, 'Active', NOW(), NOW())
-            """, (user_id, locker_id, start_time_mysql, end_time_mysql, booking_type, total_amount, total_amount))
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'Active', NOW(), NOW())
+            """, (user_id, locker_id, discount_id, start_time_mysql, end_time_mysql, booking_type,
+                  subtotal_amount, discount_amount, total_amount))
             
             booking_id = cursor.lastrowid
             
@@ -738,9 +810,35 @@ class BookingListCreateView(APIView):
                 UPDATE lockers_lockerunit SET status = 'Booked' WHERE id = %s
             """, (locker_id,))
             
+            # Side effects (notification, audit log, QR images and codes) are one
+            # outbox row here and are delivered by the dispatcher after commit
+            outbox.enqueue(cursor, outbox.BOOKING_CREATED, [{
+                'booking_id': booking_id,
+                'user_id': user_id,
+                'locker_id': locker['id'],
+                'start_time': start_time_mysql,
+                'end_time': end_time_mysql,
+                'total_amount': total_amount,
+                'unit_number': locker['unit_number'],
+                'location_id': locker['location_id'],
+                'location_name': locker['location_name'],
+                'from_status': None,
+                'to_status': 'Active',
+            }])
+            
             conn.commit()
             cursor.close()
             
+            audit.record('locker.status_changed', 'lockers_lockerunit', locker['id'],
+                         {'status': 'Available'}, {'status': 'Booked', 'booking_id': booking_id}, request)
+            if discount_id:
+                audit.record('discount.redeemed', 'lockers_discount', discount_id, None,
+                             {'booking_id': booking_id, 'discount_amount': discount_amount}, request)
+            
+            # Same naive times as stored, so these match the QR endpoints' tokens
+            start_stored = start_dt.replace(tzinfo=None)
+            end_stored = end_dt.replace(tzinfo=None)
+            
             return Response({
                 'booking_id': booking_id,
                 'user_id': user_id,
@@ -751,11 +849,11 @@ class BookingListCreateView(APIView):
                 'start_time': start_time,
                 'end_time': end_time,
                 'booking_type': booking_type,
-                'subtotal_amount': total_amount,
-                'discount_amount': 0,
+                'subtotal_amount': subtotal_amount,
+                'discount_amount': discount_amount,
                 'total_amount': total_amount,
                 'status': 'Active',
-                'qr_code': f'LOCKSPOT-{booking_id}',
+                'qr_code': issue_booking_token(booking_id, locker['id'], start_stored, end_stored),
                 'payment_status': 'paid'
             }, status=status.HTTP_201_CREATED)
 
@@ -782,6 +880,8 @@ class BookingDetailView(APIView):
             """, (booking_id, user_id))
             
             booking = cursor.fetchone()
+            if not booking:
+                booking = archived_booking(cursor, booking_id, user_id)
             cursor.close()
             
             if not booking:
@@ -805,7 +905,8 @@ class BookingDetailView(APIView):
                 'total_amount': parse_decimal(booking['total_amount']),
                 'status': booking['status'],
                 'created_at': format_datetime(booking['created_at']),
-                'qr_code': f'LOCKSPOT-{booking["id"]}',
+                'qr_code': issue_booking_token(booking['id'], booking['locker_id'], booking['start_time'], booking['end_time'])
+                           if booking['status'] in ACCESS_STATUSES else None,
                 'payment_status': 'paid'
             })
 
@@ -815,13 +916,20 @@ class BookingQRView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, booking_id):
-        """Get QR code data for a booking"""
+        """Get a signed QR token for a booking (?code_type=Unlock|Lock)"""
         user_id = request.user.id
+        code_type = request.query_params.get('code_type', 'Unlock')
+        
+        if code_type not in CODE_TYPES:
+            return Response(
+                {'detail': f'code_type must be one of {", ".join(CODE_TYPES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
-                SELECT b.id, b.status, b.end_time,
+                SELECT b.id, b.locker_id, b.status, b.start_time, b.end_time,
                        l.unit_number, loc.name as location_name
                 FROM lockers_booking b
                 JOIN lockers_lockerunit l ON b.locker_id = l.id
@@ -837,13 +945,21 @@ class BookingQRView(APIView):
                     {'detail': 'Booking not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            if booking['status'] not in ACCESS_STATUSES:
+                return Response(
+                    {'detail': f'Booking is {booking["status"].lower()}, it has no access code'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            qr_data = f'LOCKSPOT-{booking_id}'
+            qr_data = issue_booking_token(
+                booking_id, booking['locker_id'], booking['start_time'], booking['end_time'], code_type
+            )
             
             return Response({
                 'booking_id': booking_id,
                 'qr_code': qr_data,
                 'qr_data': qr_data,
+                'code_type': code_type,
                 'location_name': booking['location_name'],
                 'unit_number': booking['unit_number'],
                 'status': booking['status'],
@@ -851,6 +967,66 @@ class BookingQRView(APIView):
             })
 
 
+class BookingQRImageView(APIView):
+    """Rendered QR image for a booking, served from the on-disk image cache"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, booking_id, fmt):
+        """PNG or SVG of the signed token (?code_type=Unlock|Lock, ?size=64-1024 for PNG)"""
+        user_id = request.user.id
+        code_type = request.query_params.get('code_type', 'Unlock')
+        
+        if code_type not in CODE_TYPES:
+            return Response(
+                {'detail': f'code_type must be one of {", ".join(CODE_TYPES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            size = clamp_size(int(request.query_params.get('size', 0)))
+        except ValueError:
+            return Response(
+                {'detail': 'size must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, locker_id, status, start_time, end_time
+                FROM lockers_booking
+                WHERE id = %s AND user_id = %s
+            """, (booking_id, user_id))
+            booking = cursor.fetchone()
+            cursor.close()
+        
+        if not booking:
+            return Response(
+                {'detail': 'Booking not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if booking['status'] not in ACCESS_STATUSES:
+            return Response(
+                {'detail': f'Booking is {booking["status"].lower()}, it has no access code'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        token = issue_booking_token(
+            booking_id, booking['locker_id'], booking['start_time'], booking['end_time'], code_type
+        )
+        etag = f'"{image_key(token, fmt, size)}"'
+        
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            image = get_image_cache().get_or_render(token, fmt, size)
+            response = HttpResponse(image, content_type=IMAGE_FORMATS[fmt])
+        
+        # Per-user content: browsers may keep it, shared caches may not
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+
 class BookingCancelView(APIView):
     """Cancel a booking"""
     permission_classes = [IsAuthenticated]
@@ -862,9 +1038,13 @@ class BookingCancelView(APIView):
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
-            cursor.execute("""
-                SELECT id, locker_id, status FROM lockers_booking 
-                WHERE id = %s AND user_id = %s
+            cursor.execute(f"""
+                SELECT {outbox.BOOKING_COLUMNS}, l.status AS locker_status
+                FROM lockers_booking b
+                JOIN lockers_lockerunit l ON b.locker_id = l.id
+                JOIN lockers_lockerlocation loc ON l.location_id = loc.id
+                WHERE b.id = %s AND b.user_id = %s
+                FOR UPDATE OF b
             """, (booking_id, user_id))
             
             booking = cursor.fetchone()
@@ -895,9 +1075,15 @@ class BookingCancelView(APIView):
                 WHERE id = %s
             """, (booking['locker_id'],))
             
+            locker_status = booking.pop('locker_status')
+            outbox.enqueue(cursor, outbox.BOOKING_CANCELLED, [outbox.booking_payload(booking, 'Cancelled')])
+            
             conn.commit()
             cursor.close()
             
+            audit.record_status_changes('locker.status_changed', 'lockers_lockerunit',
+                                        [(booking['locker_id'], locker_status, 'Available')], request=request)
+            
             return Response({
                 'booking_id': booking_id,
                 'status': 'Cancelled',
@@ -905,6 +1091,101 @@ class BookingCancelView(APIView):
             })
 
 
+class QRUsageReportView(APIView):
+    """Batched QR usage reports from kiosks that verify tokens offline"""
+    authentication_classes = []
+    permission_classes = [IsKiosk]
+    
+    def post(self, request):
+        """Record a batch of {token, used_at} events of the kiosk's location in lockers_qraccesscode"""
+        events = request.data.get('events')
+        
+        if not isinstance(events, list):
+            return Response(
+                {'detail': 'events must be a list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        valid_events = [
+            e for e in events
+            if isinstance(e, dict) and isinstance(e.get('token'), str)
+            and isinstance(e.get('used_at'), (int, float))
+        ]
+        recorded = record_qr_usage(valid_events, request.kiosk_location_id)
+        
+        return Response({
+            'received': len(events),
+            'recorded': recorded
+        })
+
+
+class QRConsumeView(APIView):
+    """Online scan: validate a code and mark it as used in one statement"""
+    authentication_classes = []
+    permission_classes = [IsKiosk]
+    
+    def post(self, request):
+        """Consume a scanned code for a locker of the kiosk's location"""
+        code = request.data.get('code')
+        locker_id = request.data.get('locker_id')
+        
+        if not isinstance(code, str) or not code:
+            return Response(
+                {'detail': 'code is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if locker_id is not None and not isinstance(locker_id, int):
+            return Response(
+                {'detail': 'locker_id must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        consumed = consume_qr_code(code, locker_id, request.kiosk_location_id)
+        if not consumed:
+            return Response(
+                {'detail': 'Code is invalid, expired or already used'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response({
+            'booking_id': consumed['booking_id'],
+            'locker_id': consumed['locker_id'],
+            'code_type': consumed['code_type'],
+            'message': 'Access granted'
+        })
+
+
+class KioskSyncView(APIView):
+    """Binary snapshot/delta of valid bookings and access codes for a station"""
+    authentication_classes = []
+    permission_classes = [IsKiosk]
+    
+    def get(self, request, location_id):
+        """Full snapshot without ?since, otherwise changes since that sequence"""
+        if location_id != request.kiosk_location_id:
+            return Response(
+                {'detail': 'Kiosk key is for another location'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response(
+                {'detail': 'since must be an integer sequence number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            payload = build_sync_payload(cursor, location_id, since)
+            cursor.close()
+        
+        response = HttpResponse(payload, content_type='application/octet-stream')
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
 # ==================== DISCOUNT VIEWS ====================
 
 class DiscountView(APIView):
@@ -913,6 +1194,7 @@ class DiscountView(APIView):
     
     def post(self, request):
         code = request.data.get('code')
+        booking_amount = request.data.get('booking_amount')
         
         if not code:
             return Response(
@@ -924,25 +1206,29 @@ class DiscountView(APIView):
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
                 SELECT id, code, discount_type, discount_value, 
-                       max_discount_amount, min_order_amount, max_uses,
-                       current_uses, valid_from, valid_until, is_active
+                       max_discount_amount, min_booking_amount, max_uses,
+                       valid_from, valid_to, is_active
                 FROM lockers_discount
                 WHERE code = %s AND is_active = 1
             """, (code,))
             
             discount = cursor.fetchone()
-            cursor.close()
             
             if not discount:
+                cursor.close()
                 return Response(
                     {'detail': 'Discount code not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Check validity
-            now = timezone.now()
+            # Sharded codes keep part of their usage in counter slots
+            current_uses = get_discount_usage(cursor, discount['id'])
+            cursor.close()
+            
+            # Check validity (naive MySQL datetimes are in the server time zone)
+            now = timezone.localtime().replace(tzinfo=None)
             valid_from = discount['valid_from']
-            valid_until = discount['valid_until']
+            valid_to = discount['valid_to']
             
             if valid_from and valid_from > now:
                 return Response(
@@ -950,27 +1236,41 @@ class DiscountView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if valid_until and valid_until < now:
+            if valid_to and valid_to < now:
                 return Response(
                     {'detail': 'Discount code has expired'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if discount['max_uses'] and discount['current_uses'] >= discount['max_uses']:
+            if discount['max_uses'] and current_uses >= discount['max_uses']:
                 return Response(
                     {'detail': 'Discount code usage limit reached'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            return Response({
+            result = {
                 'id': discount['id'],
                 'code': discount['code'],
                 'discount_type': discount['discount_type'],
                 'discount_value': parse_decimal(discount['discount_value']),
                 'max_discount_amount': parse_decimal(discount['max_discount_amount']),
-                'min_order_amount': parse_decimal(discount['min_order_amount']),
+                'min_booking_amount': parse_decimal(discount['min_booking_amount']),
+                'valid_from': format_datetime(valid_from),
+                'valid_to': format_datetime(valid_to),
                 'valid': True
-            })
+            }
+            
+            # Preview only - usage is counted when the booking is created
+            if booking_amount is not None:
+                amount = parse_decimal(booking_amount)
+                if amount < parse_decimal(discount['min_booking_amount']):
+                    return Response(
+                        {'detail': 'Booking amount is below the minimum for this code'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                result['calculated_discount'] = parse_decimal(calculate_discount_amount(discount, amount))
+            
+            return Response(result)
 
 
 # ==================== REVIEW VIEWS ====================
@@ -1116,16 +1416,7 @@ class LocationReviewsView(APIView):
         """Get all reviews for a location"""
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT r.id, r.rating, r.title, r.comment, r.created_at,
-                       u.first_name, u.last_name
-                FROM lockers_review r
-                JOIN auth_user u ON r.user_id = u.id
-                JOIN lockers_booking b ON r.booking_id = b.id
-                JOIN lockers_lockerunit l ON b.locker_id = l.id
-                WHERE l.location_id = %s
-                ORDER BY r.created_at DESC
-            """, (location_id,))
+            cursor.execute(hot_queries.LOCATION_REVIEWS, (location_id,))
             
             reviews = cursor.fetchall()
             cursor.close()
@@ -1156,16 +1447,7 @@ class NotificationListView(APIView):
         
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT id, title, message, notification_type, is_read,
-                       read_at, created_at, related_booking_id
-                FROM lockers_notification
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-                LIMIT 50
-            """, (user_id,))
-            
-            notifications = cursor.fetchall()
+            notifications = notification_history(cursor, user_id)
             cursor.close()
             
             results = []
@@ -1194,22 +1476,17 @@ class NotificationMarkReadView(APIView):
         
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE lockers_notification
-                SET is_read = 1, read_at = NOW()
-                WHERE id = %s AND user_id = %s
-            """, (notification_id, user_id))
+            # Flips is_read and decrements the unread counter in one transaction
+            was_unread = notifications.mark_read(cursor, user_id, notification_id)
             conn.commit()
+            cursor.close()
             
-            if cursor.rowcount == 0:
-                cursor.close()
+            if was_unread is None:
                 return Response(
                     {'detail': 'Notification not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            cursor.close()
-            
             return Response({'status': 'read', 'message': 'Notification marked as read'})
 
 
@@ -1223,12 +1500,7 @@ class NotificationMarkAllReadView(APIView):
         
         with DatabaseConnection.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE lockers_notification
-                SET is_read = 1, read_at = NOW()
-                WHERE user_id = %s AND is_read = 0
-            """, (user_id,))
-            count = cursor.rowcount
+            count = notifications.mark_all_read(cursor, user_id)
             conn.commit()
             cursor.close()
             
@@ -1239,6 +1511,84 @@ class NotificationMarkAllReadView(APIView):
             })
 
 
+class NotificationUnreadCountView(APIView):
+    """Unread notification count (badge), from the per-user counter"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Primary-key lookup on lockers_notificationcounter"""
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor()
+            unread = notifications.unread_count(cursor, request.user.id)
+            cursor.close()
+        
+        return Response({'unread': unread})
+
+
+# ==================== FORECAST VIEWS ====================
+
+class DemandForecastView(APIView):
+    """Next-week utilization forecasts per location and size (from `manage.py forecast_demand`)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        """Busiest first; ?location_id adds the hourly curve, ?size filters"""
+        location_id = request.query_params.get('location_id')
+        size = request.query_params.get('size')
+        
+        conditions, params = [], []
+        if location_id:
+            try:
+                params.append(int(location_id))
+            except ValueError:
+                return Response(
+                    {'detail': 'location_id must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            conditions.append("f.location_id = %s")
+        if size:
+            conditions.append("f.size = %s")
+            params.append(size)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT f.location_id, loc.name AS location_name, f.size, f.lockers,
+                       f.history_weeks, f.forecast_start, f.peak_utilization, f.peak_at,
+                       f.avg_utilization, f.last_week_peak, f.weekly_trend, f.hourly, f.computed_at
+                FROM lockers_demandforecast f
+                JOIN lockers_lockerlocation loc ON loc.id = f.location_id
+                {where}
+                ORDER BY f.peak_utilization DESC
+            """, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        
+        results = []
+        for f in rows:
+            result = {
+                'location_id': f['location_id'],
+                'location_name': f['location_name'],
+                'size': f['size'],
+                'lockers': f['lockers'],
+                'peak_utilization': f['peak_utilization'],
+                'peak_at': format_datetime(f['peak_at']),
+                'avg_utilization': f['avg_utilization'],
+                'last_week_peak': f['last_week_peak'],
+                'weekly_trend': f['weekly_trend'],
+                'forecast_start': format_datetime(f['forecast_start']),
+                'history_weeks': f['history_weeks'],
+                'computed_at': format_datetime(f['computed_at']),
+            }
+            if location_id:
+                hourly = f['hourly']
+                result['hourly'] = json.loads(hourly) if isinstance(hourly, (str, bytes)) else hourly
+            results.append(result)
+        
+        return Response({'count': len(results), 'results': results})
+
+
 # ==================== HEALTH CHECK ====================
 
 @api_view(['GET'])
@@ -10,6 +10,8 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 from contextlib import contextmanager
 import os
+import threading
+import time
 
 
 # ==========================================
@@ -28,6 +30,124 @@ DATABASE_CONFIG = {
 }
 
 
+# ==========================================
+# Query Counting (load tests / benchmarks)
+# ==========================================
+
+_query_count = threading.local()
+
+
+def start_query_count():
+    """Count statements run through DatabaseConnection on this thread"""
+    _query_count.value = 0
+
+
+def stop_query_count() -> int:
+    """Stop counting on this thread and return the number of statements"""
+    count = getattr(_query_count, 'value', None) or 0
+    _query_count.value = None
+    return count
+
+
+# ==========================================
+# Statement Log (index advisor)
+# ==========================================
+
+# Strings and bytes (emails, password hashes, tokens, QR codes) are logged as
+# {'redacted': type, 'len': n} unless raw_params is set, which is only meant
+# for captures against synthetic data
+_statement_log = {'file': None, 'raw_params': False, 'lock': threading.Lock()}
+
+
+def start_statement_log(path: str, raw_params: bool = False):
+    """Append every statement run through DatabaseConnection to a JSON-lines file"""
+    stop_statement_log()
+    _statement_log['raw_params'] = raw_params
+    _statement_log['file'] = open(path, 'a', encoding='utf-8')
+
+
+def stop_statement_log():
+    """Stop logging statements and close the log file"""
+    log, _statement_log['file'] = _statement_log['file'], None
+    if log:
+        log.close()
+
+
+def _redact(value):
+    if isinstance(value, (str, bytes, bytearray)):
+        return {'redacted': type(value).__name__, 'len': len(value)}
+    return value
+
+
+def _log_statement(query, params, elapsed, many=False):
+    record = {'sql': query, 'params': params, 'ms': round(elapsed * 1000, 3)}
+    if many:
+        # Bulk writes: one sample row is enough to replay the statement shape
+        record.update(params=params[0] if params else [], rows=len(params))
+    if not _statement_log['raw_params']:
+        sample = record['params']
+        record['params'] = ({key: _redact(value) for key, value in sample.items()} if isinstance(sample, dict)
+                            else [_redact(value) for value in sample])
+    line = json.dumps(record, default=str)
+    with _statement_log['lock']:
+        log = _statement_log['file']
+        if log:
+            log.write(line + '\n')
+            log.flush()
+
+
+if os.getenv('STATEMENT_LOG'):
+    start_statement_log(os.environ['STATEMENT_LOG'], os.getenv('STATEMENT_LOG_RAW_PARAMS') == '1')
+
+
+def _instrumented():
+    return getattr(_query_count, 'value', None) is not None or _statement_log['file'] is not None
+
+
+class _CountingCursor:
+    """Cursor proxy that counts (and, with a statement log, records) execute/executemany calls"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _run(self, method, query, params, *args, many=False, **kwargs):
+        if getattr(_query_count, 'value', None) is not None:
+            _query_count.value += 1
+        if _statement_log['file'] is None:
+            return method(query, params, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(query, params, *args, **kwargs)
+        finally:
+            _log_statement(query, params or [], time.perf_counter() - started, many)
+
+    def execute(self, query, params=None, *args, **kwargs):
+        return self._run(self._cursor.execute, query, params, *args, **kwargs)
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        return self._run(self._cursor.executemany, query, seq_params, *args, many=True, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _CountingConnection:
+    """Connection proxy whose cursors count statements"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
 class DatabaseConnection:
     """Manages database connections and raw SQL execution"""
     
@@ -44,7 +164,8 @@ class DatabaseConnection:
         conn = None
         try:
             conn = mysql.connector.connect(**DATABASE_CONFIG)
-            yield conn
+            # Only wrapped while a query count or the statement log is running
+            yield _CountingConnection(conn) if _instrumented() else conn
             conn.commit()
         except Error as e:
             if conn:
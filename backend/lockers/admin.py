@@ -3,18 +3,54 @@ LockSpot Admin Configuration
 Enhanced Admin Dashboard with Charts and Analytics
 """
 
+from collections import Counter
+from datetime import timedelta
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.html import format_html
-from django.db.models import Count, Sum, Avg
+from django.db import transaction
+from django.utils.html import format_html, format_html_join
+from django.db.models import Count, Sum, Avg, F, IntegerField, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     User, LocationAddress, LockerLocation, PricingTier, LockerUnit,
-    Discount, Booking, PaymentMethod, Payment, Review, 
-    QRAccessCode, Notification, AuditLog
+    Discount, DiscountUsageShard, Booking, PaymentMethod, Payment, Review, 
+    QRAccessCode, Notification, NotificationCounter, AuditLog, OutboxEvent, DemandForecast
 )
+from api import audit
+from .admin_pagination import LargeTableAdminMixin
+from . import bulk_actions
+from .bulk_actions import BulkActionAdminMixin
+
+
+def per_row(queryset, group_by, aggregate, output_field=None):
+    """
+    Aggregate over related rows as a correlated subquery (0 when none).
+    Unlike Count/Sum over a join, several of these on one changelist never
+    multiply each other's rows, and the page stays a single query.
+    """
+    subquery = queryset.order_by().values(group_by).annotate(value=aggregate).values('value')
+    return Coalesce(Subquery(subquery), 0, output_field=output_field or IntegerField())
+
+
+class StatusAuditMixin:
+    """Audits edits of audited_fields made in the change form (api/audit.py)"""
+
+    audit_action = None
+    audited_fields = ('status',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        fields = [f for f in self.audited_fields if change and f in form.changed_data]
+        if fields:
+            old = {f: form.initial.get(f) for f in fields}
+            new = {f: form.cleaned_data.get(f) for f in fields}
+            transaction.on_commit(lambda: audit.record(
+                self.audit_action, obj._meta.db_table, obj.pk, old, new, request=request
+            ))
 
 
 # ==================== USER ADMIN ====================
@@ -54,19 +90,30 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        bookings = Booking.objects.filter(user=OuterRef('pk'))
+        return super().get_queryset(request).annotate(
+            _booking_count=per_row(bookings, 'user', Count('id')),
+            _total_spent=per_row(
+                bookings.filter(status='Completed'), 'user', Sum('total_amount'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+    
     def booking_count(self, obj):
-        count = obj.bookings.count()
+        count = obj._booking_count
         if count > 0:
             url = reverse('admin:lockers_booking_changelist') + f'?user__id__exact={obj.id}'
             return format_html('<a href="{}">{} bookings</a>', url, count)
         return '0 bookings'
     booking_count.short_description = 'Bookings'
+    booking_count.admin_order_field = '_booking_count'
     
     def total_spent(self, obj):
-        total = obj.bookings.filter(status='Completed').aggregate(
-            total=Sum('total_amount'))['total'] or 0
-        return format_html('<span style="color: green; font-weight: bold;">${:.2f}</span>', total)
+        total = obj._total_spent
+        return format_html('<span style="color: green; font-weight: bold;">${}</span>', f'{total:.2f}')
     total_spent.short_description = 'Total Spent'
+    total_spent.admin_order_field = '_total_spent'
 
 
 # ==================== LOCATION ADMIN ====================
@@ -102,6 +149,7 @@ class LockerLocationAdmin(admin.ModelAdmin):
                     'status_badge', 'avg_rating')
     list_filter = ('is_active', 'address__city')
     search_fields = ('name', 'address__city', 'address__street_address')
+    list_select_related = ('address',)
     inlines = [LockerInline]
     readonly_fields = ('created_at', 'updated_at')
     
@@ -121,6 +169,18 @@ class LockerLocationAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        lockers = LockerUnit.objects.filter(location=OuterRef('pk'))
+        reviews = Review.objects.filter(booking__locker__location=OuterRef('pk'))
+        return super().get_queryset(request).annotate(
+            _total_lockers=per_row(lockers, 'location', Count('id')),
+            _available_lockers=per_row(lockers.filter(status='Available'), 'location', Count('id')),
+            _avg_rating=Subquery(
+                reviews.order_by().values('booking__locker__location')
+                .annotate(value=Avg('rating')).values('value')
+            ),
+        )
+    
     def address_info(self, obj):
         return format_html(
             '<strong>{}</strong><br><small style="color: #666;">{}</small>',
@@ -133,17 +193,18 @@ class LockerLocationAdmin(admin.ModelAdmin):
     operating_hours.short_description = 'Hours'
     
     def locker_stats(self, obj):
-        available = obj.available_lockers_count
-        total = obj.total_lockers_count
+        available = obj._available_lockers
+        total = obj._total_lockers
         if total == 0:
             return 'No lockers'
         percentage = (available / total) * 100
         color = 'green' if percentage > 50 else 'orange' if percentage > 20 else 'red'
         return format_html(
-            '<span style="color: {};">{}/{} available ({:.0f}%)</span>',
-            color, available, total, percentage
+            '<span style="color: {};">{}/{} available ({}%)</span>',
+            color, available, total, f'{percentage:.0f}'
         )
     locker_stats.short_description = 'Lockers'
+    locker_stats.admin_order_field = '_available_lockers'
     
     def status_badge(self, obj):
         if obj.is_active:
@@ -152,12 +213,13 @@ class LockerLocationAdmin(admin.ModelAdmin):
     status_badge.short_description = 'Status'
     
     def avg_rating(self, obj):
-        rating = obj.average_rating
+        rating = obj._avg_rating
         if rating:
             stars = '★' * int(rating) + '☆' * (5 - int(rating))
-            return format_html('<span style="color: #ffc107;">{}</span> ({:.1f})', stars, rating)
+            return format_html('<span style="color: #ffc107;">{}</span> ({})', stars, f'{rating:.1f}')
         return 'No ratings'
     avg_rating.short_description = 'Rating'
+    avg_rating.admin_order_field = '_avg_rating'
 
 
 # ==================== PRICING ADMIN ====================
@@ -168,6 +230,12 @@ class PricingTierAdmin(admin.ModelAdmin):
     list_filter = ('size', 'is_active')
     search_fields = ('name',)
     
+    def get_queryset(self, request):
+        lockers = LockerUnit.objects.filter(tier=OuterRef('pk'))
+        return super().get_queryset(request).annotate(
+            _locker_count=per_row(lockers, 'tier', Count('id'))
+        )
+    
     def display_pricing(self, obj):
         return format_html(
             '<div style="line-height: 1.4;">'
@@ -180,22 +248,34 @@ class PricingTierAdmin(admin.ModelAdmin):
     display_pricing.short_description = 'Pricing'
     
     def locker_count(self, obj):
-        return obj.lockers.count()
+        return obj._locker_count
     locker_count.short_description = 'Units'
+    locker_count.admin_order_field = '_locker_count'
 
 
 # ==================== LOCKER ADMIN ====================
 
 @admin.register(LockerUnit)
-class LockerUnitAdmin(admin.ModelAdmin):
+class LockerUnitAdmin(StatusAuditMixin, BulkActionAdminMixin, admin.ModelAdmin):
+    audit_action = 'locker.status_changed'
+
     list_display = ('display_locker', 'location', 'size', 'status_badge', 
                     'tier', 'last_maintenance', 'booking_status')
     list_filter = ('status', 'size', 'location', 'location__address__city')
     search_fields = ('unit_number', 'location__name')
+    list_select_related = ('location', 'tier')
     list_per_page = 50
     readonly_fields = ('created_at', 'updated_at')
     actions = ['mark_available', 'mark_maintenance', 'mark_out_of_service']
     
+    def get_queryset(self, request):
+        current = Booking.objects.filter(
+            locker=OuterRef('pk'), status__in=['Confirmed', 'Active']
+        ).order_by('-created_at')
+        return super().get_queryset(request).annotate(
+            _current_booking_id=Subquery(current.values('id')[:1])
+        )
+    
     def display_locker(self, obj):
         return format_html(
             '<strong style="font-size: 14px;">#{}</strong>',
@@ -227,37 +307,42 @@ class LockerUnitAdmin(admin.ModelAdmin):
     last_maintenance.short_description = 'Maintenance'
     
     def booking_status(self, obj):
-        active_booking = obj.bookings.filter(status__in=['Confirmed', 'Active']).first()
-        if active_booking:
+        booking_id = obj._current_booking_id
+        if booking_id:
             return format_html(
                 '<a href="{}" style="color: #007bff;">Booking #{}</a>',
-                reverse('admin:lockers_booking_change', args=[active_booking.id]),
-                active_booking.id
+                reverse('admin:lockers_booking_change', args=[booking_id]),
+                booking_id
             )
         return '-'
     booking_status.short_description = 'Current Booking'
     
     @admin.action(description='Mark selected as Available')
     def mark_available(self, request, queryset):
-        queryset.update(status='Available')
+        return self.run_bulk_action(request, queryset, 'Mark as Available', bulk_actions.mark_available_chunk)
     
     @admin.action(description='Mark selected as Under Maintenance')
     def mark_maintenance(self, request, queryset):
-        queryset.update(status='Maintenance', last_maintenance_date=timezone.now().date())
+        return self.run_bulk_action(request, queryset, 'Mark as Under Maintenance',
+                                    bulk_actions.mark_maintenance_chunk)
     
     @admin.action(description='Mark selected as Out of Service')
     def mark_out_of_service(self, request, queryset):
-        queryset.update(status='OutOfService')
+        return self.run_bulk_action(request, queryset, 'Mark as Out of Service',
+                                    bulk_actions.mark_out_of_service_chunk)
 
 
 # ==================== BOOKING ADMIN ====================
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(StatusAuditMixin, BulkActionAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    audit_action = 'booking.status_changed'
+
     list_display = ('booking_id', 'customer_info', 'locker_info', 'booking_period',
                     'duration', 'amount_display', 'status_badge', 'created_at')
     list_filter = ('status', 'booking_type', 'created_at', 'locker__location')
     search_fields = ('id', 'user__email', 'user__first_name', 'locker__location__name')
+    list_select_related = ('user', 'locker__location')
     date_hierarchy = 'created_at'
     readonly_fields = ('created_at', 'updated_at', 'duration_hours')
     list_per_page = 25
@@ -356,27 +441,42 @@ class BookingAdmin(admin.ModelAdmin):
     
     @admin.action(description='Confirm selected bookings')
     def confirm_bookings(self, request, queryset):
-        queryset.filter(status='Pending').update(status='Confirmed')
+        return self.run_bulk_action(request, queryset, 'Confirm bookings', bulk_actions.confirm_bookings_chunk)
     
     @admin.action(description='Mark as Completed')
     def complete_bookings(self, request, queryset):
-        queryset.filter(status__in=['Confirmed', 'Active']).update(status='Completed')
+        return self.run_bulk_action(request, queryset, 'Complete bookings', bulk_actions.complete_bookings_chunk)
     
     @admin.action(description='Cancel selected bookings')
     def cancel_bookings(self, request, queryset):
-        queryset.exclude(status__in=['Completed', 'Cancelled']).update(status='Cancelled')
+        return self.run_bulk_action(request, queryset, 'Cancel bookings', bulk_actions.cancel_bookings_chunk)
 
 
 # ==================== DISCOUNT ADMIN ====================
 
 @admin.register(Discount)
-class DiscountAdmin(admin.ModelAdmin):
+class DiscountAdmin(StatusAuditMixin, admin.ModelAdmin):
+    audit_action = 'discount.status_changed'
+    audited_fields = ('is_active',)
+
     list_display = ('code', 'discount_display', 'usage_stats', 'validity_period', 
                     'status_badge', 'revenue_impact')
     list_filter = ('discount_type', 'is_active')
     search_fields = ('code', 'description')
     readonly_fields = ('current_uses', 'created_at')
     
+    def get_queryset(self, request):
+        shards = DiscountUsageShard.objects.filter(discount=OuterRef('pk'))
+        bookings = Booking.objects.filter(discount=OuterRef('pk'))
+        return super().get_queryset(request).annotate(
+            # Hot codes keep part of their usage in counter slots
+            _total_uses=F('current_uses') + per_row(shards, 'discount', Sum('uses')),
+            _revenue_impact=per_row(
+                bookings, 'discount', Sum('discount_amount'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+    
     def discount_display(self, obj):
         if obj.discount_type == 'Percentage':
             return format_html('<strong style="color: #e83e8c; font-size: 16px;">{}%</strong> OFF', obj.discount_value)
@@ -384,8 +484,9 @@ class DiscountAdmin(admin.ModelAdmin):
     discount_display.short_description = 'Discount'
     
     def usage_stats(self, obj):
+        uses = obj._total_uses
         if obj.max_uses:
-            percentage = (obj.current_uses / obj.max_uses) * 100
+            percentage = (uses / obj.max_uses) * 100
             return format_html(
                 '<div style="width: 80px;">'
                 '<div style="background: #e9ecef; border-radius: 4px;">'
@@ -393,10 +494,11 @@ class DiscountAdmin(admin.ModelAdmin):
                 '</div>'
                 '<small>{}/{}</small>'
                 '</div>',
-                percentage, obj.current_uses, obj.max_uses
+                percentage, uses, obj.max_uses
             )
-        return f'{obj.current_uses} uses'
+        return f'{uses} uses'
     usage_stats.short_description = 'Usage'
+    usage_stats.admin_order_field = '_total_uses'
     
     def validity_period(self, obj):
         now = timezone.now()
@@ -415,19 +517,22 @@ class DiscountAdmin(admin.ModelAdmin):
     status_badge.short_description = 'Status'
     
     def revenue_impact(self, obj):
-        total = obj.bookings.aggregate(total=Sum('discount_amount'))['total'] or 0
-        return format_html('<span style="color: #dc3545;">-${:.2f}</span>', total)
+        return format_html('<span style="color: #dc3545;">-${}</span>', f'{obj._revenue_impact:.2f}')
     revenue_impact.short_description = 'Total Discounted'
+    revenue_impact.admin_order_field = '_revenue_impact'
 
 
 # ==================== PAYMENT ADMIN ====================
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(StatusAuditMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    audit_action = 'payment.status_changed'
+
     list_display = ('payment_id', 'booking_link', 'amount_display', 'method_info',
                     'status_badge', 'payment_date')
     list_filter = ('status', 'payment_date')
     search_fields = ('transaction_reference', 'booking__user__email')
+    list_select_related = ('method',)
     date_hierarchy = 'payment_date'
     readonly_fields = ('payment_date',)
     
@@ -438,8 +543,8 @@ class PaymentAdmin(admin.ModelAdmin):
     def booking_link(self, obj):
         return format_html(
             '<a href="{}">Booking #{}</a>',
-            reverse('admin:lockers_booking_change', args=[obj.booking.id]),
-            obj.booking.id
+            reverse('admin:lockers_booking_change', args=[obj.booking_id]),
+            obj.booking_id
         )
     booking_link.short_description = 'Booking'
     
@@ -477,6 +582,7 @@ class ReviewAdmin(admin.ModelAdmin):
                     'comment_preview', 'created_at')
     list_filter = ('rating', 'is_verified', 'created_at')
     search_fields = ('booking__user__email', 'title', 'comment')
+    list_select_related = ('booking__user', 'booking__locker__location')
     readonly_fields = ('created_at', 'updated_at')
     
     def review_id(self, obj):
@@ -508,10 +614,42 @@ class ReviewAdmin(admin.ModelAdmin):
 # ==================== NOTIFICATION ADMIN ====================
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """
+    Adds and deletes keep lockers_notificationcounter in step, like
+    api/notifications.py: the notification rows first, then the counters.
+    Read state belongs to the customer, so it is not editable here. Users
+    without a counter row yet are skipped, their counter is seeded from the
+    table on first read.
+    """
     list_display = ('title', 'user', 'notification_type', 'read_status', 'created_at')
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('title', 'message', 'user__email')
+    list_select_related = ('user',)
+    readonly_fields = ('is_read', 'read_at')
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Moving an unread notification to another user would move its count too
+        return self.readonly_fields + ('user',) if obj else self.readonly_fields
+    
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change and not obj.is_read:
+                NotificationCounter.objects.filter(user_id=obj.user_id).update(unread=F('unread') + 1)
+    
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Notification.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            rows = list(queryset.select_for_update().values_list('user_id', 'is_read'))
+            super().delete_queryset(request, queryset)
+            unread = Counter(user_id for user_id, is_read in rows if not is_read)
+            for user_id, count in sorted(unread.items()):
+                NotificationCounter.objects.filter(user_id=user_id).update(
+                    unread=Greatest(F('unread') - count, 0)
+                )
     
     def read_status(self, obj):
         if obj.is_read:
@@ -527,6 +665,7 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_display = ('action', 'user', 'table_name', 'record_id', 'ip_address', 'created_at')
     list_filter = ('action', 'table_name', 'created_at')
     search_fields = ('action', 'user__email')
+    list_select_related = ('user',)
     readonly_fields = ('user', 'action', 'table_name', 'record_id', 'old_values', 
                        'new_values', 'ip_address', 'user_agent', 'created_at')
     
@@ -537,6 +676,37 @@ class AuditLogAdmin(admin.ModelAdmin):
         return False
 
 
+# ==================== OUTBOX ADMIN ====================
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Booking side effects waiting for `manage.py dispatch_outbox` (api/outbox.py)"""
+    list_display = ('id', 'event_type', 'booking_id', 'status', 'attempts', 'done_handlers',
+                    'next_attempt_at', 'created_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('=booking_id',)
+    readonly_fields = ('event_type', 'booking_id', 'payload', 'status', 'attempts', 'done_handlers',
+                       'last_error', 'next_attempt_at', 'created_at', 'processed_at')
+    actions = ['retry_events']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_retry_permission(self, request):
+        return request.user.has_perm('lockers.change_outboxevent')
+    
+    @admin.action(description='Retry selected failed events now', permissions=['retry'])
+    def retry_events(self, request, queryset):
+        # Handlers already in done_handlers are not run again
+        count = queryset.filter(status=OutboxEvent.Status.FAILED).update(
+            status=OutboxEvent.Status.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{count} event(s) queued for retry.')
+
+
 # ==================== PAYMENT METHOD ADMIN ====================
 
 @admin.register(PaymentMethod)
@@ -544,6 +714,7 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ('user', 'method_type', 'card_display', 'is_default', 'is_active')
     list_filter = ('method_type', 'is_default', 'is_active')
     search_fields = ('user__email',)
+    list_select_related = ('user',)
     
     def card_display(self, obj):
         if obj.card_last_four:
@@ -560,6 +731,7 @@ class QRAccessCodeAdmin(admin.ModelAdmin):
                     'expires_at', 'is_used')
     list_filter = ('code_type', 'is_used')
     search_fields = ('code', 'booking__id')
+    list_select_related = ('booking__user', 'booking__locker__location')
     
     def code_display(self, obj):
         return format_html('<code style="background: #f8f9fa; padding: 2px 6px; border-radius: 4px;">{}</code>', obj.code[:20] + '...')
@@ -574,6 +746,70 @@ class QRAccessCodeAdmin(admin.ModelAdmin):
     usage_status.short_description = 'Status'
 
 
+# ==================== DEMAND FORECAST ADMIN ====================
+
+def utilization_color(value):
+    return '#dc3545' if value >= 0.9 else '#fd7e14' if value >= 0.7 else '#28a745'
+
+
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    """Read-only output of `manage.py forecast_demand`, busiest groups first"""
+    list_display = ('location', 'size', 'lockers', 'peak_display', 'peak_at', 'average_display',
+                    'last_week_display', 'trend_display', 'computed_at')
+    list_filter = ('size',)
+    search_fields = ('location__name',)
+    list_select_related = ('location',)
+    exclude = ('hourly',)
+    readonly_fields = ('location', 'size', 'lockers', 'history_weeks', 'forecast_start', 'peak_display',
+                       'peak_at', 'average_display', 'last_week_display', 'trend_display', 'computed_at',
+                       'forecast_heatmap')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def peak_display(self, obj):
+        return format_html(
+            '<div style="background: #e9ecef; width: 100px; display: inline-block; border-radius: 3px;">'
+            '<div style="background: {}; width: {}px; height: 10px; border-radius: 3px;"></div></div> {}%',
+            utilization_color(obj.peak_utilization), round(obj.peak_utilization * 100),
+            f'{obj.peak_utilization * 100:.0f}'
+        )
+    peak_display.short_description = 'Forecast Peak'
+    peak_display.admin_order_field = 'peak_utilization'
+    
+    def average_display(self, obj):
+        return f'{obj.avg_utilization * 100:.0f}%'
+    average_display.short_description = 'Forecast Avg'
+    average_display.admin_order_field = 'avg_utilization'
+    
+    def last_week_display(self, obj):
+        return f'{obj.last_week_peak * 100:.0f}%'
+    last_week_display.short_description = 'Last Week Peak'
+    
+    def trend_display(self, obj):
+        color = 'green' if obj.weekly_trend >= 0 else 'red'
+        return format_html('<span style="color: {};">{}</span>', color, f'{obj.weekly_trend:+.2f}/wk')
+    trend_display.short_description = 'Trend'
+    
+    def forecast_heatmap(self, obj):
+        """One row per forecast day, one cell per hour, shaded by utilization"""
+        start = timezone.localtime(obj.forecast_start)
+        rows = []
+        for day in range(len(obj.hourly) // 24):
+            cells = format_html_join('', '<td title="{}:00 {}%" style="background: {}; opacity: {}; width: 14px;"></td>', (
+                (hour, f'{value * 100:.0f}', utilization_color(value), f'{max(value, 0.05):.2f}')
+                for hour, value in enumerate(obj.hourly[day * 24:(day + 1) * 24])
+            ))
+            rows.append(format_html('<tr><th style="padding-right: 8px;">{}</th>{}</tr>',
+                                    (start + timedelta(days=day)).strftime('%a %d %b'), cells))
+        return format_html('<table style="border-collapse: collapse;">{}</table>', mark_safe(''.join(rows)))
+    forecast_heatmap.short_description = 'Hourly Forecast (00-23h)'
+
+
 # ==================== ADMIN SITE CONFIG ====================
 
 admin.site.site_header = 'LockSpot Administration'
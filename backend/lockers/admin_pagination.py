@@ -0,0 +1,134 @@
+"""
+Admin pagination for very large tables
+Estimated counts, bounded filtered counts and a cached date drill-down
+"""
+
+import hashlib
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+COUNT_CACHE_SECONDS = 300
+DRILLDOWN_CACHE_SECONDS = 600
+
+# Below this many rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 100000
+
+# Filtered changelists stop counting here ("10,000+" pages are never browsed)
+BOUNDED_COUNT_LIMIT = 10000
+
+
+def estimated_row_count(model, using='default') -> int:
+    """
+    Unfiltered row count of a model's table, cached for COUNT_CACHE_SECONDS.
+    On MySQL large tables use InnoDB's table statistics instead of COUNT(*).
+    """
+    table = model._meta.db_table
+    key = f'admin_count:{using}:{table}'
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    connection = connections[using]
+    count = None
+    if connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT TABLE_ROWS FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """, [table])
+            row = cursor.fetchone()
+        if row and row[0] is not None and row[0] >= EXACT_COUNT_THRESHOLD:
+            count = int(row[0])
+
+    if count is None:
+        count = model._default_manager.using(using).count()
+
+    cache.set(key, count, COUNT_CACHE_SECONDS)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded COUNT(*):
+    unfiltered lists use estimated_row_count(), filtered lists count at most
+    BOUNDED_COUNT_LIMIT rows. `is_estimate` is set when the count is not exact.
+    """
+
+    is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        if not queryset.query.where:
+            count = estimated_row_count(queryset.model, queryset.db)
+            self.is_estimate = count >= EXACT_COUNT_THRESHOLD
+            return count
+
+        # COUNT(*) over a LIMIT subquery stops scanning at the bound
+        count = queryset.order_by().values('pk')[:BOUNDED_COUNT_LIMIT + 1].count()
+        if count > BOUNDED_COUNT_LIMIT:
+            self.is_estimate = True
+            return BOUNDED_COUNT_LIMIT
+        return count
+
+
+class DrilldownCacheQuerySet(QuerySet):
+    """
+    QuerySet whose date_hierarchy queries (the MIN/MAX range and the distinct
+    years/months/days) are cached per SQL statement.
+    """
+
+    def _cached(self, label, compute):
+        sql, params = self.query.sql_with_params()
+        digest = hashlib.sha1(repr((label, sql, params)).encode()).hexdigest()
+        key = f'admin_drilldown:{self.db}:{digest}'
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, DRILLDOWN_CACHE_SECONDS)
+        return value
+
+    def aggregate(self, *args, **kwargs):
+        compute = lambda: super(DrilldownCacheQuerySet, self).aggregate(*args, **kwargs)  # noqa: E731
+        return self._cached(('aggregate', repr(args), repr(sorted(kwargs.items()))), compute)
+
+    def dates(self, field_name, kind, order='ASC'):
+        compute = lambda: list(super(DrilldownCacheQuerySet, self).dates(field_name, kind, order))  # noqa: E731
+        return self._cached(('dates', field_name, kind, order), compute)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        compute = lambda: list(  # noqa: E731
+            super(DrilldownCacheQuerySet, self).datetimes(field_name, kind, order, tzinfo)
+        )
+        return self._cached(('datetimes', field_name, kind, order, str(tzinfo)), compute)
+
+
+class LargeTableChangeList(ChangeList):
+    """ChangeList whose date drill-down reads from DrilldownCacheQuerySet"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # result_list is already derived; from here on only the date_hierarchy tag reads this
+        if self.date_hierarchy:
+            self.queryset = DrilldownCacheQuerySet(
+                model=self.model, query=self.queryset.query.chain(), using=self.queryset.db
+            )
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin settings for tables with millions of rows"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
@@ -0,0 +1,203 @@
+"""
+Chunked, set-based admin bulk actions
+Large selections run in a background thread and report progress to the admin
+
+Progress is kept in lockers_bulkjob, so the progress page works on whichever
+worker serves it. The thread reports after every chunk; a job that has not
+reported for STALE_JOB_SECONDS (its worker was recycled or killed) is marked
+Failed when its page is next viewed.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.contrib import messages
+from django.db import close_old_connections, transaction
+from django.http import Http404, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+
+from api import audit
+
+from .models import Booking, BulkJob, LockerUnit
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+STALE_JOB_SECONDS = 300
+ACTIVE_BOOKING_STATUSES = ['Confirmed', 'Active']
+
+
+# ==================== CHUNK HANDLERS ====================
+# Each handler gets one chunk of primary keys, runs inside its own
+# transaction and returns the number of rows changed. Status changes are
+# audited (api/audit.py) once the transaction commits.
+
+def _audit_on_commit(action, table_name, changes):
+    """Audit (pk, old status, new status) changes once the chunk's transaction commits"""
+    changes = [change for change in changes if change[1] != change[2]]
+    if changes:
+        actor = audit.current_actor()
+        transaction.on_commit(lambda: audit.record_status_changes(action, table_name, changes, actor=actor))
+
+
+def _set_locker_status(queryset, to_status, **fields):
+    """Lock the lockers, set their status and audit the ones that changed; returns rows updated"""
+    rows = list(queryset.select_for_update().values_list('pk', 'status'))
+    if not rows:
+        return 0
+    LockerUnit.objects.filter(pk__in=[r[0] for r in rows]).update(
+        status=to_status, updated_at=timezone.now(), **fields
+    )
+    _audit_on_commit('locker.status_changed', 'lockers_lockerunit', [(pk, status, to_status) for pk, status in rows])
+    return len(rows)
+
+
+def _free_lockers(locker_ids):
+    """Lockers of ended bookings go back to Available unless another booking holds them"""
+    return _set_locker_status(
+        LockerUnit.objects.filter(pk__in=locker_ids, status='Booked').exclude(
+            bookings__status__in=ACTIVE_BOOKING_STATUSES
+        ),
+        'Available',
+    )
+
+
+def _change_bookings(ids, from_statuses, to_status):
+    rows = list(
+        Booking.objects.select_for_update()
+        .filter(pk__in=ids, status__in=from_statuses)
+        .values_list('pk', 'locker_id', 'status')
+    )
+    if not rows:
+        return []
+    Booking.objects.filter(pk__in=[r[0] for r in rows]).update(
+        status=to_status, updated_at=timezone.now()
+    )
+    _audit_on_commit('booking.status_changed', 'lockers_booking', [(r[0], r[2], to_status) for r in rows])
+    return [r[1] for r in rows]
+
+
+def confirm_bookings_chunk(ids):
+    locker_ids = _change_bookings(ids, ['Pending'], 'Confirmed')
+    _set_locker_status(LockerUnit.objects.filter(pk__in=locker_ids, status='Available'), 'Booked')
+    return len(locker_ids)
+
+
+def complete_bookings_chunk(ids):
+    locker_ids = _change_bookings(ids, ACTIVE_BOOKING_STATUSES, 'Completed')
+    _free_lockers(locker_ids)
+    return len(locker_ids)
+
+
+def cancel_bookings_chunk(ids):
+    locker_ids = _change_bookings(ids, ['Pending', 'Confirmed', 'Active'], 'Cancelled')
+    _free_lockers(locker_ids)
+    return len(locker_ids)
+
+
+def mark_available_chunk(ids):
+    # A locker holding a live booking stays Booked
+    return _set_locker_status(
+        LockerUnit.objects.filter(pk__in=ids).exclude(bookings__status__in=ACTIVE_BOOKING_STATUSES),
+        'Available',
+    )
+
+
+def mark_maintenance_chunk(ids):
+    return _set_locker_status(LockerUnit.objects.filter(pk__in=ids), 'Maintenance',
+                              last_maintenance_date=timezone.now().date())
+
+
+def mark_out_of_service_chunk(ids):
+    return _set_locker_status(LockerUnit.objects.filter(pk__in=ids), 'OutOfService')
+
+
+# ==================== JOBS ====================
+
+def get_job(job_id):
+    """The job, marked Failed first if its thread stopped reporting"""
+    stale = timezone.now() - timedelta(seconds=STALE_JOB_SECONDS)
+    BulkJob.objects.filter(pk=job_id, status=BulkJob.Status.RUNNING, updated_at__lt=stale).update(
+        status=BulkJob.Status.FAILED,
+        error=f'No progress for {STALE_JOB_SECONDS // 60} minutes, the worker running it was stopped',
+    )
+    return BulkJob.objects.filter(pk=job_id).first()
+
+
+def run_chunks(ids, handler, job_id=None):
+    """Apply handler chunk by chunk; returns total rows changed"""
+    changed = 0
+    for start in range(0, len(ids), CHUNK_SIZE):
+        with transaction.atomic():
+            changed += handler(ids[start:start + CHUNK_SIZE])
+        if job_id:
+            BulkJob.objects.filter(pk=job_id).update(
+                processed=min(start + CHUNK_SIZE, len(ids)), changed=changed, updated_at=timezone.now()
+            )
+    return changed
+
+
+def _run_job(job_id, ids, handler, actor):
+    try:
+        with audit.acting_as(actor):
+            run_chunks(ids, handler, job_id)
+        BulkJob.objects.filter(pk=job_id).update(status=BulkJob.Status.DONE, updated_at=timezone.now())
+    except Exception as e:
+        logger.exception('Bulk job %s failed', job_id)
+        BulkJob.objects.filter(pk=job_id).update(
+            status=BulkJob.Status.FAILED, error=str(e), updated_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+class BulkActionAdminMixin:
+    """
+    Runs an action handler over the selected rows: inline for small
+    selections, otherwise in a background thread with a progress page.
+    """
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('bulk-jobs/<int:job_id>/', self.admin_site.admin_view(self.bulk_job_view),
+                 name=f'{opts.app_label}_{opts.model_name}_bulk_job'),
+        ] + super().get_urls()
+
+    def run_bulk_action(self, request, queryset, label, handler):
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        actor = audit.actor_from(request)
+
+        if len(ids) <= CHUNK_SIZE:
+            with audit.acting_as(actor):
+                changed = run_chunks(ids, handler)
+            self.message_user(request, f'{label}: {changed} of {len(ids)} selected rows updated.')
+            return None
+
+        now = timezone.now()
+        job = BulkJob.objects.create(label=label, total=len(ids), created_at=now, updated_at=now)
+        threading.Thread(target=_run_job, args=(job.pk, ids, handler, actor), daemon=True).start()
+
+        self.message_user(request, f'{label}: processing {len(ids)} rows in the background.', messages.INFO)
+        opts = self.model._meta
+        return HttpResponseRedirect(
+            reverse(f'admin:{opts.app_label}_{opts.model_name}_bulk_job', args=[job.pk])
+        )
+
+    def bulk_job_view(self, request, job_id):
+        job = get_job(job_id)
+        if job is None:
+            raise Http404('Unknown job')
+        opts = self.model._meta
+        return TemplateResponse(request, 'admin/lockers/bulk_job.html', {
+            **self.admin_site.each_context(request),
+            'title': job.label,
+            'opts': opts,
+            'job': job,
+            'percent': int(job.processed * 100 / job.total) if job.total else 100,
+            'changelist_url': reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'),
+        })
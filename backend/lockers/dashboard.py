@@ -0,0 +1,153 @@
+"""
+Admin Analytics Dashboard for LockSpot
+Revenue trend, top locations, occupancy by hour and discount impact
+
+Everything is read from the rollup tables kept by `refresh_rollups`
+(lockers/rollups.py), which are bounded by locations x days, locations x 24
+hours and the number of discount codes rather than by bookings, plus the
+location names and discount codes. Nothing touches lockers_booking. The
+assembled figures are kept in-process for CACHE_SECONDS, so repeated views
+cost no queries at all; the rollups themselves only move every few minutes.
+"""
+
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Max, Min, Sum
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from .models import (
+    LockerLocation, Discount, RollupState, RollupDailyRevenue, RollupLocationStats,
+    RollupHourlyOccupancy, RollupDiscountImpact
+)
+
+
+CACHE_SECONDS = 60
+PERIODS = (7, 30, 90)
+DEFAULT_PERIOD = 30
+TOP_N = 10
+
+_cache = {}  # period -> (expires, data)
+_lock = threading.Lock()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _percent(value, largest):
+    return round(float(value) * 100 / float(largest), 1) if largest else 0
+
+
+def revenue_trend(days):
+    """Net revenue and bookings per day over the last `days` days, gaps filled with zeros"""
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    rows = {
+        row['day']: row
+        for row in RollupDailyRevenue.objects.filter(day__gte=since)
+        .values('day').annotate(bookings=Sum('bookings'), net=Sum('net_revenue'), discounts=Sum('discounts'))
+    }
+    trend = [
+        rows.get(since + timedelta(days=i)) or {'day': since + timedelta(days=i), 'bookings': 0,
+                                                 'net': Decimal('0'), 'discounts': Decimal('0')}
+        for i in range(days)
+    ]
+    largest = max(row['net'] for row in trend)
+    for row in trend:
+        row['bar'] = _percent(row['net'], largest)
+    return trend
+
+
+def top_locations():
+    stats = list(RollupLocationStats.objects.order_by('-completed_revenue')[:TOP_N].values())
+    names = dict(LockerLocation.objects.filter(id__in=[s['location_id'] for s in stats]).values_list('id', 'name'))
+    largest = stats[0]['completed_revenue'] if stats else 0
+    for s in stats:
+        s['name'] = names.get(s['location_id'], f"Location #{s['location_id']}")
+        s['avg_rating'] = round(s['rating_sum'] / s['reviews'], 1) if s['reviews'] else None
+        s['bar'] = _percent(s['completed_revenue'], largest)
+    return stats
+
+
+def occupancy_by_hour():
+    """
+    Booked locker-hours per local hour of day across all locations, and the
+    average share of lockers occupied in that hour over the days on record
+    """
+    minutes = dict(RollupHourlyOccupancy.objects.values('hour').annotate(m=Sum('booked_minutes'))
+                   .values_list('hour', 'm'))
+    lockers = RollupLocationStats.objects.aggregate(n=Sum('total_lockers'))['n'] or 0
+    span = RollupDailyRevenue.objects.aggregate(first=Min('day'), last=Max('day'))
+    days = (span['last'] - span['first']).days + 1 if span['first'] else 0
+    capacity = lockers * days * 60
+
+    hours = [{'hour': h, 'booked_hours': round(minutes.get(h, 0) / 60),
+              'occupancy': _percent(minutes.get(h, 0), capacity)} for h in range(24)]
+    largest = max(h['occupancy'] for h in hours)
+    for h in hours:
+        h['bar'] = _percent(h['occupancy'], largest)
+    return hours
+
+
+def discount_impact():
+    impact = list(RollupDiscountImpact.objects.order_by('-discounts')[:TOP_N].values())
+    codes = dict(Discount.objects.filter(id__in=[d['discount_id'] for d in impact]).values_list('id', 'code'))
+    for d in impact:
+        d['code'] = codes.get(d['discount_id'], f"#{d['discount_id']}")
+        d['share'] = _percent(d['discounts'], d['gross_revenue'])
+    return impact
+
+
+def build(days):
+    trend = revenue_trend(days)
+    return {
+        'days': days,
+        'revenue_trend': trend,
+        'period_revenue': sum(row['net'] for row in trend),
+        'period_bookings': sum(row['bookings'] for row in trend),
+        'period_discounts': sum(row['discounts'] for row in trend),
+        'top_locations': top_locations(),
+        'occupancy': occupancy_by_hour(),
+        'discounts': discount_impact(),
+        'refreshed_at': RollupState.objects.aggregate(at=Max('refreshed_at'))['at'],
+        'generated_at': timezone.now(),
+    }
+
+
+def dashboard_data(days=DEFAULT_PERIOD):
+    """The dashboard figures, rebuilt from the rollups at most every CACHE_SECONDS per period"""
+    entry = _cache.get(days)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    with _lock:
+        entry = _cache.get(days)  # another request may have rebuilt it meanwhile
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        data = build(days)
+        _cache[days] = (time.monotonic() + CACHE_SECONDS, data)
+        return data
+
+
+def dashboard_view(request):
+    if not request.user.has_perm('lockers.view_booking'):
+        raise PermissionDenied
+    try:
+        days = int(request.GET.get('days', DEFAULT_PERIOD))
+    except ValueError:
+        days = DEFAULT_PERIOD
+    if days not in PERIODS:
+        days = DEFAULT_PERIOD
+
+    return TemplateResponse(request, 'admin/lockers/dashboard.html', {
+        **admin.site.each_context(request),
+        'title': 'Analytics',
+        'periods': PERIODS,
+        'cache_seconds': CACHE_SECONDS,
+        **dashboard_data(days),
+    })
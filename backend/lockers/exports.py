@@ -0,0 +1,430 @@
+"""
+Columnar Snapshot Export for LockSpot - Raw SQL
+Bookings, payments, reviews and the location dimensions as compressed
+columnar files for offline analysis (run by `python manage.py export_snapshot`)
+
+Layout, one directory per table and, for the fact tables, one per month:
+
+    <out>/bookings/month=2025-03/part-00000.parquet
+    <out>/locations/part-00000.parquet
+    <out>/_manifest.json
+
+Parquet (zstd) is written when pyarrow is installed, Arrow IPC on request,
+otherwise compressed .npz files: one array per column, money as int64 cents,
+NULLs in a `<column>.null` mask next to the column (see load_npz).
+
+Datetimes leave MySQL as epoch seconds and money as integer cents: plain
+ints are much cheaper to fetch and to hand to the worker processes than
+datetime and Decimal objects, and become typed columns there in bulk.
+
+Runs are incremental. One aggregate per table (COUNT and BIT_XOR of a CRC32
+per row, grouped by month) is compared with the checksums of the previous
+run in the manifest; only months that differ are exported again, and months
+that no longer exist are removed. Updates, deletes and archiving all show up
+in the checksum. Bookings and payments include their archive tables.
+
+The rows of the changed months are streamed from an unbuffered (server-side)
+cursor and cut into parts in the main process; encoding and compression run
+in a process pool. A partition is written to a staging directory and swapped
+in only when all its parts are done, so readers never see half a month.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from db_utils import DatabaseConnection
+
+
+MANIFEST = '_manifest.json'
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow', 'npz': 'npz'}
+
+
+class Table(NamedTuple):
+    sources: Tuple[str, ...]
+    columns: Tuple[Tuple[str, str], ...]  # (column or SQL expression, type)
+    partition_by: Optional[str] = None  # datetime column giving the month
+
+
+BOOKING_COLUMNS = (
+    ('id', 'int'), ('user_id', 'int'), ('locker_id', 'int'), ('discount_id', 'int'),
+    ('start_time', 'datetime'), ('end_time', 'datetime'), ('booking_type', 'str'),
+    ('subtotal_amount', 'money'), ('discount_amount', 'money'), ('total_amount', 'money'),
+    ('status', 'str'), ('cancellation_reason', 'str'), ('created_at', 'datetime'), ('updated_at', 'datetime'),
+)
+
+PAYMENT_COLUMNS = (
+    ('id', 'int'), ('booking_id', 'int'), ('method_id', 'int'), ('amount', 'money'),
+    ('payment_date', 'datetime'), ('transaction_reference', 'str'), ('status', 'str'),
+    ('failure_reason', 'str'), ('refund_amount', 'money'), ('refund_date', 'datetime'),
+    ('processed_by', 'str'),
+)
+
+TABLES = {
+    'bookings': Table(('lockers_booking', 'lockers_bookingarchive'), BOOKING_COLUMNS, 'created_at'),
+    'payments': Table(('lockers_payment', 'lockers_paymentarchive'), PAYMENT_COLUMNS, 'payment_date'),
+    'reviews': Table(('lockers_review',), (
+        ('id', 'int'), ('booking_id', 'int'), ('rating', 'int'), ('title', 'str'), ('comment', 'str'),
+        ('is_verified', 'bool'), ('created_at', 'datetime'), ('updated_at', 'datetime'),
+    ), 'created_at'),
+    'locations': Table(('lockers_lockerlocation',), (
+        ('id', 'int'), ('name', 'str'), ('address_id', 'int'), ('description', 'str'),
+        ("TIME_FORMAT(operating_hours_start, '%H:%i')", 'str'), ("TIME_FORMAT(operating_hours_end, '%H:%i')", 'str'),
+        ('is_active', 'bool'), ('created_at', 'datetime'), ('updated_at', 'datetime'),
+    )),
+    'addresses': Table(('lockers_locationaddress',), (
+        ('id', 'int'), ('street_address', 'str'), ('city', 'str'), ('state', 'str'), ('zip_code', 'str'),
+        ('country', 'str'), ('latitude', 'float'), ('longitude', 'float'),
+    )),
+    'lockers': Table(('lockers_lockerunit',), (
+        ('id', 'int'), ('location_id', 'int'), ('tier_id', 'int'), ('unit_number', 'str'), ('size', 'str'),
+        ('status', 'str'), ('created_at', 'datetime'), ('updated_at', 'datetime'),
+    )),
+    'pricing_tiers': Table(('lockers_pricingtier',), (
+        ('id', 'int'), ('name', 'str'), ('size', 'str'), ('base_price', 'money'), ('hourly_rate', 'money'),
+        ('daily_rate', 'money'), ('weekly_rate', 'money'), ('is_active', 'bool'), ('created_at', 'datetime'),
+    )),
+}
+
+
+def column_name(expression: str) -> str:
+    """Output name of a column spec: TIME_FORMAT(operating_hours_start, ...) -> operating_hours_start"""
+    if '(' in expression:
+        return expression.split('(', 1)[1].split(',', 1)[0].strip()
+    return expression
+
+
+def _select_expr(expr: str, kind: str) -> str:
+    name = column_name(expr)
+    if kind == 'datetime':
+        expr = f"TIMESTAMPDIFF(SECOND, '1970-01-01', {expr})"
+    elif kind == 'money':
+        expr = f"CAST({expr} * 100 AS SIGNED)"
+    elif kind == 'float':
+        expr = f"CAST({expr} AS DOUBLE)"
+    return expr if expr == name else f"{expr} AS {name}"
+
+
+def _select_list(table: Table) -> str:
+    return ', '.join(_select_expr(expr, kind) for expr, kind in table.columns)
+
+
+def _partition_expr(table: Table) -> str:
+    return f"DATE_FORMAT({table.partition_by}, '%Y-%m')" if table.partition_by else "'all'"
+
+
+# ==================== ENCODING (worker processes) ====================
+
+NAT = np.iinfo(np.int64).min
+
+
+def _npz_arrays(name: str, kind: str, values: List) -> Dict[str, np.ndarray]:
+    # NULLs are NaT / NaN in these two
+    if kind == 'datetime':
+        return {name: np.array([NAT if v is None else v for v in values], dtype=np.int64).view('datetime64[s]')}
+    if kind == 'float':
+        return {name: np.array([np.nan if v is None else v for v in values], dtype=np.float64)}
+
+    nulls = np.array([v is None for v in values], dtype=bool)
+    if kind in ('int', 'money'):
+        data = np.array([0 if v is None else v for v in values], dtype=np.int64)
+    elif kind == 'bool':
+        data = np.array([bool(v) for v in values], dtype=bool)
+    else:
+        data = np.array(['' if v is None else v for v in values], dtype=str)
+    arrays = {name: data}
+    if nulls.any():
+        arrays[f'{name}.null'] = nulls
+    return arrays
+
+
+def _arrow_table(columns: Tuple[Tuple[str, str], ...], rows: List[Tuple]):
+    import pyarrow as pa
+
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string(), 'bool': pa.bool_()}
+    arrays, names = [], []
+    for i, (expr, kind) in enumerate(columns):
+        values = [row[i] for row in rows]
+        if kind == 'datetime':
+            array = pa.array(values, type=pa.int64()).cast(pa.timestamp('s'))
+        elif kind == 'money':
+            array = pa.array([None if v is None else Decimal(v).scaleb(-2) for v in values],
+                             type=pa.decimal128(12, 2))
+        elif kind == 'bool':
+            array = pa.array([None if v is None else bool(v) for v in values], type=pa.bool_())
+        else:
+            array = pa.array(values, type=types[kind])
+        arrays.append(array)
+        names.append(column_name(expr))
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def write_part(fmt: str, columns: Tuple[Tuple[str, str], ...], rows: List[Tuple], path: str) -> int:
+    """Encode rows into one columnar file; returns its size in bytes"""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(_arrow_table(columns, rows), path, compression='zstd')
+    elif fmt == 'arrow':
+        import pyarrow as pa
+        table = _arrow_table(columns, rows)
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    else:
+        arrays = {}
+        for i, (expr, kind) in enumerate(columns):
+            arrays.update(_npz_arrays(column_name(expr), kind, [row[i] for row in rows]))
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+    return os.path.getsize(path)
+
+
+def load_npz(path) -> Dict[str, np.ndarray]:
+    """Read an .npz part back; columns with NULLs come back as masked arrays"""
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    return {
+        name: np.ma.masked_array(values, mask=arrays[f'{name}.null']) if f'{name}.null' in arrays else values
+        for name, values in arrays.items() if not name.endswith('.null')
+    }
+
+
+def default_format() -> str:
+    return 'parquet' if importlib.util.find_spec('pyarrow') else 'npz'
+
+
+# ==================== CHANGE DETECTION ====================
+
+def partition_checksums(cursor, table: Table) -> Dict[str, List[int]]:
+    """month (or 'all') -> [rows, checksum] over every source table"""
+    row_text = ', '.join(expr for expr, _ in table.columns)
+    checksums = {}
+    for source in table.sources:
+        cursor.execute(f"""
+            SELECT {_partition_expr(table)} AS part, COUNT(*), BIT_XOR(CRC32(CONCAT_WS('|', {row_text})))
+            FROM {source}
+            GROUP BY part
+        """)
+        for part, rows, checksum in cursor.fetchall():
+            if part is None:
+                continue  # NULL partition column
+            total = checksums.setdefault(part, [0, 0])
+            total[0] += int(rows)
+            total[1] ^= int(checksum or 0)
+    return checksums
+
+
+def changed_partitions(previous: Dict[str, Dict], current: Dict[str, List[int]]) -> Tuple[List[str], List[str]]:
+    """(partitions to export, partitions to remove) given the manifest entries of the last run"""
+    changed = sorted(part for part, checksum in current.items()
+                     if (previous.get(part) or {}).get('checksum') != checksum)
+    removed = sorted(part for part in previous if part not in current)
+    return changed, removed
+
+
+def month_ranges(months: List[str]) -> List[Tuple[date, date]]:
+    """'YYYY-MM' months as sorted [start, end) date ranges, adjacent months merged"""
+    ranges = []
+    for month in sorted(months):
+        year, mon = map(int, month.split('-'))
+        start = date(year, mon, 1)
+        end = date(year + mon // 12, mon % 12 + 1, 1)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+# ==================== EXPORT ====================
+
+def partition_dir(out: Path, name: str, part: str) -> Path:
+    return out / name if part == 'all' else out / name / f'month={part}'
+
+
+def _staging(target: Path) -> Path:
+    return target.with_name(target.name + '.staging')
+
+
+def _swap_in(target: Path):
+    """Replace target with its staging directory; the old copy is removed afterwards"""
+    staging, old = _staging(target), target.with_name(target.name + '.old')
+    staging.mkdir(parents=True, exist_ok=True)  # rows may have vanished since the checksum
+    if target.exists():
+        target.rename(old)
+    staging.rename(target)
+    if old.exists():
+        shutil.rmtree(old)
+
+
+class _PartitionWriter:
+    """Buffers streamed rows per partition and hands full parts to the process pool"""
+
+    def __init__(self, pool, fmt: str, out: Path, name: str, table: Table, rows_per_file: int,
+                 max_buffered: int, max_pending: int):
+        self.pool = pool
+        self.fmt = fmt
+        self.out = out
+        self.name = name
+        self.table = table
+        self.rows_per_file = rows_per_file
+        self.max_buffered = max_buffered
+        self.max_pending = max_pending
+        self.buffers: Dict[str, List[Tuple]] = {}
+        self.buffered = 0
+        self.files: Dict[str, int] = {}
+        self.rows: Dict[str, int] = {}
+        self.pending = set()
+        self.bytes = 0
+
+    def add(self, part: str, row: Tuple):
+        buffer = self.buffers.setdefault(part, [])
+        buffer.append(row)
+        self.buffered += 1
+        if len(buffer) >= self.rows_per_file:
+            self.flush(part)
+        elif self.buffered >= self.max_buffered:
+            # Rows of many months interleave; cap memory by writing the largest buffer early
+            self.flush(max(self.buffers, key=lambda p: len(self.buffers[p])))
+
+    def flush(self, part: str):
+        rows = self.buffers.pop(part, [])
+        if not rows:
+            return
+        self.buffered -= len(rows)
+        self.rows[part] = self.rows.get(part, 0) + len(rows)
+        number = self.files.get(part, 0)
+        self.files[part] = number + 1
+        staging = _staging(partition_dir(self.out, self.name, part))
+        if number == 0 and staging.exists():
+            shutil.rmtree(staging)  # left over from an interrupted run
+        staging.mkdir(parents=True, exist_ok=True)
+        path = staging / f'part-{number:05d}.{EXTENSIONS[self.fmt]}'
+        while len(self.pending) >= self.max_pending:
+            self._collect(wait(self.pending, return_when=FIRST_COMPLETED).done)
+        self.pending.add(self.pool.submit(write_part, self.fmt, self.table.columns, rows, str(path)))
+
+    def finish(self):
+        for part in list(self.buffers):
+            self.flush(part)
+        self._collect(wait(self.pending).done)
+
+    def _collect(self, done):
+        for future in done:
+            self.bytes += future.result()  # re-raises a worker's error
+        self.pending -= done
+
+
+def _stream(conn, table: Table, changed: List[str], writer: _PartitionWriter, chunk_size: int) -> int:
+    where, params = '', []
+    if table.partition_by:
+        ranges = month_ranges(changed)
+        where = 'WHERE ' + ' OR '.join(
+            f"({table.partition_by} >= %s AND {table.partition_by} < %s)" for _ in ranges)
+        params = [bound for start_end in ranges for bound in start_end]
+    streamed = 0
+    for source in table.sources:
+        cursor = conn.cursor()  # unbuffered: rows arrive as they are fetched
+        cursor.execute(f"SELECT {_select_list(table)}, {_partition_expr(table)} FROM {source} {where}", params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for row in chunk:
+                writer.add(row[-1], row[:-1])
+            streamed += len(chunk)
+        cursor.close()
+    return streamed
+
+
+def export_table(conn, pool, out: Path, name: str, previous: Dict, fmt: str, options: Dict) -> Tuple[Dict, Dict]:
+    """Export the changed partitions of one table; returns (manifest entries, stats)"""
+    table = TABLES[name]
+    cursor = conn.cursor()
+    checksums = partition_checksums(cursor, table)
+    cursor.close()
+    conn.commit()
+
+    changed, removed = changed_partitions(previous, checksums)
+    manifest = {part: entry for part, entry in previous.items() if part in checksums}
+    stats = {'partitions': len(checksums), 'exported': len(changed), 'removed': len(removed), 'rows': 0, 'bytes': 0}
+
+    if changed:
+        writer = _PartitionWriter(pool, fmt, out, name, table, options['rows_per_file'],
+                                  options['max_buffered'], options['workers'] * 2)
+        stats['rows'] = _stream(conn, table, changed, writer, options['chunk_size'])
+        writer.finish()
+        conn.commit()
+        stats['bytes'] = writer.bytes
+        for part in changed:
+            _swap_in(partition_dir(out, name, part))
+            manifest[part] = {'rows': writer.rows.get(part, 0), 'files': writer.files.get(part, 0),
+                              'checksum': checksums[part]}
+    for part in removed:
+        shutil.rmtree(partition_dir(out, name, part), ignore_errors=True)
+    return manifest, stats
+
+
+def _read_manifest(out: Path) -> Dict:
+    path = out / MANIFEST
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(out: Path, manifest: Dict):
+    tmp = out / (MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, out / MANIFEST)
+
+
+def export(out, fmt: Optional[str] = None, tables: Optional[List[str]] = None, full: bool = False,
+           workers: Optional[int] = None, rows_per_file: int = 250000, chunk_size: int = 20000,
+           max_buffered: int = 1000000, log=None) -> Dict:
+    """
+    Bring the snapshot in `out` up to date. Returns stats per table and the
+    elapsed seconds. A different format than last time implies `full`.
+    """
+    started = time.perf_counter()
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    fmt = fmt or default_format()
+    options = {'workers': workers or os.cpu_count() or 2, 'rows_per_file': rows_per_file,
+               'chunk_size': chunk_size, 'max_buffered': max_buffered}
+
+    manifest = _read_manifest(out)
+    if full or manifest.get('format') != fmt:
+        manifest = {}
+    manifest['format'] = fmt
+    manifest['columns'] = {name: {column_name(expr): kind for expr, kind in TABLES[name].columns} for name in TABLES}
+    manifest.setdefault('tables', {})
+
+    results = {}
+    with ProcessPoolExecutor(options['workers']) as pool, DatabaseConnection.get_connection() as conn:
+        for name in tables or list(TABLES):
+            table_started = time.perf_counter()
+            entries, stats = export_table(conn, pool, out, name, manifest['tables'].get(name, {}), fmt, options)
+            manifest['tables'][name] = entries
+            _write_manifest(out, manifest)  # an interrupted run keeps the tables already done
+            stats['seconds'] = round(time.perf_counter() - table_started, 2)
+            results[name] = stats
+            if log:
+                log(f"  {name:<14} {stats['exported']:>3}/{stats['partitions']} partitions, "
+                    f"{stats['rows']:>12,} rows, {stats['bytes'] / 1e6:>9,.1f} MB"
+                    + (f", {stats['removed']} removed" if stats['removed'] else ''))
+
+    manifest['exported_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    _write_manifest(out, manifest)
+    results['seconds'] = round(time.perf_counter() - started, 2)
+    return results
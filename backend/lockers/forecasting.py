@@ -0,0 +1,217 @@
+"""
+Demand Forecasting for LockSpot - Raw SQL + numpy
+Hourly occupancy curves and next-week peak utilization per (location, size)
+(run by `python manage.py forecast_demand`, e.g. nightly from cron)
+
+Booking intervals of the last few weeks are streamed from an unbuffered
+cursor in chunks of plain integers (locker id, start and end in seconds from
+the window start) and folded into per-group arrays right away, so memory
+stays at groups x hours no matter how many bookings there are:
+
+- Occupancy is exact interval arithmetic on a difference array: every
+  booking adds +1 at its first hour and -1 at its last, minus the part of
+  the first hour before it starts and plus the part of the last hour it
+  still covers. One np.bincount per term and chunk, then a cumulative sum,
+  gives occupied locker-hours for every hour of every group.
+- The demand model is additive hour-of-week seasonality on top of a linear
+  trend in the weekly mean, fitted for all groups at once.
+
+The window ends at local midnight today and spans whole weeks, so slot k of
+the forecast is today + k hours. Results replace lockers_demandforecast,
+which the admin and GET /api/forecasts/ read.
+"""
+
+import time
+from itertools import chain
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Tuple
+
+import numpy as np
+from django.utils import timezone
+
+from db_utils import DatabaseConnection
+
+
+HOURS_PER_WEEK = 168
+OCCUPYING_STATUSES = ('Confirmed', 'Active', 'Completed', 'Expired')
+
+_STATUS_LIST = ", ".join(f"'{s}'" for s in OCCUPYING_STATUSES)
+
+# Lockers that can be booked, grouped by (location, size)
+LOCKER_GROUPS = """
+    SELECT id, location_id, size, status <> 'OutOfService' AS bookable
+    FROM lockers_lockerunit
+"""
+
+# Whole seconds from the window start (stored values and parameters are both UTC)
+BOOKING_INTERVALS = f"""
+    SELECT locker_id, TIMESTAMPDIFF(SECOND, %s, start_time), TIMESTAMPDIFF(SECOND, %s, end_time)
+    FROM {{table}}
+    WHERE status IN ({_STATUS_LIST}) AND start_time < %s AND end_time > %s
+"""
+
+SOURCE_TABLES = ('lockers_booking', 'lockers_bookingarchive')
+
+
+# ==================== OCCUPANCY ====================
+
+class OccupancyAccumulator:
+    """Occupied locker-hours per group per hour, fed chunk by chunk"""
+
+    def __init__(self, groups: int, hours: int):
+        self.groups = groups
+        self.hours = hours
+        width = groups * (hours + 1)  # one spare slot per group for intervals ending at the window end
+        self._starts = np.zeros(width)  # +1/-1 at the first/last hour, cumulated
+        self._partial = np.zeros(width)  # fractions of the first/last hour, per hour
+        self.intervals = 0
+
+    def add(self, group: np.ndarray, start: np.ndarray, end: np.ndarray):
+        """Add intervals [start, end), in hours from the window start, for the given group indexes"""
+        start = np.clip(start, 0, self.hours)
+        end = np.clip(end, 0, self.hours)
+        keep = end > start
+        group, start, end = group[keep], start[keep], end[keep]
+
+        first = np.floor(start).astype(np.int64)
+        last = np.floor(end).astype(np.int64)
+        base = group * (self.hours + 1)
+        width = self._starts.size
+        self._starts += np.bincount(base + first, minlength=width)
+        self._starts -= np.bincount(base + last, minlength=width)
+        self._partial -= np.bincount(base + first, weights=start - first, minlength=width)
+        self._partial += np.bincount(base + last, weights=end - last, minlength=width)
+        self.intervals += int(keep.sum())
+
+    def curves(self) -> np.ndarray:
+        """(groups, hours) array of occupied locker-hours"""
+        shape = (self.groups, self.hours + 1)
+        full = np.cumsum(self._starts.reshape(shape), axis=1)
+        return (full + self._partial.reshape(shape))[:, :self.hours]
+
+
+# ==================== DEMAND MODEL ====================
+
+def fit_forecast(curves: np.ndarray, capacity: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Forecast the week after `curves` (groups x whole weeks of hourly occupied
+    lockers): hour-of-week seasonality plus a linear trend in the weekly mean,
+    capped at capacity. Returns per-group arrays, utilization as 0-1 fractions.
+    """
+    groups = curves.shape[0]
+    weeks = curves.shape[1] // HOURS_PER_WEEK
+    by_week = curves[:, -weeks * HOURS_PER_WEEK:].reshape(groups, weeks, HOURS_PER_WEEK)
+
+    level = by_week.mean(axis=2)
+    x = np.arange(weeks) - (weeks - 1) / 2
+    slope = (level - level.mean(axis=1, keepdims=True)) @ x / (x @ x) if weeks > 1 else np.zeros(groups)
+    season = (by_week - level[:, :, None]).mean(axis=1)
+    next_level = level.mean(axis=1) + slope * (weeks - (weeks - 1) / 2)
+
+    forecast = np.clip(next_level[:, None] + season, 0, capacity[:, None])
+    safe = np.where(capacity > 0, capacity, 1)[:, None]
+    utilization = forecast / safe
+    peak_hour = utilization.argmax(axis=1)
+    return {
+        'hourly': utilization,
+        'peak': utilization[np.arange(groups), peak_hour],
+        'peak_hour': peak_hour,
+        'average': utilization.mean(axis=1),
+        'last_week_peak': (by_week[:, -1, :] / safe).max(axis=1),
+        'trend': slope,
+    }
+
+
+# ==================== RUN ====================
+
+def forecast_window(weeks: int, now=None) -> Tuple[datetime, datetime]:
+    """(start, end) in UTC: `weeks` whole weeks ending at local midnight today"""
+    local = timezone.localtime(now)
+    end = local.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(dt_timezone.utc)
+    return end - timedelta(weeks=weeks), end
+
+
+def _locker_groups(cursor):
+    """(group index per locker id, (location_id, size) per group, bookable lockers per group)"""
+    cursor.execute(LOCKER_GROUPS)
+    rows = cursor.fetchall()
+    keys = sorted({(location_id, size) for _, location_id, size, _ in rows})
+    index = {key: i for i, key in enumerate(keys)}
+    group_of = np.full(max((row[0] for row in rows), default=0) + 1, -1, dtype=np.int64)
+    capacity = np.zeros(len(keys))
+    for locker_id, location_id, size, bookable in rows:
+        group_of[locker_id] = index[(location_id, size)]
+        capacity[index[(location_id, size)]] += bookable
+    return group_of, keys, capacity
+
+
+def _stream(conn, accumulator, group_of, start, end, chunk_size, log) -> int:
+    naive_start, naive_end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    rows = 0
+    for table in SOURCE_TABLES:
+        cursor = conn.cursor()  # unbuffered: rows arrive as they are fetched
+        cursor.execute(BOOKING_INTERVALS.format(table=table), (naive_start, naive_start, naive_end, naive_start))
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            # Flattened straight into one buffer: several times faster than np.array(chunk)
+            data = np.fromiter(chain.from_iterable(chunk), dtype=np.int64, count=3 * len(chunk)).reshape(-1, 3)
+            locker = data[:, 0]
+            known = locker < group_of.size  # lockers added after the groups were read
+            group = group_of[locker[known]]
+            mapped = group >= 0
+            accumulator.add(group[mapped], data[known, 1][mapped] / 3600, data[known, 2][mapped] / 3600)
+            rows += len(chunk)
+            if log and rows % (chunk_size * 10) == 0:
+                log(f"  ... {rows:,} bookings")
+        cursor.close()
+    return rows
+
+
+def _save(conn, keys, capacity, result, end, weeks):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM lockers_demandforecast")
+    now = datetime.now(dt_timezone.utc).replace(tzinfo=None)
+    forecast_start = end.replace(tzinfo=None)
+    rows = [
+        (location_id, size, int(capacity[g]), weeks, forecast_start,
+         float(result['peak'][g]), forecast_start + timedelta(hours=int(result['peak_hour'][g])),
+         float(result['average'][g]), float(result['last_week_peak'][g]), float(result['trend'][g]),
+         '[' + ','.join(f'{u:.4f}' for u in result['hourly'][g]) + ']', now)
+        for g, (location_id, size) in enumerate(keys) if capacity[g] > 0
+    ]
+    cursor.executemany("""
+        INSERT INTO lockers_demandforecast
+            (location_id, size, lockers, history_weeks, forecast_start, peak_utilization, peak_at,
+             avg_utilization, last_week_peak, weekly_trend, hourly, computed_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, rows)
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+
+def run(weeks: int = 8, chunk_size: int = 200000, log=None) -> Dict:
+    """Recompute every forecast from the last `weeks` weeks of bookings; returns counts and seconds"""
+    started = time.perf_counter()
+    start, end = forecast_window(weeks)
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor()
+        group_of, keys, capacity = _locker_groups(cursor)
+        cursor.close()
+
+        accumulator = OccupancyAccumulator(len(keys), weeks * HOURS_PER_WEEK)
+        bookings = _stream(conn, accumulator, group_of, start, end, chunk_size, log)
+        loaded = time.perf_counter() - started
+
+        result = fit_forecast(accumulator.curves(), capacity)
+        forecasts = _save(conn, keys, capacity, result, end, weeks)
+
+    return {
+        'bookings': bookings,
+        'forecasts': forecasts,
+        'load_seconds': round(loaded, 2),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
@@ -0,0 +1,36 @@
+"""
+Deliver booking side effects (notifications, audit log, QR codes) from the
+transactional outbox. Run it as a long-lived worker, e.g. under systemd or
+supervisor:
+
+    cd /srv/lockspot/backend && python manage.py dispatch_outbox
+
+or drain whatever is due from cron instead:
+
+    * * * * * cd /srv/lockspot/backend && python manage.py dispatch_outbox --once
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.outbox import BATCH_SIZE, dispatch
+
+
+class Command(BaseCommand):
+    help = 'Drain the booking outbox in batches (at-least-once, per-handler retries)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--once', action='store_true', help='Stop as soon as no event is due')
+        parser.add_argument('--idle-seconds', type=float, default=1.0,
+                            help='Poll interval while the outbox is empty')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        stats = dispatch(batch_size=options['batch_size'], once=options['once'],
+                         idle_seconds=options['idle_seconds'], log=self.stdout.write)
+        seconds = stats['seconds']
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['done']:,} events delivered, {stats['retried']:,} to retry in {seconds:.2f}s "
+            f"({stats['events'] / seconds if seconds else 0:,.0f} events/s)"
+        ))
@@ -0,0 +1,29 @@
+"""
+Recompute the next-week demand forecasts per location and locker size from
+recent bookings. Schedule it nightly, e.g. from cron:
+
+    30 0 * * * cd /srv/lockspot/backend && python manage.py forecast_demand
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lockers.forecasting import run
+
+
+class Command(BaseCommand):
+    help = 'Forecast next-week hourly locker utilization per location and size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=8, help='Weeks of booking history to fit on')
+        parser.add_argument('--chunk-size', type=int, default=200000,
+                            help='Bookings fetched from the cursor per chunk')
+
+    def handle(self, *args, **options):
+        if options['weeks'] < 1:
+            raise CommandError('--weeks must be at least 1')
+        stats = run(weeks=options['weeks'], chunk_size=options['chunk_size'], log=self.stdout.write)
+        seconds = stats['seconds']
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['forecasts']:,} forecasts from {stats['bookings']:,} bookings in {seconds:.2f}s "
+            f"(loaded in {stats['load_seconds']:.2f}s, {stats['bookings'] / seconds if seconds else 0:,.0f} bookings/s)"
+        ))
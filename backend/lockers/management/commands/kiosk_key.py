@@ -0,0 +1,35 @@
+"""
+Print the X-Kiosk-Key for the kiosks of one or more locations, to provision
+them:
+
+    python manage.py kiosk_key 3 4
+
+A key only gives access to its own location's sync, scans and usage reports.
+Keys are derived from KIOSK_API_KEY; changing it replaces every key.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.kiosk_sync import kiosk_key
+from lockers.models import LockerLocation
+
+
+class Command(BaseCommand):
+    help = 'Print the kiosk key of each given location'
+
+    def add_arguments(self, parser):
+        parser.add_argument('location_ids', nargs='+', type=int)
+
+    def handle(self, *args, **options):
+        if not settings.KIOSK_API_KEY:
+            raise CommandError('KIOSK_API_KEY is not set')
+
+        location_ids = options['location_ids']
+        names = dict(LockerLocation.objects.filter(id__in=location_ids).values_list('id', 'name'))
+        missing = [str(i) for i in location_ids if i not in names]
+        if missing:
+            raise CommandError(f"Unknown location(s): {', '.join(missing)}")
+
+        for location_id in location_ids:
+            self.stdout.write(f"{names[location_id]}: {kiosk_key(settings.KIOSK_API_KEY, location_id)}")
@@ -0,0 +1,31 @@
+"""
+Refresh the reporting rollup tables from the bookings and reviews changed
+since the last run. Schedule it, e.g. every 5 minutes from cron:
+
+    */5 * * * * cd /srv/lockspot/backend && python manage.py refresh_rollups
+"""
+
+from django.core.management.base import BaseCommand
+
+from lockers.rollups import refresh
+
+
+class Command(BaseCommand):
+    help = 'Incrementally refresh the reporting rollups (daily revenue, location stats, customer activity)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild every rollup from scratch, archived bookings included')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--overlap-seconds', type=int, default=300,
+                            help='Re-read this much before the previous watermark (late commits)')
+
+    def handle(self, *args, **options):
+        stats = refresh(full=options['full'], batch_size=options['batch_size'],
+                        overlap_seconds=options['overlap_seconds'], log=self.stdout.write)
+        seconds = stats.pop('seconds')
+        rows = sum(stats.values())
+        summary = ', '.join(f"{count:,} {source.replace('_', ' ')}" for source, count in stats.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollups refreshed in {seconds:.2f}s: {summary} ({rows / seconds if seconds else 0:,.0f} rows/s)"
+        ))
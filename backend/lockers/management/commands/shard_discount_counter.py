@@ -0,0 +1,46 @@
+"""
+Spread the usage counter of a hot discount code over N rows, so concurrent
+redemptions stop queueing on one row lock (api/discounts.py):
+
+    python manage.py shard_discount_counter LAUNCH50 --shards 8
+
+Uses recorded so far are kept and the remaining max_uses budget is split
+across the slots. --shards 0 folds the slots back into the single counter
+once the campaign has calmed down.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.discounts import enable_sharded_counter, get_discount_usage
+from db_utils import DatabaseConnection
+
+
+class Command(BaseCommand):
+    help = 'Split (or fold back) the usage counter of a discount code'
+
+    def add_arguments(self, parser):
+        parser.add_argument('code')
+        parser.add_argument('--shards', type=int, required=True,
+                            help='Number of counter slots; 0 returns to a single counter')
+
+    def handle(self, *args, **options):
+        shards = options['shards']
+        if not 0 <= shards <= 64:
+            raise CommandError('--shards must be between 0 and 64')
+
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, max_uses FROM lockers_discount WHERE code = %s", (options['code'],))
+            discount = cursor.fetchone()
+            if not discount:
+                raise CommandError(f"Discount code {options['code']} not found")
+
+            enable_sharded_counter(cursor, discount['id'], shards)
+            uses = get_discount_usage(cursor, discount['id'])
+            cursor.close()
+
+        limit = discount['max_uses'] if discount['max_uses'] is not None else 'unlimited'
+        layout = f'{shards} counter slots' if shards else 'a single counter'
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['code']} now uses {layout} ({uses:,} of {limit} uses recorded)"
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DiscountUsageShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('uses', models.IntegerField(default=0)),
+                ('max_uses', models.IntegerField(blank=True, null=True)),
+                ('discount', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_shards', to='lockers.discount')),
+            ],
+            options={
+                'verbose_name': 'Discount Usage Shard',
+                'verbose_name_plural': 'Discount Usage Shards',
+                'unique_together': {('discount', 'slot')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_qr_location(apps, schema_editor):
+    QRAccessCode = apps.get_model('lockers', 'QRAccessCode')
+    Booking = apps.get_model('lockers', 'Booking')
+    location = Booking.objects.filter(pk=OuterRef('booking_id')).values('locker__location_id')[:1]
+    QRAccessCode.objects.filter(location__isnull=True).update(location_id=Subquery(location))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0002_discount_usage_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qraccesscode',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='qr_codes', to='lockers.lockerlocation'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['locker', 'updated_at'], name='idx_booking_locker_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='qraccesscode',
+            index=models.Index(fields=['location', 'expires_at'], name='idx_qr_location_expires'),
+        ),
+        migrations.RunPython(backfill_qr_location, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0003_kiosk_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='qraccesscode',
+            index=models.Index(fields=['generated_at'], name='idx_qr_generated'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0004_qr_generated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('booking_id', models.IntegerField(unique=True)),
+                ('method_id', models.IntegerField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_date', models.DateTimeField()),
+                ('transaction_reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Success', 'Success'), ('Failed', 'Failed'), ('Refunded', 'Refunded'), ('PartialRefund', 'Partial Refund')], max_length=15)),
+                ('failure_reason', models.CharField(blank=True, max_length=255, null=True)),
+                ('refund_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('refund_date', models.DateTimeField(blank=True, null=True)),
+                ('processed_by', models.CharField(blank=True, max_length=50, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived Payment',
+                'verbose_name_plural': 'Archived Payments',
+            },
+        ),
+        migrations.CreateModel(
+            name='QRAccessCodeArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('booking_id', models.IntegerField(db_index=True)),
+                ('location_id', models.IntegerField(blank=True, null=True)),
+                ('code', models.CharField(max_length=255)),
+                ('code_type', models.CharField(choices=[('Unlock', 'Unlock'), ('Lock', 'Lock'), ('Emergency', 'Emergency')], max_length=15)),
+                ('generated_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('used_at', models.DateTimeField(blank=True, null=True)),
+                ('is_used', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived QR Access Code',
+                'verbose_name_plural': 'Archived QR Access Codes',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField()),
+                ('locker_id', models.IntegerField()),
+                ('discount_id', models.IntegerField(blank=True, null=True)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('booking_type', models.CharField(choices=[('Storage', 'Storage'), ('Delivery', 'Delivery')], max_length=10)),
+                ('subtotal_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Confirmed', 'Confirmed'), ('Active', 'Active'), ('Completed', 'Completed'), ('Cancelled', 'Cancelled'), ('Expired', 'Expired')], max_length=15)),
+                ('cancellation_reason', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived Booking',
+                'verbose_name_plural': 'Archived Bookings',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user_id', 'created_at'], name='idx_booking_archive_user')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField()),
+                ('title', models.CharField(max_length=100)),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('Booking', 'Booking'), ('Payment', 'Payment'), ('Reminder', 'Reminder'), ('Promo', 'Promotional'), ('System', 'System'), ('Security', 'Security')], max_length=15)),
+                ('related_booking_id', models.IntegerField(blank=True, null=True)),
+                ('is_read', models.BooleanField(default=False)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived Notification',
+                'verbose_name_plural': 'Archived Notifications',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user_id', 'created_at'], name='idx_notification_archive_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0005_booking_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupBookingFact',
+            fields=[
+                ('booking_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField()),
+                ('location_id', models.IntegerField()),
+                ('booking_date', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('status', models.CharField(max_length=15)),
+                ('subtotal_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('rating', models.PositiveSmallIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Rollup Booking Fact',
+                'verbose_name_plural': 'Rollup Booking Facts',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupCustomerActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField(unique=True)),
+                ('bookings', models.IntegerField(default=0)),
+                ('completed_bookings', models.IntegerField(default=0)),
+                ('cancelled_bookings', models.IntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_booking_at', models.DateTimeField(blank=True, null=True)),
+                ('reviews', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Customer Activity',
+                'verbose_name_plural': 'Customer Activity',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupDailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('location_id', models.IntegerField()),
+                ('bookings', models.IntegerField(default=0)),
+                ('unique_customers', models.IntegerField(default=0)),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discounts', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue',
+                'verbose_name_plural': 'Daily Revenue',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupLocationStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_id', models.IntegerField(unique=True)),
+                ('total_lockers', models.IntegerField(default=0)),
+                ('available_lockers', models.IntegerField(default=0)),
+                ('booked_lockers', models.IntegerField(default=0)),
+                ('maintenance_lockers', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('completed_bookings', models.IntegerField(default=0)),
+                ('cancelled_bookings', models.IntegerField(default=0)),
+                ('booking_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('reviews', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Location Stats',
+                'verbose_name_plural': 'Location Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Rollup State',
+                'verbose_name_plural': 'Rollup State',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='idx_booking_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['updated_at'], name='idx_review_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='rollupbookingfact',
+            index=models.Index(fields=['booking_date', 'location_id', 'user_id'], name='idx_rollup_fact_day'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rollupdailyrevenue',
+            unique_together={('day', 'location_id')},
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0006_reporting_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDiscountImpact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('discount_id', models.IntegerField(unique=True)),
+                ('bookings', models.IntegerField(default=0)),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discounts', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Discount Impact',
+                'verbose_name_plural': 'Discount Impact',
+            },
+        ),
+        migrations.AddField(
+            model_name='rollupbookingfact',
+            name='discount_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rollupbookingfact',
+            name='end_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rollupbookingfact',
+            name='start_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RollupHourlyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_id', models.IntegerField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('bookings', models.IntegerField(default=0)),
+                ('booked_minutes', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Hourly Occupancy',
+                'verbose_name_plural': 'Hourly Occupancy',
+                'unique_together': {('location_id', 'hour')},
+            },
+        ),
+        # Drop the watermarks so the next refresh re-reads every booking and
+        # backfills the new rollups (existing totals net out unchanged)
+        migrations.RunSQL('DELETE FROM lockers_rollupstate', migrations.RunSQL.noop),
+    ]
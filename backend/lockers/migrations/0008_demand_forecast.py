@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0007_dashboard_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(choices=[('Small', 'Small'), ('Medium', 'Medium'), ('Large', 'Large')], max_length=10)),
+                ('lockers', models.IntegerField()),
+                ('history_weeks', models.IntegerField()),
+                ('forecast_start', models.DateTimeField()),
+                ('peak_utilization', models.FloatField()),
+                ('peak_at', models.DateTimeField()),
+                ('avg_utilization', models.FloatField()),
+                ('last_week_peak', models.FloatField()),
+                ('weekly_trend', models.FloatField(help_text='Change in average occupied lockers per week')),
+                ('hourly', models.JSONField(help_text='Forecast utilization for each hour from forecast_start')),
+                ('computed_at', models.DateTimeField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='lockers.lockerlocation')),
+            ],
+            options={
+                'verbose_name': 'Demand Forecast',
+                'verbose_name_plural': 'Demand Forecasts',
+                'ordering': ['-peak_utilization'],
+                'unique_together': {('location', 'size')},
+            },
+        ),
+    ]
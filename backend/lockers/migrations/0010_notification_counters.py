@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0009_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Notification Counter',
+                'verbose_name_plural': 'Notification Counters',
+            },
+        ),
+        # Start from the unread notifications already there
+        migrations.RunSQL(
+            """
+            INSERT INTO lockers_notificationcounter (user_id, unread)
+            SELECT user_id, COUNT(*) FROM lockers_notification WHERE is_read = 0 GROUP BY user_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
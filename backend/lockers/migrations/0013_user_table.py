@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0012_refresh_tokens'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AlterModelTable(
+            name='user',
+            table='auth_user',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lockers', '0013_user_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100)),
+                ('total', models.IntegerField()),
+                ('processed', models.IntegerField(default=0)),
+                ('changed', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('Running', 'Running'), ('Done', 'Done'), ('Failed', 'Failed')], default='Running', max_length=10)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(help_text='Last progress report of the worker thread')),
+            ],
+            options={
+                'verbose_name': 'Bulk Job',
+                'verbose_name_plural': 'Bulk Jobs',
+            },
+        ),
+    ]
@@ -206,6 +206,7 @@ class Discount(models.Model):
     valid_to = models.DateTimeField()
     max_uses = models.IntegerField(null=True, blank=True)
     current_uses = models.IntegerField(default=0)
+    counter_shards = models.PositiveSmallIntegerField(default=0)  # 0 = single-row counter
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -230,6 +231,22 @@ class Discount(models.Model):
         return True
 
 
+class DiscountUsageShard(models.Model):
+    """Counter slot for hot discount codes (summed with current_uses on read)"""
+    discount = models.ForeignKey(Discount, on_delete=models.CASCADE, related_name='usage_shards')
+    slot = models.PositiveSmallIntegerField()
+    uses = models.IntegerField(default=0)
+    max_uses = models.IntegerField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Discount Usage Shard'
+        verbose_name_plural = 'Discount Usage Shards'
+        unique_together = ['discount', 'slot']
+    
+    def __str__(self):
+        return f"{self.discount.code} slot {self.slot}: {self.uses}"
+
+
 # ==================== BOOKING MODEL ====================
 
 class Booking(models.Model):
@@ -265,6 +282,16 @@ class Booking(models.Model):
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
         ordering = ['-created_at']
+        indexes = [
+            # Kiosk sync deltas: changed bookings per locker
+            models.Index(fields=['locker', 'updated_at'], name='idx_booking_locker_updated'),
+            # Rollup refresh high-watermark (lockers/rollups.py)
+            models.Index(fields=['updated_at'], name='idx_booking_updated'),
+            # A user's bookings newest first, with and without a status filter
+            # (api/hot_queries.booking_list_query), read in index order
+            models.Index(fields=['user', 'created_at'], name='idx_booking_user_created'),
+            models.Index(fields=['user', 'status', 'created_at'], name='idx_booking_user_st_created'),
+        ]
     
     def __str__(self):
         return f"Booking #{self.id} - {self.user.email} at {self.locker.location.name}"
@@ -353,6 +380,9 @@ class Review(models.Model):
         verbose_name = 'Review'
         verbose_name_plural = 'Reviews'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['updated_at'], name='idx_review_updated'),
+        ]
     
     def __str__(self):
         return f"Review by {self.booking.user.email} - {self.rating}★"
@@ -369,6 +399,9 @@ class QRAccessCode(models.Model):
         EMERGENCY = 'Emergency', 'Emergency'
     
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='qr_codes')
+    # Denormalized from booking.locker.location for per-station kiosk sync
+    location = models.ForeignKey(LockerLocation, on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='qr_codes')
     code = models.CharField(max_length=255, unique=True)
     code_type = models.CharField(max_length=15, choices=CodeType.choices, default=CodeType.UNLOCK)
     generated_at = models.DateTimeField(auto_now_add=True)
@@ -379,6 +412,10 @@ class QRAccessCode(models.Model):
     class Meta:
         verbose_name = 'QR Access Code'
         verbose_name_plural = 'QR Access Codes'
+        indexes = [
+            models.Index(fields=['location', 'expires_at'], name='idx_qr_location_expires'),
+            models.Index(fields=['generated_at'], name='idx_qr_generated'),
+        ]
     
     def __str__(self):
         return f"QR {self.code_type} for Booking #{self.booking.id}"
@@ -410,11 +447,29 @@ class Notification(models.Model):
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Latest notifications of a user without a filesort
+            models.Index(fields=['user', 'created_at'], name='idx_notification_user_created'),
+        ]
     
     def __str__(self):
         return f"{self.notification_type}: {self.title}"
 
 
+class NotificationCounter(models.Model):
+    """Unread live notifications per user, kept in step by api/notifications.py"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Notification Counter'
+        verbose_name_plural = 'Notification Counters'
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
 # ==================== AUDIT LOG ====================
 
 class AuditLog(models.Model):
@@ -436,3 +491,358 @@ class AuditLog(models.Model):
     
     def __str__(self):
         return f"{self.action} by {self.user or 'System'}"
+
+
+# ==================== OUTBOX ====================
+
+class OutboxEvent(models.Model):
+    """Booking side effects pending delivery, written with the booking (api/outbox.py)"""
+    
+    class Status(models.TextChoices):
+        PENDING = 'Pending', 'Pending'
+        DONE = 'Done', 'Done'
+        FAILED = 'Failed', 'Failed'
+    
+    event_type = models.CharField(max_length=50)
+    booking_id = models.IntegerField(db_index=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.IntegerField(default=0)
+    done_handlers = models.JSONField(default=list, help_text='Handlers already applied to this event')
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='idx_outbox_due'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} for Booking #{self.booking_id} ({self.status})"
+
+
+# ==================== AUTH TOKENS ====================
+
+class RefreshToken(models.Model):
+    """Opaque refresh token (only its SHA-256 is stored), rotated on every use (api/authentication.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Refresh Token'
+        verbose_name_plural = 'Refresh Tokens'
+        indexes = [
+            models.Index(fields=['user', 'revoked_at'], name='idx_refresh_user'),
+            models.Index(fields=['created_at'], name='idx_refresh_created'),
+        ]
+    
+    def __str__(self):
+        return f"Refresh token #{self.id} for user {self.user_id}"
+
+
+# ==================== ADMIN BULK JOBS ====================
+
+class BulkJob(models.Model):
+    """Progress of a large admin bulk action run in the background (lockers/bulk_actions.py)"""
+
+    class Status(models.TextChoices):
+        RUNNING = 'Running', 'Running'
+        DONE = 'Done', 'Done'
+        FAILED = 'Failed', 'Failed'
+
+    label = models.CharField(max_length=100)
+    total = models.IntegerField()
+    processed = models.IntegerField(default=0)
+    changed = models.IntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(help_text='Last progress report of the worker thread')
+
+    class Meta:
+        verbose_name = 'Bulk Job'
+        verbose_name_plural = 'Bulk Jobs'
+
+    def __str__(self):
+        return f"{self.label} ({self.processed}/{self.total}, {self.status})"
+
+
+# ==================== ARCHIVE ====================
+# Finished bookings older than the retention window are moved here in batches
+# by scripts/maintenance/archive_bookings.py, together with their payments,
+# QR codes and notifications. Same columns as the live tables (ids are kept),
+# plus archived_at; no foreign keys so the live rows can be deleted.
+
+class BookingArchive(models.Model):
+    """Archived Completed/Cancelled/Expired booking"""
+    id = models.IntegerField(primary_key=True)
+    user_id = models.IntegerField()
+    locker_id = models.IntegerField()
+    discount_id = models.IntegerField(null=True, blank=True)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    booking_type = models.CharField(max_length=10, choices=Booking.BookingType.choices)
+    subtotal_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=15, choices=Booking.Status.choices)
+    cancellation_reason = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Archived Booking'
+        verbose_name_plural = 'Archived Bookings'
+        ordering = ['-created_at']
+        indexes = [
+            # Booking history pages past the live table
+            models.Index(fields=['user_id', 'created_at'], name='idx_booking_archive_user'),
+        ]
+    
+    def __str__(self):
+        return f"Archived booking #{self.id}"
+
+
+class PaymentArchive(models.Model):
+    """Payment of an archived booking"""
+    id = models.IntegerField(primary_key=True)
+    booking_id = models.IntegerField(unique=True)
+    method_id = models.IntegerField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_date = models.DateTimeField()
+    transaction_reference = models.CharField(max_length=100, null=True, blank=True)
+    status = models.CharField(max_length=15, choices=Payment.Status.choices)
+    failure_reason = models.CharField(max_length=255, blank=True, null=True)
+    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    refund_date = models.DateTimeField(null=True, blank=True)
+    processed_by = models.CharField(max_length=50, blank=True, null=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Archived Payment'
+        verbose_name_plural = 'Archived Payments'
+    
+    def __str__(self):
+        return f"Archived payment #{self.id}"
+
+
+class QRAccessCodeArchive(models.Model):
+    """QR code of an archived booking"""
+    id = models.IntegerField(primary_key=True)
+    booking_id = models.IntegerField(db_index=True)
+    location_id = models.IntegerField(null=True, blank=True)
+    code = models.CharField(max_length=255)
+    code_type = models.CharField(max_length=15, choices=QRAccessCode.CodeType.choices)
+    generated_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    used_at = models.DateTimeField(null=True, blank=True)
+    is_used = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Archived QR Access Code'
+        verbose_name_plural = 'Archived QR Access Codes'
+    
+    def __str__(self):
+        return f"Archived QR #{self.id}"
+
+
+class NotificationArchive(models.Model):
+    """Notification about an archived booking"""
+    id = models.IntegerField(primary_key=True)
+    user_id = models.IntegerField()
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=15, choices=Notification.NotificationType.choices)
+    related_booking_id = models.IntegerField(null=True, blank=True)
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Archived Notification'
+        verbose_name_plural = 'Archived Notifications'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user_id', 'created_at'], name='idx_notification_archive_user'),
+        ]
+    
+    def __str__(self):
+        return f"Archived notification #{self.id}"
+
+
+
+# ==================== REPORTING ROLLUPS ====================
+# Pre-aggregated analytics, refreshed incrementally by
+# `python manage.py refresh_rollups` (lockers/rollups.py). Averages are
+# stored as sums and counts so changes can be applied as deltas.
+
+class RollupState(models.Model):
+    """High-watermark of a rollup source"""
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Rollup State'
+        verbose_name_plural = 'Rollup State'
+    
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+
+class RollupBookingFact(models.Model):
+    """What each booking last contributed to the rollups (kept after archiving)"""
+    booking_id = models.IntegerField(primary_key=True)
+    user_id = models.IntegerField()
+    location_id = models.IntegerField()
+    booking_date = models.DateField()
+    created_at = models.DateTimeField()
+    status = models.CharField(max_length=15)
+    subtotal_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    rating = models.PositiveSmallIntegerField(null=True, blank=True)
+    discount_id = models.IntegerField(null=True, blank=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Rollup Booking Fact'
+        verbose_name_plural = 'Rollup Booking Facts'
+        indexes = [
+            models.Index(fields=['booking_date', 'location_id', 'user_id'], name='idx_rollup_fact_day'),
+        ]
+    
+    def __str__(self):
+        return f"Booking #{self.booking_id} fact"
+
+
+class RollupDailyRevenue(models.Model):
+    """Revenue per location per booking day (non-Pending bookings, as v_revenue_report)"""
+    day = models.DateField()
+    location_id = models.IntegerField()
+    bookings = models.IntegerField(default=0)
+    unique_customers = models.IntegerField(default=0)
+    gross_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discounts = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Daily Revenue'
+        verbose_name_plural = 'Daily Revenue'
+        unique_together = ['day', 'location_id']
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"{self.day} location #{self.location_id}: {self.net_revenue}"
+
+
+class RollupLocationStats(models.Model):
+    """Per-location booking, review and locker stats (v_location_stats / v_popular_locations)"""
+    location_id = models.IntegerField(unique=True)
+    total_lockers = models.IntegerField(default=0)
+    available_lockers = models.IntegerField(default=0)
+    booked_lockers = models.IntegerField(default=0)
+    maintenance_lockers = models.IntegerField(default=0)
+    bookings = models.IntegerField(default=0)
+    completed_bookings = models.IntegerField(default=0)
+    cancelled_bookings = models.IntegerField(default=0)
+    booking_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    reviews = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Location Stats'
+        verbose_name_plural = 'Location Stats'
+    
+    def __str__(self):
+        return f"Location #{self.location_id}: {self.bookings} bookings"
+
+
+class RollupCustomerActivity(models.Model):
+    """Per-customer booking and review activity (v_customer_activity)"""
+    user_id = models.IntegerField(unique=True)
+    bookings = models.IntegerField(default=0)
+    completed_bookings = models.IntegerField(default=0)
+    cancelled_bookings = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_booking_at = models.DateTimeField(null=True, blank=True)
+    reviews = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Customer Activity'
+        verbose_name_plural = 'Customer Activity'
+    
+    def __str__(self):
+        return f"User #{self.user_id}: {self.bookings} bookings"
+
+
+class RollupHourlyOccupancy(models.Model):
+    """Booked locker minutes per location per local hour of day (bookings that held a locker)"""
+    location_id = models.IntegerField()
+    hour = models.PositiveSmallIntegerField()
+    bookings = models.IntegerField(default=0)
+    booked_minutes = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Hourly Occupancy'
+        verbose_name_plural = 'Hourly Occupancy'
+        unique_together = ['location_id', 'hour']
+    
+    def __str__(self):
+        return f"Location #{self.location_id} {self.hour:02d}:00: {self.booked_minutes} min"
+
+
+class RollupDiscountImpact(models.Model):
+    """Bookings and amounts per discount code (as DiscountAdmin.revenue_impact)"""
+    discount_id = models.IntegerField(unique=True)
+    bookings = models.IntegerField(default=0)
+    gross_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discounts = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Discount Impact'
+        verbose_name_plural = 'Discount Impact'
+    
+    def __str__(self):
+        return f"Discount #{self.discount_id}: -{self.discounts}"
+
+
+class DemandForecast(models.Model):
+    """Next-week hourly utilization forecast per location and locker size (lockers/forecasting.py)"""
+    location = models.ForeignKey(LockerLocation, on_delete=models.CASCADE, related_name='forecasts')
+    size = models.CharField(max_length=10, choices=LockerUnit.Size.choices)
+    lockers = models.IntegerField()
+    history_weeks = models.IntegerField()
+    forecast_start = models.DateTimeField()
+    peak_utilization = models.FloatField()
+    peak_at = models.DateTimeField()
+    avg_utilization = models.FloatField()
+    last_week_peak = models.FloatField()
+    weekly_trend = models.FloatField(help_text='Change in average occupied lockers per week')
+    hourly = models.JSONField(help_text='Forecast utilization for each hour from forecast_start')
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Demand Forecast'
+        verbose_name_plural = 'Demand Forecasts'
+        unique_together = ['location', 'size']
+        ordering = ['-peak_utilization']
+    
+    def __str__(self):
+        return f"{self.location.name} {self.size}: peak {self.peak_utilization:.0%}"
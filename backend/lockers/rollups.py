@@ -0,0 +1,344 @@
+"""
+Reporting Rollups for LockSpot - Raw SQL
+Incremental refresh of the analytics rollup tables (run by
+`python manage.py refresh_rollups`, e.g. every few minutes from cron)
+
+Every booking's last contribution is kept in lockers_rollupbookingfact. A
+refresh reads the bookings and reviews changed since the previous run's
+high-watermark (updated_at, served by idx_booking_updated/idx_review_updated),
+subtracts what each one contributed before, adds what it contributes now, and
+applies the difference to the rollups with additive upserts. Re-reading a row
+is harmless, so the watermark can overlap generously: rows written by the ORM
+carry UTC timestamps while raw SQL uses the server clock (NOW()), and the
+window starts at the earlier of the two.
+
+Occupancy is bucketed by local hour of day (settings.TIME_ZONE); booking
+times are stored in UTC, as the ORM writes them.
+
+Archived bookings (api/archive.py) keep their facts, so they stay counted.
+Deleted bookings are not tracked; `refresh_rollups --full` rebuilds everything.
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from db_utils import DatabaseConnection
+
+
+FACT_COLUMNS = (
+    'booking_id', 'user_id', 'location_id', 'booking_date', 'created_at', 'status',
+    'subtotal_amount', 'discount_amount', 'total_amount', 'rating', 'discount_id',
+    'start_time', 'end_time',
+)
+
+# Bookings that held their locker for the booked period
+OCCUPYING_STATUSES = ('Confirmed', 'Active', 'Completed', 'Expired')
+
+# kind -> (table, key columns, additive columns)
+ROLLUPS = {
+    'daily': ('lockers_rollupdailyrevenue', ('day', 'location_id'), (
+        'bookings', 'gross_revenue', 'discounts', 'net_revenue', 'completed_revenue', 'cancelled_revenue',
+    )),
+    'location': ('lockers_rolluplocationstats', ('location_id',), (
+        'bookings', 'completed_bookings', 'cancelled_bookings', 'booking_value', 'completed_revenue',
+        'reviews', 'rating_sum',
+    )),
+    'customer': ('lockers_rollupcustomeractivity', ('user_id',), (
+        'bookings', 'completed_bookings', 'cancelled_bookings', 'total_spent', 'reviews', 'rating_sum',
+    )),
+    'hourly': ('lockers_rolluphourlyoccupancy', ('location_id', 'hour'), ('bookings', 'booked_minutes')),
+    'discount': ('lockers_rollupdiscountimpact', ('discount_id',), (
+        'bookings', 'gross_revenue', 'discounts', 'net_revenue',
+    )),
+}
+
+ROLLUP_TABLES = [table for table, _, _ in ROLLUPS.values()] + ['lockers_rollupbookingfact', 'lockers_rollupstate']
+
+CHANGED_BOOKINGS = """
+    SELECT b.id, b.user_id, l.location_id, DATE(b.created_at) AS booking_date, b.created_at,
+           b.status, b.subtotal_amount, b.discount_amount, b.total_amount, r.rating,
+           b.discount_id, b.start_time, b.end_time, b.updated_at
+    FROM {table} b
+    JOIN lockers_lockerunit l ON b.locker_id = l.id
+    LEFT JOIN lockers_review r ON r.booking_id = b.id
+    WHERE b.updated_at >= %s AND (b.updated_at > %s OR b.id > %s)
+    ORDER BY b.updated_at, b.id
+    LIMIT %s
+"""
+
+CHANGED_REVIEWS = """
+    SELECT r.id, r.booking_id, r.rating, r.updated_at
+    FROM lockers_review r
+    WHERE r.updated_at >= %s AND (r.updated_at > %s OR r.id > %s)
+    ORDER BY r.updated_at, r.id
+    LIMIT %s
+"""
+
+LOCKER_COUNTS = """
+    INSERT INTO lockers_rolluplocationstats
+        (location_id, total_lockers, available_lockers, booked_lockers, maintenance_lockers)
+    SELECT * FROM (
+        SELECT location_id, COUNT(*) AS total_lockers,
+               SUM(status = 'Available') AS available_lockers,
+               SUM(status = 'Booked') AS booked_lockers,
+               SUM(status = 'Maintenance') AS maintenance_lockers
+        FROM lockers_lockerunit
+        GROUP BY location_id
+    ) AS counts
+    ON DUPLICATE KEY UPDATE
+        total_lockers = counts.total_lockers,
+        available_lockers = counts.available_lockers,
+        booked_lockers = counts.booked_lockers,
+        maintenance_lockers = counts.maintenance_lockers
+"""
+
+DAILY_UNIQUE_CUSTOMERS = """
+    UPDATE lockers_rollupdailyrevenue d
+    SET unique_customers = (
+        SELECT COUNT(DISTINCT f.user_id) FROM lockers_rollupbookingfact f
+        WHERE f.booking_date = %s AND f.location_id = %s AND f.status <> 'Pending'
+    )
+    WHERE d.day = %s AND d.location_id = %s
+"""
+
+# Start of time for the first (full) pass
+EPOCH = '1970-01-01 00:00:00'
+
+
+# ==================== DELTAS ====================
+
+def minutes_by_hour(start: datetime, end: datetime) -> List[int]:
+    """Minutes of [start, end) falling in each local hour of day (0-23); naive times are UTC"""
+    minutes = [0] * 24
+    start, end = (t if t.tzinfo else t.replace(tzinfo=dt_timezone.utc) for t in (start, end))
+    total = int((end - start).total_seconds() // 60)
+    if total <= 0:
+        return minutes
+    days, rest = divmod(total, 1440)
+    at = start.astimezone(ZoneInfo(settings.TIME_ZONE)).replace(second=0, microsecond=0)
+    if days:
+        minutes = [60 * days] * 24
+    while rest > 0:
+        step = min(rest, 60 - at.minute)
+        minutes[at.hour] += step
+        rest -= step
+        at += timedelta(minutes=step)
+    return minutes
+
+
+def contributions(fact: Optional[Dict]) -> Dict:
+    """(kind, key) -> column increments for one booking fact (nothing for None)"""
+    if not fact:
+        return {}
+    status = fact['status']
+    completed = int(status == 'Completed')
+    cancelled = int(status == 'Cancelled')
+    total = fact['total_amount']
+    rating = fact['rating'] or 0
+    reviewed = int(fact['rating'] is not None)
+
+    result = {
+        ('location', (fact['location_id'],)): {
+            'bookings': 1, 'completed_bookings': completed, 'cancelled_bookings': cancelled,
+            'booking_value': total, 'completed_revenue': total if completed else 0,
+            'reviews': reviewed, 'rating_sum': rating,
+        },
+        ('customer', (fact['user_id'],)): {
+            'bookings': 1, 'completed_bookings': completed, 'cancelled_bookings': cancelled,
+            'total_spent': total, 'reviews': reviewed, 'rating_sum': rating,
+        },
+    }
+    # Same population as the old v_revenue_report
+    if status != 'Pending':
+        result[('daily', (fact['booking_date'], fact['location_id']))] = {
+            'bookings': 1,
+            'gross_revenue': fact['subtotal_amount'],
+            'discounts': fact['discount_amount'],
+            'net_revenue': total,
+            'completed_revenue': total if completed else 0,
+            'cancelled_revenue': total if cancelled else 0,
+        }
+    if status in OCCUPYING_STATUSES and fact.get('start_time') and fact.get('end_time'):
+        for hour, minutes in enumerate(minutes_by_hour(fact['start_time'], fact['end_time'])):
+            if minutes:
+                result[('hourly', (fact['location_id'], hour))] = {'bookings': 1, 'booked_minutes': minutes}
+    # Every status, as DiscountAdmin.revenue_impact
+    if fact.get('discount_id'):
+        result[('discount', (fact['discount_id'],))] = {
+            'bookings': 1,
+            'gross_revenue': fact['subtotal_amount'],
+            'discounts': fact['discount_amount'],
+            'net_revenue': total,
+        }
+    return result
+
+
+def add_delta(deltas: Dict, old: Optional[Dict], new: Optional[Dict]):
+    """Accumulate new minus old contributions into `deltas`, dropping keys that net to zero"""
+    for sign, fact in ((-1, old), (1, new)):
+        for key, columns in contributions(fact).items():
+            target = deltas.setdefault(key, defaultdict(int))
+            for column, value in columns.items():
+                target[column] += sign * value
+    for key in [k for k, columns in deltas.items() if not any(columns.values())]:
+        del deltas[key]
+
+
+# ==================== REFRESH ====================
+
+def _load_facts(cursor, booking_ids: List[int]) -> Dict[int, Dict]:
+    if not booking_ids:
+        return {}
+    cursor.execute(f"""
+        SELECT {', '.join(FACT_COLUMNS)} FROM lockers_rollupbookingfact
+        WHERE booking_id IN ({', '.join(['%s'] * len(booking_ids))})
+    """, booking_ids)
+    return {row['booking_id']: row for row in cursor.fetchall()}
+
+
+def _apply(cursor, facts: List[Dict], deltas: Dict):
+    """Write the new facts and the rollup deltas (inside the caller's transaction)"""
+    updates = ', '.join(f"{c} = VALUES({c})" for c in FACT_COLUMNS[1:])
+    cursor.executemany(f"""
+        INSERT INTO lockers_rollupbookingfact ({', '.join(FACT_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(FACT_COLUMNS))})
+        ON DUPLICATE KEY UPDATE {updates}
+    """, [tuple(f[c] for c in FACT_COLUMNS) for f in facts])
+
+    for kind, (table, key_columns, columns) in ROLLUPS.items():
+        rows = [key + tuple(delta.get(c, 0) for c in columns)
+                for (k, key), delta in deltas.items() if k == kind]
+        if not rows:
+            continue
+        all_columns = key_columns + columns
+        cursor.executemany(f"""
+            INSERT INTO {table} ({', '.join(all_columns)})
+            VALUES ({', '.join(['%s'] * len(all_columns))})
+            ON DUPLICATE KEY UPDATE {', '.join(f'{c} = {c} + VALUES({c})' for c in columns)}
+        """, rows)
+
+    latest = {}
+    for fact in facts:
+        if fact['user_id'] not in latest or fact['created_at'] > latest[fact['user_id']]:
+            latest[fact['user_id']] = fact['created_at']
+    if latest:
+        cursor.executemany("""
+            INSERT INTO lockers_rollupcustomeractivity (user_id, last_booking_at) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE last_booking_at =
+                GREATEST(COALESCE(last_booking_at, VALUES(last_booking_at)), VALUES(last_booking_at))
+        """, list(latest.items()))
+
+    days = [key for (kind, key) in deltas if kind == 'daily']
+    if days:
+        cursor.executemany(DAILY_UNIQUE_CUSTOMERS, [(day, loc, day, loc) for day, loc in days])
+
+
+def _booking_batch(cursor, rows: List[Dict]) -> List[Dict]:
+    old_facts = _load_facts(cursor, [r['id'] for r in rows])
+    deltas, facts = {}, []
+    for row in rows:
+        fact = {c: row[c] for c in FACT_COLUMNS[1:]}
+        fact['booking_id'] = row['id']
+        add_delta(deltas, old_facts.get(row['id']), fact)
+        facts.append(fact)
+    _apply(cursor, facts, deltas)
+    return facts
+
+
+def _review_batch(cursor, rows: List[Dict]) -> List[Dict]:
+    old_facts = _load_facts(cursor, [r['booking_id'] for r in rows])
+    deltas, facts = {}, []
+    for row in rows:
+        old = old_facts.get(row['booking_id'])
+        if old is None:
+            continue  # booking not seen yet; its next refresh reads the rating with it
+        fact = {**old, 'rating': row['rating']}
+        add_delta(deltas, old, fact)
+        facts.append(fact)
+    if facts:
+        _apply(cursor, facts, deltas)
+    return facts
+
+
+def _watermark(cursor, name):
+    cursor.execute("SELECT watermark FROM lockers_rollupstate WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    return row['watermark'] if row else None
+
+
+def _save_watermark(cursor, name, watermark):
+    cursor.execute("""
+        INSERT INTO lockers_rollupstate (name, watermark, refreshed_at) VALUES (%s, %s, UTC_TIMESTAMP())
+        ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), refreshed_at = VALUES(refreshed_at)
+    """, (name, watermark))
+
+
+def _run_source(conn, cursor, query, apply_batch, since, batch_size, log) -> int:
+    """Feed rows changed at or after `since` to `apply_batch` in (updated_at, id) order, one commit per batch"""
+    position = (since, since, 0)
+    processed = 0
+    while True:
+        cursor.execute(query, (*position, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return processed
+        apply_batch(cursor, rows)
+        conn.commit()
+        processed += len(rows)
+        last = rows[-1]
+        position = (last['updated_at'], last['updated_at'], last['id'])
+        if log and processed % (batch_size * 20) == 0:
+            log(f"  ... {processed:,} rows")
+
+
+def refresh(full: bool = False, batch_size: int = 2000, overlap_seconds: int = 300, log=None) -> Dict:
+    """
+    Bring the rollups up to date. Returns rows processed per source and the
+    elapsed seconds. With `full` (or on the first run) everything, including
+    archived bookings, is aggregated from scratch.
+    """
+    started = time.perf_counter()
+    stats = {}
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        if full:
+            for table in ROLLUP_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            conn.commit()
+
+        cursor.execute("SELECT NOW() AS local_now, UTC_TIMESTAMP() AS utc_now")
+        clock = cursor.fetchone()
+        offset = clock['local_now'] - clock['utc_now']
+        conn.commit()
+
+        def since(name):
+            watermark = _watermark(cursor, name)
+            if watermark is None:
+                return None
+            return min(watermark, watermark + offset) - timedelta(seconds=overlap_seconds)
+
+        booking_since = since('booking')
+        if booking_since is None:
+            # First run: archived bookings never change again, so they are only read here
+            stats['archived_bookings'] = _run_source(
+                conn, cursor, CHANGED_BOOKINGS.format(table='lockers_bookingarchive'),
+                _booking_batch, EPOCH, batch_size, log)
+        stats['bookings'] = _run_source(
+            conn, cursor, CHANGED_BOOKINGS.format(table='lockers_booking'),
+            _booking_batch, booking_since or EPOCH, batch_size, log)
+        stats['reviews'] = _run_source(
+            conn, cursor, CHANGED_REVIEWS, _review_batch, since('review') or EPOCH, batch_size, log)
+
+        cursor.execute(LOCKER_COUNTS)
+        _save_watermark(cursor, 'booking', clock['utc_now'])
+        _save_watermark(cursor, 'review', clock['utc_now'])
+        conn.commit()
+        cursor.close()
+
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
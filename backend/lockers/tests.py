@@ -1,3 +1,537 @@
-from django.test import TestCase
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from api import audit
+
+from . import dashboard, exports, forecasting, rollups
+from .admin_pagination import EstimatedCountPaginator, estimated_row_count
+from .models import (
+    User, LocationAddress, LockerLocation, PricingTier, LockerUnit,
+    Discount, DiscountUsageShard, Booking, PaymentMethod, Payment, Review,
+    QRAccessCode, Notification, NotificationCounter, AuditLog, BulkJob, RollupState, RollupDailyRevenue, RollupLocationStats,
+    RollupHourlyOccupancy, RollupDiscountImpact
+)
+
+
+_customers = 0
+
+
+def create_customers(count):
+    """Add `count` customers, each with a full booking graph"""
+    global _customers
+    now = timezone.now()
+    for _ in range(count):
+        _customers += 1
+        n = _customers
+        user = User.objects.create_user(
+            email=f'customer{n}@lockspot.test', password='pass', first_name='Customer', last_name=str(n)
+        )
+        address = LocationAddress.objects.create(street_address=f'{n} Main St', city='Riyadh')
+        location = LockerLocation.objects.create(name=f'Station {n}', address=address)
+        tier = PricingTier.objects.create(
+            name=f'Tier {n}', size='Small', hourly_rate=Decimal('5.00'), daily_rate=Decimal('30.00')
+        )
+        lockers = [
+            LockerUnit.objects.create(location=location, tier=tier, unit_number=f'U{i}', size='Small',
+                                      status='Booked' if i == 0 else 'Available')
+            for i in range(3)
+        ]
+        discount = Discount.objects.create(
+            code=f'CODE{n}', discount_type='Percentage', discount_value=Decimal('10'),
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=30), max_uses=100,
+            counter_shards=2
+        )
+        DiscountUsageShard.objects.create(discount=discount, slot=0, uses=3, max_uses=50)
+        DiscountUsageShard.objects.create(discount=discount, slot=1, uses=1, max_uses=50)
+        method = PaymentMethod.objects.create(user=user, method_type='Visa', card_last_four='4242')
+        for status in ('Active', 'Completed'):
+            booking = Booking.objects.create(
+                user=user, locker=lockers[0], discount=discount, start_time=now,
+                end_time=now + timedelta(hours=4), subtotal_amount=Decimal('20.00'),
+                discount_amount=Decimal('2.00'), total_amount=Decimal('18.00'), status=status
+            )
+            Payment.objects.create(booking=booking, method=method, amount=booking.total_amount,
+                                   status='Success')
+            QRAccessCode.objects.create(booking=booking, location=location, code=f'QR-{booking.id}',
+                                        expires_at=booking.end_time)
+            Notification.objects.create(user=user, title='Booked', message='Your locker is ready',
+                                        notification_type='Booking', related_booking=booking)
+        Review.objects.create(booking=booking, rating=4, comment='Great')
+        AuditLog.objects.create(user=user, action='booking.create', table_name='lockers_booking',
+                                record_id=booking.id)
+
+
+class AdminChangelistQueryCountTests(TestCase):
+    """A changelist page must cost the same number of queries for 1 row or 25"""
+
+    CHANGELISTS = [
+        'user', 'locationaddress', 'lockerlocation', 'pricingtier', 'lockerunit',
+        'booking', 'discount', 'payment', 'review', 'notification', 'auditlog',
+        'paymentmethod', 'qraccesscode', 'demandforecast', 'outboxevent',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def count_queries(self, model):
+        url = reverse(f'admin:lockers_{model}_changelist')
+        cache.clear()  # cached counts would hide per-row queries
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        create_customers(1)
+        baseline = {model: self.count_queries(model) for model in self.CHANGELISTS}
+
+        create_customers(12)
+        for model in self.CHANGELISTS:
+            with self.subTest(model=model):
+                self.assertEqual(self.count_queries(model), baseline[model])
+
+    def test_annotated_columns_match_model_values(self):
+        create_customers(2)
+        response = self.client.get(reverse('admin:lockers_lockerlocation_changelist'))
+        self.assertContains(response, '2/3 available')
+        self.assertContains(response, '(4.0)')
+
+        response = self.client.get(reverse('admin:lockers_discount_changelist'))
+        self.assertContains(response, '<small>4/100</small>')
+        self.assertContains(response, '-$4.00')
+
+        response = self.client.get(reverse('admin:lockers_user_changelist'))
+        self.assertContains(response, '2 bookings')
+        self.assertContains(response, '$18.00')
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+        create_customers(3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_unfiltered_count_is_cached(self):
+        self.assertEqual(estimated_row_count(Booking), 6)
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(Booking.objects.all(), 25).count, 6)
+
+    def test_filtered_count_is_bounded(self):
+        with mock.patch('lockers.admin_pagination.BOUNDED_COUNT_LIMIT', 2):
+            paginator = EstimatedCountPaginator(Booking.objects.filter(status='Active'), 25)
+            self.assertEqual(paginator.count, 2)
+            self.assertTrue(paginator.is_estimate)
+
+        paginator = EstimatedCountPaginator(Booking.objects.filter(status='Active'), 25)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.is_estimate)
+
+    def test_date_drilldown_is_cached(self):
+        url = reverse('admin:lockers_booking_changelist')
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(second), len(first))
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in second))
+
+
+class BulkActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+        create_customers(3)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post_action(self, model, action, ids):
+        return self.client.post(reverse(f'admin:lockers_{model}_changelist'), {
+            'action': action, '_selected_action': [str(i) for i in ids],
+        })
+
+    def test_cancel_frees_lockers_in_chunks(self):
+        active = list(Booking.objects.filter(status='Active').values_list('pk', flat=True))
+        with mock.patch('lockers.bulk_actions.CHUNK_SIZE', 2), \
+                mock.patch('lockers.bulk_actions.threading.Thread') as thread:
+            thread.side_effect = lambda target, args, daemon: mock.Mock(start=lambda: target(*args))
+            response = self.post_action('booking', 'cancel_bookings', active)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/bulk-jobs/', response['Location'])
+        self.assertContains(self.client.get(response['Location']), 'Finished')
+        self.assertFalse(Booking.objects.filter(pk__in=active).exclude(status='Cancelled').exists())
+        self.assertFalse(LockerUnit.objects.filter(status='Booked').exists())
+
+    def test_failed_job_records_the_error(self):
+        lockers = list(LockerUnit.objects.values_list('pk', flat=True))
+        with mock.patch('lockers.bulk_actions.CHUNK_SIZE', 2), \
+                mock.patch('lockers.bulk_actions._set_locker_status', side_effect=RuntimeError('lock wait timeout')), \
+                mock.patch('lockers.bulk_actions.threading.Thread') as thread:
+            thread.side_effect = lambda target, args, daemon: mock.Mock(start=lambda: target(*args))
+            response = self.post_action('lockerunit', 'mark_maintenance', lockers)
+
+        job = BulkJob.objects.get()
+        self.assertEqual((job.status, job.processed, job.error), ('Failed', 0, 'lock wait timeout'))
+        self.assertContains(self.client.get(response['Location']), 'lock wait timeout')
+
+    def test_job_without_progress_is_marked_failed(self):
+        stale = timezone.now() - timedelta(minutes=10)
+        job = BulkJob.objects.create(label='Cancel bookings', total=5000, processed=1000,
+                                     created_at=stale, updated_at=stale)
+        response = self.client.get(reverse('admin:lockers_booking_bulk_job', args=[job.pk]))
+
+        self.assertContains(response, 'Failed after 1000 rows')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Failed')
+
+    def test_mark_available_skips_lockers_with_live_bookings(self):
+        lockers = list(LockerUnit.objects.values_list('pk', flat=True))
+        LockerUnit.objects.update(status='Maintenance')
+        self.post_action('lockerunit', 'mark_available', lockers)
+
+        booked = LockerUnit.objects.filter(bookings__status='Active').distinct()
+        self.assertTrue(booked.exists())
+        self.assertFalse(booked.filter(status='Available').exists())
+        self.assertEqual(LockerUnit.objects.filter(status='Available').count(), len(lockers) - booked.count())
+
+    def test_status_changes_are_audited_after_commit(self):
+        lockers = list(LockerUnit.objects.order_by('pk').values_list('pk', 'status'))
+        LockerUnit.objects.filter(pk=lockers[0][0]).update(status='Maintenance')
+        writer = audit.AuditWriter(tempfile.mkdtemp(), autostart=False)
+        with mock.patch('api.audit.get_writer', return_value=writer), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.post_action('lockerunit', 'mark_maintenance', [pk for pk, _ in lockers])
+
+        entries = {entry[3]: entry for entry in writer.take()}
+        self.assertEqual(sorted(entries), [pk for pk, _ in lockers[1:]])
+        for pk, old_status in lockers[1:]:
+            self.assertEqual(entries[pk][:6], (self.admin.pk, 'locker.status_changed', 'lockers_lockerunit', pk,
+                                               {'status': old_status}, {'status': 'Maintenance'}))
+
+
+class NotificationAdminTests(TestCase):
+    """Admin adds and deletes keep the unread counters in step"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+        create_customers(2)
+        cls.users = list(User.objects.filter(user_type='Customer').order_by('pk'))
+        for user in cls.users:
+            NotificationCounter.objects.create(user=user, unread=2)
+        Notification.objects.filter(user=cls.users[1]).update(is_read=True)
+        NotificationCounter.objects.filter(user=cls.users[1]).update(unread=0)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def unread(self, user):
+        return NotificationCounter.objects.get(user=user).unread
+
+    def test_add_counts_the_new_notification(self):
+        self.client.post(reverse('admin:lockers_notification_add'), {
+            'user': self.users[0].pk, 'title': 'Maintenance', 'message': 'Station closed on Friday',
+            'notification_type': 'System', 'is_read': 'on',
+        })
+        notification = Notification.objects.get(title='Maintenance')
+        self.assertFalse(notification.is_read)
+        self.assertEqual(self.unread(self.users[0]), 3)
+
+    def test_read_state_and_user_are_not_editable(self):
+        notification = Notification.objects.filter(user=self.users[0]).first()
+        response = self.client.get(reverse('admin:lockers_notification_change', args=[notification.pk]))
+        fields = response.context['adminform'].form.fields
+        self.assertNotIn('is_read', fields)
+        self.assertNotIn('user', fields)
+
+    def test_deletes_release_unread_notifications_only(self):
+        first = Notification.objects.filter(user=self.users[0]).first()
+        self.client.post(reverse('admin:lockers_notification_delete', args=[first.pk]), {'post': 'yes'})
+        self.assertEqual(self.unread(self.users[0]), 1)
+
+        self.client.post(reverse('admin:lockers_notification_changelist'), {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [str(pk) for pk in Notification.objects.values_list('pk', flat=True)],
+        })
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual((self.unread(self.users[0]), self.unread(self.users[1])), (0, 0))
+
+
+class RollupDeltaTests(SimpleTestCase):
+
+    FACT = {
+        'booking_id': 1, 'user_id': 7, 'location_id': 3, 'booking_date': timezone.now().date(),
+        'created_at': timezone.now(), 'status': 'Pending', 'subtotal_amount': Decimal('50.00'),
+        'discount_amount': Decimal('5.00'), 'total_amount': Decimal('45.00'), 'rating': None,
+    }
+
+    def test_new_booking_is_added_everywhere_but_pending_revenue(self):
+        deltas = {}
+        rollups.add_delta(deltas, None, self.FACT)
+        self.assertEqual(deltas[('location', (3,))]['bookings'], 1)
+        self.assertEqual(deltas[('customer', (7,))]['total_spent'], Decimal('45.00'))
+        self.assertNotIn('daily', {kind for kind, _ in deltas})
+
+    def test_status_change_moves_amounts(self):
+        completed = {**self.FACT, 'status': 'Completed'}
+        deltas = {}
+        rollups.add_delta(deltas, self.FACT, completed)
+        daily = deltas[('daily', (self.FACT['booking_date'], 3))]
+        self.assertEqual((daily['bookings'], daily['net_revenue'], daily['completed_revenue']),
+                         (1, Decimal('45.00'), Decimal('45.00')))
+        location = deltas[('location', (3,))]
+        self.assertEqual((location['bookings'], location['completed_bookings']), (0, 1))
+
+        # Completed -> Cancelled moves the revenue between columns
+        deltas = {}
+        rollups.add_delta(deltas, completed, {**completed, 'status': 'Cancelled'})
+        daily = deltas[('daily', (self.FACT['booking_date'], 3))]
+        self.assertEqual((daily['bookings'], daily['completed_revenue'], daily['cancelled_revenue']),
+                         (0, Decimal('-45.00'), Decimal('45.00')))
+
+    def test_unchanged_fact_produces_no_delta(self):
+        deltas = {}
+        rollups.add_delta(deltas, self.FACT, dict(self.FACT))
+        self.assertEqual(deltas, {})
+
+    def test_review_counts_rating(self):
+        deltas = {}
+        rollups.add_delta(deltas, self.FACT, {**self.FACT, 'rating': 4})
+        self.assertEqual(dict(deltas[('location', (3,))]), {'bookings': 0, 'completed_bookings': 0,
+                         'cancelled_bookings': 0, 'booking_value': 0, 'completed_revenue': 0,
+                         'reviews': 1, 'rating_sum': 4})
+
+    def test_occupancy_is_split_by_local_hour(self):
+        # 06:30-08:15 UTC is 09:30-11:15 in Riyadh
+        minutes = rollups.minutes_by_hour(datetime(2025, 1, 1, 6, 30), datetime(2025, 1, 1, 8, 15))
+        self.assertEqual({h: m for h, m in enumerate(minutes) if m}, {9: 30, 10: 60, 11: 15})
+        # Whole days add an hour to every slot
+        self.assertEqual(sum(rollups.minutes_by_hour(datetime(2025, 1, 1), datetime(2025, 1, 3))), 2 * 1440)
+
+    def test_discount_and_occupancy_follow_status(self):
+        fact = {**self.FACT, 'discount_id': 9, 'start_time': datetime(2025, 1, 1, 6, 0),
+                'end_time': datetime(2025, 1, 1, 8, 0)}
+        deltas = {}
+        rollups.add_delta(deltas, None, fact)
+        self.assertEqual(deltas[('discount', (9,))]['discounts'], Decimal('5.00'))
+        self.assertNotIn('hourly', {kind for kind, _ in deltas})  # Pending holds no locker
+
+        deltas = {}
+        rollups.add_delta(deltas, fact, {**fact, 'status': 'Active'})
+        self.assertEqual(dict(deltas[('hourly', (3, 9))]), {'bookings': 1, 'booked_minutes': 60})
+        self.assertNotIn('discount', {kind for kind, _ in deltas})
+
+
+class AnalyticsDashboardTests(TestCase):
+    """The analytics page reads the rollups only, and serves repeat views from its cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@lockspot.test', password='admin-pass', first_name='Admin', last_name='User'
+        )
+        create_customers(1)
+        location = LockerLocation.objects.order_by('-id').first()
+        discount = Discount.objects.order_by('-id').first()
+        RollupDailyRevenue.objects.create(day=timezone.localdate(), location_id=location.id, bookings=2,
+                                          net_revenue=Decimal('36.00'), discounts=Decimal('4.00'))
+        RollupLocationStats.objects.create(location_id=location.id, total_lockers=3, bookings=2,
+                                           completed_revenue=Decimal('18.00'), reviews=1, rating_sum=4)
+        RollupHourlyOccupancy.objects.create(location_id=location.id, hour=10, bookings=2, booked_minutes=120)
+        RollupDiscountImpact.objects.create(discount_id=discount.id, bookings=2, gross_revenue=Decimal('40.00'),
+                                            discounts=Decimal('4.00'), net_revenue=Decimal('36.00'))
+        RollupState.objects.create(name='booking', refreshed_at=timezone.now())
+        cls.location, cls.discount = location, discount
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        dashboard.clear_cache()
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_analytics'))
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in queries]
+
+    def test_renders_from_rollups_without_touching_bookings(self):
+        response, queries = self.get()
+        self.assertContains(response, self.location.name)
+        self.assertContains(response, self.discount.code)
+        self.assertContains(response, '$36.00')
+        self.assertFalse([q for q in queries if re.search(r'lockers_booking\b', q)])
+
+    def test_repeat_views_are_served_from_cache(self):
+        _, first = self.get()
+        _, second = self.get()
+        self.assertTrue([q for q in first if 'lockers_rollup' in q])
+        self.assertFalse([q for q in second if 'lockers_rollup' in q])
+
+
+class ForecastTests(SimpleTestCase):
+
+    def test_occupancy_counts_partial_hours(self):
+        occupancy = forecasting.OccupancyAccumulator(groups=2, hours=6)
+        occupancy.add(np.array([0, 0, 1]), np.array([1.5, 2.25, -3.0]), np.array([3.25, 2.75, 9.0]))
+        curves = occupancy.curves()
+        np.testing.assert_allclose(curves[0], [0, 0.5, 1.5, 0.25, 0, 0])
+        np.testing.assert_allclose(curves[1], [1] * 6)  # clipped to the window
+        self.assertEqual(occupancy.intervals, 3)
+
+    def test_chunks_add_up(self):
+        rng = np.random.default_rng(1)
+        group = rng.integers(0, 3, 1000)
+        start = rng.uniform(-10, 100, 1000)
+        end = start + rng.uniform(0, 30, 1000)
+        whole = forecasting.OccupancyAccumulator(3, 96)
+        whole.add(group, start, end)
+        chunked = forecasting.OccupancyAccumulator(3, 96)
+        for part in np.array_split(np.arange(1000), 7):
+            chunked.add(group[part], start[part], end[part])
+        np.testing.assert_allclose(chunked.curves(), whole.curves())
+        # Total locker-hours equal the clipped durations
+        self.assertAlmostEqual(whole.curves().sum(), (np.clip(end, 0, 96) - np.clip(start, 0, 96)).sum())
+
+    def test_forecast_repeats_the_week_shape_with_the_trend(self):
+        season = np.tile(np.r_[np.zeros(12), np.full(12, 4.0)], 7)
+        weeks = np.concatenate([season + week for week in range(4)])  # one more locker busy every week
+        result = forecasting.fit_forecast(np.stack([weeks, weeks]), np.array([10.0, 6.0]))
+        np.testing.assert_allclose(result['hourly'][0], (season + 4) / 10)
+        self.assertAlmostEqual(result['trend'][0], 1.0)
+        self.assertEqual(result['peak_hour'][0], 12)
+        self.assertAlmostEqual(result['peak'][0], 0.8)
+        self.assertAlmostEqual(result['peak'][1], 1.0)  # capped at capacity
+        self.assertAlmostEqual(result['last_week_peak'][0], 0.7)
+
+
+class SnapshotCursor:
+    """Answers the checksum query with `checksums` and streams `rows` (tagged with their month)"""
+
+    def __init__(self, checksums, rows):
+        self.checksums = checksums
+        self.rows = rows
+        self.streamed = None
+
+    def execute(self, query, params=None):
+        if 'BIT_XOR' in query:
+            self.result = self.checksums if 'archive' not in query else []
+        else:
+            self.result = self.rows if 'archive' not in query else []
+        self.streamed = None
+
+    def fetchall(self):
+        return self.result
+
+    def fetchmany(self, size):
+        if self.streamed is None:
+            self.streamed = list(self.result)
+        chunk, self.streamed = self.streamed[:size], self.streamed[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class SnapshotConnection:
+
+    def __init__(self, checksums, rows):
+        self.checksums, self.rows = checksums, rows
+
+    def cursor(self, *args, **kwargs):
+        return SnapshotCursor(self.checksums, self.rows)
+
+    def commit(self):
+        pass
+
+
+class SnapshotExportTests(SimpleTestCase):
+
+    COLUMNS = (('id', 'int'), ('amount', 'money'), ('paid_at', 'datetime'), ('note', 'str'), ('ok', 'bool'),
+               ("TIME_FORMAT(opens, '%H:%i')", 'str'))
+
+    def test_npz_round_trip(self):
+        # As selected: epoch seconds and cents
+        rows = [(1, 1250, 1740823200, 'first', 1, '08:00'), (2, None, None, None, 0, '09:30')]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'part.npz'
+            exports.write_part('npz', self.COLUMNS, rows, str(path))
+            data = exports.load_npz(path)
+        self.assertEqual(data['amount'].tolist(), [1250, None])
+        self.assertEqual(data['note'].tolist(), ['first', None])
+        self.assertEqual(data['paid_at'][0], np.datetime64('2025-03-01T10:00:00'))
+        self.assertTrue(np.isnat(data['paid_at'][1]))
+        self.assertEqual(data['ok'].tolist(), [True, False])
+        self.assertEqual(data['opens'].tolist(), ['08:00', '09:30'])
+
+    def test_month_ranges_merge_adjacent_months(self):
+        self.assertEqual(exports.month_ranges(['2025-12', '2025-02', '2026-01']), [
+            (date(2025, 2, 1), date(2025, 3, 1)), (date(2025, 12, 1), date(2026, 2, 1)),
+        ])
+
+    @staticmethod
+    def booking(booking_id, month):
+        created = int(datetime.strptime(month, '%Y-%m').timestamp())
+        return (booking_id, 1, 1, None, created, created, 'Storage', 1000, 0, 1000,
+                'Completed', None, created, created, month)
+
+    def export(self, out, manifest, checksums, rows):
+        options = {'workers': 2, 'rows_per_file': 2, 'chunk_size': 2, 'max_buffered': 10}
+        with ThreadPoolExecutor(2) as pool:
+            return exports.export_table(SnapshotConnection(checksums, rows), pool, out, 'bookings',
+                                        manifest, 'npz', options)
+
+    def test_only_changed_partitions_are_rewritten(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp)
+            manifest, stats = self.export(out, {}, [('2025-01', 3, 7), ('2025-02', 1, 9)], [
+                self.booking(1, '2025-01'), self.booking(2, '2025-01'),
+                self.booking(3, '2025-01'), self.booking(4, '2025-02'),
+            ])
+            self.assertEqual((stats['exported'], stats['rows']), (2, 4))
+            self.assertEqual(manifest['2025-01'], {'rows': 3, 'files': 2, 'checksum': [3, 7]})
+            self.assertEqual(len(list((out / 'bookings' / 'month=2025-01').iterdir())), 2)
+
+            # Only February changed, so only February is streamed and rewritten
+            manifest, stats = self.export(out, manifest, [('2025-01', 3, 7), ('2025-02', 1, 5)],
+                                          [self.booking(4, '2025-02')])
+            self.assertEqual((stats['exported'], stats['rows']), (1, 1))
+            self.assertEqual(manifest['2025-02']['checksum'], [1, 5])
+
+            # January's rows are gone
+            manifest, stats = self.export(out, manifest, [('2025-02', 1, 5)], [])
+            self.assertEqual((stats['exported'], stats['removed']), (0, 1))
+            self.assertEqual([p.name for p in (out / 'bookings').iterdir()], ['month=2025-02'])
+            self.assertEqual(list(manifest), ['2025-02'])
@@ -6,6 +6,7 @@ Smart Locker Booking System
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -49,6 +50,7 @@ JAZZMIN_SETTINGS = {
     # Top menu links
     "topmenu_links": [
         {"name": "Home", "url": "admin:index", "permissions": ["auth.view_user"]},
+        {"name": "Analytics", "url": "admin_analytics", "permissions": ["lockers.view_booking"]},
         {"name": "API Docs", "url": "/api/docs/", "new_window": True},
         {"model": "lockers.Booking"},
         {"app": "lockers"},
@@ -89,6 +91,8 @@ JAZZMIN_SETTINGS = {
         "lockers.QRAccessCode": "fas fa-qrcode",
         "lockers.Notification": "fas fa-bell",
         "lockers.AuditLog": "fas fa-history",
+        "lockers.DemandForecast": "fas fa-chart-line",
+        "lockers.OutboxEvent": "fas fa-paper-plane",
     },
     "default_icon_parents": "fas fa-folder",
     "default_icon_children": "fas fa-circle",
@@ -169,17 +173,34 @@ INSTALLED_APPS = [
 
 # ==================== MIDDLEWARE ====================
 
+# Every request: metrics, CORS, security headers, APPEND_SLASH redirects. The
+# bearer-token API stops there; SiteMiddleware adds SITE_MIDDLEWARE for the
+# admin and everything else.
 MIDDLEWARE = [
+    'api.middleware.QueryCountMiddleware',  # outermost, so every statement is counted
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'api.middleware.SiteMiddleware',
+]
+
+SITE_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Paths that skip SITE_MIDDLEWARE (JWT only: no session, CSRF or messages)
+LEAN_MIDDLEWARE_PATHS = ['/api/']
+
+# The admin's session, auth and messages middleware are in SITE_MIDDLEWARE
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
+# X-DB-Queries response header for load tests (scripts/testing/load_test.py)
+QUERY_COUNT_HEADER = os.getenv('QUERY_COUNT_HEADER', 'False').lower() == 'true'
+
 ROOT_URLCONF = 'lockspot_backend.urls'
 
 TEMPLATES = [
@@ -241,8 +262,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
-        'api.authentication.JWTAuthentication',
+        'api.authentication.JWTAuthentication',  # /api/ has no session middleware
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -269,7 +289,33 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG  # Allow all in development
 
 JWT_SECRET = os.getenv('JWT_SECRET', SECRET_KEY)
 JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_HOURS = 24
+# Access tokens are verified from a per-process cache; refresh tokens are
+# checked, rotated and revocable in the database. The mobile app
+# (lib/services/api_service.dart) does not refresh yet, so access tokens keep
+# their 24 hour lifetime; lower it once every client refreshes.
+JWT_ACCESS_TOKEN_MINUTES = int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', '1440'))
+JWT_REFRESH_TOKEN_DAYS = int(os.getenv('JWT_REFRESH_TOKEN_DAYS', '30'))
+JWT_TOKEN_CACHE_SIZE = 10000
+# How long a worker trusts its copy of a user's is_active / user_type, i.e.
+# how soon a disabled or demoted account loses access with a valid token
+JWT_USER_CHECK_SECONDS = int(os.getenv('JWT_USER_CHECK_SECONDS', '5'))
+
+
+# ==================== QR ACCESS TOKENS ====================
+
+# Shared with locker kiosks, which verify tokens offline. A kiosk holds it, so
+# it must be a secret of its own: never SECRET_KEY or JWT_SECRET. Development
+# (DEBUG) falls back to a fixed insecure value; production must set it.
+QR_TOKEN_SECRET = os.getenv('QR_TOKEN_SECRET') or ('django-insecure-lockspot-dev-qr-secret' if DEBUG else '')
+if not QR_TOKEN_SECRET or QR_TOKEN_SECRET in (SECRET_KEY, JWT_SECRET):
+    raise ImproperlyConfigured(
+        'Set QR_TOKEN_SECRET to a secret used for nothing else (it is shared with the locker kiosks)'
+    )
+QR_TOKEN_EARLY_ACCESS_MINUTES = 15
+
+# Each location's kiosk key (X-Kiosk-Key header) is derived from this secret
+# (manage.py kiosk_key); a kiosk only holds the key of its own location
+KIOSK_API_KEY = os.getenv('KIOSK_API_KEY', '')
 
 
 # ==================== INTERNATIONALIZATION ====================
@@ -289,6 +335,16 @@ STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered QR images (content-addressed, safe to delete at any time)
+QR_IMAGE_CACHE_DIR = Path(os.getenv('QR_IMAGE_CACHE_DIR', MEDIA_ROOT / 'qr'))
+QR_IMAGE_RENDER_WORKERS = int(os.getenv('QR_IMAGE_RENDER_WORKERS', '2'))
+QR_IMAGE_CACHE_MAX_MB = int(os.getenv('QR_IMAGE_CACHE_MAX_MB', '512'))  # least recently used images go first
+
+# Audit entries the database could not take in time (replayed automatically, see api/audit.py)
+AUDIT_SPILL_DIR = Path(os.getenv('AUDIT_SPILL_DIR', BASE_DIR / 'audit_spill'))
+# Reverse proxies whose X-Forwarded-For is believed for the audited client address
+AUDIT_TRUSTED_PROXIES = [ip.strip() for ip in os.getenv('AUDIT_TRUSTED_PROXIES', '').split(',') if ip.strip()]
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
@@ -7,7 +7,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import redirect
-import os
+
+from lockers.dashboard import dashboard_view
 
 
 def root_view(request):
@@ -158,13 +159,11 @@ urlpatterns = [
     path('download/', download_page, name='download'),
     
     # Admin Dashboard
+    path('admin/analytics/', admin.site.admin_view(dashboard_view), name='admin_analytics'),
     path('admin/', admin.site.urls),
     
     # API endpoints
     path('api/', include('api.urls')),
-    
-    # API Documentation (DRF browsable API)
-    path('api-auth/', include('rest_framework.urls')),
 ]
 
 # Serve media files in development
@@ -0,0 +1,512 @@
+"""
+Script Name: bulk_import.py
+Purpose: Load addresses, locations, pricing tiers and locker units from
+         CSV/JSONL files in bulk
+Author: LockSpot Team
+
+Usage:
+    python scripts/database_setup/bulk_import.py [--addresses FILE] [--locations FILE]
+        [--tiers FILE] [--units FILE] [--chunk-size 5000] [--load-data]
+        [--dry-run] [--strict]
+
+Input files are CSV (header row) or JSON Lines, chosen by extension. Columns:
+    addresses  street_address, city, state, zip_code, country, latitude, longitude
+    locations  name, street_address, city, [state, zip_code, country, latitude,
+               longitude,] description, operating_hours_start,
+               operating_hours_end, is_active, contact_phone
+    tiers      name, size, base_price, hourly_rate, daily_rate, weekly_rate,
+               description, is_active
+    units      location, unit_number, size, tier, status, qr_code, notes
+
+A location refers to its address by (street_address, city); an address that
+does not exist yet is created from the location row. A unit refers to its
+location by name and its tier by (tier, size); without a tier the first
+active tier of that size is used.
+
+Every row is validated in memory first. Foreign keys are resolved from
+dictionaries built with one SELECT per table, rows that already exist are
+skipped, and the rest are written with multi-row INSERTs (or LOAD DATA
+LOCAL INFILE with --load-data), one transaction per chunk.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import time as dt_time
+from decimal import Decimal, InvalidOperation
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import mysql.connector  # noqa: E402
+
+from db_utils import DATABASE_CONFIG  # noqa: E402
+
+
+LOCKER_SIZES = ('Small', 'Medium', 'Large')
+LOCKER_STATUSES = ('Available', 'Booked', 'Maintenance', 'OutOfService')
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class RowError(ValueError):
+    """A row that failed validation"""
+
+
+# ==================== READING ====================
+
+def read_rows(path):
+    """Yield (line number, row dict) from a CSV or JSONL file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson', '.json')):
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+        else:
+            # Line 1 is the header
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield line_no, row
+
+
+# ==================== VALIDATION ====================
+
+def _text(row, field, max_length, required=False, default=None):
+    value = row.get(field)
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        if required:
+            raise RowError(f'{field} is required')
+        return default
+    if len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _decimal(row, field, digits, places, required=False, default=None, minimum=None, maximum=None):
+    value = row.get(field)
+    if value is None or str(value).strip() == '':
+        if required:
+            raise RowError(f'{field} is required')
+        return default
+    try:
+        number = Decimal(str(value).strip()).quantize(Decimal(1).scaleb(-places))
+    except InvalidOperation:
+        raise RowError(f'{field} is not a number: {value!r}')
+    if len(number.as_tuple().digits) > digits:
+        raise RowError(f'{field} has too many digits: {value!r}')
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise RowError(f'{field} is out of range: {value!r}')
+    return number
+
+
+def _bool(row, field, default=True):
+    value = row.get(field)
+    if value is None or str(value).strip() == '':
+        return int(default)
+    if isinstance(value, bool):
+        return int(value)
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y'):
+        return 1
+    if text in ('0', 'false', 'no', 'n'):
+        return 0
+    raise RowError(f'{field} is not a boolean: {value!r}')
+
+
+def _time(row, field, default):
+    value = _text(row, field, 8, default=default)
+    try:
+        return dt_time.fromisoformat(value).strftime('%H:%M:%S')
+    except ValueError:
+        raise RowError(f'{field} is not a time: {value!r}')
+
+
+def _choice(row, field, choices, required=True, default=None):
+    value = _text(row, field, 15, required=required, default=default)
+    if value is not None:
+        # Accept any capitalisation of a known choice
+        matches = [c for c in choices if c.lower() == value.lower()]
+        if not matches:
+            raise RowError(f'{field} must be one of {", ".join(choices)}')
+        value = matches[0]
+    return value
+
+
+def parse_address(row):
+    return {
+        'street_address': _text(row, 'street_address', 255, required=True),
+        'city': _text(row, 'city', 50, required=True),
+        'state': _text(row, 'state', 50),
+        'zip_code': _text(row, 'zip_code', 10),
+        'country': _text(row, 'country', 50, default='Saudi Arabia'),
+        'latitude': _decimal(row, 'latitude', 10, 8, minimum=-90, maximum=90),
+        'longitude': _decimal(row, 'longitude', 11, 8, minimum=-180, maximum=180),
+    }
+
+
+def parse_location(row):
+    return {
+        'name': _text(row, 'name', 100, required=True),
+        'address': parse_address(row),
+        'description': _text(row, 'description', 65535),
+        'operating_hours_start': _time(row, 'operating_hours_start', '08:00:00'),
+        'operating_hours_end': _time(row, 'operating_hours_end', '22:00:00'),
+        'is_active': _bool(row, 'is_active'),
+        'contact_phone': _text(row, 'contact_phone', 20),
+    }
+
+
+def parse_tier(row):
+    return {
+        'name': _text(row, 'name', 50, required=True),
+        'size': _choice(row, 'size', LOCKER_SIZES),
+        'base_price': _decimal(row, 'base_price', 10, 2, default=Decimal('0.00'), minimum=0),
+        'hourly_rate': _decimal(row, 'hourly_rate', 10, 2, required=True, minimum=0),
+        'daily_rate': _decimal(row, 'daily_rate', 10, 2, required=True, minimum=0),
+        'weekly_rate': _decimal(row, 'weekly_rate', 10, 2, minimum=0),
+        'description': _text(row, 'description', 255),
+        'is_active': _bool(row, 'is_active'),
+    }
+
+
+def parse_unit(row):
+    return {
+        'location': _text(row, 'location', 100, required=True),
+        'unit_number': _text(row, 'unit_number', 10, required=True),
+        'size': _choice(row, 'size', LOCKER_SIZES),
+        'tier': _text(row, 'tier', 50),
+        'status': _choice(row, 'status', LOCKER_STATUSES, required=False, default='Available'),
+        'qr_code': _text(row, 'qr_code', 255),
+        'notes': _text(row, 'notes', 65535),
+    }
+
+
+def load_file(path, parse, errors):
+    """Parse every row of a file; bad rows are recorded in `errors` and skipped"""
+    rows = []
+    for line_no, raw in read_rows(path):
+        try:
+            rows.append(parse(raw))
+        except RowError as e:
+            errors.append(f'{os.path.basename(path)}:{line_no}: {e}')
+    return rows
+
+
+# ==================== KEY MAPS ====================
+# One SELECT per table; foreign keys are then resolved in Python.
+
+def address_key(address):
+    return address['street_address'].lower(), address['city'].lower()
+
+
+def fetch_keys(cursor, table):
+    if table == 'lockers_locationaddress':
+        cursor.execute("SELECT id, street_address, city FROM lockers_locationaddress")
+        return {(street.lower(), city.lower()): pk for pk, street, city in cursor}
+    if table == 'lockers_lockerlocation':
+        cursor.execute("SELECT id, name FROM lockers_lockerlocation")
+        return {name.lower(): pk for pk, name in cursor}
+    if table == 'lockers_pricingtier':
+        cursor.execute("SELECT id, name, size, is_active FROM lockers_pricingtier ORDER BY id")
+        return {(name.lower(), size): (pk, bool(active)) for pk, name, size, active in cursor}
+    if table == 'lockers_lockerunit':
+        cursor.execute("SELECT location_id, unit_number, qr_code FROM lockers_lockerunit")
+        units, qr_codes = set(), set()
+        for location_id, unit_number, qr_code in cursor:
+            units.add((location_id, unit_number.lower()))
+            if qr_code:
+                qr_codes.add(qr_code)
+        return units, qr_codes
+    raise ValueError(table)
+
+
+# ==================== WRITING ====================
+
+class TableLoad:
+    """Columns of one table and the rows waiting to be written"""
+
+    def __init__(self, table, columns, timestamps=('created_at', 'updated_at')):
+        self.table = table
+        self.columns = columns
+        self.timestamps = timestamps
+        self.rows = []
+        self.skipped = 0
+        self.seconds = 0.0
+
+
+def insert_chunks(conn, load, chunk_size):
+    """Multi-row INSERT, committed once per chunk"""
+    columns = ', '.join(load.columns + list(load.timestamps))
+    values = '(' + ', '.join(['%s'] * len(load.columns) + ['NOW()'] * len(load.timestamps)) + ')'
+    cursor = conn.cursor()
+    for start in range(0, len(load.rows), chunk_size):
+        chunk = load.rows[start:start + chunk_size]
+        cursor.execute(
+            f"INSERT INTO {load.table} ({columns}) VALUES {', '.join([values] * len(chunk))}",
+            [value for row in chunk for value in row],
+        )
+        conn.commit()
+    cursor.close()
+
+
+def _tsv_value(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def load_data_chunks(conn, load, chunk_size):
+    """LOAD DATA LOCAL INFILE from a temporary TSV file, committed once per chunk"""
+    now = ', '.join(f'{column} = NOW()' for column in load.timestamps)
+    cursor = conn.cursor()
+    for start in range(0, len(load.rows), chunk_size):
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', delete=False) as f:
+            for row in load.rows[start:start + chunk_size]:
+                f.write('\t'.join(_tsv_value(v) for v in row) + '\n')
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {load.table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(load.columns)})" + (f" SET {now}" if now else ''),
+                (f.name,),
+            )
+            conn.commit()
+        finally:
+            os.unlink(f.name)
+    cursor.close()
+
+
+def write_table(conn, load, chunk_size, use_load_data):
+    if not load.rows:
+        return
+    start = time.perf_counter()
+    (load_data_chunks if use_load_data else insert_chunks)(conn, load, chunk_size)
+    load.seconds = time.perf_counter() - start
+    rate = len(load.rows) / load.seconds if load.seconds else 0
+    print(f"  ✓ {load.table}: {len(load.rows):,} rows in {load.seconds:.2f} s ({rate:,.0f} rows/s)")
+
+
+# ==================== IMPORT ====================
+
+def build_addresses(addresses, locations, known):
+    load = TableLoad('lockers_locationaddress', [
+        'street_address', 'city', 'state', 'zip_code', 'country', 'latitude', 'longitude',
+    ], timestamps=())
+    seen = set(known)
+    for address in addresses + [location['address'] for location in locations]:
+        key = address_key(address)
+        if key in seen:
+            load.skipped += 1
+            continue
+        seen.add(key)
+        load.rows.append([address[c] for c in load.columns])
+    return load
+
+
+def build_locations(locations, address_ids, known, errors):
+    load = TableLoad('lockers_lockerlocation', [
+        'name', 'address_id', 'description', 'operating_hours_start', 'operating_hours_end',
+        'is_active', 'contact_phone',
+    ])
+    seen = set(known)
+    for location in locations:
+        key = location['name'].lower()
+        if key in seen:
+            load.skipped += 1
+            continue
+        address_id = address_ids.get(address_key(location['address']))
+        if address_id is None:
+            errors.append(f"location {location['name']!r}: address was not created")
+            continue
+        seen.add(key)
+        load.rows.append([address_id if c == 'address_id' else location[c] for c in load.columns])
+    return load
+
+
+def build_tiers(tiers, known):
+    load = TableLoad('lockers_pricingtier', [
+        'name', 'size', 'base_price', 'hourly_rate', 'daily_rate', 'weekly_rate',
+        'description', 'is_active',
+    ], timestamps=('created_at',))
+    seen = set(known)
+    for tier in tiers:
+        key = (tier['name'].lower(), tier['size'])
+        if key in seen:
+            load.skipped += 1
+            continue
+        seen.add(key)
+        load.rows.append([tier[c] for c in load.columns])
+    return load
+
+
+def build_units(units, location_ids, tier_ids, known, errors):
+    load = TableLoad('lockers_lockerunit', [
+        'location_id', 'tier_id', 'unit_number', 'size', 'status', 'qr_code', 'notes',
+    ])
+    existing_units, qr_codes = known
+    default_tiers = {}
+    for (name, size), (pk, active) in tier_ids.items():
+        if active:
+            default_tiers.setdefault(size, pk)
+
+    seen = set(existing_units)
+    for unit in units:
+        location_id = location_ids.get(unit['location'].lower())
+        if location_id is None:
+            errors.append(f"unit {unit['unit_number']!r}: unknown location {unit['location']!r}")
+            continue
+        if unit['tier']:
+            tier_id = tier_ids.get((unit['tier'].lower(), unit['size']), (None, False))[0]
+        else:
+            tier_id = default_tiers.get(unit['size'])
+        if tier_id is None:
+            errors.append(f"unit {unit['location']}/{unit['unit_number']}: "
+                          f"no {unit['size']} tier {unit['tier'] or ''}".rstrip())
+            continue
+        key = (location_id, unit['unit_number'].lower())
+        if key in seen:
+            load.skipped += 1
+            continue
+        if unit['qr_code'] and unit['qr_code'] in qr_codes:
+            errors.append(f"unit {unit['location']}/{unit['unit_number']}: "
+                          f"qr_code {unit['qr_code']!r} is already in use")
+            continue
+        seen.add(key)
+        if unit['qr_code']:
+            qr_codes.add(unit['qr_code'])
+        load.rows.append([
+            location_id, tier_id, unit['unit_number'], unit['size'], unit['status'],
+            unit['qr_code'], unit['notes'],
+        ])
+    return load
+
+
+def _placeholder_ids(load, key):
+    # A dry run has no ids for new rows; negative ones let later tables resolve them
+    return {key(row): -i for i, row in enumerate(load.rows, 1)}
+
+
+def connect(use_load_data):
+    if use_load_data:
+        return mysql.connector.connect(**DATABASE_CONFIG, allow_local_infile=True)
+    return mysql.connector.connect(**DATABASE_CONFIG)
+
+
+def run_import(args):
+    errors = []
+    parsed = {}
+    start = time.perf_counter()
+    for name, parse in (('addresses', parse_address), ('locations', parse_location),
+                        ('tiers', parse_tier), ('units', parse_unit)):
+        path = getattr(args, name)
+        parsed[name] = load_file(path, parse, errors) if path else []
+        if path:
+            print(f"  ✓ Read {len(parsed[name]):,} {name} from {path}")
+    print(f"  Validated in {time.perf_counter() - start:.2f} s")
+
+    if errors and args.strict:
+        return errors, []
+
+    conn = connect(args.load_data)
+    loads = []
+    try:
+        cursor = conn.cursor()
+
+        address_ids = fetch_keys(cursor, 'lockers_locationaddress')
+        load = build_addresses(parsed['addresses'], parsed['locations'], address_ids)
+        loads.append(load)
+        if not args.dry_run:
+            write_table(conn, load, args.chunk_size, args.load_data)
+            if load.rows:
+                address_ids = fetch_keys(cursor, 'lockers_locationaddress')
+        else:
+            address_ids.update(_placeholder_ids(load, lambda row: (row[0].lower(), row[1].lower())))
+
+        location_ids = fetch_keys(cursor, 'lockers_lockerlocation')
+        load = build_locations(parsed['locations'], address_ids, location_ids, errors)
+        loads.append(load)
+        if not args.dry_run:
+            write_table(conn, load, args.chunk_size, args.load_data)
+            if load.rows:
+                location_ids = fetch_keys(cursor, 'lockers_lockerlocation')
+        else:
+            location_ids.update(_placeholder_ids(load, lambda row: row[0].lower()))
+
+        tier_ids = fetch_keys(cursor, 'lockers_pricingtier')
+        load = build_tiers(parsed['tiers'], tier_ids)
+        loads.append(load)
+        if not args.dry_run:
+            write_table(conn, load, args.chunk_size, args.load_data)
+            if load.rows:
+                tier_ids = fetch_keys(cursor, 'lockers_pricingtier')
+        else:
+            tier_ids.update({key: (pk, True) for key, pk in
+                             _placeholder_ids(load, lambda row: (row[0].lower(), row[1])).items()})
+
+        load = build_units(parsed['units'], location_ids, tier_ids,
+                           fetch_keys(cursor, 'lockers_lockerunit'), errors)
+        loads.append(load)
+        if not args.dry_run:
+            write_table(conn, load, args.chunk_size, args.load_data)
+
+        cursor.close()
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return errors, loads
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import locations, lockers and pricing')
+    parser.add_argument('--addresses', help='CSV/JSONL file of addresses')
+    parser.add_argument('--locations', help='CSV/JSONL file of locations')
+    parser.add_argument('--tiers', help='CSV/JSONL file of pricing tiers')
+    parser.add_argument('--units', help='CSV/JSONL file of locker units')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Rows per INSERT statement and transaction')
+    parser.add_argument('--load-data', action='store_true',
+                        help='Write with LOAD DATA LOCAL INFILE (server needs local_infile=ON)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and resolve keys only')
+    parser.add_argument('--strict', action='store_true', help='Write nothing if any row fails validation')
+    args = parser.parse_args()
+
+    if not any((args.addresses, args.locations, args.tiers, args.units)):
+        parser.error('nothing to import')
+
+    print("Bulk import" + (" (dry run)" if args.dry_run else ""))
+    start = time.perf_counter()
+    errors, loads = run_import(args)
+    elapsed = time.perf_counter() - start
+
+    for error in errors[:50]:
+        print(f"  ❌ {error}")
+    if len(errors) > 50:
+        print(f"  ... and {len(errors) - 50:,} more errors")
+
+    if not loads:
+        print(f"\n❌ {len(errors):,} invalid rows, nothing written")
+        sys.exit(1)
+
+    print("\nSummary:")
+    written = 0
+    for load in loads:
+        verb = 'to write' if args.dry_run else 'written'
+        print(f"  {load.table:<26} {len(load.rows):>10,} {verb}, {load.skipped:,} already present")
+        written += len(load.rows)
+    if not args.dry_run:
+        rate = written / elapsed if elapsed else 0
+        print(f"\n✅ {written:,} rows in {elapsed:.2f} s ({rate:,.0f} rows/s overall)")
+    if errors:
+        print(f"⚠️  {len(errors):,} rows skipped")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
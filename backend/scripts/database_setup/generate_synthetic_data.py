@@ -0,0 +1,563 @@
+"""
+Script Name: generate_synthetic_data.py
+Purpose: Generate a production-sized synthetic dataset for benchmarking
+Author: LockSpot Team
+
+Usage:
+    python scripts/database_setup/generate_synthetic_data.py [--users 1000000]
+        [--locations 2000] [--lockers-per-location 40] [--bookings 50000000]
+        [--days 730] [--workers 8] [--batch-size 5000] [--seed 42] [--dry-run]
+
+Rows get explicit ids above the current MAX(id) of each table, so worker
+processes can generate users, lockers and bookings independently and still
+produce consistent foreign keys. Every table is written with
+DatabaseConnection.execute_many, which mysql-connector turns into multi-row
+INSERTs. Distributions:
+    - location and customer popularity follow a Zipf-like curve; a
+      location gets at most the bookings that keep its lockers
+      MAX_OCCUPANCY busy on average, the rest go to the next most popular
+    - booking volume grows over the period, with a weekly cycle and a
+      diurnal start-time profile (morning and evening peaks)
+    - durations range from 1 hour to a week, most under 8 hours
+    - past bookings are Completed, Cancelled (--cancel-rate) or Expired;
+      running ones are Active, future ones Pending/Confirmed
+Every booking except Pending gets a payment and Unlock/Lock QR codes; a
+share of completed bookings gets a review, and notifications are added at
+--notifications-per-booking.
+
+Bookings never overlap on a locker (except Cancelled ones, which hold
+nothing): each booking task covers whole locations and places every booking
+on a locker of its location that is free for the whole [start, end). A
+booking that finds every locker taken PLACEMENT_ATTEMPTS times is written
+as Cancelled.
+
+--dry-run generates everything without a database to measure generation speed.
+"""
+
+import argparse
+import bisect
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from db_utils import DatabaseConnection  # noqa: E402
+
+
+USER_TASK_SIZE = 50000
+BOOKING_TASK_SIZE = 50000
+MAX_OCCUPANCY = 0.5
+PLACEMENT_ATTEMPTS = 5
+SYNTHETIC_PASSWORD = 'synthetic-pass'
+
+CITIES = [
+    ('Riyadh', 'Saudi Arabia', 24.7136, 46.6753),
+    ('Jeddah', 'Saudi Arabia', 21.4858, 39.1925),
+    ('Mecca', 'Saudi Arabia', 21.3891, 39.8579),
+    ('Medina', 'Saudi Arabia', 24.5247, 39.5692),
+    ('Dammam', 'Saudi Arabia', 26.4207, 50.0888),
+    ('Khobar', 'Saudi Arabia', 26.2172, 50.1971),
+    ('Cairo', 'Egypt', 30.0444, 31.2357),
+    ('Giza', 'Egypt', 30.0131, 31.2089),
+    ('Alexandria', 'Egypt', 31.2001, 29.9187),
+    ('New Cairo', 'Egypt', 30.0283, 31.4190),
+]
+SITES = ['Mall', 'Airport', 'Station', 'University', 'Tower', 'Boulevard', 'Market', 'Hospital']
+FIRST_NAMES = ['Ahmed', 'Mohamed', 'Omar', 'Sara', 'Fatima', 'Khalid', 'Noura', 'Youssef',
+               'Layla', 'Hassan', 'Mariam', 'Ali', 'Huda', 'Tariq', 'Reem', 'Karim']
+LAST_NAMES = ['Al-Saud', 'Hassan', 'Ibrahim', 'Mahmoud', 'Al-Harbi', 'Farouk', 'Nasser',
+              'Al-Qahtani', 'Salem', 'Mostafa', 'Al-Ghamdi', 'Fawzy']
+
+# Relative share of booking starts per hour of day
+HOURLY_WEIGHTS = [1, 0.5, 0.3, 0.2, 0.2, 0.5, 2, 4, 6, 8, 9, 9,
+                  8, 7, 7, 7, 8, 10, 11, 10, 8, 6, 4, 2]
+# Monday..Sunday
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.05, 1.3, 1.35, 1.1]
+DURATION_HOURS = [1, 2, 3, 4, 6, 8, 12, 24, 48, 72, 168]
+DURATION_WEIGHTS = [18, 22, 16, 12, 9, 7, 5, 6, 3, 1.5, 0.5]
+RATING_WEIGHTS = list(itertools.accumulate([3, 4, 10, 30, 53]))
+LOCKER_SIZES = ('Small', 'Medium', 'Large')
+ZERO = Decimal('0.00')
+
+
+def zipf_cum_weights(n, s):
+    """Cumulative weights for ranks 1..n with P(rank) ~ 1 / rank**s"""
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def task_seed(plan, *parts):
+    # Stable across processes, unlike hash() of a str
+    return zlib.crc32(repr((plan.args.seed,) + parts).encode())
+
+
+def pick(rng, cum_weights):
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def locker_size(slot):
+    # 40% Small, 35% Medium, 25% Large within every location
+    slot %= 20
+    return 'Small' if slot < 8 else 'Medium' if slot < 15 else 'Large'
+
+
+def location_capacity(args):
+    """Bookings per location that keep its lockers MAX_OCCUPANCY busy on average"""
+    hours = (args.days + future_days(args)) * 24
+    mean_duration = sum(h * w for h, w in zip(DURATION_HOURS, DURATION_WEIGHTS)) / sum(DURATION_WEIGHTS)
+    held = max(0.01, 1 - args.cancel_rate)
+    return int(args.lockers_per_location * hours * MAX_OCCUPANCY / mean_duration / held)
+
+
+def future_days(args):
+    # The last 2% of bookings are upcoming
+    return max(1, args.days // 50)
+
+
+def chunks(total, size):
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def booking_price(tier, hours):
+    if hours >= 24:
+        return tier['daily_rate'] * math.ceil(hours / 24)
+    return tier['hourly_rate'] * hours
+
+
+# ==================== PLAN ====================
+
+class Plan:
+    """Everything a worker needs to generate its slice without the database"""
+
+    def __init__(self, args, bases, tiers, now, password_hash):
+        self.args = args
+        self.bases = bases
+        self.tiers = tiers
+        self.now = now
+        self.password_hash = password_hash
+        self.start = now - timedelta(days=args.days)
+
+        rng = random.Random(args.seed)
+        # Popularity rank -> location / user index, shuffled so rank is not id order
+        self.location_order = list(range(args.locations))
+        rng.shuffle(self.location_order)
+        self.user_order = list(range(args.users))
+        rng.shuffle(self.user_order)
+        self.user_weights = zipf_cum_weights(args.users, 0.8)
+
+        # Bookings are numbered location by location: location i gets indexes
+        # [location_starts[i], location_starts[i + 1])
+        counts = [0] * args.locations
+        capacity, remaining = location_capacity(args), args.bookings
+        weights = [1.0 / (rank ** 1.1) for rank in range(1, args.locations + 1)]
+        weight_left = sum(weights)
+        for location_index, weight in zip(self.location_order, weights):
+            counts[location_index] = min(capacity, remaining, round(remaining * weight / weight_left))
+            remaining -= counts[location_index]
+            weight_left -= weight
+        self.location_starts = [0] + list(itertools.accumulate(counts))
+
+        # Volume grows ~3x over the period
+        self.day_weights = list(itertools.accumulate(
+            (1 + 2 * day / args.days) * WEEKDAY_WEIGHTS[(self.start + timedelta(days=day)).weekday()]
+            for day in range(args.days + future_days(args))
+        ))
+        self.hour_weights = list(itertools.accumulate(HOURLY_WEIGHTS))
+        self.duration_weights = list(itertools.accumulate(DURATION_WEIGHTS))
+
+        # (subtotal, (discount, total) with 10% off) per size and duration
+        self.prices = {}
+        for size, tier in tiers.items():
+            self.prices[size] = []
+            for hours in DURATION_HOURS:
+                subtotal = tier['base_price'] + booking_price(tier, hours)
+                discount = (subtotal * Decimal('0.10')).quantize(Decimal('0.01'))
+                self.prices[size].append((subtotal, (discount, subtotal - discount)))
+
+    def user_id(self, index):
+        return self.bases['auth_user'] + 1 + index
+
+    def locker_id(self, location_index, slot):
+        return self.bases['lockers_lockerunit'] + 1 + location_index * self.args.lockers_per_location + slot
+
+    def booking_tasks(self, size):
+        """(start, end) index ranges of about `size` bookings that never split a location"""
+        tasks, start = [], 0
+        for end in self.location_starts[1:]:
+            if end - start >= size:
+                tasks.append((start, end))
+                start = end
+        if start < self.location_starts[-1]:
+            tasks.append((start, self.location_starts[-1]))
+        return tasks
+
+
+_plan = None
+
+
+def _init_worker(plan):
+    global _plan
+    _plan = plan
+
+
+# ==================== WRITING ====================
+
+COLUMNS = {
+    'lockers_locationaddress': ['id', 'street_address', 'city', 'country', 'latitude', 'longitude'],
+    'lockers_lockerlocation': ['id', 'name', 'address_id', 'description', 'operating_hours_start',
+                               'operating_hours_end', 'is_active', 'contact_phone', 'created_at',
+                               'updated_at'],
+    'lockers_lockerunit': ['id', 'location_id', 'tier_id', 'unit_number', 'size', 'status',
+                           'qr_code', 'created_at', 'updated_at'],
+    'auth_user': ['id', 'password', 'is_superuser', 'email', 'first_name', 'last_name', 'phone',
+                  'user_type', 'is_verified', 'is_staff', 'is_active', 'created_at', 'updated_at'],
+    'lockers_paymentmethod': ['id', 'user_id', 'method_type', 'card_last_four', 'card_holder_name',
+                              'expiry_month', 'expiry_year', 'wallet_phone', 'is_default',
+                              'is_active', 'created_at'],
+    'lockers_booking': ['id', 'user_id', 'locker_id', 'start_time', 'end_time', 'booking_type',
+                        'subtotal_amount', 'discount_amount', 'total_amount', 'status',
+                        'cancellation_reason', 'created_at', 'updated_at'],
+    'lockers_payment': ['booking_id', 'method_id', 'amount', 'payment_date', 'transaction_reference',
+                        'status', 'refund_amount', 'refund_date', 'processed_by'],
+    'lockers_review': ['booking_id', 'rating', 'title', 'comment', 'is_verified', 'created_at',
+                       'updated_at'],
+    'lockers_qraccesscode': ['booking_id', 'location_id', 'code', 'code_type', 'generated_at',
+                             'expires_at', 'used_at', 'is_used'],
+    'lockers_notification': ['user_id', 'title', 'message', 'notification_type',
+                             'related_booking_id', 'is_read', 'read_at', 'created_at'],
+}
+
+
+class BatchWriter:
+    """Buffers rows per table and flushes them with execute_many"""
+
+    def __init__(self, batch_size, dry_run):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.buffers = {}
+        self.counts = Counter()
+
+    def add(self, table, row):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in ([table] if table else list(self.buffers)):
+            rows = self.buffers.get(name)
+            if not rows:
+                continue
+            if not self.dry_run:
+                columns = COLUMNS[name]
+                DatabaseConnection.execute_many(
+                    f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                    rows,
+                )
+            self.counts[name] += len(rows)
+            self.buffers[name] = []
+
+
+# ==================== GENERATORS ====================
+
+def generate_locations(plan, writer):
+    """Addresses, locations and their lockers (small enough for one process)"""
+    args, rng = plan.args, random.Random(task_seed(plan, 'locations'))
+    for index in range(args.locations):
+        address_id = plan.bases['lockers_locationaddress'] + 1 + index
+        location_id = plan.bases['lockers_lockerlocation'] + 1 + index
+        city, country, lat, lng = CITIES[index % len(CITIES)]
+        site = SITES[rng.randrange(len(SITES))]
+        created = plan.start - timedelta(days=rng.randint(0, 365))
+        writer.add('lockers_locationaddress', (
+            address_id, f'{rng.randint(1, 999)} {site} Road', city, country,
+            round(lat + rng.uniform(-0.2, 0.2), 8), round(lng + rng.uniform(-0.2, 0.2), 8),
+        ))
+        writer.add('lockers_lockerlocation', (
+            location_id, f'{city} {site} #{location_id}', address_id,
+            f'Synthetic locker station in {city}', '06:00:00', '23:00:00', 1,
+            f'+999{location_id:010d}', created, created,
+        ))
+        for slot in range(args.lockers_per_location):
+            locker_id = plan.locker_id(index, slot)
+            size = locker_size(slot)
+            writer.add('lockers_lockerunit', (
+                locker_id, location_id, plan.tiers[size]['id'], f'{size[0]}{slot + 1:03d}', size,
+                'Available', f'SYN-LOCKER-{locker_id}', created, created,
+            ))
+
+
+def generate_users(task):
+    """Users [start, end) with one payment method each"""
+    start, end = task
+    plan = _plan
+    rng = random.Random(task_seed(plan, 'users', start))
+    writer = BatchWriter(plan.args.batch_size, plan.args.dry_run)
+    began = time.perf_counter()
+    for index in range(start, end):
+        user_id = plan.user_id(index)
+        method_id = plan.bases['lockers_paymentmethod'] + 1 + index
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        created = plan.start - timedelta(days=180) + timedelta(seconds=rng.randrange(
+            int((plan.now - plan.start).total_seconds()) + 180 * 86400))
+        writer.add('auth_user', (
+            user_id, plan.password_hash, 0, f'user{user_id}@synthetic.lockspot.test', first, last,
+            f'+999{user_id:010d}', 'Customer', int(rng.random() < 0.7), 0, 1, created, created,
+        ))
+        if rng.random() < 0.3:
+            method = ('MobileWallet', None, None, None, None, f'+999{user_id:010d}')
+        else:
+            method = (rng.choice(('Visa', 'Mastercard')), f'{rng.randrange(10000):04d}', f'{first} {last}',
+                      rng.randint(1, 12), plan.now.year + rng.randint(1, 5), None)
+        writer.add('lockers_paymentmethod', (method_id, user_id) + method + (1, 1, created))
+    writer.flush()
+    return writer.counts, time.perf_counter() - began
+
+
+def booking_times(plan, rng):
+    day = pick(rng, plan.day_weights)
+    hour = pick(rng, plan.hour_weights)
+    start = (plan.start + timedelta(days=day)).replace(hour=hour, minute=0, second=0, microsecond=0)
+    start += timedelta(minutes=rng.randrange(60))
+    duration = pick(rng, plan.duration_weights)
+    end = start + timedelta(hours=DURATION_HOURS[duration])
+    created = max(start - timedelta(minutes=rng.randrange(3 * 24 * 60)), plan.start)
+    return start, end, min(created, start), duration
+
+
+def booking_status(plan, rng, start, end):
+    args, now = plan.args, plan.now
+    if rng.random() < args.cancel_rate:
+        return 'Cancelled'
+    if end <= now:
+        return 'Expired' if rng.random() < 0.03 else 'Completed'
+    if start <= now:
+        return 'Active'
+    return 'Pending' if rng.random() < 0.2 else 'Confirmed'
+
+
+def place(busy, lockers, rng, start, end):
+    """Slot of a locker free over [start, end), trying all `lockers` from a random one"""
+    first = rng.randrange(lockers)
+    for offset in range(lockers):
+        slot = (first + offset) % lockers
+        # Bookings of a locker, sorted and disjoint, so their ends are sorted too
+        starts, ends = busy.setdefault(slot, ([], []))
+        i = bisect.bisect_left(starts, end)
+        if i == 0 or ends[i - 1] <= start:
+            starts.insert(i, start)
+            ends.insert(i, end)
+            return slot
+    return None
+
+
+def generate_bookings(task):
+    """Bookings [start, end) with payments, QR codes, reviews and notifications"""
+    start_index, end_index = task
+    plan = _plan
+    args = plan.args
+    rng = random.Random(task_seed(plan, 'bookings', start_index))
+    writer = BatchWriter(args.batch_size, args.dry_run)
+    began = time.perf_counter()
+    location_index = bisect.bisect_right(plan.location_starts, start_index) - 1
+    busy = {}
+
+    for index in range(start_index, end_index):
+        booking_id = plan.bases['lockers_booking'] + 1 + index
+        user_index = plan.user_order[pick(rng, plan.user_weights)]
+        user_id = plan.user_id(user_index)
+        while index >= plan.location_starts[location_index + 1]:
+            location_index += 1
+            busy = {}
+        location_id = plan.bases['lockers_lockerlocation'] + 1 + location_index
+
+        for _ in range(PLACEMENT_ATTEMPTS):
+            start, end, created, duration = booking_times(plan, rng)
+            status = booking_status(plan, rng, start, end)
+            slot = (rng.randrange(args.lockers_per_location) if status == 'Cancelled'
+                    else place(busy, args.lockers_per_location, rng, start, end))
+            if slot is not None:
+                break
+        else:
+            status, slot = 'Cancelled', rng.randrange(args.lockers_per_location)
+        size = locker_size(slot)
+        subtotal, discounted = plan.prices[size][duration]
+        discount, total = discounted if rng.random() < 0.1 else (ZERO, subtotal)
+        if status == 'Cancelled':
+            updated = min(created + timedelta(minutes=rng.randrange(1, 24 * 60)), plan.now)
+        else:
+            updated = min(end, plan.now) if status in ('Completed', 'Expired', 'Active') else created
+        writer.add('lockers_booking', (
+            booking_id, user_id, plan.locker_id(location_index, slot), start, end,
+            'Delivery' if rng.random() < 0.05 else 'Storage', subtotal, discount, total, status,
+            'Change of plans' if status == 'Cancelled' else None, created, updated,
+        ))
+
+        if status != 'Pending':
+            refunded = status == 'Cancelled'
+            writer.add('lockers_payment', (
+                booking_id, plan.bases['lockers_paymentmethod'] + 1 + user_index, total, created,
+                f'SYN-TXN-{booking_id}', 'Refunded' if refunded else 'Success',
+                total if refunded else None, updated if refunded else None, 'synthetic',
+            ))
+            opened = status in ('Active', 'Completed')
+            for code_type, used_at in (('Unlock', start), ('Lock', end)):
+                used = opened and used_at <= plan.now
+                writer.add('lockers_qraccesscode', (
+                    booking_id, location_id, f'SYN-{booking_id}-{code_type[0]}', code_type, created, end,
+                    used_at if used else None, int(used),
+                ))
+
+        if status == 'Completed' and rng.random() < args.review_rate:
+            rating = pick(rng, RATING_WEIGHTS) + 1
+            reviewed = end + timedelta(hours=rng.randint(1, 72))
+            writer.add('lockers_review', (
+                booking_id, rating, None, 'Great service' if rating >= 4 else 'Could be better', 1,
+                reviewed, reviewed,
+            ))
+
+        notifications = int(args.notifications_per_booking)
+        if rng.random() < args.notifications_per_booking - notifications:
+            notifications += 1
+        for n in range(notifications):
+            kind, title = (('Booking', 'Booking confirmed'), ('Reminder', 'Booking ending soon'),
+                           ('Payment', 'Payment received'))[n % 3]
+            sent = created if n == 0 else min(end - timedelta(minutes=30), plan.now)
+            read = sent < plan.now - timedelta(days=2) or rng.random() < 0.5
+            writer.add('lockers_notification', (
+                user_id, title, f'{title} for booking #{booking_id}', kind, booking_id,
+                int(read), sent + timedelta(minutes=rng.randint(1, 600)) if read else None, sent,
+            ))
+
+    writer.flush()
+    return writer.counts, time.perf_counter() - began
+
+
+# ==================== DRIVER ====================
+
+def load_plan_inputs(args):
+    """Current MAX(id) per table, the tier used per size and the database clock"""
+    if args.dry_run:
+        bases = {table: 0 for table in COLUMNS}
+        tiers = {size: {'id': i + 1, 'base_price': Decimal('0.00'), 'hourly_rate': Decimal(5 + 3 * i),
+                        'daily_rate': Decimal(35 + 20 * i)} for i, size in enumerate(LOCKER_SIZES)}
+        return bases, tiers, datetime.now().replace(microsecond=0)
+
+    bases = {}
+    for table in ('lockers_locationaddress', 'lockers_lockerlocation', 'lockers_lockerunit',
+                  'auth_user', 'lockers_paymentmethod', 'lockers_booking'):
+        row = DatabaseConnection.execute_query_one(f"SELECT COALESCE(MAX(id), 0) AS max_id FROM {table}")
+        bases[table] = row['max_id']
+
+    tiers = {}
+    for row in DatabaseConnection.execute_query(
+        "SELECT id, size, base_price, hourly_rate, daily_rate FROM lockers_pricingtier "
+        "WHERE is_active = 1 ORDER BY id"
+    ):
+        tiers.setdefault(row['size'], row)
+    missing = [size for size in LOCKER_SIZES if size not in tiers]
+    if missing:
+        raise RuntimeError(f"No active pricing tier for {', '.join(missing)}; "
+                           f"load tiers first (bulk_import.py --tiers)")
+
+    now = DatabaseConnection.execute_query_one("SELECT NOW() AS now")['now']
+    return bases, tiers, now
+
+
+def make_password_hash():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lockspot_backend.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.hashers import make_password
+    # One hash for every synthetic user; hashing a million passwords would dominate the run
+    return make_password(SYNTHETIC_PASSWORD)
+
+
+def run_parallel(pool, label, func, tasks, totals):
+    total = sum(end - start for start, end in tasks)
+    began = time.perf_counter()
+    done = 0
+    for counts, _ in pool.imap_unordered(func, tasks):
+        totals.update(counts)
+        done += 1
+        print(f"\r  {label}: {done}/{len(tasks)} chunks", end='', flush=True)
+    elapsed = time.perf_counter() - began
+    if tasks:
+        print(f"\r  ✓ {label}: {total:,} in {elapsed:.1f} s ({total / elapsed:,.0f}/s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic LockSpot dataset')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--locations', type=int, default=500)
+    parser.add_argument('--lockers-per-location', type=int, default=40)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=730, help='Length of the booking history')
+    parser.add_argument('--cancel-rate', type=float, default=0.12)
+    parser.add_argument('--review-rate', type=float, default=0.25, help='Share of completed bookings reviewed')
+    parser.add_argument('--notifications-per-booking', type=float, default=1.5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per execute_many call')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dry-run', action='store_true', help='Generate rows without writing them')
+    args = parser.parse_args()
+
+    if min(args.users, args.locations, args.lockers_per_location) < 1:
+        parser.error('--users, --locations and --lockers-per-location must be positive')
+    if args.bookings > location_capacity(args) * args.locations:
+        parser.error(f'--bookings above {location_capacity(args) * args.locations:,} would keep the lockers '
+                     f'more than {MAX_OCCUPANCY:.0%} busy; add --locations or --lockers-per-location')
+
+    print("Generating synthetic dataset" + (" (dry run)" if args.dry_run else ""))
+    began = time.perf_counter()
+    bases, tiers, now = load_plan_inputs(args)
+    plan = Plan(args, bases, tiers, now, make_password_hash())
+    totals = Counter()
+
+    start = time.perf_counter()
+    writer = BatchWriter(args.batch_size, args.dry_run)
+    generate_locations(plan, writer)
+    writer.flush()
+    totals.update(writer.counts)
+    lockers = args.locations * args.lockers_per_location
+    print(f"  ✓ Locations: {args.locations:,} with {lockers:,} lockers "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        run_parallel(pool, 'Users', generate_users, chunks(args.users, USER_TASK_SIZE), totals)
+        run_parallel(pool, 'Bookings', generate_bookings, plan.booking_tasks(BOOKING_TASK_SIZE), totals)
+
+    if not args.dry_run and args.bookings:
+        # Lockers holding a running or upcoming booking are Booked, as in production
+        DatabaseConnection.execute_update("""
+            UPDATE lockers_lockerunit u
+            JOIN (SELECT DISTINCT locker_id FROM lockers_booking
+                  WHERE id > %s AND status IN ('Confirmed', 'Active')) b ON b.locker_id = u.id
+            SET u.status = 'Booked'
+        """, (bases['lockers_booking'],))
+        # Fresh statistics for the optimizer and for the admin's estimated counts
+        DatabaseConnection.execute_query("ANALYZE TABLE " + ', '.join(COLUMNS))
+
+    elapsed = time.perf_counter() - began
+    print("\nRows:")
+    for table in COLUMNS:
+        print(f"  {table:<26} {totals[table]:>14,}")
+    rows = sum(totals.values())
+    print(f"\n✅ {rows:,} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s, {args.workers} workers)")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,132 @@
+"""
+Script Name: archive_bookings.py
+Purpose: Move finished bookings past the retention window, with their
+         payments, QR codes and notifications, into the archive tables
+Author: LockSpot Team
+
+Usage:
+    python scripts/maintenance/archive_bookings.py [--older-than-days 180]
+        [--batch-size 500] [--sleep 0.2] [--no-adaptive] [--max-seconds 600] [--dry-run]
+
+Safe to run while the API is serving traffic (e.g. nightly from cron): the
+live tables are walked in primary-key order and every batch is its own short
+transaction (see api/archive.py). Lock waits are capped per batch; a batch
+that times out or deadlocks is retried after a pause. Between batches the
+script sleeps --sleep seconds, plus as long as the batch took when
+--adaptive is on, so it never holds more than about half of the time on busy
+tables. Interrupting it is safe; the next run continues where it stopped.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import mysql.connector  # noqa: E402
+
+from db_utils import DatabaseConnection  # noqa: E402
+from api.archive import ARCHIVED_CHILDREN, ELIGIBLE, archive_batch, next_batch  # noqa: E402
+
+
+# Lock wait timeout, deadlock
+RETRYABLE_ERRORS = (1205, 1213)
+MAX_RETRIES = 5
+
+
+def count_eligible(cursor, older_than_days):
+    cursor.execute(f"SELECT COUNT(*) FROM lockers_booking b WHERE {ELIGIBLE}", (older_than_days,))
+    return cursor.fetchone()[0]
+
+
+def run(args):
+    totals = {'lockers_booking': 0}
+    totals.update({live: 0 for _, live, _, _ in ARCHIVED_CHILDREN})
+    started = time.perf_counter()
+    batches = retries = 0
+    after_id = 0
+
+    with DatabaseConnection.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION innodb_lock_wait_timeout = %s", (args.lock_wait_timeout,))
+
+        eligible = count_eligible(cursor, args.older_than_days)
+        conn.commit()
+        print(f"Bookings eligible for archiving (older than {args.older_than_days} days): {eligible:,}")
+        if args.dry_run or not eligible:
+            cursor.close()
+            return totals
+
+        while True:
+            if args.max_seconds and time.perf_counter() - started > args.max_seconds:
+                print(f"⚠️  Stopping after {args.max_seconds}s; run again to continue")
+                break
+
+            ids = next_batch(cursor, args.older_than_days, after_id, args.batch_size)
+            conn.commit()  # end the read snapshot before taking locks
+            if not ids:
+                break
+
+            batch_started = time.perf_counter()
+            try:
+                moved = archive_batch(conn, ids, args.older_than_days)
+            except mysql.connector.Error as e:
+                if e.errno not in RETRYABLE_ERRORS:
+                    raise
+                retries += 1
+                if retries > MAX_RETRIES:
+                    print(f"⚠️  Skipping ids {ids[0]}-{ids[-1]} after {MAX_RETRIES} retries: {e.msg}")
+                    after_id, retries = ids[-1], 0
+                else:
+                    time.sleep(args.sleep * 10 or 1)
+                continue
+
+            retries = 0
+            after_id = ids[-1]
+            batches += 1
+            for table, rows in moved.items():
+                totals[table] += rows
+            elapsed = time.perf_counter() - started
+            print(f"  ✓ batch {batches}: {moved['lockers_booking']} bookings "
+                  f"({totals['lockers_booking']:,}/{eligible:,}, "
+                  f"{totals['lockers_booking'] / elapsed:,.0f} bookings/s)")
+
+            pause = args.sleep + (time.perf_counter() - batch_started if args.adaptive else 0)
+            if pause:
+                time.sleep(pause)
+
+        cursor.close()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    print(f"\n✅ Archived in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s):")
+    for table, count in totals.items():
+        print(f"   {table:<24} {count:>10,}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive finished bookings in throttled batches')
+    parser.add_argument('--older-than-days', type=int, default=180,
+                        help='Archive bookings that ended at least this many days ago')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--sleep', type=float, default=0.2, help='Seconds to pause between batches')
+    parser.add_argument('--adaptive', action=argparse.BooleanOptionalAction, default=True,
+                        help='Also pause as long as each batch took')
+    parser.add_argument('--lock-wait-timeout', type=int, default=5, help='Seconds a batch may wait for a row lock')
+    parser.add_argument('--max-seconds', type=int, default=0, help='Stop after this long (0 = until done)')
+    parser.add_argument('--dry-run', action='store_true', help='Only count eligible bookings')
+    args = parser.parse_args()
+
+    if args.older_than_days < 1:
+        parser.error('--older-than-days must be at least 1')
+    run(args)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,505 @@
+"""
+Script Name: index_advisor.py
+Purpose: Recommend composite/covering indexes to add (and redundant ones to
+         drop) by replaying a captured statement log against a copy of the
+         database, and generate the migration
+Author: LockSpot Team
+
+Usage:
+    # 1. Capture the workload: every DatabaseConnection statement is appended
+    #    to the log while STATEMENT_LOG is set (drive it with load_test.py)
+    #    String parameters are redacted unless STATEMENT_LOG_RAW_PARAMS=1,
+    #    which only belongs on a synthetic dataset
+    STATEMENT_LOG=statements.jsonl STATEMENT_LOG_RAW_PARAMS=1 python manage.py runserver
+
+    # 2. Replay it on a copy (never on the live database)
+    python scripts/maintenance/index_advisor.py --log statements.jsonl
+        --database lockspot_advisor [--clone] [--repeat 5] [--samples 20]
+        [--candidate "lockers_booking(user_id,status)"] [--min-gain 5]
+        [--max-regression 5] [--migration] [--output results/indexes.json]
+
+Statements are grouped by their SQL text (parameters are already %s
+placeholders) and weighted by how often they were logged. The baseline is
+the median latency of every statement over up to --samples logged parameter
+sets; writes run inside a transaction that is rolled back. Parameter sets
+with redacted strings cannot be replayed and are not sampled. Each candidate
+index is then created on its own, the statements touching its table are
+re-timed, and it is recommended when they get at least --min-gain percent
+faster net of write overhead. With the accepted indexes in place, existing
+non-unique indexes that no plan uses and whose columns are a left prefix of
+another index are dropped one at a time and kept dropped when no statement
+regresses by more than --max-regression percent. The copy is restored
+afterwards.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lockspot_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+import mysql.connector  # noqa: E402
+from django.apps import apps  # noqa: E402
+from django.db import migrations, models  # noqa: E402
+from django.db.migrations.loader import MigrationLoader  # noqa: E402
+from django.db.migrations.writer import MigrationWriter  # noqa: E402
+
+from api.hot_queries import explain, summarize_plan  # noqa: E402
+from db_utils import DATABASE_CONFIG  # noqa: E402
+
+
+class Candidate:
+    """An index to try: table, ordered columns and the name it would get"""
+
+    def __init__(self, table, columns, name=None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.name = name or f"idx_{table.replace('lockers_', '')}_{'_'.join(self.columns)}"[:64]
+
+    def __repr__(self):
+        return f"{self.table}({', '.join(self.columns)})"
+
+
+# Composite predicates of the hot statements (api/hot_queries.py, api/views.py)
+CANDIDATES = [
+    Candidate('lockers_lockerunit', ('location_id', 'status', 'size'), 'idx_locker_location_status_size'),
+    Candidate('lockers_booking', ('user_id', 'status', 'end_time'), 'idx_booking_user_status_end'),
+    Candidate('lockers_booking', ('user_id', 'created_at'), 'idx_booking_user_created'),
+    Candidate('lockers_notification', ('user_id', 'is_read', 'created_at'), 'idx_notification_user_read_created'),
+]
+
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def parse_candidate(text):
+    """'table(col1, col2)' -> Candidate"""
+    match = re.fullmatch(r'\s*(\w+)\s*\(([\w\s,]+)\)\s*', text)
+    if not match:
+        raise argparse.ArgumentTypeError(f'expected table(col1,col2,...), got {text!r}')
+    return Candidate(match.group(1), [c.strip() for c in match.group(2).split(',') if c.strip()])
+
+
+class Statement:
+    """One distinct SQL text from the log, with its frequency and sample parameters"""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.kind = 'read' if sql.lstrip().upper().startswith('SELECT') else 'write'
+        self.tables = {t.lower() for t in TABLE_PATTERN.findall(sql)}
+        self.count = 0
+        self.samples = []
+        self.keys = set()
+
+    def touches(self, table):
+        return table.lower() in self.tables
+
+
+def is_redacted(params):
+    values = params.values() if isinstance(params, dict) else params
+    return any(isinstance(value, dict) and 'redacted' in value for value in values)
+
+
+def load_workload(path, max_samples, seed=7):
+    """Group the log by SQL text; keeps a uniform sample of parameter sets per statement"""
+    rng = random.Random(seed)
+    statements = {}
+    skipped = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            sql = ' '.join(record['sql'].split())
+            verb = sql.split(' ', 1)[0].upper()
+            if verb not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+                skipped += 1
+                continue
+            statement = statements.get(sql)
+            if statement is None:
+                statement = statements[sql] = Statement(sql)
+            statement.count += record.get('rows', 1)
+            if is_redacted(record['params']):
+                continue
+            # Reservoir sampling keeps every logged call equally likely
+            calls = statement.count
+            if len(statement.samples) < max_samples:
+                statement.samples.append(record['params'])
+            elif rng.random() < max_samples / calls:
+                statement.samples[rng.randrange(max_samples)] = record['params']
+    return list(statements.values()), skipped
+
+
+def connect(database):
+    return mysql.connector.connect(**{**DATABASE_CONFIG, 'database': database, 'autocommit': True})
+
+
+def clone_database(source, target):
+    """Copy every base table of `source` into a fresh `target` database on the same server"""
+    conn = connect(source)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{target}`")
+        cursor.execute(f"CREATE DATABASE `{target}` CHARACTER SET utf8mb4")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        cursor.execute("""
+            SELECT TABLE_NAME FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'
+        """, (source,))
+        tables = [row[0] for row in cursor.fetchall()]
+        for table in tables:
+            started = time.perf_counter()
+            cursor.execute(f"CREATE TABLE `{target}`.`{table}` LIKE `{source}`.`{table}`")
+            cursor.execute(f"INSERT INTO `{target}`.`{table}` SELECT * FROM `{source}`.`{table}`")
+            print(f"  ✓ {table}: {cursor.rowcount:,} rows ({time.perf_counter() - started:.1f}s)")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def existing_indexes(cursor):
+    """{(table, index): {'columns': (...), 'unique': bool}} for the current database"""
+    cursor.execute("""
+        SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """)
+    indexes = {}
+    for table, name, column, non_unique in cursor.fetchall():
+        index = indexes.setdefault((table.lower(), name), {'columns': (), 'unique': not non_unique})
+        index['columns'] += (column,)
+    return indexes
+
+
+def create_index(cursor, table, name, columns):
+    cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({', '.join(f'`{c}`' for c in columns)})")
+    cursor.execute(f"ANALYZE TABLE `{table}`")
+    cursor.fetchall()
+
+
+def drop_index(cursor, table, name):
+    cursor.execute(f"DROP INDEX `{name}` ON `{table}`")
+    cursor.execute(f"ANALYZE TABLE `{table}`")
+    cursor.fetchall()
+
+
+def time_statement(conn, cursor, statement, repeat):
+    """Median milliseconds per execution over the sampled parameter sets (None if it fails here)"""
+    timings = []
+    try:
+        for params in statement.samples:
+            for _ in range(repeat):
+                if statement.kind == 'write':
+                    conn.start_transaction()
+                started = time.perf_counter()
+                cursor.execute(statement.sql, params)
+                if cursor.with_rows:
+                    cursor.fetchall()
+                timings.append(time.perf_counter() - started)
+                if statement.kind == 'write':
+                    conn.rollback()
+    except mysql.connector.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        return None
+    return statistics.median(timings) * 1000 if timings else None
+
+
+def plan_keys(cursor, statement):
+    """Index names the optimizer picks for the first sample"""
+    try:
+        summary = summarize_plan(explain(cursor, statement.sql, statement.samples[0]))
+    except (mysql.connector.Error, ValueError, KeyError, IndexError):
+        return set()
+    return {t['key'] for t in summary['tables'] if t['key']}
+
+
+def measure(conn, cursor, statements, repeat, table=None):
+    """{sql: ms} for the statements touching `table` (all when None); refreshes their plan keys"""
+    timings = {}
+    for statement in statements:
+        if table and not statement.touches(table):
+            continue
+        ms = time_statement(conn, cursor, statement, repeat)
+        if ms is not None:
+            timings[statement.sql] = ms
+            statement.keys = plan_keys(cursor, statement)
+    return timings
+
+
+def refresh_keys(cursor, statements, table):
+    for statement in statements:
+        if statement.touches(table) and statement.samples:
+            statement.keys = plan_keys(cursor, statement)
+
+
+def weighted(statements, timings):
+    """Workload milliseconds: per-execution latency times logged frequency"""
+    return sum(s.count * timings[s.sql] for s in statements if s.sql in timings)
+
+
+def compare(statements, before, after, table):
+    """Weighted before/after of the statements on `table`, and the worst single-statement regression (%)"""
+    affected = [s for s in statements if s.touches(table) and s.sql in before and s.sql in after]
+    cost_before, cost_after = weighted(affected, before), weighted(affected, after)
+    worst = max((100 * (after[s.sql] - before[s.sql]) / before[s.sql]
+                 for s in affected if before[s.sql] > 0), default=0.0)
+    return cost_before, cost_after, worst
+
+
+def is_left_prefix(columns, indexes, table, name):
+    """Another index on the table starts with all of `columns` (so it can serve the same lookups)"""
+    return any(t == table and other != name and other_index['columns'][:len(columns)] == columns
+               for (t, other), other_index in indexes.items())
+
+
+def evaluate_candidates(conn, cursor, statements, candidates, baseline, args):
+    results, accepted = [], []
+    indexes = existing_indexes(cursor)
+    for candidate in candidates:
+        table = candidate.table.lower()
+        result = {'table': table, 'columns': list(candidate.columns), 'name': candidate.name}
+        results.append(result)
+        if any(t == table and index['columns'][:len(candidate.columns)] == candidate.columns
+               for (t, _), index in indexes.items()):
+            result['verdict'] = 'exists'
+            continue
+        if not any(s.touches(table) for s in statements):
+            result['verdict'] = 'not in workload'
+            continue
+
+        create_index(cursor, table, candidate.name, candidate.columns)
+        try:
+            timings = measure(conn, cursor, statements, args.repeat, table)
+            used = sum(s.count for s in statements if s.touches(table) and candidate.name in s.keys)
+        finally:
+            drop_index(cursor, table, candidate.name)
+            refresh_keys(cursor, statements, table)
+
+        cost_before, cost_after, worst = compare(statements, baseline, timings, table)
+        gain = 100 * (cost_before - cost_after) / cost_before if cost_before else 0.0
+        result.update(before_ms=round(cost_before, 2), after_ms=round(cost_after, 2),
+                      gain_pct=round(gain, 1), worst_regression_pct=round(worst, 1), plan_uses=used)
+        if used and gain >= args.min_gain and worst <= args.max_regression:
+            result['verdict'] = 'add'
+            accepted.append(candidate)
+        else:
+            result['verdict'] = 'skip'
+    return results, accepted
+
+
+def evaluate_removals(conn, cursor, statements, current, added, args):
+    """Drop unused, left-prefix-redundant indexes one by one; keeps the ones whose loss costs nothing"""
+    results, removed = [], []
+    added_names = {candidate.name for candidate in added}
+    indexes = existing_indexes(cursor)
+    used_keys = set().union(*(s.keys for s in statements)) if statements else set()
+    for (table, name), index in sorted(indexes.items()):
+        if name == 'PRIMARY' or index['unique'] or name in used_keys or name in added_names:
+            continue
+        if not is_left_prefix(index['columns'], indexes, table, name):
+            continue
+        result = {'table': table, 'columns': list(index['columns']), 'name': name}
+        results.append(result)
+        try:
+            drop_index(cursor, table, name)
+        except mysql.connector.Error as e:
+            # e.g. still needed by a foreign key
+            result.update(verdict='keep', reason=str(e))
+            continue
+
+        timings = measure(conn, cursor, statements, args.repeat, table)
+        cost_before, cost_after, worst = compare(statements, current, timings, table)
+        gain = 100 * (cost_before - cost_after) / cost_before if cost_before else 0.0
+        result.update(before_ms=round(cost_before, 2), after_ms=round(cost_after, 2),
+                      gain_pct=round(gain, 1), worst_regression_pct=round(worst, 1))
+        if worst <= args.max_regression:
+            result['verdict'] = 'drop'
+            removed.append((table, name, index['columns']))
+            current.update(timings)
+            del indexes[(table, name)]
+        else:
+            result['verdict'] = 'keep'
+            create_index(cursor, table, name, index['columns'])
+            refresh_keys(cursor, statements, table)
+    return results, removed
+
+
+# ==================== MIGRATION ====================
+
+def model_for_table(table):
+    for model in apps.get_app_config('lockers').get_models():
+        if model._meta.db_table.lower() == table:
+            return model
+    return None
+
+
+def field_names(model, columns):
+    by_column = {f.column: f.name for f in model._meta.concrete_fields}
+    return [by_column[c] for c in columns]
+
+
+def build_migration(additions, removals):
+    """
+    Django migration adding the accepted indexes. Removed indexes are only
+    dropped here when the models declare them; the rest exist only in
+    sql/01_create_schema_mysql.sql and are returned as DROP INDEX statements.
+    """
+    operations, schema_sql = [], []
+    for candidate in additions:
+        model = model_for_table(candidate.table.lower())
+        schema_sql.append(f"ALTER TABLE {candidate.table} ADD INDEX {candidate.name} ({', '.join(candidate.columns)});")
+        if model is None:
+            continue
+        operations.append(migrations.AddIndex(
+            model_name=model._meta.model_name,
+            index=models.Index(fields=field_names(model, candidate.columns), name=candidate.name),
+        ))
+    for table, name, _ in removals:
+        schema_sql.append(f"ALTER TABLE {table} DROP INDEX {name};")
+        model = model_for_table(table)
+        if model and any(index.name == name for index in model._meta.indexes):
+            operations.append(migrations.RemoveIndex(model_name=model._meta.model_name, name=name))
+
+    if not operations:
+        return None, None, schema_sql
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    leaf = sorted(loader.graph.leaf_nodes('lockers'))[-1][1]
+    number = int(leaf.split('_', 1)[0]) + 1
+    migration = migrations.Migration(f'{number:04d}_workload_indexes', 'lockers')
+    migration.dependencies = [('lockers', leaf)]
+    migration.operations = operations
+    writer = MigrationWriter(migration)
+    return writer.path, writer.as_string(), schema_sql
+
+
+def print_rows(title, rows):
+    print(f"\n{title}")
+    print(f"  {'Index':<44} {'Before':>11} {'After':>11} {'Gain':>7} {'Worst':>7}  Verdict")
+    for r in rows:
+        label = f"{r['table']}({', '.join(r['columns'])})"
+        if 'before_ms' in r:
+            print(f"  {label:<44} {r['before_ms']:>9.1f}ms {r['after_ms']:>9.1f}ms {r['gain_pct']:>6.1f}% "
+                  f"{r['worst_regression_pct']:>6.1f}%  {r['verdict']}")
+        else:
+            print(f"  {label:<44} {'':>11} {'':>11} {'':>7} {'':>7}  {r['verdict']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recommend indexes from a captured statement log')
+    parser.add_argument('--log', required=True, help='JSON-lines statement log (STATEMENT_LOG)')
+    parser.add_argument('--database', required=True, help='Scratch copy to replay on')
+    parser.add_argument('--clone', action='store_true',
+                        help=f"(Re)create --database as a copy of {DATABASE_CONFIG['database']} first")
+    parser.add_argument('--repeat', type=int, default=5, help='Executions per sampled parameter set')
+    parser.add_argument('--samples', type=int, default=20, help='Parameter sets kept per statement')
+    parser.add_argument('--candidate', action='append', type=parse_candidate, default=[],
+                        help='Extra candidate, e.g. "lockers_booking(user_id,status)"')
+    parser.add_argument('--no-defaults', action='store_true', help='Only try --candidate indexes')
+    parser.add_argument('--min-gain', type=float, default=5.0,
+                        help='Required %% speed-up of the statements on the table')
+    parser.add_argument('--max-regression', type=float, default=5.0,
+                        help='Largest %% slowdown of any single statement that is tolerated')
+    parser.add_argument('--no-removals', action='store_true')
+    parser.add_argument('--migration', action='store_true', help='Write lockers/migrations/NNNN_workload_indexes.py')
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    if args.database == DATABASE_CONFIG['database']:
+        parser.error('--database must be a copy, not the live database')
+
+    statements, skipped = load_workload(args.log, args.samples)
+    calls = sum(s.count for s in statements)
+    print(f"Workload: {calls:,} statements, {len(statements)} distinct ({skipped:,} non-DML lines skipped)")
+    redacted = sum(1 for s in statements if not s.samples)
+    if redacted:
+        print(f"⚠️  {redacted} distinct statements only have redacted parameters and are not timed "
+              f"(capture with STATEMENT_LOG_RAW_PARAMS=1 on a synthetic dataset)")
+    if not statements:
+        print("❌ Nothing to replay")
+        return
+
+    if args.clone:
+        print(f"\nCloning {DATABASE_CONFIG['database']} into {args.database}...")
+        clone_database(DATABASE_CONFIG['database'], args.database)
+
+    candidates = ([] if args.no_defaults else CANDIDATES) + args.candidate
+    conn = connect(args.database)
+    cursor = conn.cursor(buffered=True)
+    added, removed = [], []
+    try:
+        print(f"\nBaseline ({args.repeat} runs x up to {args.samples} parameter sets per statement)...")
+        baseline = measure(conn, cursor, statements, args.repeat)
+        failed = [s for s in statements if s.sql not in baseline]
+        print(f"  ✓ {weighted(statements, baseline):,.1f}ms workload, {len(failed)} statements failed on the copy")
+
+        additions, accepted = evaluate_candidates(conn, cursor, statements, candidates, baseline, args)
+        print_rows('Candidate indexes', additions)
+
+        current = dict(baseline)
+        for candidate in accepted:
+            create_index(cursor, candidate.table, candidate.name, candidate.columns)
+            added.append(candidate)
+        if accepted:
+            current = measure(conn, cursor, statements, args.repeat)
+
+        removals = []
+        if not args.no_removals:
+            removals, removed = evaluate_removals(conn, cursor, statements, current, added, args)
+            if removals:
+                print_rows('Redundant indexes', removals)
+
+        before, after = weighted(statements, baseline), weighted(statements, current)
+        print(f"\nWorkload: {before:,.1f}ms → {after:,.1f}ms "
+              f"({100 * (before - after) / before if before else 0:.1f}% faster)")
+    finally:
+        # Leave the copy as it was
+        for table, name, columns in removed:
+            create_index(cursor, table, name, columns)
+        for candidate in added:
+            drop_index(cursor, candidate.table, candidate.name)
+        cursor.close()
+        conn.close()
+
+    path, source, schema_sql = build_migration(accepted, removed)
+    if schema_sql:
+        print("\nsql/01_create_schema_mysql.sql:")
+        for line in schema_sql:
+            print(f"  {line}")
+    if source and args.migration:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        print(f"\n✓ Migration written to {os.path.relpath(path)}; add the indexes to the models' Meta.indexes")
+    elif source:
+        print("\nRe-run with --migration to write the Django migration")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {'log': args.log, 'database': args.database, 'statements': calls,
+                         'distinct': len(statements), 'repeat': args.repeat, 'samples': args.samples},
+                'workload_ms': {'before': round(before, 2), 'after': round(after, 2)},
+                'additions': additions,
+                'removals': removals,
+                'schema_sql': schema_sql,
+            }, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,188 @@
+"""
+Script Name: purge_expired.py
+Purpose: Delete notifications past the retention TTL of their type, QR
+         codes that expired more than --qr-grace-days ago and refresh
+         tokens expired or revoked more than --refresh-grace-days ago
+Author: LockSpot Team
+
+Usage:
+    python scripts/maintenance/purge_expired.py [--ttl Promo=14 --ttl System=60]
+        [--qr-grace-days 30] [--refresh-grace-days 7] [--only notifications|qr_codes|refresh_tokens]
+        [--batch-size 1000]
+        [--sleep 0.1] [--no-adaptive] [--replica db-replica-1:3306 --max-replica-lag 5]
+        [--max-seconds 600] [--dry-run]
+
+Safe to run while the API is serving traffic (e.g. nightly from cron): rows
+are deleted in primary-key order, each batch in its own short transaction
+(see api/retention.py). Lock waits are capped per batch; a batch that times
+out or deadlocks is retried after a pause. Between batches the script sleeps
+--sleep seconds, plus as long as the batch took when --adaptive is on, and
+with --replica it also waits until every replica is within
+--max-replica-lag seconds, so replicas never fall far behind the deletes.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import mysql.connector  # noqa: E402
+
+from db_utils import DATABASE_CONFIG, DatabaseConnection  # noqa: E402
+from api.retention import (  # noqa: E402
+    NOTIFICATION_TTL_DAYS, QR_CODE_GRACE_DAYS, REFRESH_TOKEN_GRACE_DAYS, ReplicaThrottle, count_expired,
+    next_batch, notification_target, purge_batch, qr_code_target, refresh_token_target, upper_id
+)
+
+
+# Lock wait timeout, deadlock
+RETRYABLE_ERRORS = (1205, 1213)
+MAX_RETRIES = 5
+
+
+def parse_ttl(value):
+    notification_type, _, days = value.partition('=')
+    if notification_type not in NOTIFICATION_TTL_DAYS or not days.isdigit() or int(days) < 1:
+        raise argparse.ArgumentTypeError(
+            f"expected TYPE=DAYS with TYPE one of {', '.join(NOTIFICATION_TTL_DAYS)}, got {value!r}"
+        )
+    return notification_type, int(days)
+
+
+def connect_replicas(addresses):
+    replicas = {}
+    for address in addresses:
+        host, _, port = address.partition(':')
+        replicas[address] = mysql.connector.connect(**{**DATABASE_CONFIG, 'host': host,
+                                                       'port': int(port or 3306)})
+    return replicas
+
+
+def purge(conn, cursor, name, target, args, throttle, deadline):
+    started = time.perf_counter()
+    upper = upper_id(cursor, target)
+    expired = count_expired(cursor, target, upper) if upper else 0
+    conn.commit()
+    print(f"{name}: {expired:,} rows past retention")
+    if args.dry_run or not expired:
+        return 0, 0.0
+
+    deleted = batches = retries = 0
+    after_id = 0
+    while True:
+        if deadline and time.perf_counter() > deadline:
+            print(f"⚠️  Stopping after {args.max_seconds}s; run again to continue")
+            break
+        if throttle:
+            throttle.wait()
+
+        ids = next_batch(cursor, target, after_id, upper, args.batch_size)
+        conn.commit()  # end the read snapshot before taking locks
+        if not ids:
+            break
+
+        batch_started = time.perf_counter()
+        try:
+            rows = purge_batch(conn, target, ids)
+        except mysql.connector.Error as e:
+            if e.errno not in RETRYABLE_ERRORS:
+                raise
+            retries += 1
+            if retries > MAX_RETRIES:
+                print(f"⚠️  Skipping ids {ids[0]}-{ids[-1]} after {MAX_RETRIES} retries: {e.msg}")
+                after_id, retries = ids[-1], 0
+            else:
+                time.sleep(args.sleep * 10 or 1)
+            continue
+
+        retries = 0
+        after_id = ids[-1]
+        batches += 1
+        deleted += rows
+        elapsed = time.perf_counter() - started
+        print(f"  ✓ batch {batches}: {rows} rows ({deleted:,}/{expired:,}, {deleted / elapsed:,.0f} rows/s)")
+
+        pause = args.sleep + (time.perf_counter() - batch_started if args.adaptive else 0)
+        if pause:
+            time.sleep(pause)
+
+    return deleted, time.perf_counter() - started
+
+
+def run(args):
+    targets = {
+        'notifications': notification_target({**NOTIFICATION_TTL_DAYS, **dict(args.ttl or [])}),
+        'qr_codes': qr_code_target(args.qr_grace_days),
+        'refresh_tokens': refresh_token_target(args.refresh_grace_days),
+    }
+    if args.only:
+        targets = {args.only: targets[args.only]}
+
+    replicas = connect_replicas(args.replica or [])
+    throttle = ReplicaThrottle(replicas, args.max_replica_lag) if replicas else None
+    started = time.perf_counter()
+    deadline = started + args.max_seconds if args.max_seconds else None
+    totals = {}
+
+    try:
+        with DatabaseConnection.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SET SESSION innodb_lock_wait_timeout = %s", (args.lock_wait_timeout,))
+            for name, target in targets.items():
+                totals[name] = purge(conn, cursor, name, target, args, throttle, deadline)
+            cursor.close()
+    finally:
+        for replica in replicas.values():
+            replica.close()
+
+    if args.dry_run:
+        return totals
+    elapsed = time.perf_counter() - started
+    rows = sum(deleted for deleted, _ in totals.values())
+    print(f"\n✅ Purged {rows:,} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s):")
+    for name, (deleted, seconds) in totals.items():
+        print(f"   {name:<16} {deleted:>10,}  ({deleted / seconds if seconds else 0:,.0f} rows/s)")
+    if throttle and throttle.waited:
+        print(f"   waited {throttle.waited:.0f}s for replicas")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Purge expired notifications, QR codes and refresh tokens in throttled batches'
+    )
+    parser.add_argument('--ttl', type=parse_ttl, action='append', metavar='TYPE=DAYS',
+                        help=f"Notification retention per type (defaults: "
+                             f"{', '.join(f'{t}={d}' for t, d in NOTIFICATION_TTL_DAYS.items())})")
+    parser.add_argument('--qr-grace-days', type=int, default=QR_CODE_GRACE_DAYS,
+                        help='Keep QR codes this many days after they expire')
+    parser.add_argument('--refresh-grace-days', type=int, default=REFRESH_TOKEN_GRACE_DAYS,
+                        help='Keep refresh tokens this many days after they expire or are revoked')
+    parser.add_argument('--only', choices=['notifications', 'qr_codes', 'refresh_tokens'])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches')
+    parser.add_argument('--adaptive', action=argparse.BooleanOptionalAction, default=True,
+                        help='Also pause as long as each batch took')
+    parser.add_argument('--replica', action='append', metavar='HOST[:PORT]',
+                        help='Replica to watch (same credentials as the primary); repeat for several')
+    parser.add_argument('--max-replica-lag', type=float, default=5, help='Seconds of replica lag to wait out')
+    parser.add_argument('--lock-wait-timeout', type=int, default=5, help='Seconds a batch may wait for a row lock')
+    parser.add_argument('--max-seconds', type=int, default=0, help='Stop after this long (0 = until done)')
+    parser.add_argument('--dry-run', action='store_true', help='Only count rows past retention')
+    args = parser.parse_args()
+
+    if args.qr_grace_days < 1:
+        parser.error('--qr-grace-days must be at least 1')
+    if args.refresh_grace_days < 1:
+        parser.error('--refresh-grace-days must be at least 1')
+    run(args)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
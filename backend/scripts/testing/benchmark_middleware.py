@@ -0,0 +1,149 @@
+"""
+Script Name: benchmark_middleware.py
+Purpose: Measure per-request middleware overhead of the full Django stack
+         against the routed stack (lean /api/, full /admin/), see
+         api.middleware.SiteMiddleware
+Author: LockSpot Team
+
+Usage:
+    python scripts/testing/benchmark_middleware.py [--iterations 20000] [--warmup 1000]
+        [--output results/middleware.json]
+
+Requests are run in-process through a Django handler built for each stack
+(no HTTP server, no database). "ping" is a bare view returning a few bytes,
+so its latency is almost entirely middleware; "health" is the real
+/api/health/ DRF view. The "full" stack is the single MIDDLEWARE list the
+project used before routing: settings.MIDDLEWARE with SiteMiddleware
+replaced by SITE_MIDDLEWARE, so every path pays for sessions, CSRF, auth,
+messages and clickjacking protection.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lockspot_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.handlers.base import BaseHandler  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.urls import include, path  # noqa: E402
+
+
+def ping(request):
+    return HttpResponse(b'pong', content_type='text/plain')
+
+
+# Used as the urlconf of the "ping" requests
+urlpatterns = [
+    path('api/ping/', ping),
+    path('admin/ping/', ping),
+    path('api/', include('api.urls')),
+]
+
+TARGETS = {
+    'api ping': '/api/ping/',
+    'api health': '/api/health/',
+    'admin ping': '/admin/ping/',
+}
+
+
+def stacks():
+    routed = list(settings.MIDDLEWARE)
+    full = []
+    for name in routed:
+        full += settings.SITE_MIDDLEWARE if name == 'api.middleware.SiteMiddleware' else [name]
+    return {'full': full, 'routed': routed}
+
+
+def build_handler(middleware):
+    with override_settings(MIDDLEWARE=middleware):
+        handler = BaseHandler()
+        handler.load_middleware()
+    return handler
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def measure(handler, url, iterations, warmup):
+    factory = RequestFactory()
+    urlconf = sys.modules[__name__]
+
+    def new_request():
+        request = factory.get(url, HTTP_ORIGIN='http://localhost:3000', HTTP_USER_AGENT='LockSpot/1.0 (Android)')
+        request.urlconf = urlconf
+        return request
+
+    response = handler.get_response(new_request())
+    for _ in range(warmup):
+        handler.get_response(new_request())
+
+    # Requests are built up front so only the handler is timed
+    requests = [new_request() for _ in range(iterations)]
+    latencies = []
+    cpu_started = time.process_time()
+    for request in requests:
+        started = time.perf_counter()
+        handler.get_response(request)
+        latencies.append(time.perf_counter() - started)
+    cpu = time.process_time() - cpu_started
+
+    return {
+        'status': response.status_code,
+        'headers': len(response.headers),
+        'p50_us': round(percentile(latencies, 50) * 1e6, 1),
+        'p95_us': round(percentile(latencies, 95) * 1e6, 1),
+        'cpu_us': round(cpu / iterations * 1e6, 1),
+        'requests_per_s': round(iterations / sum(latencies)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the full vs routed middleware stacks')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--warmup', type=int, default=1000)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    handlers = {name: build_handler(middleware) for name, middleware in stacks().items()}
+    for name, middleware in stacks().items():
+        print(f"{name:<7} {len(middleware)} middleware: {', '.join(m.rsplit('.', 1)[1] for m in middleware)}")
+
+    print(f"\n{'Target':<12} {'Stack':<7} {'p50':>9} {'p95':>9} {'CPU':>9} {'req/s':>9} {'Headers':>8}")
+    results = {}
+    for target, url in TARGETS.items():
+        results[target] = {}
+        for name, handler in handlers.items():
+            r = measure(handler, url, args.iterations, args.warmup)
+            results[target][name] = r
+            flag = '' if r['status'] == 200 else f"  ⚠️  HTTP {r['status']}"
+            print(f"{target:<12} {name:<7} {r['p50_us']:>7.1f}µs {r['p95_us']:>7.1f}µs {r['cpu_us']:>7.1f}µs "
+                  f"{r['requests_per_s']:>9,} {r['headers']:>8}{flag}")
+        full, routed = results[target]['full'], results[target]['routed']
+        saved = full['cpu_us'] - routed['cpu_us']
+        print(f"{'':<12} → routed saves {saved:.1f}µs CPU per request "
+              f"({saved / full['cpu_us'] * 100 if full['cpu_us'] else 0:.0f}%)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'iterations': args.iterations, 'stacks': stacks()}, 'targets': results}, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,139 @@
+"""
+Script Name: benchmark_qr_consume.py
+Purpose: Measure online QR consume latency/throughput for a station-opening
+         scan burst, and compare with the old SELECT-then-UPDATE flow
+Author: LockSpot Team
+
+Usage:
+    python scripts/testing/benchmark_qr_consume.py [--codes 2000] [--threads 32]
+        [--duplicates 1] [--unknown 2000] [--booking-id 1]
+
+Seeds temporary codes for one booking, scans them concurrently (each valid
+code scanned 1 + duplicates times, mixed with unknown codes) and removes them
+afterwards. Requires the MySQL database from db_utils.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lockspot_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from db_utils import DatabaseConnection  # noqa: E402
+from api.qr_codes import consume_qr_code, get_code_cache  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def seed_codes(booking_id, count, prefix):
+    rows = [(booking_id, f'{prefix}-{i}') for i in range(count)]
+    DatabaseConnection.execute_many("""
+        INSERT INTO lockers_qraccesscode (booking_id, code, code_type, generated_at, expires_at, is_used)
+        VALUES (%s, %s, 'Unlock', NOW(), NOW() + INTERVAL 1 HOUR, 0)
+    """, rows)
+    return [code for _, code in rows]
+
+
+def legacy_consume(code):
+    """The previous flow: SELECT, check expiry in Python, then UPDATE"""
+    qr = DatabaseConnection.execute_query_one(
+        "SELECT * FROM lockers_qraccesscode WHERE code = %s AND is_used = 0", (code,)
+    )
+    if not qr:
+        return None
+    DatabaseConnection.execute_update(
+        "UPDATE lockers_qraccesscode SET is_used = 1, used_at = NOW() WHERE id = %s", (qr['id'],)
+    )
+    return qr
+
+
+def run_burst(label, consume, scans, threads):
+    def scan(code):
+        start = time.perf_counter()
+        result = consume(code)
+        return code, result is not None, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(scan, scans))
+    elapsed = time.perf_counter() - start
+
+    granted = [r for r in results if r[1]]
+    rejected = [r for r in results if not r[1]]
+    print(f"\n{label}")
+    print(f"  Scans:        {len(results):,} in {elapsed:.2f} s ({len(results) / elapsed:,.0f} scans/s)")
+    for name, group in (('Granted', granted), ('Rejected', rejected)):
+        latencies = [r[2] for r in group]
+        print(f"  {name + ':':<13} {len(group):,}  p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+              f"p95 {percentile(latencies, 95) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+    return {code for code, ok, _ in granted}, len(granted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark online QR consume')
+    parser.add_argument('--codes', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duplicates', type=int, default=1, help='Extra scans per valid code')
+    parser.add_argument('--unknown', type=int, default=2000, help='Scans of codes that do not exist')
+    parser.add_argument('--booking-id', type=int, help='Booking to attach codes to (default: latest)')
+    args = parser.parse_args()
+
+    booking_id = args.booking_id
+    if not booking_id:
+        booking = DatabaseConnection.execute_query_one("SELECT MAX(id) AS id FROM lockers_booking")
+        booking_id = booking and booking['id']
+    if not booking_id:
+        print("❌ No booking found; run seed_data.py first")
+        sys.exit(1)
+
+    prefix = f'BENCH-{uuid.uuid4().hex[:8]}'
+    print(f"Seeding {args.codes:,} codes for booking #{booking_id}...")
+    codes = seed_codes(booking_id, args.codes, prefix)
+
+    try:
+        scans = codes * (1 + args.duplicates) + [f'{prefix}-unknown-{i}' for i in range(args.unknown)]
+        random.shuffle(scans)
+
+        cache = get_code_cache()
+        start = time.perf_counter()
+        consume_qr_code(f'{prefix}-warmup')
+        print(f"  ✓ Cache loaded: {len(cache):,} codes in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        _, granted = run_burst('Single-statement consume', consume_qr_code, scans, args.threads)
+        print(f"  Cache:        {cache.stats()}")
+        if granted == len(codes):
+            print("  ✓ Every code opened exactly once")
+        else:
+            print(f"  ❌ {granted:,} grants for {len(codes):,} codes")
+
+        DatabaseConnection.execute_update(
+            "UPDATE lockers_qraccesscode SET is_used = 0, used_at = NULL WHERE code LIKE %s",
+            (f'{prefix}-%',)
+        )
+        _, granted = run_burst('Legacy SELECT + UPDATE', legacy_consume, scans, args.threads)
+        if granted > len(codes):
+            print(f"  ⚠️  {granted - len(codes):,} codes opened more than once")
+    finally:
+        deleted = DatabaseConnection.execute_update(
+            "DELETE FROM lockers_qraccesscode WHERE code LIKE %s", (f'{prefix}-%',)
+        )
+        print(f"\n✓ Removed {deleted:,} benchmark codes")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
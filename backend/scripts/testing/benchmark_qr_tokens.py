@@ -0,0 +1,66 @@
+"""
+Script Name: benchmark_qr_tokens.py
+Purpose: Measure offline QR token verification throughput on one core
+Author: LockSpot Team
+
+Usage:
+    python scripts/testing/benchmark_qr_tokens.py [--tokens 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.qr_tokens import QRTokenSigner, KioskVerifier, InvalidQRToken  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark QR token verification')
+    parser.add_argument('--tokens', type=int, default=200000)
+    args = parser.parse_args()
+
+    secret = 'benchmark-secret'
+    signer = QRTokenSigner(secret)
+    now = int(time.time())
+
+    print(f"Issuing {args.tokens:,} tokens...")
+    start = time.perf_counter()
+    tokens = [
+        signer.issue(i, i % 1000, now - 60, now + 3600, 'Unlock' if i % 2 else 'Lock')
+        for i in range(args.tokens)
+    ]
+    elapsed = time.perf_counter() - start
+    print(f"  ✓ Issue:   {args.tokens / elapsed:,.0f} tokens/s ({len(tokens[0])} chars each)")
+
+    start = time.perf_counter()
+    for token in tokens:
+        signer.verify(token)
+    elapsed = time.perf_counter() - start
+    print(f"  ✓ Verify:  {args.tokens / elapsed:,.0f} tokens/s ({elapsed / args.tokens * 1e6:.2f} µs each)")
+
+    kiosk = KioskVerifier(secret)
+    start = time.perf_counter()
+    for token in tokens:
+        kiosk.consume(token)
+    elapsed = time.perf_counter() - start
+    print(f"  ✓ Consume: {args.tokens / elapsed:,.0f} tokens/s (verify + single-use check)")
+
+    # Tampered tokens must all be rejected
+    rejected = 0
+    for token in tokens[:1000]:
+        try:
+            signer.verify(token[:-4] + ('AAAA' if token[-4:] != 'AAAA' else 'BBBB'))
+        except InvalidQRToken:
+            rejected += 1
+    print(f"  ✓ Rejected {rejected}/1000 tampered tokens")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,253 @@
+"""
+Script Name: benchmark_views.py
+Purpose: Compare the raw SQL views (api/views.py, api/views_raw_sql.py) with
+         the ORM viewsets (api/views_orm_backup.py) endpoint by endpoint
+Author: LockSpot Team
+
+Usage:
+    python scripts/testing/benchmark_views.py [--iterations 200] [--warmup 20]
+        [--endpoints locations,bookings] [--impl views,raw_sql,orm]
+        [--user-id 42] [--location-id 7] [--output results/views.json]
+
+Every implementation is called in-process with the same request (DRF
+force_authenticate, no HTTP or JWT), and the response is rendered so
+serialization is included. Per endpoint and implementation it reports
+wall-clock latency (p50/p95/p99), CPU time of this process, SQL statements
+(raw DatabaseConnection statements plus ORM queries) and the allocation
+peak measured with tracemalloc in a separate pass. Run it against a
+database filled by generate_synthetic_data.py; database server CPU is not
+included.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lockspot_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from api import views, views_orm_backup, views_raw_sql  # noqa: E402
+from db_utils import start_query_count, stop_query_count  # noqa: E402
+from lockers.models import Booking, LockerUnit, User  # noqa: E402
+
+
+IMPLEMENTATIONS = {
+    'views': views,
+    'raw_sql': views_raw_sql,
+    'orm': views_orm_backup,
+}
+
+# endpoint -> (path, {implementation: (view class, viewset actions or None, url kwarg)})
+# Only views_orm_backup's viewsets use the ORM; its APIViews are raw SQL copies.
+ENDPOINTS = {
+    'profile': ('/api/auth/me/', {
+        'views': ('ProfileView', None, None),
+        'raw_sql': ('ProfileView', None, None),
+        'orm': ('ProfileView', None, None),
+    }),
+    'locations': ('/api/locations/', {
+        'views': ('LocationListView', None, None),
+        'raw_sql': ('LocationListView', None, None),
+        'orm': ('LocationViewSet', {'get': 'list'}, None),
+    }),
+    'location_detail': ('/api/locations/{location_id}/', {
+        'views': ('LocationDetailView', None, 'location_id'),
+        'raw_sql': ('LocationDetailView', None, 'location_id'),
+        'orm': ('LocationViewSet', {'get': 'retrieve'}, 'pk'),
+    }),
+    'lockers_available': ('/api/lockers/available/?location_id={location_id}', {
+        'views': ('LockerListView', None, None),
+        'raw_sql': ('LockerListView', None, None),
+        'orm': ('LockerViewSet', {'get': 'available'}, None),
+    }),
+    'bookings': ('/api/bookings/', {
+        'views': ('BookingListCreateView', None, None),
+        'raw_sql': ('BookingListCreateView', None, None),
+        'orm': ('BookingViewSet', {'get': 'list'}, None),
+    }),
+    'booking_detail': ('/api/bookings/{booking_id}/', {
+        'views': ('BookingDetailView', None, 'booking_id'),
+        'raw_sql': ('BookingDetailView', None, 'booking_id'),
+        'orm': ('BookingViewSet', {'get': 'retrieve'}, 'pk'),
+    }),
+    'notifications': ('/api/notifications/', {
+        'views': ('NotificationListView', None, None),
+        'raw_sql': ('NotificationListView', None, None),
+        'orm': ('NotificationViewSet', {'get': 'list'}, None),
+    }),
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def pick_sample(args):
+    """User, location and booking ids to request (latest booking unless given)"""
+    booking = None
+    if args.user_id:
+        booking = Booking.objects.filter(user_id=args.user_id).order_by('-id').first()
+    else:
+        booking = Booking.objects.order_by('-id').first()
+    if booking is None and not args.user_id:
+        raise RuntimeError('No bookings found; run generate_synthetic_data.py first')
+
+    user = User.objects.get(pk=args.user_id or booking.user_id)
+    location_id = args.location_id
+    if not location_id:
+        location_id = (LockerUnit.objects.filter(pk=booking.locker_id).values_list('location_id', flat=True).first()
+                       if booking else LockerUnit.objects.values_list('location_id', flat=True).first())
+    return user, {'location_id': location_id, 'booking_id': booking.id if booking else 0}
+
+
+class Call:
+    """One endpoint of one implementation, callable with a fresh request"""
+
+    def __init__(self, implementation, spec, path, user, ids):
+        name, actions, kwarg = spec
+        view_class = getattr(IMPLEMENTATIONS[implementation], name)
+        self.view = view_class.as_view(actions) if actions else view_class.as_view()
+        self.path = path.format(**ids)
+        self.kwargs = {kwarg: ids['booking_id' if '{booking_id}' in path else 'location_id']} if kwarg else {}
+        self.user = user
+        self.factory = APIRequestFactory()
+
+    def __call__(self):
+        request = self.factory.get(self.path)
+        force_authenticate(request, user=self.user)
+        response = self.view(request, **self.kwargs)
+        response.render()
+        return response
+
+
+def count_statements(call):
+    orm = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        orm[0] += 1
+        return execute(sql, params, many, context)
+
+    start_query_count()
+    try:
+        with connection.execute_wrapper(wrapper):
+            response = call()
+    finally:
+        raw = stop_query_count()
+    return raw + orm[0], response
+
+
+def measure(call, iterations, warmup, alloc_iterations):
+    for _ in range(warmup):
+        call()
+
+    queries, response = count_statements(call)
+
+    latencies, cpu = [], []
+    for _ in range(iterations):
+        wall, proc = time.perf_counter(), time.process_time()
+        call()
+        latencies.append(time.perf_counter() - wall)
+        cpu.append(time.process_time() - proc)
+
+    # tracemalloc slows everything down, so allocations get their own pass
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'bytes': len(response.content),
+        'queries': queries,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'cpu_ms': round(sum(cpu) / len(cpu) * 1000, 3),
+        'alloc_peak_kib': round(sorted(peaks)[len(peaks) // 2] / 1024, 1) if peaks else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark raw SQL vs ORM views per endpoint')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--alloc-iterations', type=int, default=20)
+    parser.add_argument('--endpoints', help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--impl', default=','.join(IMPLEMENTATIONS),
+                        help=f"Comma-separated subset of: {', '.join(IMPLEMENTATIONS)}")
+    parser.add_argument('--user-id', type=int, help='Authenticated user (default: owner of the latest booking)')
+    parser.add_argument('--location-id', type=int)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(',') if args.endpoints else list(ENDPOINTS)
+    implementations = args.impl.split(',')
+    for name in endpoints:
+        if name not in ENDPOINTS:
+            parser.error(f'unknown endpoint {name}')
+    for name in implementations:
+        if name not in IMPLEMENTATIONS:
+            parser.error(f'unknown implementation {name}')
+
+    user, ids = pick_sample(args)
+    print(f"Benchmarking as user #{user.id}, location #{ids['location_id']}, booking #{ids['booking_id']} "
+          f"({args.iterations} iterations)")
+    print(f"\n{'Endpoint':<18} {'Impl':<8} {'p50':>9} {'p95':>9} {'p99':>9} {'CPU':>9} "
+          f"{'Queries':>8} {'Alloc':>10} {'Bytes':>8}")
+
+    results = {}
+    for endpoint in endpoints:
+        path, specs = ENDPOINTS[endpoint]
+        results[endpoint] = {}
+        for implementation in implementations:
+            call = Call(implementation, specs[implementation], path, user, ids)
+            try:
+                r = measure(call, args.iterations, args.warmup, args.alloc_iterations)
+            except Exception as e:
+                print(f"{endpoint:<18} {implementation:<8} ❌ {e}")
+                results[endpoint][implementation] = {'error': str(e)}
+                continue
+            results[endpoint][implementation] = r
+            flag = '' if r['status'] == 200 else f"  ⚠️  HTTP {r['status']}"
+            print(f"{endpoint:<18} {implementation:<8} {r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms "
+                  f"{r['p99_ms']:>7.2f}ms {r['cpu_ms']:>7.2f}ms {r['queries']:>8} "
+                  f"{r['alloc_peak_kib']:>7.1f}KiB {r['bytes']:>8,}{flag}")
+
+        measured = {k: v for k, v in results[endpoint].items() if v.get('status') == 200}
+        if len(measured) > 1:
+            best = min(measured, key=lambda k: measured[k]['p50_ms'])
+            print(f"{'':<18} → fastest: {best}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {'iterations': args.iterations, 'warmup': args.warmup, 'user_id': user.id, **ids,
+                         'database': connection.vendor},
+                'endpoints': results,
+            }, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
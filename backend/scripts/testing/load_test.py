@@ -0,0 +1,353 @@
+"""
+Script Name: load_test.py
+Purpose: Drive realistic user journeys against a running API and report
+         per-endpoint throughput, latency percentiles, DB queries and errors
+Author: LockSpot Team
+
+Usage:
+    # Closed model: 20 users looping journeys for 60 s
+    python scripts/testing/load_test.py --url http://localhost:8000/api \\
+        --concurrency 20 --duration 60 --output results/run1.json
+
+    # Open model: 15 journeys/s (Poisson arrivals), compared with a previous run
+    python scripts/testing/load_test.py --rate 15 --duration 120 --concurrency 64 \\
+        --output results/run2.json --compare results/run1.json
+
+Each journey is: login -> locations -> location detail -> available lockers
+-> book -> list bookings -> cancel. Accounts come from --accounts (CSV of
+email,password) or are registered through the API before the run.
+
+Start the server with QUERY_COUNT_HEADER=true to get per-request query
+counts (X-DB-Queries header). The raw SQL views need the MySQL database
+from db_utils; for an isolated run point DATABASE_CONFIG at a scratch
+database loaded with generate_synthetic_data.py.
+"""
+
+import argparse
+import csv
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+
+ACCOUNT_PASSWORD = 'LoadTest123!'
+LOCKER_SIZES = ('Small', 'Medium', 'Large')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+# ==================== HTTP CLIENT ====================
+
+class ApiClient:
+    """Keep-alive HTTP connection per thread; every call is recorded"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.records = []
+        self.recording = True
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self.local.conn = factory(self.host, timeout=self.timeout)
+        return conn
+
+    def call(self, method, path, label, token=None, body=None):
+        """Returns (status, parsed JSON or None); status 0 means a network error"""
+        headers = {'Accept': 'application/json'}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        start = time.perf_counter()
+        status, payload, queries = 0, None, None
+        try:
+            conn = self._connection()
+            conn.request(method, self.prefix + path, body=data, headers=headers)
+            response = conn.getresponse()
+            raw = response.read()
+            status = response.status
+            queries = response.getheader('X-DB-Queries')
+            if raw and 'json' in (response.getheader('Content-Type') or ''):
+                payload = json.loads(raw)
+        except (OSError, http.client.HTTPException, ValueError):
+            # Drop the connection; the next call opens a fresh one
+            self.local.conn = None
+        elapsed = time.perf_counter() - start
+
+        if self.recording:
+            with self.lock:
+                self.records.append((label, status, elapsed, int(queries) if queries else None))
+        return status, payload
+
+
+# ==================== JOURNEY ====================
+
+def run_journey(client, account, think_time, rng):
+    """One user session; returns True if it ran to the end"""
+
+    def think():
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+
+    status, body = client.call('POST', '/auth/login/', 'POST /auth/login/', body=account)
+    if status != 200:
+        return False
+    token = body['access_token']
+    think()
+
+    status, body = client.call('GET', '/locations/', 'GET /locations/', token)
+    if status != 200 or not body['results']:
+        return False
+    location = rng.choice(body['results'])
+    think()
+
+    status, _ = client.call('GET', f"/locations/{location['id']}/", 'GET /locations/{id}/', token)
+    if status != 200:
+        return False
+    think()
+
+    size = rng.choice(LOCKER_SIZES)
+    status, body = client.call('GET', f"/lockers/available/?location_id={location['id']}&size={size}",
+                               'GET /lockers/available/', token)
+    if status != 200 or not body['results']:
+        return False
+    think()
+
+    # Other users race for the same lockers; try a few before giving up
+    start = datetime.now() + timedelta(minutes=5)
+    booking = None
+    for locker in rng.sample(body['results'], min(3, len(body['results']))):
+        status, booking = client.call('POST', '/bookings/', 'POST /bookings/', token, {
+            'locker_id': locker['id'],
+            'start_time': start.isoformat(timespec='seconds'),
+            'end_time': (start + timedelta(hours=rng.choice((1, 2, 4)))).isoformat(timespec='seconds'),
+            'booking_type': 'Storage',
+        })
+        if status == 201:
+            break
+    else:
+        return False
+    think()
+
+    status, _ = client.call('GET', '/bookings/', 'GET /bookings/', token)
+    if status != 200:
+        return False
+    think()
+
+    status, _ = client.call('POST', f"/bookings/{booking['booking_id']}/cancel/",
+                            'POST /bookings/{id}/cancel/', token, {'reason': 'Load test'})
+    return status == 200
+
+
+def load_accounts(args, client):
+    if args.accounts:
+        with open(args.accounts, newline='') as f:
+            return [{'email': row[0], 'password': row[1]} for row in csv.reader(f) if row]
+
+    run = uuid.uuid4().hex[:8]
+    accounts = []
+    client.recording = False
+    for i in range(args.register):
+        account = {'email': f'loadtest-{run}-{i}@lockspot.test', 'password': ACCOUNT_PASSWORD}
+        status, _ = client.call('POST', '/auth/register/', 'register', body={
+            **account, 'first_name': 'Load', 'last_name': f'Test {i}',
+            'phone': f'+998{int(run, 16) % 10 ** 6:06d}{i:05d}',
+        })
+        if status != 201:
+            raise RuntimeError(f'registering {account["email"]} returned HTTP {status}')
+        accounts.append(account)
+    client.recording = True
+    print(f"  ✓ Registered {len(accounts)} accounts")
+    return accounts
+
+
+# ==================== DRIVERS ====================
+
+def run_closed(args, client, accounts):
+    """`concurrency` users, each running journeys back to back"""
+    deadline = time.monotonic() + args.duration
+    results = defaultdict(int)
+    lock = threading.Lock()
+
+    def user(n):
+        rng = random.Random(args.seed + n)
+        while time.monotonic() < deadline:
+            with lock:
+                if args.journeys and results['started'] >= args.journeys:
+                    return
+                results['started'] += 1
+            ok = run_journey(client, accounts[n % len(accounts)], args.think_time, rng)
+            with lock:
+                results['completed' if ok else 'failed'] += 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(user, range(args.concurrency)))
+    return dict(results), []
+
+
+def run_open(args, client, accounts):
+    """Journeys arrive at `rate` per second regardless of how fast they finish"""
+    rng = random.Random(args.seed)
+    results = defaultdict(int)
+    delays = []
+    lock = threading.Lock()
+
+    def journey(n, scheduled):
+        # Time spent waiting for a free worker: the server is not keeping up
+        delay = time.monotonic() - scheduled
+        ok = run_journey(client, accounts[n % len(accounts)], args.think_time, random.Random(args.seed + n))
+        with lock:
+            delays.append(delay)
+            results['completed' if ok else 'failed'] += 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        start = time.monotonic()
+        next_arrival = start
+        n = 0
+        while next_arrival < start + args.duration and not (args.journeys and n >= args.journeys):
+            time.sleep(max(0.0, next_arrival - time.monotonic()))
+            pool.submit(journey, n, next_arrival)
+            n += 1
+            next_arrival += rng.expovariate(args.rate)
+        results['started'] = n
+    return dict(results), delays
+
+
+# ==================== REPORT ====================
+
+def summarize(records, elapsed):
+    endpoints = {}
+    by_label = defaultdict(list)
+    for record in records:
+        by_label[record[0]].append(record)
+    for label, rows in by_label.items():
+        latencies = [r[2] for r in rows]
+        queries = [r[3] for r in rows if r[3] is not None]
+        endpoints[label] = {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / elapsed, 2),
+            'errors': sum(1 for r in rows if r[1] == 0 or r[1] >= 500),
+            'rejected_4xx': sum(1 for r in rows if 400 <= r[1] < 500),
+            'error_rate': round(sum(1 for r in rows if r[1] == 0 or r[1] >= 500) / len(rows), 4),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+            'avg_queries': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return endpoints
+
+
+def print_report(endpoints, journeys, delays, elapsed):
+    print(f"\n{'Endpoint':<30} {'Reqs':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'err%':>6} {'4xx':>5} {'queries':>8}")
+    for label, e in endpoints.items():
+        queries = f"{e['avg_queries']:.1f}" if e['avg_queries'] is not None else '-'
+        print(f"{label:<30} {e['requests']:>7,} {e['throughput_rps']:>8.1f} {e['p50_ms']:>6.1f}ms "
+              f"{e['p95_ms']:>6.1f}ms {e['p99_ms']:>6.1f}ms {e['error_rate'] * 100:>5.1f}% "
+              f"{e['rejected_4xx']:>5} {queries:>8}")
+    print(f"\nJourneys: {journeys.get('completed', 0):,} completed, {journeys.get('failed', 0):,} failed "
+          f"in {elapsed:.1f} s ({journeys.get('completed', 0) / elapsed:.1f}/s)")
+    if delays:
+        print(f"Arrival queueing: p50 {percentile(delays, 50) * 1000:.1f} ms, "
+              f"p95 {percentile(delays, 95) * 1000:.1f} ms (high values mean the target rate was not met)")
+
+
+def print_comparison(endpoints, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['endpoints']
+    print(f"\nCompared with {baseline_path}:")
+    for label, e in endpoints.items():
+        before = baseline.get(label)
+        if not before:
+            continue
+        change = (e['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        print(f"  {label:<30} p95 {before['p95_ms']:>7.1f} -> {e['p95_ms']:>7.1f} ms ({change:+.0f}%), "
+              f"req/s {before['throughput_rps']:.1f} -> {e['throughput_rps']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the LockSpot API')
+    parser.add_argument('--url', default='http://localhost:8000/api')
+    parser.add_argument('--concurrency', type=int, default=10, help='Concurrent users (closed) or worker cap (open)')
+    parser.add_argument('--rate', type=float, default=0, help='Journeys per second (open model); 0 = closed model')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to generate load')
+    parser.add_argument('--journeys', type=int, default=0, help='Stop after this many journeys (0 = no limit)')
+    parser.add_argument('--think-time', type=float, default=0, help='Mean pause between steps, seconds')
+    parser.add_argument('--accounts', help='CSV file of email,password')
+    parser.add_argument('--register', type=int, default=20, help='Accounts to register when --accounts is not given')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--compare', help='Previous JSON result to compare against')
+    args = parser.parse_args()
+
+    client = ApiClient(args.url)
+    print(f"Load test against {args.url}")
+    accounts = load_accounts(args, client)
+    if not accounts:
+        print("❌ No accounts to log in with")
+        sys.exit(1)
+
+    mode = f'open, {args.rate:g} journeys/s' if args.rate else f'closed, {args.concurrency} users'
+    print(f"  Running for {args.duration:g} s ({mode})...")
+    start = time.perf_counter()
+    if args.rate:
+        journeys, delays = run_open(args, client, accounts)
+    else:
+        journeys, delays = run_closed(args, client, accounts)
+    elapsed = time.perf_counter() - start
+
+    endpoints = summarize(client.records, elapsed)
+    print_report(endpoints, journeys, delays, elapsed)
+    if args.compare:
+        print_comparison(endpoints, args.compare)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'url': args.url, 'mode': 'open' if args.rate else 'closed', 'rate': args.rate,
+                    'concurrency': args.concurrency, 'duration_s': round(elapsed, 2),
+                    'think_time': args.think_time, 'seed': args.seed,
+                    'started_at': datetime.now().isoformat(timespec='seconds'),
+                },
+                'journeys': journeys,
+                'arrival_delay_ms': {
+                    'p50': round(percentile(delays, 50) * 1000, 2),
+                    'p95': round(percentile(delays, 95) * 1000, 2),
+                } if delays else None,
+                'endpoints': endpoints,
+            }, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,165 @@
+"""
+Script Name: simulate_kiosks.py
+Purpose: Simulate station kiosks syncing access codes and measure payload
+         size, latency and server CPU
+Author: LockSpot Team
+
+Usage:
+    # Against a running local server (pass its PID to sample server CPU);
+    # each kiosk uses the key of its location, derived from KIOSK_API_KEY
+    python scripts/testing/simulate_kiosks.py --url http://localhost:8000/api \\
+        --kiosk-secret $KIOSK_API_KEY --kiosks 1000 --rounds 5 --server-pid 12345
+
+    # Encoder only, with synthetic stations (no server or database needed)
+    python scripts/testing/simulate_kiosks.py --synthetic --kiosks 1000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.kiosk_sync import encode_sync_payload, decode_sync_payload, kiosk_key  # noqa: E402
+
+
+def read_process_cpu(pid):
+    """User + system CPU seconds of a local process (Linux /proc)"""
+    if not pid:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, sizes, latencies, cpu_seconds=None):
+    print(f"\n{label}")
+    print(f"  Requests:     {len(sizes):,}")
+    print(f"  Payload:      avg {statistics.mean(sizes):,.0f} B, max {max(sizes):,} B, "
+          f"total {sum(sizes) / 1024:,.1f} KiB")
+    print(f"  Latency:      p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 95) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+    if cpu_seconds is not None:
+        print(f"  Server CPU:   {cpu_seconds:.2f} s ({cpu_seconds / len(sizes) * 1000:.3f} ms per sync)")
+
+
+# ==================== HTTP MODE ====================
+
+def run_http(args):
+    locations = [int(x) for x in args.locations.split(',')] if args.locations else list(range(1, 14))
+    kiosks = [{'location_id': locations[i % len(locations)], 'seq': 0} for i in range(args.kiosks)]
+
+    def sync(kiosk):
+        url = f"{args.url}/kiosk/locations/{kiosk['location_id']}/sync/"
+        if kiosk['seq']:
+            url += f"?since={kiosk['seq']}"
+        key = kiosk_key(args.kiosk_secret, kiosk['location_id'])
+        request = urllib.request.Request(url, headers={'X-Kiosk-Key': key})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=30) as response:
+            body = response.read()
+        elapsed = time.perf_counter() - start
+        kiosk['seq'] = decode_sync_payload(body)['seq']
+        return len(body), elapsed
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for round_number in range(args.rounds + 1):
+            cpu_before = read_process_cpu(args.server_pid)
+            results = list(pool.map(sync, kiosks))
+            cpu_after = read_process_cpu(args.server_pid)
+            cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+            label = 'Full snapshot' if round_number == 0 else f'Delta round {round_number}'
+            report(label, [r[0] for r in results], [r[1] for r in results], cpu)
+            if round_number < args.rounds:
+                time.sleep(args.interval)
+
+
+# ==================== SYNTHETIC MODE ====================
+
+def synthetic_station(location_id, lockers, now):
+    """Rows shaped like fetch_location_changes() output for one station"""
+    bookings, codes = [], []
+    for unit in range(lockers):
+        if random.random() < 0.6:
+            booking_id = location_id * 10000 + unit
+            start = now - timedelta(hours=random.randint(0, 6))
+            end = start + timedelta(hours=random.choice([2, 4, 8, 24]))
+            bookings.append({'id': booking_id, 'locker_id': location_id * 100 + unit,
+                             'start_time': start, 'end_time': end, 'status': 'Active'})
+            for code_type in ('Unlock', 'Lock'):
+                codes.append({'id': booking_id * 2 + len(codes) % 2, 'booking_id': booking_id,
+                              'locker_id': location_id * 100 + unit, 'code_type': code_type,
+                              'code': '%032x' % random.getrandbits(128), 'expires_at': end,
+                              'is_used': False})
+    return bookings, codes
+
+
+def run_synthetic(args):
+    now = datetime.now(timezone.utc)
+    stations = [synthetic_station(i, args.lockers, now) for i in range(args.kiosks)]
+
+    sizes, latencies = [], []
+    cpu_start = time.process_time()
+    for bookings, codes in stations:
+        start = time.perf_counter()
+        payload = encode_sync_payload(int(now.timestamp()), True, bookings, codes)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(payload))
+    report('Full snapshot (encode only)', sizes, latencies, time.process_time() - cpu_start)
+
+    # A delta typically carries a handful of changed bookings per interval
+    sizes, latencies = [], []
+    cpu_start = time.process_time()
+    for bookings, codes in stations:
+        changed = random.sample(bookings, min(len(bookings), 3))
+        changed_codes = [c for c in codes if c['booking_id'] in {b['id'] for b in changed}]
+        start = time.perf_counter()
+        payload = encode_sync_payload(int(now.timestamp()), False, changed, changed_codes)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(payload))
+    report('Delta (encode only)', sizes, latencies, time.process_time() - cpu_start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate kiosk sync load')
+    parser.add_argument('--url', default='http://localhost:8000/api')
+    parser.add_argument('--kiosk-secret', default=os.getenv('KIOSK_API_KEY', ''),
+                        help='KIOSK_API_KEY of the server, to derive each location\'s kiosk key')
+    parser.add_argument('--kiosks', type=int, default=1000)
+    parser.add_argument('--locations', help='Comma-separated location IDs (default 1-13)')
+    parser.add_argument('--rounds', type=int, default=3, help='Delta rounds after the full snapshot')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between rounds')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--server-pid', type=int, help='Local server PID for CPU sampling')
+    parser.add_argument('--synthetic', action='store_true', help='Benchmark the encoder only')
+    parser.add_argument('--lockers', type=int, default=60, help='Lockers per synthetic station')
+    args = parser.parse_args()
+
+    print(f"Simulating {args.kiosks:,} kiosks...")
+    if args.synthetic:
+        run_synthetic(args)
+    else:
+        run_http(args)
+    print("\n✅ Simulation complete")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
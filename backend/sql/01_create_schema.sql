@@ -175,7 +175,8 @@ CREATE TABLE IF NOT EXISTS lockers_booking (
     FOREIGN KEY (discount_id) REFERENCES lockers_discount(id) ON DELETE SET NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_booking_user ON lockers_booking(user_id);
+CREATE INDEX IF NOT EXISTS idx_booking_user_created ON lockers_booking(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_booking_user_st_created ON lockers_booking(user_id, status, created_at);
 CREATE INDEX IF NOT EXISTS idx_booking_locker ON lockers_booking(locker_id);
 CREATE INDEX IF NOT EXISTS idx_booking_status ON lockers_booking(status);
 CREATE INDEX IF NOT EXISTS idx_booking_dates ON lockers_booking(start_time, end_time);
@@ -138,6 +138,7 @@ CREATE TABLE IF NOT EXISTS lockers_discount (
     valid_to DATETIME NOT NULL,
     max_uses INT NULL,
     current_uses INT NOT NULL DEFAULT 0,
+    counter_shards SMALLINT UNSIGNED NOT NULL DEFAULT 0,
     is_active TINYINT(1) NOT NULL DEFAULT 1,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_discount_code (code),
@@ -165,11 +166,14 @@ CREATE TABLE IF NOT EXISTS lockers_booking (
     cancellation_reason TEXT NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_booking_user (user_id),
+    INDEX idx_booking_user_created (user_id, created_at),
+    INDEX idx_booking_user_st_created (user_id, status, created_at),
     INDEX idx_booking_locker (locker_id),
     INDEX idx_booking_status (status),
     INDEX idx_booking_dates (start_time, end_time),
     INDEX idx_booking_created (created_at),
+    INDEX idx_booking_locker_updated (locker_id, updated_at),
+    INDEX idx_booking_updated (updated_at),
     FOREIGN KEY (user_id) REFERENCES auth_user(id) ON DELETE RESTRICT,
     FOREIGN KEY (locker_id) REFERENCES lockers_lockerunit(id) ON DELETE RESTRICT,
     FOREIGN KEY (discount_id) REFERENCES lockers_discount(id) ON DELETE SET NULL
@@ -239,6 +243,7 @@ CREATE TABLE IF NOT EXISTS lockers_review (
     INDEX idx_review_booking (booking_id),
     INDEX idx_review_rating (rating),
     INDEX idx_review_created (created_at),
+    INDEX idx_review_updated (updated_at),
     FOREIGN KEY (booking_id) REFERENCES lockers_booking(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -250,6 +255,7 @@ CREATE TABLE IF NOT EXISTS lockers_review (
 CREATE TABLE IF NOT EXISTS lockers_qraccesscode (
     id INT AUTO_INCREMENT PRIMARY KEY,
     booking_id INT NOT NULL,
+    location_id INT NULL,
     code VARCHAR(255) NOT NULL UNIQUE,
     code_type VARCHAR(15) NOT NULL DEFAULT 'Unlock' CHECK(code_type IN ('Unlock', 'Lock', 'Emergency')),
     generated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
@@ -259,7 +265,10 @@ CREATE TABLE IF NOT EXISTS lockers_qraccesscode (
     INDEX idx_qr_booking (booking_id),
     INDEX idx_qr_code (code),
     INDEX idx_qr_expires (expires_at),
-    FOREIGN KEY (booking_id) REFERENCES lockers_booking(id) ON DELETE CASCADE
+    INDEX idx_qr_location_expires (location_id, expires_at),
+    INDEX idx_qr_generated (generated_at),
+    FOREIGN KEY (booking_id) REFERENCES lockers_booking(id) ON DELETE CASCADE,
+    FOREIGN KEY (location_id) REFERENCES lockers_lockerlocation(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 
@@ -277,7 +286,7 @@ CREATE TABLE IF NOT EXISTS lockers_notification (
     is_read TINYINT(1) NOT NULL DEFAULT 0,
     read_at DATETIME NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_notification_user (user_id),
+    INDEX idx_notification_user_created (user_id, created_at),
     INDEX idx_notification_read (is_read),
     INDEX idx_notification_type (notification_type),
     INDEX idx_notification_created (created_at),
@@ -285,6 +294,14 @@ CREATE TABLE IF NOT EXISTS lockers_notification (
     FOREIGN KEY (related_booking_id) REFERENCES lockers_booking(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Unread live notifications per user (GET /api/notifications/unread-count/),
+-- adjusted in the same transaction as every notification write (api/notifications.py)
+CREATE TABLE IF NOT EXISTS lockers_notificationcounter (
+    user_id INT PRIMARY KEY,
+    unread INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES auth_user(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 
 -- ==========================================
 -- 13. AUDIT LOG TABLE
@@ -307,3 +324,344 @@ CREATE TABLE IF NOT EXISTS lockers_auditlog (
     INDEX idx_audit_created (created_at),
     FOREIGN KEY (user_id) REFERENCES auth_user(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ==========================================
+-- 14. DISCOUNT USAGE SHARD TABLE
+-- Counter slots for hot discount codes; total uses = current_uses + SUM(uses)
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS lockers_discountusageshard (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    discount_id INT NOT NULL,
+    slot SMALLINT UNSIGNED NOT NULL,
+    uses INT NOT NULL DEFAULT 0,
+    max_uses INT NULL,
+    UNIQUE KEY unique_discount_slot (discount_id, slot),
+    FOREIGN KEY (discount_id) REFERENCES lockers_discount(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ==========================================
+-- 15. ARCHIVE TABLES
+-- Finished bookings past the retention window, moved in batches with their
+-- payments, QR codes and notifications (scripts/maintenance/archive_bookings.py).
+-- Same columns and ids as the live tables, no foreign keys.
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS lockers_bookingarchive (
+    id INT NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    locker_id INT NOT NULL,
+    discount_id INT NULL,
+    start_time DATETIME NOT NULL,
+    end_time DATETIME NOT NULL,
+    booking_type VARCHAR(10) NOT NULL,
+    subtotal_amount DECIMAL(10, 2) NOT NULL,
+    discount_amount DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    status VARCHAR(15) NOT NULL,
+    cancellation_reason TEXT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_booking_archive_user (user_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_paymentarchive (
+    id INT NOT NULL PRIMARY KEY,
+    booking_id INT NOT NULL UNIQUE,
+    method_id INT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    payment_date DATETIME NOT NULL,
+    transaction_reference VARCHAR(100) NULL,
+    status VARCHAR(15) NOT NULL,
+    failure_reason VARCHAR(255) NULL,
+    refund_amount DECIMAL(10, 2) NULL,
+    refund_date DATETIME NULL,
+    processed_by VARCHAR(50) NULL,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_qraccesscodearchive (
+    id INT NOT NULL PRIMARY KEY,
+    booking_id INT NOT NULL,
+    location_id INT NULL,
+    code VARCHAR(255) NOT NULL,
+    code_type VARCHAR(15) NOT NULL,
+    generated_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL,
+    used_at DATETIME NULL,
+    is_used TINYINT(1) NOT NULL DEFAULT 0,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_qr_archive_booking (booking_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_notificationarchive (
+    id INT NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    title VARCHAR(100) NOT NULL,
+    message TEXT NOT NULL,
+    notification_type VARCHAR(15) NOT NULL,
+    related_booking_id INT NULL,
+    is_read TINYINT(1) NOT NULL DEFAULT 0,
+    read_at DATETIME NULL,
+    created_at DATETIME NOT NULL,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_notification_archive_user (user_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ==========================================
+-- 16. REPORTING ROLLUPS
+-- Refreshed incrementally from lockers_booking.updated_at and
+-- lockers_review.updated_at by `python manage.py refresh_rollups`.
+-- Averages are kept as sums and counts so changes apply as deltas.
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS lockers_rollupstate (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(50) NOT NULL UNIQUE,
+    watermark DATETIME NULL,
+    refreshed_at DATETIME NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- What each booking last contributed (kept after the booking is archived)
+CREATE TABLE IF NOT EXISTS lockers_rollupbookingfact (
+    booking_id INT NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    location_id INT NOT NULL,
+    booking_date DATE NOT NULL,
+    created_at DATETIME NOT NULL,
+    status VARCHAR(15) NOT NULL,
+    subtotal_amount DECIMAL(10, 2) NOT NULL,
+    discount_amount DECIMAL(10, 2) NOT NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    rating SMALLINT UNSIGNED NULL,
+    discount_id INT NULL,
+    start_time DATETIME NULL,
+    end_time DATETIME NULL,
+    INDEX idx_rollup_fact_day (booking_date, location_id, user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_rollupdailyrevenue (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    day DATE NOT NULL,
+    location_id INT NOT NULL,
+    bookings INT NOT NULL DEFAULT 0,
+    unique_customers INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    discounts DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    net_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    completed_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    cancelled_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    UNIQUE KEY unique_day_location (day, location_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_rolluplocationstats (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    location_id INT NOT NULL UNIQUE,
+    total_lockers INT NOT NULL DEFAULT 0,
+    available_lockers INT NOT NULL DEFAULT 0,
+    booked_lockers INT NOT NULL DEFAULT 0,
+    maintenance_lockers INT NOT NULL DEFAULT 0,
+    bookings INT NOT NULL DEFAULT 0,
+    completed_bookings INT NOT NULL DEFAULT 0,
+    cancelled_bookings INT NOT NULL DEFAULT 0,
+    booking_value DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    completed_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    reviews INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_rollupcustomeractivity (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL UNIQUE,
+    bookings INT NOT NULL DEFAULT 0,
+    completed_bookings INT NOT NULL DEFAULT 0,
+    cancelled_bookings INT NOT NULL DEFAULT 0,
+    total_spent DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    last_booking_at DATETIME NULL,
+    reviews INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Booked minutes per local hour of day (admin analytics dashboard)
+CREATE TABLE IF NOT EXISTS lockers_rolluphourlyoccupancy (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    location_id INT NOT NULL,
+    hour SMALLINT UNSIGNED NOT NULL,
+    bookings INT NOT NULL DEFAULT 0,
+    booked_minutes BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY unique_location_hour (location_id, hour)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lockers_rollupdiscountimpact (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    discount_id INT NOT NULL UNIQUE,
+    bookings INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    discounts DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    net_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0.00
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- Next-week utilization forecast per location and size, rewritten nightly
+-- by `python manage.py forecast_demand` (lockers/forecasting.py)
+CREATE TABLE IF NOT EXISTS lockers_demandforecast (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    location_id INT NOT NULL,
+    size VARCHAR(10) NOT NULL,
+    lockers INT NOT NULL,
+    history_weeks INT NOT NULL,
+    forecast_start DATETIME NOT NULL,
+    peak_utilization DOUBLE NOT NULL,
+    peak_at DATETIME NOT NULL,
+    avg_utilization DOUBLE NOT NULL,
+    last_week_peak DOUBLE NOT NULL,
+    weekly_trend DOUBLE NOT NULL,
+    hourly JSON NOT NULL,
+    computed_at DATETIME NOT NULL,
+    UNIQUE KEY unique_location_size (location_id, size),
+    FOREIGN KEY (location_id) REFERENCES lockers_lockerlocation(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ==========================================
+-- 17. REPORTING VIEWS (over the rollups)
+-- MySQL replacements for the full-scan views in 02_create_views.sql
+-- ==========================================
+
+CREATE OR REPLACE VIEW v_revenue_report AS
+SELECT
+    d.day AS booking_date,
+    SUM(d.bookings) AS total_bookings,
+    SUM(d.gross_revenue) AS gross_revenue,
+    SUM(d.discounts) AS total_discounts,
+    SUM(d.net_revenue) AS net_revenue,
+    SUM(d.completed_revenue) AS completed_revenue,
+    SUM(d.cancelled_revenue) AS cancelled_revenue,
+    ROUND(SUM(d.net_revenue) / NULLIF(SUM(d.bookings), 0), 2) AS avg_booking_value
+FROM lockers_rollupdailyrevenue d
+GROUP BY d.day;
+
+CREATE OR REPLACE VIEW v_location_stats AS
+SELECT
+    loc.id AS location_id,
+    loc.name AS location_name,
+    addr.city,
+    s.total_lockers,
+    s.available_lockers,
+    s.booked_lockers,
+    s.maintenance_lockers,
+    s.bookings AS total_bookings,
+    ROUND(s.rating_sum / NULLIF(s.reviews, 0), 2) AS avg_rating,
+    s.reviews AS review_count,
+    s.completed_revenue AS total_revenue,
+    loc.is_active AS location_active
+FROM lockers_lockerlocation loc
+INNER JOIN lockers_locationaddress addr ON loc.address_id = addr.id
+LEFT JOIN lockers_rolluplocationstats s ON s.location_id = loc.id;
+
+CREATE OR REPLACE VIEW v_popular_locations AS
+SELECT
+    loc.id AS location_id,
+    loc.name AS location_name,
+    addr.city,
+    addr.street_address,
+    s.bookings AS total_bookings,
+    ROUND(s.rating_sum / NULLIF(s.reviews, 0), 2) AS avg_rating,
+    s.reviews AS review_count,
+    s.booking_value AS total_revenue,
+    ROUND(s.booking_value / NULLIF(s.bookings, 0), 2) AS avg_booking_value,
+    s.available_lockers,
+    s.total_lockers
+FROM lockers_lockerlocation loc
+INNER JOIN lockers_locationaddress addr ON loc.address_id = addr.id
+INNER JOIN lockers_rolluplocationstats s ON s.location_id = loc.id
+WHERE loc.is_active = 1;
+
+CREATE OR REPLACE VIEW v_customer_activity AS
+SELECT
+    u.id AS user_id,
+    u.email,
+    CONCAT(u.first_name, ' ', u.last_name) AS full_name,
+    u.phone,
+    u.user_type,
+    u.is_verified,
+    u.created_at AS registration_date,
+    c.bookings AS total_bookings,
+    c.completed_bookings,
+    c.cancelled_bookings,
+    c.total_spent,
+    ROUND(c.total_spent / NULLIF(c.bookings, 0), 2) AS avg_booking_value,
+    c.last_booking_at AS last_booking_date,
+    c.reviews AS reviews_given,
+    ROUND(c.rating_sum / NULLIF(c.reviews, 0), 2) AS avg_rating_given
+FROM auth_user u
+INNER JOIN lockers_rollupcustomeractivity c ON c.user_id = u.id
+WHERE u.user_type = 'Customer';
+
+
+-- ==========================================
+-- 18. OUTBOX
+-- Booking side effects (notifications, audit log, QR codes, cache
+-- invalidation), inserted in the booking's transaction and drained by
+-- `python manage.py dispatch_outbox` (api/outbox.py)
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS lockers_outboxevent (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    booking_id INT NOT NULL,
+    payload JSON NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'Pending' CHECK(status IN ('Pending', 'Done', 'Failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    done_handlers JSON NOT NULL,
+    last_error TEXT NULL,
+    next_attempt_at DATETIME NOT NULL,
+    created_at DATETIME NOT NULL,
+    processed_at DATETIME NULL,
+    INDEX idx_outbox_booking (booking_id),
+    INDEX idx_outbox_due (status, next_attempt_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ==========================================
+-- 19. REFRESH TOKENS
+-- Opaque refresh tokens (SHA-256 only), rotated on every
+-- POST /api/auth/refresh/ (api/authentication.py); old rows are purged by
+-- scripts/maintenance/purge_expired.py
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS lockers_refreshtoken (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    token_hash CHAR(64) NOT NULL UNIQUE,
+    expires_at DATETIME NOT NULL,
+    created_at DATETIME NOT NULL,
+    revoked_at DATETIME NULL,
+    INDEX idx_refresh_user (user_id, revoked_at),
+    INDEX idx_refresh_created (created_at),
+    FOREIGN KEY (user_id) REFERENCES auth_user(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ==========================================
+-- 20. ADMIN BULK JOBS
+-- Progress of large admin bulk actions run in a background thread
+-- (lockers/bulk_actions.py); shared by all workers, so the progress page
+-- works on any of them
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS lockers_bulkjob (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    label VARCHAR(100) NOT NULL,
+    total INT NOT NULL,
+    processed INT NOT NULL DEFAULT 0,
+    changed INT NOT NULL DEFAULT 0,
+    status VARCHAR(10) NOT NULL DEFAULT 'Running' CHECK(status IN ('Running', 'Done', 'Failed')),
+    error TEXT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -73,34 +73,6 @@ WHERE l.status = 'Available'
 ORDER BY loc.name, l.unit_number;
 
 
--- ==========================================
--- View: Location Statistics
--- Aggregate statistics per location
--- ==========================================
-
-CREATE VIEW IF NOT EXISTS v_location_stats AS
-SELECT 
-    loc.id AS location_id,
-    loc.name AS location_name,
-    addr.city,
-    COUNT(DISTINCT l.id) AS total_lockers,
-    SUM(CASE WHEN l.status = 'Available' THEN 1 ELSE 0 END) AS available_lockers,
-    SUM(CASE WHEN l.status = 'Booked' THEN 1 ELSE 0 END) AS booked_lockers,
-    SUM(CASE WHEN l.status = 'Maintenance' THEN 1 ELSE 0 END) AS maintenance_lockers,
-    COUNT(DISTINCT b.id) AS total_bookings,
-    ROUND(AVG(CASE WHEN r.rating IS NOT NULL THEN r.rating END), 2) AS avg_rating,
-    COUNT(DISTINCT r.id) AS review_count,
-    ROUND(SUM(CASE WHEN b.status = 'Completed' THEN b.total_amount ELSE 0 END), 2) AS total_revenue,
-    loc.is_active AS location_active
-FROM lockers_lockerlocation loc
-INNER JOIN lockers_locationaddress addr ON loc.address_id = addr.id
-LEFT JOIN lockers_lockerunit l ON loc.id = l.location_id
-LEFT JOIN lockers_booking b ON l.id = b.locker_id
-LEFT JOIN lockers_review r ON b.id = r.booking_id
-GROUP BY loc.id, loc.name, addr.city, loc.is_active
-ORDER BY loc.name;
-
-
 -- ==========================================
 -- View: User Booking History
 -- Complete booking history with all details
@@ -141,83 +113,9 @@ ORDER BY b.created_at DESC;
 
 
 -- ==========================================
--- View: Revenue Report
--- Daily revenue summary
--- ==========================================
-
-CREATE VIEW IF NOT EXISTS v_revenue_report AS
-SELECT 
-    DATE(b.created_at) AS booking_date,
-    COUNT(DISTINCT b.id) AS total_bookings,
-    COUNT(DISTINCT b.user_id) AS unique_customers,
-    SUM(b.subtotal_amount) AS gross_revenue,
-    SUM(b.discount_amount) AS total_discounts,
-    SUM(b.total_amount) AS net_revenue,
-    SUM(CASE WHEN b.status = 'Completed' THEN b.total_amount ELSE 0 END) AS completed_revenue,
-    SUM(CASE WHEN b.status = 'Cancelled' THEN b.total_amount ELSE 0 END) AS cancelled_revenue,
-    ROUND(AVG(b.total_amount), 2) AS avg_booking_value
-FROM lockers_booking b
-WHERE b.status NOT IN ('Pending')
-GROUP BY DATE(b.created_at)
-ORDER BY booking_date DESC;
-
-
--- ==========================================
--- View: Popular Locations
--- Locations ranked by booking frequency
+-- Revenue, location and customer reports
+-- v_revenue_report, v_location_stats, v_popular_locations and
+-- v_customer_activity are defined in 01_create_schema_mysql.sql over the
+-- reporting rollup tables (refreshed by `python manage.py refresh_rollups`)
+-- instead of grouping every booking on each read.
 -- ==========================================
-
-CREATE VIEW IF NOT EXISTS v_popular_locations AS
-SELECT 
-    loc.id AS location_id,
-    loc.name AS location_name,
-    addr.city,
-    addr.street_address,
-    COUNT(DISTINCT b.id) AS total_bookings,
-    COUNT(DISTINCT b.user_id) AS unique_customers,
-    ROUND(AVG(CASE WHEN r.rating IS NOT NULL THEN r.rating END), 2) AS avg_rating,
-    COUNT(DISTINCT r.id) AS review_count,
-    ROUND(SUM(b.total_amount), 2) AS total_revenue,
-    ROUND(AVG(b.total_amount), 2) AS avg_booking_value,
-    SUM(CASE WHEN l.status = 'Available' THEN 1 ELSE 0 END) AS available_lockers,
-    COUNT(DISTINCT l.id) AS total_lockers
-FROM lockers_lockerlocation loc
-INNER JOIN lockers_locationaddress addr ON loc.address_id = addr.id
-LEFT JOIN lockers_lockerunit l ON loc.id = l.location_id
-LEFT JOIN lockers_booking b ON l.id = b.locker_id
-LEFT JOIN lockers_review r ON b.id = r.booking_id
-WHERE loc.is_active = 1
-GROUP BY loc.id, loc.name, addr.city, addr.street_address
-ORDER BY total_bookings DESC, avg_rating DESC;
-
-
--- ==========================================
--- View: Customer Activity
--- Customer engagement metrics
--- ==========================================
-
-CREATE VIEW IF NOT EXISTS v_customer_activity AS
-SELECT 
-    u.id AS user_id,
-    u.email,
-    u.first_name || ' ' || u.last_name AS full_name,
-    u.phone,
-    u.user_type,
-    u.is_verified,
-    u.created_at AS registration_date,
-    COUNT(DISTINCT b.id) AS total_bookings,
-    SUM(CASE WHEN b.status = 'Completed' THEN 1 ELSE 0 END) AS completed_bookings,
-    SUM(CASE WHEN b.status = 'Cancelled' THEN 1 ELSE 0 END) AS cancelled_bookings,
-    ROUND(SUM(b.total_amount), 2) AS total_spent,
-    ROUND(AVG(b.total_amount), 2) AS avg_booking_value,
-    MAX(b.created_at) AS last_booking_date,
-    COUNT(DISTINCT r.id) AS reviews_given,
-    ROUND(AVG(r.rating), 2) AS avg_rating_given,
-    COUNT(DISTINCT pm.id) AS saved_payment_methods
-FROM auth_user u
-LEFT JOIN lockers_booking b ON u.id = b.user_id
-LEFT JOIN lockers_review r ON b.id = r.booking_id
-LEFT JOIN lockers_paymentmethod pm ON u.id = pm.user_id AND pm.is_active = 1
-WHERE u.user_type = 'Customer'
-GROUP BY u.id, u.email, u.first_name, u.last_name, u.phone, u.user_type, u.is_verified, u.created_at
-ORDER BY total_bookings DESC, total_spent DESC;